@@ -34,9 +34,13 @@ from sutekh.base.core.DBUtility import refresh_tables, make_adapter_caches
 from sutekh.base.Utility import (ensure_dir_exists, prefs_dir, sqlite_uri,
                                  setup_logging)
 from sutekh.core.DatabaseUpgrade import DBUpgradeManager
+from sutekh.core.SutekhObjectCache import SutekhObjectCache, get_snapshot_file
 from sutekh.base.core.CardSetHolder import CardSetWrapper
 from sutekh.base.CliUtils import (run_filter, print_card_filter_list,
-                                  print_card_list, do_print_card)
+                                  print_card_list, do_print_card,
+                                  print_similar_card_sets)
+from sutekh.base.core.CardSetSimilarity import METRICS, COSINE
+from sutekh.core.TWDAIndex import get_twda_deck_ids
 from sutekh.io.XmlFileHandling import (PhysicalCardXmlFile,
                                        PhysicalCardSetXmlFile,
                                        AbstractCardSetXmlFile,
@@ -149,6 +153,22 @@ def parse_options(aArgs):
                           dest="filter_detailed", default=False,
                           help="Print card details for filter results, "
                                "rather than just card names")
+    oOptParser.add_option("--similar-to", type="string", dest="similar_to",
+                          default=None,
+                          help="Print the card sets most similar to the "
+                               "given card set")
+    oOptParser.add_option("--similar-count", type="int",
+                          dest="similar_count", default=10,
+                          help="Number of similar card sets to print "
+                               "(default 10)")
+    oOptParser.add_option("--similar-metric", type="choice",
+                          dest="similar_metric", choices=METRICS,
+                          default=COSINE,
+                          help="Similarity measure to use (%s, default "
+                               "%s)" % (', '.join(METRICS), COSINE))
+    oOptParser.add_option("--similar-twda", action="store_true",
+                          dest="similar_twda", default=False,
+                          help="Only compare against TWDA decks")
     oOptParser.add_option("--print-card", type="string", dest="print_card",
                           default=None,
                           help="Print the details of the given card")
@@ -157,6 +177,12 @@ def parse_options(aArgs):
                           help="Encoding to use when printing output")
     oOptParser.add_option("--verbose", action="store_true", dest="verbose",
                           default=False, help="Display warning messages")
+    oOptParser.add_option("--object-cache", action="store_true",
+                          dest="object_cache", default=False,
+                          help="Load the card object cache before processing "
+                               "other options, using the saved snapshot "
+                               "if it is still valid. Speeds up repeated "
+                               "scripted queries")
     oOptParser.add_option("--fetch-files", action="store_true", dest="fetch",
                           default=False,
                           help="Fetch the rulings, WW cardlist and extra card "
@@ -349,6 +375,10 @@ def main_with_args(aTheArgs):
     # card sets
     make_adapter_caches()
 
+    if oOpts.object_cache:
+        # Hold a reference, so the objects stay cached until we're done
+        _oCache = SutekhObjectCache(get_snapshot_file())
+
     if oOpts.read_physical_cards_from is not None:
         oFile = PhysicalCardXmlFile(oOpts.read_physical_cards_from)
         oFile.read()
@@ -391,6 +421,15 @@ def main_with_args(aTheArgs):
         print_card_filter_list(dResults, print_card_details,
                                oOpts.filter_detailed)
 
+    if oOpts.similar_to is not None:
+        aCandidates = None
+        if oOpts.similar_twda:
+            aCandidates = set(get_twda_deck_ids())
+        if not print_similar_card_sets(oOpts.similar_to,
+                                       oOpts.similar_count,
+                                       oOpts.similar_metric, aCandidates):
+            return 1
+
     if oOpts.print_card is not None:
         if not do_print_card(oOpts.print_card, print_card_details):
             return 1
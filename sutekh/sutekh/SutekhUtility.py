@@ -25,13 +25,16 @@ from sutekh.io.RulingParser import RulingParser
 from sutekh.io.ExpInfoParser import ExpInfoParser
 
 
-def read_white_wolf_list(oFile, oLogHandler=None):
+def read_white_wolf_list(oFile, oLogHandler=None, bBulk=True):
     """Parse in a new White Wolf cardlist
 
        oFile is an object with a .open() method (e.g.
        sutekh.base.io.EncodedFile.EncodedFile)
+       If bBulk is True, new cards are written to the database in bulk
+       once the whole list has been parsed, and the caches are flushed
+       afterwards.
        """
-    oParser = WhiteWolfTextParser(oLogHandler)
+    oParser = WhiteWolfTextParser(oLogHandler, bBulk)
     safe_parser(oFile, oParser)
 
 
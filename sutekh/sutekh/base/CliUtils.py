@@ -11,13 +11,14 @@ functions to help the CLI programs
 from __future__ import print_function
 
 from sqlobject import SQLObjectNotFound
-from .core.BaseTables import (PhysicalCard,
+from .core.BaseTables import (PhysicalCard, PhysicalCardSet,
                               MapPhysicalCardToPhysicalCardSet)
 from .core.BaseAdapters import IPhysicalCardSet, IAbstractCard
 from .core.BaseFilters import (PhysicalCardSetFilter, FilterAndBox,
                                PhysicalCardFilter)
 from .core.FilterParser import FilterParser
 from .core.CardSetUtilities import format_cs_list
+from .core.CardSetSimilarity import CardSetSimilarityIndex
 from .core.DBUtility import make_adapter_caches
 
 
@@ -83,6 +84,22 @@ def print_card_list(sTreeRoot):
     return True
 
 
+def print_similar_card_sets(sCardSet, iTop, sMetric, aCandidates=None):
+    """Print the card sets most similar to the given card set, optionally
+       limited to the card set ids in aCandidates."""
+    try:
+        oCardSet = IPhysicalCardSet(sCardSet)
+    except SQLObjectNotFound:
+        print('Unable to load card set', sCardSet)
+        return False
+    oIndex = CardSetSimilarityIndex()
+    oIndex.rebuild()
+    for fScore, iSetId in oIndex.find_similar_card_sets(
+            oCardSet, iTop, sMetric, aCandidates):
+        print('%.3f  %s' % (fScore, PhysicalCardSet.get(iSetId).name))
+    return True
+
+
 def do_print_card(sCardName, fPrintCard):
     """Print a card, handling possible encoding issues."""
     make_adapter_caches()  # Needed for lookups to work
@@ -16,18 +16,23 @@
 # BaseTables. We want to keep all the database upgrade stuff together.
 # so we jsut live with it
 
+import logging
+import time
 from logging import Logger
 
 # pylint: disable=no-name-in-module
 # sqlobject confuses pylint here
 from sqlobject import sqlhub, connectionForURI, SQLObjectNotFound
+from sqlobject.sqlbuilder import Table, Select, Insert, SQLObjectState
 # pylint: enable=no-name-in-module
 
 from .BaseTables import (PhysicalCard, AbstractCard,
                          PhysicalCardSet, Expansion,
                          Rarity, RarityPair, CardType,
                          Ruling, Keyword, Artist, Metadata,
-                         LookupHints, Printing, PrintingProperty)
+                         LookupHints, Printing, PrintingProperty,
+                         MapPhysicalCardToPhysicalCardSet,
+                         MapPrintingToPrintingProperty)
 from .DBUtility import flush_cache, refresh_tables
 from .BaseDBManagement import UnknownVersion
 from .DatabaseVersion import DatabaseVersion
@@ -40,6 +45,74 @@ from .DatabaseVersion import DatabaseVersion
 # duplicated copies for upgrading base classes, but avoids issues of
 # when to remove upgrade logic from here.
 
+# Tables which don't change version are copied in bulk, reading the rows
+# in id order and inserting them with multi-row inserts, rather than
+# creating an SQLObject for each row. This is the number of rows
+# read and inserted at a time.
+BULK_COPY_ROWS = 500
+
+
+def insert_rows(oConn, sTable, aColumns, aRows):
+    """Insert the list of value tuples aRows into the given columns of
+       sTable, using multi-row inserts."""
+    for iStart in range(0, len(aRows), BULK_COPY_ROWS):
+        oConn.query(oConn.sqlrepr(Insert(
+            sTable, template=aColumns,
+            valueList=aRows[iStart:iStart + BULK_COPY_ROWS])))
+
+
+def bulk_copy_table(cClass, oOrigConn, oDestConn, bKeepIds=True,
+                    fRowMap=None):
+    """Copy the contents of cClass's table from oOrigConn to oDestConn.
+
+       The rows are read in id order a chunk at a time, so we never hold
+       the whole table in memory. Values are converted using the column
+       validators, so copying between different database types works. If
+       bKeepIds is False, the destination database assigns new ids.
+       fRowMap, if given, is called with the list of column values (in
+       sqlmeta.columnList order) for each row, and returns the values to
+       insert, or None to skip the row.
+
+       This is a generator, yielding the number of rows copied for each
+       chunk."""
+    aCols = cClass.sqlmeta.columnList
+    oTable = Table(cClass.sqlmeta.table)
+    oId = getattr(oTable, cClass.sqlmeta.idName)
+    aSelect = [oId] + [getattr(oTable, oCol.dbName) for oCol in aCols]
+    aTemplate = [oCol.dbName for oCol in aCols]
+    if bKeepIds:
+        aTemplate.insert(0, cClass.sqlmeta.idName)
+    oReadState = SQLObjectState(cClass, connection=oOrigConn)
+    oWriteState = SQLObjectState(cClass, connection=oDestConn)
+    aConverters = [(oCol.to_python, oCol.from_python) for oCol in aCols]
+    oWhere = None
+    while True:
+        dArgs = {'orderBy': oId, 'limit': BULK_COPY_ROWS}
+        if oWhere is not None:
+            dArgs['where'] = oWhere
+        aChunk = oOrigConn.queryAll(oOrigConn.sqlrepr(Select(aSelect,
+                                                            **dArgs)))
+        if not aChunk:
+            return
+        aRows = []
+        for tRow in aChunk:
+            aValues = [fToPython(oValue, oReadState) if fToPython
+                       else oValue for oValue, (fToPython, _fFrom) in
+                       zip(tRow[1:], aConverters)]
+            if fRowMap:
+                aValues = fRowMap(aValues)
+                if aValues is None:
+                    continue
+            aValues = [fFromPython(oValue, oWriteState) if fFromPython
+                       else oValue for oValue, (_fTo, fFromPython) in
+                       zip(aValues, aConverters)]
+            if bKeepIds:
+                aValues.insert(0, tRow[0])
+            aRows.append(tuple(aValues))
+        insert_rows(oDestConn, cClass.sqlmeta.table, aTemplate, aRows)
+        yield len(aRows)
+        oWhere = oId > aChunk[-1][0]
+
 
 class BaseDBUpgradeManager:
     """Convience class to define and manage all the various aspects
@@ -137,11 +210,38 @@ class BaseDBUpgradeManager:
         """Check number of items in upgraded DB for progress bars, etc."""
         raise NotImplementedError('Implement cur_database_count')
 
+    def _bulk_copy(self, cClass, oOrigConn, oTrans, oLogger=None,
+                   bKeepIds=True, fRowMap=None):
+        """Copy cClass's table with bulk_copy_table, reporting the copy
+           rate.
+
+           If oLogger is given, we log each chunk, with the number of rows
+           as the number of progress steps."""
+        fStart = time.perf_counter()
+        iTotal = 0
+        for iRows in bulk_copy_table(cClass, oOrigConn, oTrans, bKeepIds,
+                                     fRowMap):
+            iTotal += iRows
+            if oLogger:
+                oLogger.info('copied %d rows of %s', iRows,
+                             cClass.sqlmeta.table, extra={'iSteps': iRows})
+        fTime = time.perf_counter() - fStart
+        logging.info('Copied %d rows of %s in %.3fs (%.0f rows/s)', iTotal,
+                     cClass.sqlmeta.table, fTime,
+                     iTotal / fTime if fTime > 0 else 0)
+        return iTotal
+
+    def _get_join_tables(self, cClass):
+        """Return the mapping table classes for cClass's related joins."""
+        aTables = set(oJoin.intermediateTable for oJoin in
+                      cClass.sqlmeta.joins
+                      if getattr(oJoin, 'intermediateTable', None))
+        return [cTable for cTable in self._aTableList
+                if cTable.sqlmeta.table in aTables]
+
     def _copy_rarity(self, oOrigConn, oTrans):
         """Copy rarity tables, assuming same version"""
-        for oObj in Rarity.select(connection=oOrigConn):
-            _oCopy = Rarity(id=oObj.id, name=oObj.name,
-                            shortname=oObj.shortname, connection=oTrans)
+        self._bulk_copy(Rarity, oOrigConn, oTrans)
 
     def _copy_old_lookup_hints(self, oOrigConn, oTrans, oVer):
         """Copy lookup table, upgrading versions as needed"""
@@ -225,11 +325,7 @@ class BaseDBUpgradeManager:
 
     def _copy_print_properties(self, oOrigConn, oTrans):
         """Copy Keyword, assuming versions match"""
-        for oObj in PrintingProperty.select(connection=oOrigConn):
-            _oCopy = PrintingProperty(id=oObj.id,
-                                      value=oObj.value,
-                                      canonicalValue=oObj.canonicalValue,
-                                      connection=oTrans)
+        self._bulk_copy(PrintingProperty, oOrigConn, oTrans)
 
     def _copy_old_print_properties(self, oOrigConn, oTrans, oVer):
         """Copy printing data table, upgrading versions as needed"""
@@ -260,13 +356,9 @@ class BaseDBUpgradeManager:
 
     def _copy_printing(self, oOrigConn, oTrans):
         """Copy Printing, assuming versions match"""
-        for oObj in Printing.select(connection=oOrigConn):
-            oPrintCopy = Printing(id=oObj.id, expansionID=oObj.expansionID,
-                                  name=oObj.name, connection=oTrans)
-            for oData in oObj.properties:
-                # pylint: disable=no-member
-                # SQLObject confuses pylint
-                oPrintCopy.addPrintingProperty(oData)
+        self._bulk_copy(Printing, oOrigConn, oTrans)
+        self._bulk_copy(MapPrintingToPrintingProperty, oOrigConn, oTrans,
+                        bKeepIds=False)
 
     def _copy_old_printing(self, oOrigConn, oTrans, oVer):
         """Copy printing table, upgrading versions as needed"""
@@ -294,10 +386,7 @@ class BaseDBUpgradeManager:
 
     def _copy_expansion(self, oOrigConn, oTrans):
         """Copy expansion, assuming versions match"""
-        for oObj in Expansion.select(connection=oOrigConn):
-            _oCopy = Expansion(id=oObj.id, name=oObj.name,
-                               shortname=oObj.shortname,
-                               connection=oTrans)
+        self._bulk_copy(Expansion, oOrigConn, oTrans)
 
     def _copy_old_expansion(self, oOrigConn, oTrans, oVer):
         """Copy Expansion, updating as needed"""
@@ -316,8 +405,7 @@ class BaseDBUpgradeManager:
 
     def _copy_card_type(self, oOrigConn, oTrans):
         """Copy CardType, assuming versions match"""
-        for oObj in CardType.select(connection=oOrigConn):
-            _oCopy = CardType(id=oObj.id, name=oObj.name, connection=oTrans)
+        self._bulk_copy(CardType, oOrigConn, oTrans)
 
     def _copy_old_card_type(self, oOrigConn, oTrans, oVer):
         """Copy CardType, upgrading as needed"""
@@ -335,9 +423,7 @@ class BaseDBUpgradeManager:
 
     def _copy_ruling(self, oOrigConn, oTrans):
         """Copy Ruling, assuming versions match"""
-        for oObj in Ruling.select(connection=oOrigConn):
-            _oCopy = Ruling(id=oObj.id, text=oObj.text, code=oObj.code,
-                            url=oObj.url, connection=oTrans)
+        self._bulk_copy(Ruling, oOrigConn, oTrans)
 
     def _copy_old_ruling(self, oOrigConn, oTrans, oVer):
         """Copy Ruling, upgrading as needed"""
@@ -356,38 +442,15 @@ class BaseDBUpgradeManager:
 
     def _copy_lookup_hints(self, oOrigConn, oTrans):
         """Copy LookupHints, assuming versions match"""
-        for oObj in LookupHints.select(connection=oOrigConn):
-            # Force for SQLObject >= 0.11.4
-            # pylint: disable=protected-access
-            # Need to access _connect here
-            oObj._connection = oOrigConn
-            # pylint: enable=protected-access
-            _oCopy = LookupHints(id=oObj.id, domain=oObj.domain,
-                                 lookup=oObj.lookup, value=oObj.value,
-                                 connection=oTrans)
+        self._bulk_copy(LookupHints, oOrigConn, oTrans)
 
     def _copy_metadata(self, oOrigConn, oTrans):
         """Copy Metadata, assuming versions match"""
-        for oObj in Metadata.select(connection=oOrigConn):
-            # Force for SQLObject >= 0.11.4
-            # pylint: disable=protected-access
-            # Need to access _connect here
-            oObj._connection = oOrigConn
-            # pylint: enable=protected-access
-            _oCopy = Metadata(id=oObj.id, dataKey=oObj.dataKey,
-                              value=oObj.value,
-                              connection=oTrans)
+        self._bulk_copy(Metadata, oOrigConn, oTrans)
 
     def _copy_rarity_pair(self, oOrigConn, oTrans):
         """Copy RairtyPair, assuming versions match"""
-        for oObj in RarityPair.select(connection=oOrigConn):
-            # Force for SQLObject >= 0.11.4
-            # pylint: disable=protected-access
-            # Need to access _connect here
-            oObj._connection = oOrigConn
-            # pylint: enable=protected-access
-            _oCopy = RarityPair(id=oObj.id, expansion=oObj.expansion,
-                                rarity=oObj.rarity, connection=oTrans)
+        self._bulk_copy(RarityPair, oOrigConn, oTrans)
 
     def _copy_old_rarity_pair(self, oOrigConn, oTrans, oVer):
         """Copy RarityPair, upgrading as needed"""
@@ -407,9 +470,7 @@ class BaseDBUpgradeManager:
 
     def _copy_keyword(self, oOrigConn, oTrans):
         """Copy Keyword, assuming versions match"""
-        for oObj in Keyword.select(connection=oOrigConn):
-            _oCopy = Keyword(id=oObj.id, keyword=oObj.keyword,
-                             connection=oTrans)
+        self._bulk_copy(Keyword, oOrigConn, oTrans)
 
     def _copy_old_keyword(self, oOrigConn, oTrans, oVer):
         """Copy Keyword, updating if needed"""
@@ -427,9 +488,7 @@ class BaseDBUpgradeManager:
 
     def _copy_artist(self, oOrigConn, oTrans):
         """Copy Artist, assuming versions match"""
-        for oObj in Artist.select(connection=oOrigConn):
-            _oCopy = Artist(id=oObj.id, canonicalName=oObj.canonicalName,
-                            name=oObj.name, connection=oTrans)
+        self._bulk_copy(Artist, oOrigConn, oTrans)
 
     def _copy_old_artist(self, oOrigConn, oTrans, oVer):
         """Copy Artist, updating if needed"""
@@ -446,40 +505,17 @@ class BaseDBUpgradeManager:
         return (False, ["Unknown Artist Version"])
 
     def _copy_abstract_card(self, oOrigConn, oTrans, oLogger):
-        """Copy AbstractCard, assuming versions match"""
-        # Postgres 9's default ordering may not be by id, which causes issues
-        # when doing the copy when combined with postgres 9's
-        # auto-incrementing behaviour. We explictly sort by id to force
-        # the issue, which works, but may break again later.
-        for oCard in self.cAbstractCardCls.select(
-                connection=oOrigConn).orderBy('id'):
-            # force issue for SQObject >= 0.11.4
-            # pylint: disable=protected-access
-            # Need to access _parent and _connection here
-            oCard._connection = oOrigConn
-            oCard._parent._connection = oOrigConn
-            # pylint: enable=protected-access
-            oCardCopy = self._make_abs_card(oCard, oTrans)
-            # Copy the stuff defined in base
-            for oData in oCard.rarity:
-                oCardCopy.addRarityPair(oData)
-            for oData in oCard.cardtype:
-                oCardCopy.addCardType(oData)
-            for oData in oCard.rulings:
-                oCardCopy.addRuling(oData)
-            for oData in oCard.artists:
-                oCardCopy.addArtist(oData)
-            for oData in oCard.keywords:
-                oCardCopy.addKeyword(oData)
-            oCardCopy.syncUpdate()
-            # pylint: disable=protected-access
-            # Need to access _parent here
-            oCardCopy._parent.syncUpdate()
-            oLogger.info('copied AC %s', oCardCopy.name)
-
-    def _make_abs_card(self, oOldCard, oTrans):
-        """Copy the details of the old card to a new card."""
-        raise NotImplementedError("Implement _make_abs_card")
+        """Copy AbstractCard and the card property mapping tables,
+           assuming versions match"""
+        # bulk_copy_table copies in id order, which avoids issues with
+        # postgres 9's default ordering and auto-incrementing behaviour.
+        self._bulk_copy(AbstractCard, oOrigConn, oTrans, oLogger)
+        self._bulk_copy(self.cAbstractCardCls, oOrigConn, oTrans)
+        for cTable in self._get_join_tables(AbstractCard) + \
+                self._get_join_tables(self.cAbstractCardCls):
+            # We don't keep the mapping table ids, matching the
+            # behaviour of the joins' add methods
+            self._bulk_copy(cTable, oOrigConn, oTrans, bKeepIds=False)
 
     def _copy_old_abstract_card(self, oOrigConn, oTrans, oLogger, oVer):
         """Copy AbstractCard, upgrading as needed"""
@@ -501,14 +537,7 @@ class BaseDBUpgradeManager:
 
     def _copy_physical_card(self, oOrigConn, oTrans, oLogger):
         """Copy PhysicalCard, assuming version match"""
-        # We copy abstractCardID rather than abstractCard, to avoid issues
-        # with abstract card class changes
-        for oCard in PhysicalCard.select(connection=oOrigConn).orderBy('id'):
-            oCardCopy = PhysicalCard(id=oCard.id,
-                                     abstractCardID=oCard.abstractCardID,
-                                     printingID=oCard.printingID,
-                                     connection=oTrans)
-            oLogger.info('copied PC %s', oCardCopy.id)
+        self._bulk_copy(PhysicalCard, oOrigConn, oTrans, oLogger)
 
     def _copy_old_physical_card(self, oOrigConn, oTrans, oLogger, oVer):
         """Copy PhysicalCards, upgrading if needed."""
@@ -528,11 +557,15 @@ class BaseDBUpgradeManager:
            required"""
         return (False, ["Unknown PhysicalCard version"])
 
-    def _copy_physical_card_set_loop(self, aSets, oTrans, oOrigConn, oLogger):
+    def _copy_physical_card_set_loop(self, aSets, oTrans, oOrigConn, oLogger,
+                                     bCopyCards=True):
         """Central loop for copying card sets.
 
            Copy the list of card sets in aSet, ensuring we copy parents before
-           children."""
+           children. If bCopyCards is False, the cards are not copied, and
+           the caller is responsible for copying them.
+
+           Returns a dictionary mapping the old card set ids to the copies."""
         bDone = False
         dDone = {}
         # SQLObject < 0.11.4 does this automatically, but later versions don't
@@ -562,8 +595,9 @@ class BaseDBUpgradeManager:
                                             annotations=oSet.annotations,
                                             inuse=oSet.inuse,
                                             parent=oParent, connection=oTrans)
-                    for oCard in oSet.cards:
-                        oCopy.addPhysicalCard(oCard.id)
+                    if bCopyCards:
+                        for oCard in oSet.cards:
+                            oCopy.addPhysicalCard(oCard.id)
                     oCopy.syncUpdate()
                     oLogger.info('Copied PCS %s', oCopy.name)
                     dDone[oSet.id] = oCopy
@@ -574,11 +608,32 @@ class BaseDBUpgradeManager:
             else:
                 aSets = aToDo
             oTrans.commit()
+        return dDone
 
     def _copy_physical_card_set(self, oOrigConn, oTrans, oLogger):
         """Copy PCS, assuming versions match"""
         aSets = list(PhysicalCardSet.select(connection=oOrigConn))
-        self._copy_physical_card_set_loop(aSets, oTrans, oOrigConn, oLogger)
+        dDone = self._copy_physical_card_set_loop(aSets, oTrans, oOrigConn,
+                                                  oLogger, False)
+        # The card sets get new ids, so we remap the card set column when
+        # bulk copying the cards.
+        dSetIds = dict((iOldId, oCopy.id) for iOldId, oCopy in dDone.items())
+        aNames = [oCol.name for oCol in
+                  MapPhysicalCardToPhysicalCardSet.sqlmeta.columnList]
+        iSetCol = aNames.index('physicalCardSetID')
+
+        def remap_set(aValues):
+            """Update the card set id, skipping rows for card sets which
+               no longer exist"""
+            if aValues[iSetCol] not in dSetIds:
+                logging.warning('Skipping card in missing card set %s',
+                                aValues[iSetCol])
+                return None
+            aValues[iSetCol] = dSetIds[aValues[iSetCol]]
+            return aValues
+
+        self._bulk_copy(MapPhysicalCardToPhysicalCardSet, oOrigConn, oTrans,
+                        bKeepIds=False, fRowMap=remap_set)
 
     def _copy_old_physical_card_set(self, oOrigConn, oTrans, oLogger, oVer):
         """Copy PCS, upgrading as needed."""
@@ -30,6 +30,7 @@ from .BaseTables import (AbstractCard, CardType, Expansion, RarityPair,
 from .BaseAdapters import (IAbstractCard, IPhysicalCardSet, IRarityPair,
                            IExpansion, ICardType, IRarity, IArtist,
                            IPrinting, IPrintingName, IKeyword)
+from .FilterIndex import get_filter_index
 
 
 # Compability Patches
@@ -69,10 +70,32 @@ class Filter:
         return self.is_physical_card_only()
 
     def select(self, cCardClass):
-        """cCardClass.select(...) applying the filter to the selection."""
+        """cCardClass.select(...) applying the filter to the selection.
+
+           If the in-memory filter index is active, it's used to find the
+           matching cards where possible."""
+        oIndex = get_filter_index()
+        if oIndex is not None:
+            oResults = oIndex.select(self, cCardClass)
+            if oResults is not None:
+                return oResults
         return cCardClass.select(self._get_expression(),
                                  join=self._get_joins())
 
+    # pylint: disable=unused-argument
+    # children need the index
+    def get_card_bitmap(self, oIndex):
+        """Return the bitmap of AbstractCard ids matching this filter,
+           evaluated using the FilterIndex oIndex, or None if the filter
+           can't be evaluated in memory."""
+        return None
+    # pylint: enable=unused-argument
+
+    def selects_physical_cards(self):
+        """Return true if this filter joins PhysicalCard to AbstractCard,
+           so it can be used to select physical cards."""
+        return False
+
     def _get_expression(self):
         """Actual filter expression"""
         raise NotImplementedError
@@ -125,6 +148,17 @@ class FilterBox(Filter, list):
             bResult = bResult or oSubFilter.involves(oCardSet)
         return bResult
 
+    def _get_sub_bitmaps(self, oIndex):
+        """Return the list of card bitmaps for the subfilters, or None
+           if any of them can't be evaluated."""
+        aResults = []
+        for oSubFilter in self:
+            iBitmap = oIndex.card_bitmap(oSubFilter)
+            if iBitmap is None:
+                return None
+            aResults.append(iBitmap)
+        return aResults
+
     # We allow protected access here too
     types = property(fget=lambda self: self._get_types(),
                      doc="types supported by this filter")
@@ -139,6 +173,20 @@ class FilterAndBox(FilterBox):
         """Combine filters with AND"""
         return AND(*[x._get_expression() for x in self])
 
+    def get_card_bitmap(self, oIndex):
+        """Intersect the results of the subfilters"""
+        aResults = self._get_sub_bitmaps(oIndex)
+        if aResults is None:
+            return None
+        iBitmap = oIndex.all_bitmap()
+        for iSubBitmap in aResults:
+            iBitmap &= iSubBitmap
+        return iBitmap
+
+    def selects_physical_cards(self):
+        """True if any of the subfilters joins PhysicalCard"""
+        return any(x.selects_physical_cards() for x in self)
+
 
 class FilterOrBox(FilterBox):
     """OR a list of filters."""
@@ -149,6 +197,16 @@ class FilterOrBox(FilterBox):
         """Combine filters with OR"""
         return OR(*[x._get_expression() for x in self])
 
+    def get_card_bitmap(self, oIndex):
+        """Combine the results of the subfilters"""
+        aResults = self._get_sub_bitmaps(oIndex)
+        if aResults is None:
+            return None
+        iBitmap = 0
+        for iSubBitmap in aResults:
+            iBitmap |= iSubBitmap
+        return iBitmap
+
 
 # NOT Filter
 class FilterNot(Filter):
@@ -196,6 +254,15 @@ class FilterNot(Filter):
         else:
             raise RuntimeError("FilterNot unable to handle sub-filter type.")
 
+    def get_card_bitmap(self, oIndex):
+        """All the cards not matched by the sub-filter"""
+        if 'AbstractCard' not in self.__oSubFilter.types:
+            return None
+        iBitmap = oIndex.card_bitmap(self.__oSubFilter)
+        if iBitmap is None:
+            return None
+        return oIndex.all_bitmap() & ~iBitmap
+
 
 class CachedFilter(Filter):
     """A filter which caches joins and expression lookups"""
@@ -214,6 +281,12 @@ class CachedFilter(Filter):
     def _get_joins(self):
         return self._aJoins
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.card_bitmap(self._oSubFilter)
+
+    def selects_physical_cards(self):
+        return self._oSubFilter.selects_physical_cards()
+
     # pylint: disable=protected-access
     # we are delibrately accesing protected members her
     types = property(fget=lambda self: self._oSubFilter.types,
@@ -234,6 +307,9 @@ class NullFilter(Filter):
     def _get_joins(self):
         return []
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.all_bitmap()
+
 
 # NotNullFilter
 class NotNullFilter(NullFilter):
@@ -244,6 +320,9 @@ class NotNullFilter(NullFilter):
     def _get_expression(self):
         return NOT(TRUE)  # See Null Filter
 
+    def get_card_bitmap(self, oIndex):
+        return 0
+
 
 # Base Classes for Common Filter Idioms
 class SingleFilter(Filter):
@@ -266,6 +345,9 @@ class SingleFilter(Filter):
         # SQLObject methods not detected by pylint
         return self._oIdField == self._oId
 
+    def get_card_bitmap(self, oIndex):
+        return get_map_card_bitmap(oIndex, self._oIdField, [self._oId])
+
 
 class MultiFilter(Filter):
     """Base class for filters on multiple items which connect to AbstractCard
@@ -288,6 +370,9 @@ class MultiFilter(Filter):
         # SQLObject methods not detected by pylint
         return IN(self._oIdField, self._aIds)
 
+    def get_card_bitmap(self, oIndex):
+        return get_map_card_bitmap(oIndex, self._oIdField, self._aIds)
+
 
 class DirectFilter(Filter):
     """Base class for filters which query AbstractTable directly."""
@@ -298,6 +383,18 @@ class DirectFilter(Filter):
         return []
 
 
+def get_map_card_bitmap(oIndex, oIdField, aIds):
+    """Helper for filters using a mapping table to find the cards
+       joined to aIds with oIndex.
+
+       Returns None if the mapping table isn't in the index."""
+    sTable = str(getattr(oIdField, 'tableName', ''))
+    sColumn = getattr(oIdField, 'fieldName', None)
+    if not oIndex.has_join(sTable, sColumn):
+        return None
+    return oIndex.join_bitmap(sTable, sColumn, aIds)
+
+
 # Useful utiltiy function for filters using with
 def split_list(aList):
     """Split a list of 'X with Y' strings into (X, Y) tuples"""
@@ -422,6 +519,9 @@ class PrintingFilter(DirectFilter):
         # SQLObject confuses pylint
         return IN(AbstractCard.q.id, self._aIds)
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.all_bitmap() & oIndex.ids_to_bitmap(self._aIds)
+
 
 class MultiPrintingFilter(DirectFilter):
     """Filter on multiple Printings"""
@@ -458,6 +558,9 @@ class MultiPrintingFilter(DirectFilter):
         # SQLObject confuses pylint
         return IN(AbstractCard.q.id, self._aIds)
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.all_bitmap() & oIndex.ids_to_bitmap(self._aIds)
+
 
 class CardTypeFilter(SingleFilter):
     """Filter on card type"""
@@ -578,6 +681,10 @@ class BaseCardTextFilter(DirectFilter):
         return LIKE(func.LOWER(AbstractCard.q.text),
                     '%' + self._sPattern + '%')
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.like_bitmap(AbstractCard.sqlmeta.table, 'text',
+                                  '%' + self._sPattern + '%')
+
 
 class CardNameFilter(DirectFilter):
     """Filter on the name of the card"""
@@ -604,6 +711,10 @@ class CardNameFilter(DirectFilter):
         return LIKE(AbstractCard.q.canonicalName,
                     '%' + self.__sPattern + '%')
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.like_bitmap(AbstractCard.sqlmeta.table, 'canonical_name',
+                                  '%' + self.__sPattern + '%')
+
 
 class PhysicalCardFilter(Filter):
     """Filter for converting a filter on abstract cards to a filter on
@@ -627,6 +738,12 @@ class PhysicalCardFilter(Filter):
     def _get_expression(self):
         return TRUE  # SQLite doesn't like True. Postgres doesn't like 1.
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.all_bitmap()
+
+    def selects_physical_cards(self):
+        return True
+
 
 class AbstractCardFilter(Filter):
     """Filter for converting a filter on physical cards to a filter on
@@ -658,6 +775,9 @@ class AbstractCardFilter(Filter):
     def _get_expression(self):
         return TRUE  # See PhysicalCardFilter
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.all_bitmap()
+
 
 class CardSetMultiCardCountFilter(DirectFilter):
     """Filter on number of cards in the Physical Card Set"""
@@ -1075,6 +1195,9 @@ class SpecificCardFilter(DirectFilter):
         # SQLObject methods not detected by pylint
         return AbstractCard.q.id == self.__iCardId
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.all_bitmap() & oIndex.ids_to_bitmap([self.__iCardId])
+
 
 class SpecificCardIdFilter(DirectFilter):
     """This filter matches a single card by id."""
@@ -1090,6 +1213,9 @@ class SpecificCardIdFilter(DirectFilter):
         # SQLObject methods not detected by pylint
         return AbstractCard.q.id == self.__iCardId
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.all_bitmap() & oIndex.ids_to_bitmap([self.__iCardId])
+
 
 class MultiSpecificCardIdFilter(DirectFilter):
     """This filter matches multiple cards by id."""
@@ -1105,6 +1231,9 @@ class MultiSpecificCardIdFilter(DirectFilter):
         # SQLObject methods not detected by pylint
         return IN(AbstractCard.q.id, self.__aCardIds)
 
+    def get_card_bitmap(self, oIndex):
+        return oIndex.all_bitmap() & oIndex.ids_to_bitmap(self.__aCardIds)
+
 
 class SpecificPhysCardIdFilter(DirectFilter):
     """This filter matches a single physical card by id.
@@ -205,6 +205,11 @@ class Keyword(SQLObject):
 
 class MapPhysicalCardToPhysicalCardSet(SQLObject):
 
+    # This holds one row for each copy of a card in a card set. Code that
+    # only needs the number of copies should use the grouped queries in
+    # CardSetUtilities (get_card_counts and friends) rather than
+    # iterating over the rows.
+
     class sqlmeta:
         table = 'physical_map'
 
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Save and restore the raw data used to fill the object cache and the
+   cached joins, so we can skip rebuilding them from the database on
+   startup."""
+
+import json
+import logging
+
+from sqlobject.inheritance import InheritableSQLObject
+from sqlobject.sqlbuilder import Table, Select, func
+
+from .DBUtility import (get_metadata_date, get_database_change_marker,
+                        get_connection_key, CARDLIST_UPDATE_DATE)
+from .DatabaseVersion import DatabaseVersion
+
+# Increase this if the snapshot format changes
+SNAPSHOT_VERSION = 2
+
+
+def _query_one(oConn, oSelect):
+    """Helper to run a query returning a single row."""
+    return list(oConn.queryOne(oConn.sqlrepr(oSelect)))
+
+
+def get_table_rows(cType):
+    """Return the raw rows for cType, with the id followed by the
+       column values, as used by SQLObject's select."""
+    # pylint: disable=protected-access
+    # We need to access _connection here
+    oConn = cType._connection
+    oTable = Table(cType.sqlmeta.table)
+    aCols = [cType.sqlmeta.idName] + [oCol.dbName for oCol in
+                                      cType.sqlmeta.columnList]
+    return [list(x) for x in oConn.queryAll(oConn.sqlrepr(
+        Select([getattr(oTable, sCol) for sCol in aCols])))]
+
+
+def make_objects(cType, aRows):
+    """Create objects of cType from rows returned by get_table_rows,
+       without querying the database.
+
+       For inherited tables, the parent class must be loaded before the
+       child class."""
+    bParent = (issubclass(cType, InheritableSQLObject) and
+               'childName' in cType.sqlmeta.columns)
+    if bParent:
+        # Only create the parent object, since we'll create the child
+        # from its own rows
+        return [cType.get(aRow[0], selectResults=aRow[1:], childUpdate=True)
+                for aRow in aRows]
+    return [cType.get(aRow[0], selectResults=aRow[1:]) for aRow in aRows]
+
+
+def get_snapshot_key(aTypes, aJoins):
+    """Return a description of the current database state.
+
+       A snapshot is only valid if this matches the key it was saved
+       with. We use the card list date, the change marker set when the
+       card data is imported and the table versions, along with the
+       sizes of the cached tables, so rows added or removed in other
+       ways are also caught.
+
+       The database is identified by a hash of its URI, so passwords
+       aren't written to the snapshot."""
+    # pylint: disable=protected-access
+    # We need to access _connection here
+    oVer = DatabaseVersion()
+    dTables = {}
+    oConn = None
+    for cType in aTypes:
+        oConn = cType._connection
+        oTable = Table(cType.sqlmeta.table)
+        dTables[cType.sqlmeta.table] = [
+            oVer.get_table_version(cType)] + _query_one(oConn, Select(
+                [func.COUNT(getattr(oTable, cType.sqlmeta.idName)),
+                 func.MAX(getattr(oTable, cType.sqlmeta.idName))]))
+    for oJoin in aJoins:
+        oConn = oJoin.soClass._connection
+        oTable = Table(oJoin.intermediateTable)
+        dTables[oJoin.intermediateTable] = _query_one(oConn, Select(
+            [func.COUNT(getattr(oTable, oJoin.joinColumn))]))
+    oDate = get_metadata_date(CARDLIST_UPDATE_DATE)
+    return {
+        'version': SNAPSHOT_VERSION,
+        'database': get_connection_key(oConn) if oConn is not None else None,
+        'cardlist date': oDate.isoformat() if oDate else None,
+        'change marker': get_database_change_marker(),
+        'tables': dTables,
+    }
+
+
+def save_snapshot(sFileName, dKey, dTypeRows, dJoinRows):
+    """Write the snapshot to sFileName.
+
+       dTypeRows maps each class to the rows from get_table_rows, and
+       dJoinRows maps each join to its cache rows. Failures are logged
+       and ignored, since the snapshot is purely an optimisation."""
+    dData = {
+        'key': dKey,
+        'tables': dict((cType.sqlmeta.table, aRows) for cType, aRows
+                       in dTypeRows.items()),
+        'joins': dict((oJoin.intermediateTable, [list(x) for x in aRows])
+                      for oJoin, aRows in dJoinRows.items()),
+    }
+    try:
+        with open(sFileName, 'w') as fSnapshot:
+            json.dump(dData, fSnapshot)
+    except (IOError, OSError, TypeError, ValueError) as oErr:
+        logging.warning('Unable to save cache snapshot %s: %s',
+                        sFileName, oErr)
+
+
+def load_snapshot(sFileName, dKey, aTypes, aJoins):
+    """Load the snapshot from sFileName if it matches dKey.
+
+       Returns a tuple of dictionaries (dTypeRows, dJoinRows) as passed
+       to save_snapshot, or None if the snapshot is missing, stale or
+       can't be read."""
+    try:
+        with open(sFileName, 'r') as fSnapshot:
+            dData = json.load(fSnapshot)
+        if dData['key'] != dKey:
+            logging.info('Cache snapshot %s is out of date', sFileName)
+            return None
+        dTypeRows = dict((cType, dData['tables'][cType.sqlmeta.table])
+                         for cType in aTypes)
+        dJoinRows = dict((oJoin, dData['joins'][oJoin.intermediateTable])
+                         for oJoin in aJoins)
+    except (IOError, OSError) as oErr:
+        # Most likely, there is no snapshot yet
+        logging.info('Unable to read cache snapshot %s: %s', sFileName, oErr)
+        return None
+    except (ValueError, KeyError, TypeError) as oErr:
+        logging.warning('Invalid cache snapshot %s: %s', sFileName, oErr)
+        return None
+    return dTypeRows, dJoinRows
@@ -11,6 +11,15 @@ from sqlobject import joins
 from sqlobject.sqlbuilder import Table, Select
 
 
+def _cache_conn(oConn):
+    """Return the database connection underlying oConn.
+
+       Inside a transaction, _connection is the Transaction object, but
+       it reads the same database, so the cache is keyed on the
+       connection the transaction wraps."""
+    return getattr(oConn, '_dbConnection', oConn)
+
+
 class SOCachedRelatedJoin(joins.SORelatedJoin):
     """Version of RelatedJoin that caches the lookup of related objects.
 
@@ -24,7 +33,19 @@ class SOCachedRelatedJoin(joins.SORelatedJoin):
 
     def __init__(self, *aArgs, **kwargs):
         super(SOCachedRelatedJoin, self).__init__(*aArgs, **kwargs)
+        # Maps the id of the instance to a tuple of the ids of the joined
+        # objects. None marks an entry that must be reread from the database
+        self._dIdCache = {}
+        # Lazily created lists of the joined objects, keyed by id
         self._dJoinCache = {}
+        # True if _dIdCache has been filled from the full intermediate
+        # table, so get_id_map doesn't need to reread it
+        self._bComplete = False
+        # The connection the cached ids come from
+        self._oCacheConn = None
+        # Incremented whenever the cache contents change, so users of
+        # get_id_map can tell when to update
+        self.iCacheVersion = 0
         self._oOtherJoin = None
         self._bOtherJoinCached = None
 
@@ -43,35 +64,103 @@ class SOCachedRelatedJoin(joins.SORelatedJoin):
 
     def flush_cache(self):
         """Flush the contents of the cache."""
+        self._dIdCache = {}
         self._dJoinCache = {}
+        self._bComplete = False
+        self._oCacheConn = None
+        self.iCacheVersion += 1
 
-    def init_cache(self):
-        """Initialise the cache with the data from the database."""
-        self._find_other_join()
+    def _check_conn(self):
+        """Flush the cache if the database connection has changed, since
+           the ids will refer to different objects."""
+        # pylint: disable=protected-access
+        # We need to access _connection here
+        oConn = self.soClass._connection
+        if _cache_conn(oConn) is not self._oCacheConn:
+            self.flush_cache()
+            self._oCacheConn = _cache_conn(oConn)
+        return oConn
 
+    def get_cache_rows(self):
+        """Return the (id, other id) pairs in the intermediate table."""
         oIntermediateTable = Table(self.intermediateTable)
         oJoinColumn = getattr(oIntermediateTable, self.joinColumn)
         oOtherColumn = getattr(oIntermediateTable, self.otherColumn)
         # pylint: disable=protected-access
         # We need to access _connection here
         oConn = self.soClass._connection
+        return oConn.queryAll(repr(Select((oJoinColumn, oOtherColumn))))
+
+    def init_cache(self, aRows=None):
+        """Initialise the cache with the data from the database.
+
+           If aRows is given, it's used as the list of (id, other id)
+           pairs, rather than querying the intermediate table.
+
+           Only the ids are stored, the objects are created when
+           performJoin is called."""
+        self._find_other_join()
+        self._check_conn()
 
-        for (oId, oOtherId) in oConn.queryAll(
-                repr(Select((oJoinColumn, oOtherColumn)))):
-            oInst = self.soClass.get(oId, oConn)
-            oOther = self.otherClass.get(oOtherId, oConn)
-            self._dJoinCache.setdefault(oInst, [])
-            self._dJoinCache[oInst].append(oOther)
+        if aRows is None:
+            aRows = self.get_cache_rows()
 
-        # Apply ordering (we assume it won't change later)
-        for oInst in self._dJoinCache:
-            self._dJoinCache[oInst] = self._applyOrderBy(
-                self._dJoinCache[oInst], self.otherClass)
+        dIds = {}
+        for (iId, iOtherId) in aRows:
+            dIds.setdefault(iId, []).append(iOtherId)
+        self._dIdCache = dict((iId, tuple(aIds)) for iId, aIds
+                              in dIds.items())
+        self._dJoinCache = {}
+        self._bComplete = True
+        self.iCacheVersion += 1
+
+    def _query_ids(self, oConn, iId):
+        """Read the ids joined to iId from the database."""
+        # pylint: disable=protected-access
+        # We need to access _SO_intermediateJoin here
+        return tuple(iOtherId for (iOtherId,) in oConn._SO_intermediateJoin(
+            self.intermediateTable, self.otherColumn, self.joinColumn, iId)
+                     if iOtherId is not None)
+
+    def get_ids(self, oInst):
+        """Return a tuple of the ids joined to oInst, without creating
+           the joined objects.
+
+           oInst can be either an instance of soClass or its id."""
+        iId = getattr(oInst, 'id', oInst)
+        oConn = self._check_conn()
+        tIds = self._dIdCache.get(iId)
+        if tIds is None:
+            # Either invalidated, or not in the intermediate table when the
+            # cache was filled. We can't assume the latter means nothing
+            # is joined, since rows may have been inserted directly since
+            # then, so we check the database and remember the answer.
+            tIds = self._query_ids(oConn, iId)
+            self._dIdCache[iId] = tIds
+        return tIds
+
+    def get_id_map(self):
+        """Return a dictionary mapping the id of every instance with
+           entries in the join to a tuple of the joined ids.
+
+           The cache is filled from the database if required. Callers
+           must not modify the result."""
+        self._check_conn()
+        if not self._bComplete:
+            self.init_cache()
+        for iId in [iId for iId, tIds in self._dIdCache.items()
+                    if tIds is None]:
+            self.get_ids(iId)
+        return self._dIdCache
 
     def invalidate_cache_item(self, oInst, oOther, bDoOther=True):
         """Invalidate a cache item and its equivalent in the other join."""
-        if oInst in self._dJoinCache:
-            del self._dJoinCache[oInst]
+        # pylint: disable=protected-access
+        # We need to access _connection here
+        if _cache_conn(oInst._connection) is self._oCacheConn:
+            self._dIdCache[oInst.id] = None
+            self._dJoinCache.pop(oInst.id, None)
+            self.iCacheVersion += 1
         if bDoOther and self._bOtherJoinCached:
             self._find_other_join()
             self._oOtherJoin.invalidate_cache_item(oOther, oInst,
@@ -81,10 +170,27 @@ class SOCachedRelatedJoin(joins.SORelatedJoin):
     # Name must match SQLObject conventions
     def performJoin(self, oInst):
         """Return the join the result, from the cache if possible."""
-        if oInst not in self._dJoinCache:
-            self._dJoinCache[oInst] = joins.SORelatedJoin.performJoin(self,
-                                                                      oInst)
-        return self._dJoinCache[oInst]
+        # pylint: disable=protected-access
+        # We need to access _connection here
+        if (_cache_conn(oInst._connection) is not
+                _cache_conn(self.soClass._connection)):
+            # Objects from other connections, such as those used when
+            # copying databases, bypass the cache
+            return joins.SORelatedJoin.performJoin(self, oInst)
+        self._check_conn()
+        aResult = self._dJoinCache.get(oInst.id)
+        if aResult is None:
+            # Follow SORelatedJoin in handling per-connection objects
+            if oInst.sqlmeta._perConnection:
+                oConn = oInst._connection
+            else:
+                oConn = None
+            # Apply ordering (we assume it won't change later)
+            aResult = self._applyOrderBy(
+                [self.otherClass.get(iId, oConn) for iId in
+                 self.get_ids(oInst.id)], self.otherClass)
+            self._dJoinCache[oInst.id] = aResult
+        return aResult
 
     def add(self, oInst, oOther):
         """Add an item to the join."""
@@ -100,3 +206,23 @@ class SOCachedRelatedJoin(joins.SORelatedJoin):
 class CachedRelatedJoin(joins.RelatedJoin):
     """Provide CacheRelatedJoin object to Sutekh"""
     baseClass = SOCachedRelatedJoin
+
+
+def get_join_ids(oInst, sJoin):
+    """Return the ids joined to oInst by the cached join named sJoin
+       (e.g. get_join_ids(oCard, 'keywords')), without creating the
+       joined objects."""
+    return get_cached_join(type(oInst), sJoin).get_ids(oInst)
+
+
+def get_cached_join(cClass, sJoin):
+    """Return the SOCachedRelatedJoin called sJoin on cClass or its
+       parent classes."""
+    for cBase in cClass.__mro__:
+        if not hasattr(cBase, 'sqlmeta'):
+            continue
+        for oJoin in cBase.sqlmeta.joins:
+            if oJoin.joinMethodName == sJoin and isinstance(
+                    oJoin, SOCachedRelatedJoin):
+                return oJoin
+    raise KeyError('No cached join %s on %s' % (sJoin, cClass.__name__))
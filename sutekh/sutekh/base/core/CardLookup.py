@@ -6,8 +6,11 @@
 """Lookup AbstractCards for a list of card names.
    """
 
+import logging
+
 from sqlobject import SQLObjectNotFound
 from .BaseAdapters import IPhysicalCard, IExpansion, IAbstractCard, IPrinting
+from .CardNameIndex import get_card_name_index, AUTO_ACCEPT
 
 
 class LookupFailed(Exception):
@@ -138,4 +141,35 @@ class SimpleLookup(AbstractCardLookup, PhysicalCardLookup, PrintingLookup):
         return dPrintings
 
 
+class IndexedLookup(SimpleLookup):
+    """A SimpleLookup which also accepts close matches from the card name
+       index.
+
+       Intended for bulk imports, where asking about every misspelt card
+       name isn't practical. Names without a clear match with at least
+       fMinConfidence are still excluded.
+       """
+
+    def __init__(self, fMinConfidence=AUTO_ACCEPT):
+        super(IndexedLookup, self).__init__()
+        self._fMinConfidence = fMinConfidence
+
+    def lookup(self, aNames, sInfo):
+        """Lookup the cards, falling back to the card name index for
+           unknown names."""
+        aCards = super(IndexedLookup, self).lookup(aNames, sInfo)
+        oIndex = None
+        for iPos, sName in enumerate(aNames):
+            if aCards[iPos] is not None or not sName:
+                continue
+            if oIndex is None:
+                oIndex = get_card_name_index()
+            oCard = oIndex.best_match(sName, self._fMinConfidence)
+            if oCard is not None:
+                logging.info("%s: Using %s for unknown card %s", sInfo,
+                             oCard.name, sName)
+                aCards[iPos] = oCard
+        return aCards
+
+
 DEFAULT_LOOKUP = SimpleLookup()
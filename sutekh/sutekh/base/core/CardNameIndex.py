@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Index of card names for resolving misspelt or alternative names.
+
+   The canonical card names and the card name lookup hints are
+   normalised and broken into trigrams. The trigram index picks out a
+   short list of likely candidates, which are then scored by edit
+   distance, giving a confidence between 0 and 1 for each card."""
+
+import heapq
+import logging
+import re
+
+from sqlobject import SQLObjectNotFound
+
+from .BaseTables import AbstractCard, LookupHints
+from .BaseAdapters import IAbstractCard
+from ..Utility import move_articles_to_front, to_ascii
+
+# Matches at or above this confidence are accepted without asking
+AUTO_ACCEPT = 0.85
+# Matches below this confidence aren't returned at all
+MIN_CONFIDENCE = 0.5
+# The best match must be this far ahead of the next card to be accepted
+AMBIGUITY_MARGIN = 0.05
+# Number of trigram candidates to score by edit distance
+CANDIDATES = 25
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+# The active index. This is built when first needed, and cleared when the
+# caches are flushed
+_oCardNameIndex = None
+
+
+def get_card_name_index():
+    """Return the active CardNameIndex, building it if required."""
+    # pylint: disable=global-statement
+    # We deliberately use a module level variable here
+    global _oCardNameIndex
+    if _oCardNameIndex is None:
+        _oCardNameIndex = make_card_name_index()
+    return _oCardNameIndex
+
+
+def set_card_name_index(oIndex):
+    """Set the active CardNameIndex. Use None to force the index to be
+       rebuilt when next needed."""
+    # pylint: disable=global-statement
+    # We deliberately use a module level variable here
+    global _oCardNameIndex
+    _oCardNameIndex = oIndex
+
+
+def normalise_card_name(sName):
+    """Reduce a card name to the form used for matching.
+
+       Case, accents, punctuation, spacing and the article 'the' are
+       ignored, since these are the most common differences between
+       the names used by other programs and forums."""
+    sName = to_ascii(move_articles_to_front(sName)).lower()
+    return ' '.join([x for x in _NON_ALNUM.split(sName)
+                     if x and x != 'the'])
+
+
+def edit_distance(sFirst, sSecond):
+    """Return the edit distance between the two strings.
+
+       This is the Levenshtein distance, with swapping adjacent characters
+       also counted as a single edit. We use the bit-parallel algorithm
+       of Myers, with Hyyro's extension for transpositions, so each
+       character of sSecond is handled with a few integer operations,
+       rather than a row of the full table."""
+    if not sFirst:
+        return len(sSecond)
+    # Bitmap of the positions of each character in sFirst
+    dPositions = {}
+    for iPos, sChar in enumerate(sFirst):
+        dPositions[sChar] = dPositions.get(sChar, 0) | (1 << iPos)
+    iMask = (1 << len(sFirst)) - 1
+    iLast = 1 << (len(sFirst) - 1)
+    # Vertical positive and negative deltas, and the diagonal zero deltas
+    iVertPos, iVertNeg, iDiagZero, iPrevEq = iMask, 0, 0, 0
+    iDist = len(sFirst)
+    for sChar in sSecond:
+        iEq = dPositions.get(sChar, 0)
+        iTrans = (((~iDiagZero) & iEq) << 1) & iPrevEq
+        iDiagZero = ((((iEq & iVertPos) + iVertPos) ^ iVertPos) | iEq |
+                     iVertNeg | iTrans) & iMask
+        iHorizPos = iVertNeg | ~(iDiagZero | iVertPos)
+        iHorizNeg = iVertPos & iDiagZero
+        if iHorizPos & iLast:
+            iDist += 1
+        elif iHorizNeg & iLast:
+            iDist -= 1
+        iHorizPos = (iHorizPos << 1) | 1
+        iHorizNeg = iHorizNeg << 1
+        iVertPos = (iHorizNeg | ~(iDiagZero | iHorizPos)) & iMask
+        iVertNeg = iHorizPos & iDiagZero & iMask
+        iPrevEq = iEq
+    return iDist
+
+
+def _make_grams(sKey):
+    """Return the set of trigrams in the normalised name"""
+    sPadded = ' %s ' % sKey
+    return set([sPadded[iPos:iPos + 3] for iPos in
+                range(len(sPadded) - 2)])
+
+
+class CardNameIndex:
+    """Trigram index over the known card names.
+
+       Each card can be listed under several names (the canonical name
+       and any lookup hints). Results for a name are cached, since bulk
+       imports tend to repeat the same mistakes."""
+
+    def __init__(self):
+        # Normalised name, card and trigram count for each entry
+        self._aKeys = []
+        self._aCards = []
+        self._aGramCounts = []
+        # trigram : list of entries
+        self._dGrams = {}
+        # (normalised name, max results) : results
+        self._dCache = {}
+
+    def __len__(self):
+        return len(self._aKeys)
+
+    def add_name(self, sName, oCard):
+        """Add sName as a name for oCard."""
+        sKey = normalise_card_name(sName)
+        if not sKey:
+            return
+        iEntry = len(self._aKeys)
+        aGrams = _make_grams(sKey)
+        self._aKeys.append(sKey)
+        self._aCards.append(oCard)
+        self._aGramCounts.append(len(aGrams))
+        for sGram in aGrams:
+            self._dGrams.setdefault(sGram, []).append(iEntry)
+        self._dCache = {}
+
+    def lookup(self, sName, iMax=5):
+        """Return a list of up to iMax (card, confidence) pairs for the
+           cards which best match sName, best match first.
+
+           The confidence is 1.0 for a match after normalisation, and
+           cards with a confidence below MIN_CONFIDENCE are excluded."""
+        sKey = normalise_card_name(sName)
+        tCacheKey = (sKey, iMax)
+        if tCacheKey in self._dCache:
+            return list(self._dCache[tCacheKey])
+        aGrams = _make_grams(sKey) if sKey else set()
+        dShared = {}
+        for sGram in aGrams:
+            for iEntry in self._dGrams.get(sGram, []):
+                dShared[iEntry] = dShared.get(iEntry, 0) + 1
+        iGrams = len(aGrams)
+        aCandidates = heapq.nlargest(
+            CANDIDATES, dShared,
+            key=lambda x: dShared[x] / (iGrams + self._aGramCounts[x]))
+        dScores = {}
+        for iEntry in aCandidates:
+            sCand = self._aKeys[iEntry]
+            fConfidence = 1.0 - (edit_distance(sKey, sCand) /
+                                 max(len(sKey), len(sCand)))
+            if fConfidence < MIN_CONFIDENCE:
+                continue
+            oCard = self._aCards[iEntry]
+            if fConfidence > dScores.get(oCard, 0.0):
+                dScores[oCard] = fConfidence
+        aResults = sorted(dScores.items(),
+                          key=lambda x: (-x[1], x[0].name))[:iMax]
+        self._dCache[tCacheKey] = aResults
+        return list(aResults)
+
+    def best_match(self, sName, fMinConfidence=AUTO_ACCEPT):
+        """Return the card matching sName, or None if there isn't a
+           single clear match with at least fMinConfidence."""
+        aMatches = self.lookup(sName, 2)
+        if not aMatches or aMatches[0][1] < fMinConfidence:
+            return None
+        if (len(aMatches) > 1 and
+                aMatches[0][1] - aMatches[1][1] < AMBIGUITY_MARGIN):
+            return None
+        return aMatches[0][0]
+
+
+def make_card_name_index():
+    """Build a CardNameIndex from the card list and the card name
+       lookup hints."""
+    oIndex = CardNameIndex()
+    for oCard in AbstractCard.select():
+        oIndex.add_name(oCard.name, oCard)
+    # pylint: disable=no-member
+    # SQLObject confuses pylint
+    for oLookup in LookupHints.selectBy(domain='CardNames'):
+        try:
+            oCard = IAbstractCard(oLookup.value)
+        except SQLObjectNotFound:
+            # Already warned about when creating the adapter cache
+            logging.debug("Skipping card name hint %s -> %s",
+                          oLookup.lookup, oLookup.value)
+            continue
+        oIndex.add_name(oLookup.lookup, oCard)
+    return oIndex
@@ -10,6 +10,7 @@ from sqlobject import SQLObjectNotFound, sqlhub
 
 from .CardLookup import DEFAULT_LOOKUP
 from .BaseTables import PhysicalCardSet
+from .CardSetUtilities import apply_card_changes
 
 
 class CardSetHolder:
@@ -178,12 +179,13 @@ class CardSetHolder:
                                inuse=self.inuse, parent=oParent)
         oPCS.syncUpdate()
 
+        dCards = {}
         for oPhysCard in aPhysCards:
-            # pylint: disable=no-member
-            # SQLObject confuses pylint
             if not oPhysCard:
                 continue
-            oPCS.addPhysicalCard(oPhysCard.id)
+            dCards[oPhysCard] = dCards.get(oPhysCard, 0) + 1
+        # Add all the cards using bulk inserts
+        apply_card_changes(oPCS, dCards)
         oPCS.syncUpdate()
 
 
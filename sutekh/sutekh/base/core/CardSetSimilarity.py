@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Find the card sets most similar to a given card set."""
+
+import heapq
+import math
+
+from .BaseTables import PhysicalCardSet
+from .CardSetUtilities import (get_abstract_card_counts,
+                               get_card_set_checksums)
+from .DBSignals import (listen_changed, listen_row_destroy,
+                        disconnect_changed, disconnect_row_destroy)
+
+COSINE = 'cosine'
+JACCARD = 'jaccard'
+
+METRICS = (COSINE, JACCARD)
+
+
+def get_card_set_vector(oCardSet):
+    """Return the abstract card id : count dictionary for the card set"""
+    return get_abstract_card_counts([oCardSet.id]).get(oCardSet.id, {})
+
+
+class CardSetSimilarityIndex:
+    """Represent each card set as a sparse vector of abstract card id :
+       count, and find the nearest card sets to a given vector.
+
+       We keep an inverted index of abstract card id : {card set id :
+       count}, so queries only touch the card sets that share at least
+       one card with the query.
+
+       Similarity is either the cosine of the angle between the vectors,
+       or the weighted Jaccard index (the sum of the smaller counts
+       divided by the sum of the larger counts).
+
+       Call listen to keep the index up to date as card sets are changed.
+       """
+
+    def __init__(self):
+        self._dVectors = {}
+        self._dCards = {}
+        self._dNorms = {}
+        self._dTotals = {}
+        # Card set id : checksum from get_card_set_checksums
+        self._dChecksums = {}
+        self._bListening = False
+
+    def rebuild(self):
+        """Rebuild the index for all the card sets in the database."""
+        self._dVectors = {}
+        self._dCards = {}
+        self._dNorms = {}
+        self._dTotals = {}
+        self._dChecksums = get_card_set_checksums()
+        for iSetId, dVector in get_abstract_card_counts().items():
+            self.set_vector(iSetId, dVector)
+
+    def is_current(self):
+        """Check that the index matches the database.
+
+           This compares a checksum of each card set's contents, so we
+           can catch changes that bypass the changed signal, such as
+           restoring a backup or writing to the mapping table
+           directly."""
+        return self._dChecksums == get_card_set_checksums()
+
+    def ensure_current(self):
+        """Rebuild the index if it no longer matches the database."""
+        if not self.is_current():
+            self.rebuild()
+
+    def set_vector(self, iSetId, dVector):
+        """Replace the vector for the given card set id."""
+        self.remove(iSetId)
+        dVector = dict((iAbsId, iCount) for iAbsId, iCount in
+                       dVector.items() if iCount > 0)
+        if not dVector:
+            return
+        self._dVectors[iSetId] = dVector
+        for iAbsId, iCount in dVector.items():
+            self._dCards.setdefault(iAbsId, {})[iSetId] = iCount
+        self._dNorms[iSetId] = math.sqrt(sum(x * x for x in
+                                             dVector.values()))
+        self._dTotals[iSetId] = sum(dVector.values())
+
+    def remove(self, iSetId):
+        """Remove the given card set id from the index."""
+        dVector = self._dVectors.pop(iSetId, None)
+        if dVector is None:
+            return
+        for iAbsId in dVector:
+            dSets = self._dCards[iAbsId]
+            del dSets[iSetId]
+            if not dSets:
+                del self._dCards[iAbsId]
+        del self._dNorms[iSetId]
+        del self._dTotals[iSetId]
+
+    def get_vector(self, iSetId):
+        """Return the vector for the given card set id."""
+        return dict(self._dVectors.get(iSetId, {}))
+
+    def apply_changes(self, iSetId, dChanges):
+        """Update the vector for iSetId with the changes in dChanges
+           (abstract card id : change in count)."""
+        dVector = self.get_vector(iSetId)
+        for iAbsId, iChg in dChanges.items():
+            dVector[iAbsId] = dVector.get(iAbsId, 0) + iChg
+        self.set_vector(iSetId, dVector)
+
+    def find_similar(self, dVector, iTop=10, sMetric=COSINE,
+                     aCandidates=None, aExclude=()):
+        """Find the iTop card sets closest to dVector (abstract card id :
+           count).
+
+           If aCandidates is given, only those card set ids are
+           considered. Returns a list of (similarity, card set id) pairs,
+           most similar first."""
+        if sMetric not in METRICS:
+            raise ValueError('Unknown similarity metric: %s' % sMetric)
+        dVector = dict((iAbsId, iCount) for iAbsId, iCount in
+                       dVector.items() if iCount > 0)
+        if not dVector or iTop < 1:
+            return []
+        dShared = {}
+        for iAbsId, iCount in dVector.items():
+            for iSetId, iSetCount in self._dCards.get(iAbsId, {}).items():
+                if aCandidates is not None and iSetId not in aCandidates:
+                    continue
+                if sMetric == COSINE:
+                    dShared[iSetId] = (dShared.get(iSetId, 0) +
+                                       iCount * iSetCount)
+                else:
+                    dShared[iSetId] = (dShared.get(iSetId, 0) +
+                                       min(iCount, iSetCount))
+        for iSetId in aExclude:
+            dShared.pop(iSetId, None)
+        if sMetric == COSINE:
+            fNorm = math.sqrt(sum(x * x for x in dVector.values()))
+            aScores = [(iShared / (fNorm * self._dNorms[iSetId]), iSetId)
+                       for iSetId, iShared in dShared.items()]
+        else:
+            iTotal = sum(dVector.values())
+            aScores = [(iShared / float(iTotal + self._dTotals[iSetId] -
+                                        iShared), iSetId)
+                       for iSetId, iShared in dShared.items()]
+        # Break ties on the card set id, so the results are stable
+        return heapq.nlargest(iTop, aScores, key=lambda x: (x[0], -x[1]))
+
+    def find_similar_card_sets(self, oCardSet, iTop=10, sMetric=COSINE,
+                               aCandidates=None):
+        """Find the iTop card sets closest to oCardSet, excluding the card
+           set itself."""
+        if oCardSet.id in self._dVectors:
+            dVector = self._dVectors[oCardSet.id]
+        else:
+            dVector = get_card_set_vector(oCardSet)
+        return self.find_similar(dVector, iTop, sMetric, aCandidates,
+                                 aExclude=[oCardSet.id])
+
+    # Signal handling
+
+    def listen(self):
+        """Listen for changes to card sets so we can update the index."""
+        if not self._bListening:
+            listen_changed(self.card_changed, PhysicalCardSet)
+            listen_row_destroy(self.card_set_deleted, PhysicalCardSet)
+            self._bListening = True
+
+    def cleanup(self):
+        """Stop listening for card set changes."""
+        if self._bListening:
+            disconnect_changed(self.card_changed, PhysicalCardSet)
+            disconnect_row_destroy(self.card_set_deleted, PhysicalCardSet)
+            self._bListening = False
+
+    def card_changed(self, oCardSet, dChanges):
+        """Update the vector for the card set from the changed signal."""
+        dAbsChanges = {}
+        iCount, iSum, iSquares = self._dChecksums.get(oCardSet.id,
+                                                      [0, 0, 0])
+        for oPhysCard, iChg in dChanges.items():
+            iAbsId = oPhysCard.abstractCardID
+            dAbsChanges[iAbsId] = dAbsChanges.get(iAbsId, 0) + iChg
+            iCount += iChg
+            iSum += iChg * oPhysCard.id
+            iSquares += iChg * oPhysCard.id * oPhysCard.id
+        if iCount > 0:
+            self._dChecksums[oCardSet.id] = [iCount, iSum, iSquares]
+        else:
+            self._dChecksums.pop(oCardSet.id, None)
+        self.apply_changes(oCardSet.id, dAbsChanges)
+
+    def card_set_deleted(self, oCardSet, _fPostFuncs=None):
+        """Remove deleted card sets from the index."""
+        self._dChecksums.pop(oCardSet.id, None)
+        self.remove(oCardSet.id)
@@ -6,8 +6,17 @@
 """Utility functions for dealing with managing the CardSet Objects"""
 
 from sqlobject import SQLObjectNotFound, sqlhub
-from .BaseTables import PhysicalCardSet
+from sqlobject.sqlbuilder import (Table, Select, Insert, Delete, AND, IN,
+                                  func)
+from .BaseTables import (PhysicalCardSet, PhysicalCard, AbstractCard,
+                         Printing, Expansion,
+                         MapPhysicalCardToPhysicalCardSet)
 from .BaseAdapters import IPhysicalCardSet
+from .DBSignals import send_card_set_changes
+
+# Maximum number of rows or ids used in a single bulk statement. Older
+# versions of SQLite limit the number of rows in a VALUES clause to 500.
+BULK_SIZE = 500
 
 
 def check_cs_exists(sName):
@@ -76,8 +85,17 @@ def delete_physical_card_set(sSetName):
         """Remove cards from the card set.
 
            Intended to be wrapped in a transaction for speed."""
-        for oCard in oCS.cards:
-            oCS.removePhysicalCard(oCard)
+        # pylint: disable=protected-access
+        # We need to access _connection here
+        oConn = PhysicalCardSet._connection
+        cClass = MapPhysicalCardToPhysicalCardSet
+        oTable = Table(cClass.sqlmeta.table)
+        oWhere = oTable.physical_card_set_id == oCS.id
+        aIds = [x[0] for x in oConn.queryAll(oConn.sqlrepr(
+            Select(oTable.id, where=oWhere)))]
+        oConn.query(oConn.sqlrepr(Delete(cClass.sqlmeta.table,
+                                         where=oWhere)))
+        _expire_rows(oConn, cClass, aIds)
     try:
         oCS = PhysicalCardSet.byName(sSetName)
         aChildren = find_children(oCS)
@@ -143,6 +161,301 @@ def clean_empty(aMyList, aExistingList):
         delete_physical_card_set(sName)
 
 
+def get_card_counts(oCardSet):
+    """Return a dictionary of physical card id : count for the card set.
+
+       The database does the counting, so we only read one row per
+       distinct card, rather than one per copy."""
+    return get_physical_card_counts([oCardSet.id]).get(oCardSet.id, {})
+
+
+def get_card_count(oCardSet, oPhysCard):
+    """Return the number of copies of oPhysCard in the card set."""
+    # pylint: disable=no-member
+    # SQLObject confuses pylint
+    return MapPhysicalCardToPhysicalCardSet.selectBy(
+        physicalCardSetID=oCardSet.id, physicalCardID=oPhysCard.id).count()
+
+
+def get_total_card_count(oCardSet):
+    """Return the total number of cards in the card set."""
+    # pylint: disable=no-member
+    # SQLObject confuses pylint
+    return MapPhysicalCardToPhysicalCardSet.selectBy(
+        physicalCardSetID=oCardSet.id).count()
+
+
+def get_abstract_card_counts(aSetIds=None):
+    """Return a dictionary of card set id : {abstract card id : count}
+       for the given card sets, or for all card sets if aSetIds is None.
+
+       This is a single grouped query on the mapping table, so it's
+       suitable for reading thousands of card sets at once. Empty card
+       sets are not included."""
+    # pylint: disable=protected-access
+    # We need to access _connection here
+    oConn = PhysicalCardSet._connection
+    oMap = Table(MapPhysicalCardToPhysicalCardSet.sqlmeta.table)
+    oCard = Table(PhysicalCard.sqlmeta.table)
+    oWhere = oMap.physical_card_id == oCard.id
+    if aSetIds is not None:
+        aSetIds = list(aSetIds)
+        if not aSetIds:
+            return {}
+        oWhere = AND(oWhere, IN(oMap.physical_card_set_id, aSetIds))
+    dCounts = {}
+    for iSetId, iAbsId, iCount in oConn.queryAll(oConn.sqlrepr(Select(
+            [oMap.physical_card_set_id, oCard.abstract_card_id,
+             func.COUNT(oMap.id)],
+            where=oWhere,
+            groupBy=[oMap.physical_card_set_id,
+                     oCard.abstract_card_id]))):
+        dCounts.setdefault(iSetId, {})[iAbsId] = int(iCount)
+    return dCounts
+
+
+def get_physical_card_counts(aSetIds):
+    """Return a dictionary of card set id : {physical card id : count}
+       for the given card sets.
+
+       Like get_abstract_card_counts, the counts are grouped by the
+       database, using one query per BULK_SIZE card sets. Empty card
+       sets are not included."""
+    # pylint: disable=protected-access
+    # We need to access _connection here
+    oConn = PhysicalCardSet._connection
+    oMap = Table(MapPhysicalCardToPhysicalCardSet.sqlmeta.table)
+    dCounts = {}
+    for aChunk in _chunks(aSetIds):
+        for iSetId, iCardId, iCount in oConn.queryAll(oConn.sqlrepr(Select(
+                [oMap.physical_card_set_id, oMap.physical_card_id,
+                 func.COUNT(oMap.id)],
+                where=IN(oMap.physical_card_set_id, aChunk),
+                groupBy=[oMap.physical_card_set_id,
+                         oMap.physical_card_id]))):
+            dCounts.setdefault(iSetId, {})[iCardId] = int(iCount)
+    return dCounts
+
+
+def get_card_set_checksums(aSetIds=None):
+    """Return a dictionary of card set id : [number of cards, sum of the
+       physical card ids, sum of the squares of the physical card ids]
+       for the given card sets, or for all card sets if aSetIds is None.
+
+       This is cheap to read compared to the card counts, and changes if
+       a card is replaced by another, so caches of the card set
+       contents can use it to check that they are current. Empty card
+       sets are not included."""
+    # pylint: disable=protected-access
+    # We need to access _connection here
+    oConn = PhysicalCardSet._connection
+    oMap = Table(MapPhysicalCardToPhysicalCardSet.sqlmeta.table)
+    oCardId = oMap.physical_card_id
+    aColumns = [oMap.physical_card_set_id, func.COUNT(oMap.id),
+                func.SUM(oCardId), func.SUM(oCardId * oCardId)]
+    if aSetIds is None:
+        aQueries = [Select(aColumns, groupBy=oMap.physical_card_set_id)]
+    else:
+        aQueries = [Select(aColumns,
+                           where=IN(oMap.physical_card_set_id, aChunk),
+                           groupBy=oMap.physical_card_set_id)
+                    for aChunk in _chunks(aSetIds)]
+    dChecksums = {}
+    for oQuery in aQueries:
+        for oRow in oConn.queryAll(oConn.sqlrepr(oQuery)):
+            # Lists, rather than tuples, so the results can be compared
+            # with values loaded from json files
+            dChecksums[oRow[0]] = [int(x) for x in oRow[1:]]
+    return dChecksums
+
+
+def get_filtered_card_counts(oFilter):
+    """Return a dictionary of physical card id : count for the mapping
+       table rows selected by oFilter.
+
+       The filter's joins may match a mapping table row several times,
+       so we count the distinct rows."""
+    # pylint: disable=protected-access
+    # We need to access _connection and the filter's query
+    oConn = PhysicalCardSet._connection
+    oMap = Table(MapPhysicalCardToPhysicalCardSet.sqlmeta.table)
+    oRows = Select(oMap.id, where=oFilter._get_expression(),
+                   join=oFilter._get_joins(), distinct=True)
+    return dict((iCardId, int(iCount)) for iCardId, iCount in
+                oConn.queryAll(oConn.sqlrepr(Select(
+                    [oMap.physical_card_id, func.COUNT(oMap.id)],
+                    where=IN(oMap.id, oRows),
+                    groupBy=oMap.physical_card_id))))
+
+
+def get_filtered_card_rows(oFilter):
+    """Return a list of (physical card id, card set id) pairs, one for
+       each mapping table row selected by oFilter.
+
+       Like get_filtered_card_counts, this reads the ids directly,
+       rather than creating an object for each row."""
+    # pylint: disable=protected-access
+    # We need to access _connection and the filter's query
+    oConn = PhysicalCardSet._connection
+    oMap = Table(MapPhysicalCardToPhysicalCardSet.sqlmeta.table)
+    oRows = Select(oMap.id, where=oFilter._get_expression(),
+                   join=oFilter._get_joins(), distinct=True)
+    return oConn.queryAll(oConn.sqlrepr(Select(
+        [oMap.physical_card_id, oMap.physical_card_set_id],
+        where=IN(oMap.id, oRows))))
+
+
+def get_physical_card_names(aCardIds):
+    """Return a dictionary of physical card id : (card name, expansion
+       name, printing name) for the given physical cards.
+
+       The expansion and printing names are None if the card has no
+       printing, and the printing name is None for the default printing.
+       This avoids loading the card, printing and expansion objects for
+       every card when writing out large card sets."""
+    # pylint: disable=protected-access
+    # We need to access _connection here
+    oConn = PhysicalCardSet._connection
+    oCard = Table(PhysicalCard.sqlmeta.table)
+    oAbs = Table(AbstractCard.sqlmeta.table)
+    oPrint = Table(Printing.sqlmeta.table)
+    oExp = Table(Expansion.sqlmeta.table)
+    # There are few printings, so we just read them all
+    dPrintings = dict((iPrintId, (sExpName, sPrintName)) for
+                      iPrintId, sExpName, sPrintName in
+                      oConn.queryAll(oConn.sqlrepr(Select(
+                          [oPrint.id, oExp.name, oPrint.name],
+                          where=oPrint.expansion_id == oExp.id))))
+    dNames = {}
+    for aChunk in _chunks(aCardIds):
+        for iCardId, sName, iPrintId in oConn.queryAll(oConn.sqlrepr(Select(
+                [oCard.id, oAbs.name, oCard.printing_id],
+                where=AND(oCard.abstract_card_id == oAbs.id,
+                          IN(oCard.id, aChunk))))):
+            dNames[iCardId] = (sName,) + dPrintings.get(iPrintId,
+                                                        (None, None))
+    return dNames
+
+
+def iter_physical_cards(oCardSet):
+    """Iterate over the physical cards in the card set, yielding each
+       card once per copy, as iterating over physical_map does."""
+    # pylint: disable=no-member
+    # SQLObject confuses pylint
+    for iCardId, iCount in get_card_counts(oCardSet).items():
+        oPhysCard = PhysicalCard.get(iCardId)
+        for _iNum in range(iCount):
+            yield oPhysCard
+
+
+def _chunks(aItems):
+    """Split aItems into lists of at most BULK_SIZE items."""
+    aItems = list(aItems)
+    for iPos in range(0, len(aItems), BULK_SIZE):
+        yield aItems[iPos:iPos + BULK_SIZE]
+
+
+def _expire_rows(oConn, cClass, aIds):
+    """Remove rows deleted behind SQLObject's back from the object
+       caches, so we don't return stale objects if the ids are reused."""
+    # pylint: disable=protected-access
+    # We need to get the underlying connection for transactions
+    aConns = [oConn]
+    if hasattr(oConn, '_dbConnection'):
+        # A transaction, so the main connection may also hold the rows
+        aConns.append(oConn._dbConnection)
+    for oCacheConn in aConns:
+        for iId in aIds:
+            oCacheConn.cache.expire(iId, cClass)
+
+
+def apply_card_changes(oCardSet, dCardChanges):
+    """Change the card set contents using bulk statements.
+
+       dCardChanges maps physical cards to the change in the number of
+       copies. Removals are limited to the copies actually in the card
+       set, and the most recently added copies are removed first.
+       This doesn't manage transactions or send signals - callers should
+       generally use change_card_sets.
+
+       Returns a dictionary of the changes actually made."""
+    # pylint: disable=protected-access, too-many-locals
+    # We need to access _connection here
+    # We use a lot of local variables for clarity
+    oConn = PhysicalCardSet._connection
+    sMapTable = MapPhysicalCardToPhysicalCardSet.sqlmeta.table
+    oMap = Table(sMapTable)
+    dCounts = get_card_counts(oCardSet)
+
+    dApplied = {}
+    dRemove = {}
+    aInserts = []
+    for oPhysCard, iChg in dCardChanges.items():
+        iCur = dCounts.get(oPhysCard.id, 0)
+        iNew = max(iCur + iChg, 0)
+        if iNew == iCur:
+            continue
+        dApplied[oPhysCard] = iNew - iCur
+        if iNew < iCur:
+            dRemove[oPhysCard.id] = iCur - iNew
+        else:
+            aInserts.extend([(oPhysCard.id, oCardSet.id)] * (iNew - iCur))
+    if not dApplied:
+        return dApplied
+
+    # Remove the copies from the mapping table
+    aDelete = []
+    for aCardIds in _chunks(dRemove):
+        dRows = {}
+        for iRowId, iCardId in oConn.queryAll(oConn.sqlrepr(Select(
+                [oMap.id, oMap.physical_card_id],
+                where=AND(oMap.physical_card_set_id == oCardSet.id,
+                          IN(oMap.physical_card_id, aCardIds)),
+                orderBy=oMap.id))):
+            dRows.setdefault(iCardId, []).append(iRowId)
+        for iCardId in aCardIds:
+            aDelete.extend(dRows.get(iCardId, [])[-dRemove[iCardId]:])
+    for aRowIds in _chunks(aDelete):
+        oConn.query(oConn.sqlrepr(Delete(sMapTable,
+                                         where=IN(oMap.id, aRowIds))))
+    _expire_rows(oConn, MapPhysicalCardToPhysicalCardSet, aDelete)
+    for aRows in _chunks(aInserts):
+        oConn.query(oConn.sqlrepr(Insert(
+            sMapTable, template=['physical_card_id', 'physical_card_set_id'],
+            valueList=aRows)))
+    return dApplied
+
+
+def change_card_sets(dChanges):
+    """Apply a batch of changes to one or more card sets in a single
+       transaction.
+
+       dChanges maps card sets to dictionaries of physical card: change
+       in count, as for apply_card_changes. A single changed signal is
+       sent for each card set that is actually changed. If we're already
+       in a transaction, the signals are sent before it's committed.
+
+       Returns the changes actually made, in the same form as dChanges."""
+    def _apply_changes(dChanges):
+        """Apply all the changes, so this can be wrapped in a
+           transaction."""
+        dApplied = {}
+        for oCardSet, dCardChanges in dChanges.items():
+            dSetApplied = apply_card_changes(oCardSet, dCardChanges)
+            if dSetApplied:
+                dApplied[oCardSet] = dSetApplied
+        return dApplied
+
+    if hasattr(sqlhub.processConnection, 'commit'):
+        # We're already in a transaction, so just apply the changes
+        dApplied = _apply_changes(dChanges)
+    else:
+        dApplied = sqlhub.doInTransaction(_apply_changes, dChanges)
+    for oCardSet, dSetApplied in dApplied.items():
+        send_card_set_changes(oCardSet, dSetApplied)
+    return dApplied
+
+
 def get_current_card_sets():
     """Return a list of current card sets.
 
@@ -8,6 +8,8 @@
 """Wrappers around SQLObject signals needed to keep card sets and the card
 collection in sync."""
 
+from contextlib import contextmanager
+
 from sqlobject.events import (Signal, listen, RowUpdateSignal,
                               RowDestroySignal, RowCreatedSignal)
 
@@ -21,6 +23,10 @@ except ImportError:
     from pydispatch import dispatcher
 from .BaseTables import PhysicalCardSet
 
+# Changes collected while batching, as (class, card set): {card: change}.
+# None when we're not batching.
+_dBatchedChanges = None
+
 
 class ChangedSignal(Signal):
     """Syncronisation signal for card sets.
@@ -28,13 +34,60 @@ class ChangedSignal(Signal):
        Needs to be sent after changes are commited to the database, so card
        sets can reload properly.
        Used so card sets always reflect correct available counts.
+
+       Listeners are called with the card set and a dictionary of
+       physical card: change in count, so a batch of changes to a card
+       set only needs a single signal.
        """
 
 
 # Senders
 def send_changed_signal(oCardSet, oPhysCard, iChange, cClass=PhysicalCardSet):
     """Sent when card counts change, as card sets may need to update."""
-    cClass.sqlmeta.send(ChangedSignal, oCardSet, oPhysCard, iChange)
+    send_card_set_changes(oCardSet, {oPhysCard: iChange}, cClass)
+
+
+def send_card_set_changes(oCardSet, dChanges, cClass=PhysicalCardSet):
+    """Send a single changed signal for all the changes in dChanges
+       (physical card: change in count).
+
+       If we're batching changes, they are added to the batch instead."""
+    if _dBatchedChanges is None:
+        cClass.sqlmeta.send(ChangedSignal, oCardSet, dChanges)
+        return
+    dSetChanges = _dBatchedChanges.setdefault((cClass, oCardSet), {})
+    for oPhysCard, iChange in dChanges.items():
+        dSetChanges[oPhysCard] = dSetChanges.get(oPhysCard, 0) + iChange
+
+
+@contextmanager
+def batch_changed_signals():
+    """Context manager which collects the changed signals sent inside the
+       with block, and then sends a single signal for each card set with
+       the combined changes.
+
+       Changes which cancel out are dropped. Nested blocks are merged into
+       the outermost one."""
+    # pylint: disable=global-statement
+    # We deliberately use a module level variable here
+    global _dBatchedChanges
+    if _dBatchedChanges is not None:
+        # Already batching
+        yield
+        return
+    _dBatchedChanges = {}
+    try:
+        yield
+    finally:
+        # The changes have been made to the database, so we send the
+        # signals even if there was an error
+        dBatch = _dBatchedChanges
+        _dBatchedChanges = None
+        for (cClass, oCardSet), dSetChanges in dBatch.items():
+            dSetChanges = dict((oPhysCard, iChange) for oPhysCard, iChange
+                               in dSetChanges.items() if iChange)
+            if dSetChanges:
+                send_card_set_changes(oCardSet, dSetChanges, cClass)
 
 
 # Listeners
@@ -9,18 +9,28 @@
 """Misc functions that influence the database in various ways."""
 
 import datetime
+import hashlib
 import logging
+import uuid
+from urllib.parse import urlsplit, urlunsplit
 
 from sqlobject import SQLObjectNotFound
+from sqlobject.sqlbuilder import Insert, Table, Select, func
 
 from .BaseTables import VersionTable, PhysicalCardSet, AbstractCard, Metadata
 from .BaseAdapters import Adapter
 from .BaseAbbreviations import DatabaseAbbreviation
 from .DatabaseVersion import DatabaseVersion
 from .CachedRelatedJoin import SOCachedRelatedJoin
+from .FilterIndex import set_filter_index
+from .CardNameIndex import set_card_name_index
 from ..Utility import find_subclasses
 
 CARDLIST_UPDATE_DATE = "last cardlist update"
+DATABASE_CHANGE_MARKER = "database change marker"
+
+# Number of rows to write in each statement in bulk_insert
+BULK_BATCH_SIZE = 500
 
 
 def make_adapter_caches():
@@ -40,33 +50,43 @@ def make_adapter_caches():
         cAdapter.make_object_cache()
 
 
-def flush_cache(bMakeCache=True):
-    """Flush all the object caches - needed before importing new card lists
-       and such"""
-    for oJoin in AbstractCard.sqlmeta.joins:
-        if isinstance(oJoin, SOCachedRelatedJoin):
-            oJoin.flush_cache()
+def get_cached_joins():
+    """Return the list of cached joins on AbstractCard and its
+       subclasses."""
+    aJoins = [oJoin for oJoin in AbstractCard.sqlmeta.joins
+              if isinstance(oJoin, SOCachedRelatedJoin)]
     # pylint: disable=no-member
     # AbstractCard confuses pylint
     for oChild in AbstractCard.__subclasses__():
-        for oJoin in oChild.sqlmeta.joins:
-            if isinstance(oJoin, SOCachedRelatedJoin):
-                oJoin.flush_cache()
+        aJoins.extend([oJoin for oJoin in oChild.sqlmeta.joins
+                       if isinstance(oJoin, SOCachedRelatedJoin)])
+    return aJoins
+
+
+def flush_cache(bMakeCache=True):
+    """Flush all the object caches - needed before importing new card lists
+       and such.
+
+       This also disables the in-memory filter index and clears the card
+       name index, since the card list may change."""
+    set_filter_index(None)
+    set_card_name_index(None)
+    for oJoin in get_cached_joins():
+        oJoin.flush_cache()
     if bMakeCache:
         make_adapter_caches()
 
 
-def init_cache():
-    """Initiliase the cached join tables."""
-    for oJoin in AbstractCard.sqlmeta.joins:
-        if isinstance(oJoin, SOCachedRelatedJoin):
+def init_cache(dJoinRows=None):
+    """Initiliase the cached join tables.
+
+       dJoinRows, if given, maps each join to the list of rows to use
+       instead of querying the database."""
+    for oJoin in get_cached_joins():
+        if dJoinRows is not None:
+            oJoin.init_cache(dJoinRows[oJoin])
+        else:
             oJoin.init_cache()
-    # pylint: disable=no-member
-    # AbstractCard confuses pylint
-    for oChild in AbstractCard.__subclasses__():
-        for oJoin in oChild.sqlmeta.joins:
-            if isinstance(oJoin, SOCachedRelatedJoin):
-                oJoin.init_cache()
     make_adapter_caches()
 
 
@@ -91,6 +111,19 @@ def refresh_tables(aTables, oConn, bMakeCache=True):
     return True
 
 
+def bulk_insert(oConn, sTable, aColumns, aRows, iBatchSize=BULK_BATCH_SIZE):
+    """Insert aRows into sTable using multi-row INSERT statements.
+
+       aColumns gives the database column names, and each row is a
+       sequence of values in the same order. This bypasses SQLObject's
+       object creation entirely, so the caller is responsible for
+       flushing any caches that may be affected."""
+    for iStart in range(0, len(aRows), iBatchSize):
+        oInsert = Insert(sTable, valueList=aRows[iStart:iStart + iBatchSize],
+                         template=aColumns)
+        oConn.query(oConn.sqlrepr(oInsert))
+
+
 # Utility function to help with config management and such
 def get_cs_id_name_table():
     """Returns a dictionary id : name for all the card sets.
@@ -131,3 +164,58 @@ def set_metadata_date(sKey, oDate):
         oObj.syncUpdate()
     except SQLObjectNotFound:
         oObj = Metadata(dataKey=sKey, value=sDate)
+
+
+def mark_database_changed():
+    """Store a new random change marker in the metadata table.
+
+       Files which cache data from the database, such as the object cache
+       snapshot, compare the marker to tell when they are out of date,
+       since updating rows in place doesn't change the table sizes."""
+    sMarker = uuid.uuid4().hex
+    try:
+        # pylint: disable=no-member
+        # SQLObject confuses pylint
+        oObj = Metadata.byDataKey(DATABASE_CHANGE_MARKER)
+        oObj.value = sMarker
+        oObj.syncUpdate()
+    except SQLObjectNotFound:
+        Metadata(dataKey=DATABASE_CHANGE_MARKER, value=sMarker)
+
+
+def get_database_change_marker():
+    """Return the change marker set by mark_database_changed, or None if
+       it has never been set."""
+    try:
+        # pylint: disable=no-member
+        # SQLObject confuses pylint
+        return Metadata.byDataKey(DATABASE_CHANGE_MARKER).value
+    except SQLObjectNotFound:
+        return None
+
+
+def get_connection_key(oConn):
+    """Return a hash identifying the database used by oConn.
+
+       Any password is removed from the connection URI before hashing,
+       so the result can be safely written to cache files."""
+    sUri = oConn.uri()
+    oParts = urlsplit(sUri)
+    if oParts.password is not None:
+        sHost = oParts.netloc.rsplit('@', 1)[1]
+        sUri = urlunsplit(oParts._replace(
+            netloc='%s@%s' % (oParts.username, sHost)))
+    return hashlib.sha256(sUri.encode('utf-8')).hexdigest()
+
+
+def get_cardlist_key():
+    """Describe the current card list, so indexes built from the card
+       list can tell when they need to be rebuilt."""
+    # pylint: disable=protected-access
+    # We need to access _connection here
+    oConn = AbstractCard._connection
+    oTable = Table(AbstractCard.sqlmeta.table)
+    iCount, iMax = oConn.queryOne(oConn.sqlrepr(Select(
+        [func.COUNT(oTable.id), func.MAX(oTable.id)])))
+    return (get_connection_key(oConn),
+            get_metadata_date(CARDLIST_UPDATE_DATE), iCount, iMax)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""In-memory evaluation of card filters.
+
+   Filters which support it return a bitmap of the matching AbstractCard
+   ids from get_card_bitmap, using inverted indexes built from the cached
+   joins and the card table columns, rather than building an SQL query.
+   Bit n of the bitmap is set if the card with id n matches. Filter
+   trees are combined with bitwise operations. Filters which don't
+   support this fall back to SQL."""
+
+import re
+
+from sqlobject import NOT
+from sqlobject.sqlbuilder import Table, Select, SQLTrueClause as TRUE
+
+from .BaseTables import AbstractCard, PhysicalCard
+
+# The active index. This is set when the object cache is created, and
+# cleared when the caches are flushed
+_oFilterIndex = None
+
+
+def get_filter_index():
+    """Return the active FilterIndex, or None if in-memory filtering is
+       disabled."""
+    return _oFilterIndex
+
+
+def set_filter_index(oIndex):
+    """Set the active FilterIndex. Use None to disable in-memory
+       filtering."""
+    # pylint: disable=global-statement
+    # We deliberately use a module level variable here
+    global _oFilterIndex
+    _oFilterIndex = oIndex
+
+
+def like_to_regex(sPattern):
+    """Convert an SQL LIKE pattern to an equivalent compiled regular
+       expression."""
+    aParts = []
+    for sChar in sPattern:
+        if sChar == '%':
+            aParts.append('.*')
+        elif sChar == '_':
+            aParts.append('.')
+        else:
+            aParts.append(re.escape(sChar))
+    return re.compile(''.join(aParts), re.DOTALL)
+
+
+def ids_to_bitmap(aIds):
+    """Convert an iterable of ids to a bitmap."""
+    iBitmap = 0
+    for iId in aIds:
+        iBitmap |= 1 << iId
+    return iBitmap
+
+
+def bitmap_to_ids(iBitmap):
+    """Return the ids set in iBitmap, in ascending order."""
+    return [iId for iId, sBit in enumerate(reversed(bin(iBitmap)[2:]))
+            if sBit == '1']
+
+
+class FilterIndex:
+    """Bitmap inverted indexes over the card list, used to evaluate
+       filters without querying the database.
+
+       aJoins is the list of cached joins on AbstractCard and its
+       subclasses. Indexes are built when first needed. The join indexes
+       are rebuilt if the join contents change, but the card table
+       indexes assume the card list doesn't change while the index is
+       active. flush_cache disables the index, so reloading the card
+       list requires a new index."""
+
+    # Also provide the conversion helpers for the filters
+    ids_to_bitmap = staticmethod(ids_to_bitmap)
+    bitmap_to_ids = staticmethod(bitmap_to_ids)
+
+    def __init__(self, aJoins):
+        # Index the joins by (intermediate table, other column)
+        self._dJoins = dict(((oJoin.intermediateTable, oJoin.otherColumn),
+                             oJoin) for oJoin in aJoins)
+        self._dJoinIndex = {}
+        self._dColumns = {}
+        self._dColumnIndex = {}
+        self._iAllBitmap = None
+
+    def _get_column(self, sTable, sColumn):
+        """Return a dictionary of id: value for the given column."""
+        tKey = (sTable, sColumn)
+        if tKey not in self._dColumns:
+            # pylint: disable=protected-access
+            # We need to access _connection here
+            oConn = AbstractCard._connection
+            oTable = Table(sTable)
+            self._dColumns[tKey] = dict(oConn.queryAll(oConn.sqlrepr(
+                Select([oTable.id, getattr(oTable, sColumn)]))))
+        return self._dColumns[tKey]
+
+    def _get_column_index(self, sTable, sColumn):
+        """Return the inverted index (value: bitmap) for the column."""
+        tKey = (sTable, sColumn)
+        if tKey not in self._dColumnIndex:
+            dIndex = {}
+            for iId, oValue in self._get_column(sTable, sColumn).items():
+                dIndex[oValue] = dIndex.get(oValue, 0) | (1 << iId)
+            self._dColumnIndex[tKey] = dIndex
+        return self._dColumnIndex[tKey]
+
+    def all_bitmap(self):
+        """Return the bitmap of all the cards."""
+        if self._iAllBitmap is None:
+            self._iAllBitmap = ids_to_bitmap(self._get_column(
+                AbstractCard.sqlmeta.table, 'id'))
+        return self._iAllBitmap
+
+    def has_join(self, sTable, sColumn):
+        """Return True if we have an index for the given mapping table
+           column."""
+        return (sTable, sColumn) in self._dJoins
+
+    def _get_join_index(self, oJoin):
+        """Return the inverted index (other id: bitmap) for the join."""
+        tCached = self._dJoinIndex.get(oJoin)
+        if tCached is None or tCached[0] != oJoin.iCacheVersion:
+            dIndex = {}
+            for iId, tOtherIds in oJoin.get_id_map().items():
+                iBit = 1 << iId
+                for iOtherId in tOtherIds:
+                    dIndex[iOtherId] = dIndex.get(iOtherId, 0) | iBit
+            # get_id_map may update the version, so we check it afterwards
+            tCached = (oJoin.iCacheVersion, dIndex)
+            self._dJoinIndex[oJoin] = tCached
+        return tCached[1]
+
+    def join_bitmap(self, sTable, sColumn, aOtherIds):
+        """Return the bitmap of the cards joined to any of aOtherIds by
+           the given mapping table column."""
+        dIndex = self._get_join_index(self._dJoins[(sTable, sColumn)])
+        iBitmap = 0
+        for iOtherId in aOtherIds:
+            iBitmap |= dIndex.get(iOtherId, 0)
+        return iBitmap
+
+    def column_bitmap(self, sTable, sColumn, aValues, bNull=False):
+        """Return the bitmap of the cards where the column has one of
+           aValues, following SQL's IN semantics.
+
+           If bNull is True, cards where the column is NULL are also
+           included."""
+        dIndex = self._get_column_index(sTable, sColumn)
+        iBitmap = 0
+        for oValue in set(aValues):
+            if oValue is not None:
+                iBitmap |= dIndex.get(oValue, 0)
+        if bNull:
+            iBitmap |= dIndex.get(None, 0)
+        return iBitmap
+
+    def like_bitmap(self, sTable, sColumn, sPattern):
+        """Return the bitmap of the cards where the lower case column
+           value matches the LIKE pattern sPattern."""
+        oRegex = like_to_regex(sPattern.lower())
+        iBitmap = 0
+        for sValue, iValueBitmap in self._get_column_index(
+                sTable, sColumn).items():
+            if sValue is not None and oRegex.fullmatch(sValue.lower()):
+                iBitmap |= iValueBitmap
+        return iBitmap
+
+    def card_bitmap(self, oFilter):
+        """Return the bitmap of AbstractCard ids matching oFilter.
+
+           Filters on abstract cards which can't be evaluated in memory
+           are evaluated with an SQL query. Returns None if this isn't
+           possible (filters on physical cards or card sets)."""
+        # pylint: disable=protected-access
+        # We use the filter's expression and joins for the fallback
+        iBitmap = oFilter.get_card_bitmap(self)
+        if iBitmap is None and 'AbstractCard' in oFilter.types:
+            # pylint: disable=no-member
+            # SQLObject confuses pylint
+            oConn = AbstractCard._connection
+            oQuery = Select(AbstractCard.q.id, oFilter._get_expression(),
+                            join=oFilter._get_joins())
+            iBitmap = ids_to_bitmap(iId for (iId,) in oConn.queryAll(
+                oConn.sqlrepr(oQuery)))
+        return iBitmap
+
+    def card_ids(self, oFilter):
+        """Return the sorted list of AbstractCard ids matching oFilter, or
+           None if the filter can't be evaluated."""
+        iBitmap = self.card_bitmap(oFilter)
+        if iBitmap is None:
+            return None
+        return bitmap_to_ids(iBitmap)
+
+    def select(self, oFilter, cCardClass):
+        """Return the results of oFilter.select(cCardClass) using the
+           index, or None if we can't handle this case.
+
+           We handle selecting abstract cards, and selecting physical
+           cards using the PhysicalCardFilter."""
+        if issubclass(cCardClass, AbstractCard):
+            sField = '%s.%s' % (cCardClass.sqlmeta.table,
+                                cCardClass.sqlmeta.idName)
+        elif (cCardClass is PhysicalCard and
+              oFilter.selects_physical_cards()):
+            sField = '%s.abstract_card_id' % PhysicalCard.sqlmeta.table
+        else:
+            return None
+        iBitmap = self.card_bitmap(oFilter)
+        if iBitmap is None:
+            return None
+        iAll = self.all_bitmap()
+        if iBitmap & iAll == iAll:
+            return cCardClass.select()
+        if not iBitmap:
+            # Empty lists in IN aren't handled by all databases
+            return cCardClass.select(NOT(TRUE))
+        # The ids are all integers from the database, so we can safely
+        # build the clause directly. This is much faster than having
+        # SQLObject convert each id for large lists.
+        return cCardClass.select('%s IN (%s)' % (
+            sField, ', '.join([str(x) for x in bitmap_to_ids(iBitmap)])))
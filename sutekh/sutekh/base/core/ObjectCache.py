@@ -8,7 +8,10 @@
 
 from .BaseTables import (AbstractCard, RarityPair, Rarity, CardType,
                          Expansion, Ruling, PhysicalCard, Keyword, Artist)
-from .DBUtility import init_cache
+from .DBUtility import init_cache, get_cached_joins
+from .FilterIndex import FilterIndex, set_filter_index
+from .CacheSnapshot import (get_table_rows, make_objects, get_snapshot_key,
+                            load_snapshot, save_snapshot)
 
 
 class ObjectCache:
@@ -21,14 +24,42 @@ class ObjectCache:
        Including Ruling costs about an extra 1MB for no real speed up, but
        we threw it in anyway (on the assumption it may be useful sometime
        in the future).
+
+       If sSnapshotFile is given, the data used to fill the cache and the
+       cached joins is loaded from it if it's still valid for the
+       database, and saved to it otherwise.
+
+       Since the card list is now in memory, this also enables evaluating
+       filters with the FilterIndex.
        """
 
-    def __init__(self, aExtraTypesToCache):
+    def __init__(self, aExtraTypesToCache, sSnapshotFile=None):
         self._dCache = {}
         aTypesToCache = [Rarity, Expansion, RarityPair, CardType,
                          Ruling, Keyword, Artist, AbstractCard,
                          PhysicalCard] + aExtraTypesToCache
-        for cType in aTypesToCache:
-            self._dCache[cType] = list(cType.select())
+        if not sSnapshotFile:
+            for cType in aTypesToCache:
+                self._dCache[cType] = list(cType.select())
+            init_cache()
+            set_filter_index(FilterIndex(get_cached_joins()))
+            return
 
-        init_cache()
+        aJoins = get_cached_joins()
+        dKey = get_snapshot_key(aTypesToCache, aJoins)
+        tSnapshot = load_snapshot(sSnapshotFile, dKey, aTypesToCache, aJoins)
+        if tSnapshot is None:
+            dTypeRows = dict((cType, get_table_rows(cType))
+                             for cType in aTypesToCache)
+            dJoinRows = dict((oJoin, oJoin.get_cache_rows())
+                             for oJoin in aJoins)
+        else:
+            dTypeRows, dJoinRows = tSnapshot
+        # Order matters here, since parent classes must be created before
+        # their children
+        for cType in aTypesToCache:
+            self._dCache[cType] = make_objects(cType, dTypeRows[cType])
+        init_cache(dJoinRows)
+        set_filter_index(FilterIndex(aJoins))
+        if tSnapshot is None:
+            save_snapshot(sSnapshotFile, dKey, dTypeRows, dJoinRows)
@@ -23,6 +23,7 @@ from sqlobject import sqlhub
 from ..core.DatabaseVersion import DatabaseVersion
 from ..core.BaseTables import PhysicalCardSet, PhysicalCard
 from ..core.BaseAdapters import IAbstractCard
+from ..core.CardSetUtilities import change_card_sets
 from .BaseConfigFile import CARDSET, FULL_CARDLIST, CARDSET_LIST, FRAME
 from .MessageBus import MessageBus, CONFIG_MSG, DATABASE_MSG
 from .SutekhDialog import do_complaint_warning
@@ -469,12 +470,7 @@ class BasePlugin:
 
     def _commit_cards(self, oCS, aCards):
         """Add a list of physiccal cards to the given card set"""
-        def _in_transaction(oCS, aCards):
-            """The actual work happens here, so it can be wrapped in a
-               sqlobject transaction"""
-            for oCard in aCards:
-                # pylint: disable=no-member
-                # SQLObject confuses pylint
-                oCS.addPhysicalCard(oCard)
-
-        sqlhub.doInTransaction(_in_transaction, oCS, aCards)
+        dCards = {}
+        for oCard in aCards:
+            dCards[oCard] = dCards.get(oCard, 0) + 1
+        change_card_sets({oCS: dCards})
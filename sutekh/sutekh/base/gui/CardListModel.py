@@ -72,6 +72,12 @@ class CardListModel(Gtk.TreeStore):
         self._oConfig = oConfig
 
         self.bExpansions = True
+        # If True, the expansion rows are only added when the card row
+        # is expanded, or when they're asked for through the model API
+        self.bLazyExpansions = False
+        # abstract card : expansion info for cards whose expansion rows
+        # haven't been added yet
+        self._dLazyExpansions = {}
         self.oEmptyIter = None
         self.oIconManager = None
         self.bUseIcons = True
@@ -242,6 +248,7 @@ class CardListModel(Gtk.TreeStore):
         """Clear and reload the underlying store. For use after initialisation
            or when the filter or grouping changes."""
         self.clear()
+        self._dLazyExpansions = {}
 
         oCardIter = self.get_card_iterator(self.get_current_filter())
         fGetCard, _fGetCount, fGetExpanInfo, oGroupedIter, aCards = \
@@ -279,14 +286,17 @@ class CardListModel(Gtk.TreeStore):
                          8, oCard,
                          9, IPhysicalCard((oCard, None)),
                         )
-                aExpansionInfo = self.get_expansion_info(oCard,
-                                                         fGetExpanInfo(oItem))
-                for oPhysCard, sExpansion in aExpansionInfo:
-                    oExpansionIter = self.append(oChildIter)
-                    self.set(oExpansionIter,
-                             0, sExpansion,
-                             9, oPhysCard,
-                            )
+                if self.bLazyExpansions:
+                    dExpanInfo = fGetExpanInfo(oItem)
+                    if self.bExpansions and dExpanInfo:
+                        self._dLazyExpansions[oCard] = dExpanInfo
+                        # Placeholder row, so the card can be expanded.
+                        # This has no physical card, but needs a name so
+                        # the row can be sorted
+                        self.set(self.append(oChildIter), 0, '')
+                else:
+                    self._add_expansion_rows(oChildIter, oCard,
+                                             fGetExpanInfo(oItem))
                 bEmpty = False
 
             # Update Group Section
@@ -312,6 +322,52 @@ class CardListModel(Gtk.TreeStore):
         if iSortColumn is not None:
             self.set_sort_column_id(iSortColumn, iSortOrder)
 
+    def _add_expansion_rows(self, oCardIter, oCard, dExpanInfo):
+        """Add the expansion rows for the card at oCardIter"""
+        aExpansionInfo = self.get_expansion_info(oCard, dExpanInfo)
+        for oPhysCard, sExpansion in aExpansionInfo:
+            oExpansionIter = self.append(oCardIter)
+            self.set(oExpansionIter,
+                     0, sExpansion,
+                     9, oPhysCard,
+                    )
+
+    def load_children(self, oIter):
+        """Add the expansion rows for the card at oIter, if they were
+           deferred when loading.
+
+           The view calls this when a card row is expanded, and the
+           model API calls this before looking at the expansion level, so
+           callers don't need to know about the lazy loading."""
+        if not self._dLazyExpansions or oIter is None or \
+                self.iter_depth(oIter) != 1:
+            return
+        oPlaceholder = self.iter_children(oIter)
+        if oPlaceholder is None or \
+                self.get_value(oPlaceholder, 9) is not None:
+            # Nothing deferred, or the rows have already been added
+            return
+        # Cards can appear in several groups, so we keep the info until
+        # the next load
+        oCard = self.get_value(oIter, 8)
+        dExpanInfo = self._dLazyExpansions.get(oCard)
+        if dExpanInfo is None:
+            return
+        # We add the new rows before removing the placeholder, so the
+        # card row always has children while it's being expanded
+        self._add_expansion_rows(oIter, oCard, dExpanInfo)
+        self.remove(oPlaceholder)
+
+    def _get_iter_from_path(self, oPath):
+        """Get the iter for oPath, adding any deferred expansion rows
+           needed to reach it."""
+        if self._dLazyExpansions:
+            oPath = Gtk.TreePath(oPath)
+            if oPath.get_depth() > 2:
+                self.load_children(self.get_iter(Gtk.TreePath(
+                    oPath.get_indices()[:2])))
+        return self.get_iter(oPath)
+
     def get_card_iterator(self, oFilter):
         """Return an interator over the card model.
 
@@ -404,7 +460,7 @@ class CardListModel(Gtk.TreeStore):
     def get_card_name_from_path(self, oPath):
         """Get the card name associated with the current path. Handle the
            expansion level transparently."""
-        oIter = self.get_iter(oPath)
+        oIter = self._get_iter_from_path(oPath)
         return self.get_card_name_from_iter(oIter)
 
     def get_card_name_from_iter(self, oIter):
@@ -418,13 +474,13 @@ class CardListModel(Gtk.TreeStore):
 
     def get_abstract_card_from_path(self, oPath):
         """Get the abstract card name for the current path."""
-        oIter = self.get_iter(oPath)
+        oIter = self._get_iter_from_path(oPath)
         return self.get_abstract_card_from_iter(oIter)
 
     def get_physical_card_from_path(self, oPath):
         """Get the physical card name for the current path."""
         try:
-            oIter = self.get_iter(oPath)
+            oIter = self._get_iter_from_path(oPath)
             return self.get_physical_card_from_iter(oIter)
         except ValueError:
             # Something bad has happened, and we have an invalid path
@@ -443,6 +499,7 @@ class CardListModel(Gtk.TreeStore):
     def get_all_iter_children(self, oIter):
         """Get a list of all the subiters of this iter"""
         aChildIters = []
+        self.load_children(oIter)
         oChildIter = self.iter_children(oIter)
         while oChildIter:
             aChildIters.append(oChildIter)
@@ -476,7 +533,7 @@ class CardListModel(Gtk.TreeStore):
            """
         if oPath:
             # Avoid crashes when oPath is None for some reason
-            oIter = self.get_iter(oPath)
+            oIter = self._get_iter_from_path(oPath)
             return self.get_all_from_iter(oIter)
         return None, None, None, None
 
@@ -488,6 +545,7 @@ class CardListModel(Gtk.TreeStore):
         if iDepth != 1:
             # No children to look at
             return aChildren
+        self.load_children(oIter)
         oChildIter = self.iter_children(oIter)
         while oChildIter:
             oPhysCard = self.get_value(oChildIter, 9)
@@ -498,7 +556,7 @@ class CardListModel(Gtk.TreeStore):
 
     def get_inc_dec_flags_from_path(self, oPath):
         """Get the settings of the inc + dec flags for the current path"""
-        oIter = self.get_iter(oPath)
+        oIter = self._get_iter_from_path(oPath)
         bInc = self.get_value(oIter, 3)
         bDec = self.get_value(oIter, 4)
         return (bInc, bDec)
@@ -506,7 +564,7 @@ class CardListModel(Gtk.TreeStore):
     def get_exp_name_from_path(self, oPath):
         """Get the expansion information from the model, returning None if this
            is not at a level where the expansion is known."""
-        oIter = self.get_iter(oPath)
+        oIter = self._get_iter_from_path(oPath)
         if self.iter_depth(oIter) != 2:
             return None
         return self.get_name_from_iter(oIter)
@@ -10,10 +10,15 @@ from gi.repository import Gtk, Gdk
 
 from .FilteredView import FilteredView
 from .FilterDialog import FilterDialog
+from .MessageBus import MessageBus, CARD_TEXT_MSG
 from ..core.BaseTables import PhysicalCard, AbstractCard
 from ..core.BaseAdapters import IPhysicalCard
 from ..Utility import to_ascii
 
+# Number of rows either side of the selection listeners are asked to
+# prepare for
+PREFETCH_ROWS = 3
+
 
 class CardListView(FilteredView):
     """Base class for all the card list views in Sutekh."""
@@ -84,6 +89,33 @@ class CardListView(FilteredView):
         oPhysCard = self._oModel.get_physical_card_from_path(oPath)
         if oPhysCard:
             self._oController.set_card_text(oPhysCard)
+            self.prefetch_neighbours(oPath)
+
+    def prefetch_neighbours(self, oPath):
+        """Tell the card text listeners about the cards next to oPath,
+           so they can prepare them before they're selected.
+
+           The following rows are listed before the preceding ones at the
+           same distance, since moving down the list is most common."""
+        oIter = self._oModel.get_iter(oPath)
+        aNext, aPrev = [], []
+        for fStep, aRows in ((self._oModel.iter_next, aNext),
+                             (self._oModel.iter_previous, aPrev)):
+            oCur = oIter
+            for _iRow in range(PREFETCH_ROWS):
+                oCur = fStep(oCur)
+                if oCur is None:
+                    break
+                aRows.append(oCur)
+        aCards = []
+        for iRow in range(PREFETCH_ROWS):
+            for aRows in (aNext, aPrev):
+                if iRow < len(aRows):
+                    oCard = self._oModel.get_physical_card_from_iter(
+                        aRows[iRow])
+                    if oCard:
+                        aCards.append(oCard)
+        MessageBus.publish(CARD_TEXT_MSG, 'prefetch_cards', aCards)
 
     def process_selection(self):
         """Create a dictionary from the selection.
@@ -11,11 +11,12 @@ from sqlobject import SQLObjectNotFound
 from .GuiCardSetFunctions import check_ok_to_delete, update_card_set
 from .CardSetView import CardSetView
 from .MessageBus import MessageBus, CARD_TEXT_MSG
-from ..core.DBSignals import send_changed_signal
+from ..core.DBSignals import send_changed_signal, batch_changed_signals
 from ..core.BaseTables import (PhysicalCardSet, PhysicalCard,
                                MapPhysicalCardToPhysicalCardSet)
 from ..core.BaseAdapters import IPhysicalCardSet
-from ..core.CardSetUtilities import delete_physical_card_set
+from ..core.CardSetUtilities import (delete_physical_card_set, get_card_count,
+                                     change_card_sets)
 
 
 class CardSetController:
@@ -75,10 +76,7 @@ class CardSetController:
             # they are present.
 
             if not oPhysCard.printing:
-                iCardCount = MapPhysicalCardToPhysicalCardSet.selectBy(
-                    physicalCardID=oPhysCard.id,
-                    physicalCardSetID=oThePCS.id).count()
-                if iCardCount == 0:
+                if get_card_count(oThePCS, oPhysCard) == 0:
                     # Given card is not in the card set, so consider all
                     # cards with the same name.
                     aPhysCards = list(PhysicalCard.selectBy(
@@ -208,15 +206,18 @@ class CardSetController:
             return False
         if aSources[0] in ("Phys", PhysicalCardSet.sqlmeta.table):
             # Add the cards, Count Matters
+            dCards = {}
             for iCount, oPhysCard in aCards:
                 if aSources[0] == "Phys":
                     # Only ever add 1 when dragging from physical card list
-                    self.add_card(oPhysCard, None, False)
-                    aUndoCards.append((oPhysCard, -1))
-                else:
-                    for _iLoop in range(iCount):
-                        self.add_card(oPhysCard, None, False)
-                        aUndoCards.append((oPhysCard, -1))
+                    iCount = 1
+                dCards[oPhysCard] = dCards.get(oPhysCard, 0) + iCount
+            # Add all the cards in one go, so the model only needs to
+            # handle a single update
+            dApplied = change_card_sets({self.__oPhysCardSet: dCards})
+            for oPhysCard, iCount in dApplied.get(self.__oPhysCardSet,
+                                                  {}).items():
+                aUndoCards.extend([(oPhysCard, -1)] * iCount)
             dOperation = {self.view.sSetName: aUndoCards}
             self._add_undo_operation(dOperation)
             return True
@@ -225,24 +226,28 @@ class CardSetController:
     def change_selected_card_count(self, dSelectedData):
         """Helper function to set the selected cards to the specified number"""
         dOperation = {}
-        for oPhysCard in dSelectedData:
-            for sCardSetName, (iCardCount, iNewCnt) in \
-                    dSelectedData[oPhysCard].items():
-                aCards = []
-                if iNewCnt < iCardCount:
-                    # remove cards
-                    for _iAttempt in range(iCardCount - iNewCnt):
-                        # None as card set indicates this card set
-                        oCard = self.dec_card(oPhysCard, sCardSetName, False)
-                        if oCard:
-                            aCards.append((oCard, 1))
-                elif iNewCnt > iCardCount:
-                    # add cards
-                    for _iAttempt in range(iNewCnt - iCardCount):
-                        oCard = self.inc_card(oPhysCard, sCardSetName, False)
-                        aCards.append((oCard, -1))
-                dOperation.setdefault(sCardSetName, [])
-                dOperation[sCardSetName].extend(aCards)
+        # Update the models once all the changes are done
+        with batch_changed_signals():
+            for oPhysCard in dSelectedData:
+                for sCardSetName, (iCardCount, iNewCnt) in \
+                        dSelectedData[oPhysCard].items():
+                    aCards = []
+                    if iNewCnt < iCardCount:
+                        # remove cards
+                        for _iAttempt in range(iCardCount - iNewCnt):
+                            # None as card set indicates this card set
+                            oCard = self.dec_card(oPhysCard, sCardSetName,
+                                                  False)
+                            if oCard:
+                                aCards.append((oCard, 1))
+                    elif iNewCnt > iCardCount:
+                        # add cards
+                        for _iAttempt in range(iNewCnt - iCardCount):
+                            oCard = self.inc_card(oPhysCard, sCardSetName,
+                                                  False)
+                            aCards.append((oCard, -1))
+                    dOperation.setdefault(sCardSetName, [])
+                    dOperation[sCardSetName].extend(aCards)
         self._add_undo_operation(dOperation)
 
     def _add_undo_operation(self, dOperation):
@@ -259,12 +264,13 @@ class CardSetController:
         if not self._aUndoList:
             return
         dOperation = self._aUndoList.pop()
-        for sCardSetName, aCards in dOperation.items():
-            for oPhysCard, iCnt in aCards:
-                if iCnt < 0:
-                    self.dec_card(oPhysCard, sCardSetName, False)
-                else:
-                    self.add_card(oPhysCard, sCardSetName, False)
+        with batch_changed_signals():
+            for sCardSetName, aCards in dOperation.items():
+                for oPhysCard, iCnt in aCards:
+                    if iCnt < 0:
+                        self.dec_card(oPhysCard, sCardSetName, False)
+                    else:
+                        self.add_card(oPhysCard, sCardSetName, False)
         self._aRedoList.append(dOperation)
         self._fix_undo_status()
 
@@ -273,12 +279,13 @@ class CardSetController:
         if not self._aRedoList:
             return
         dOperation = self._aRedoList.pop()
-        for sCardSetName, aCards in dOperation.items():
-            for oPhysCard, iCnt in aCards:
-                # Logic is reversed from Undo list
-                if iCnt > 0:
-                    self.dec_card(oPhysCard, sCardSetName, False)
-                else:
-                    self.add_card(oPhysCard, sCardSetName, False)
+        with batch_changed_signals():
+            for sCardSetName, aCards in dOperation.items():
+                for oPhysCard, iCnt in aCards:
+                    # Logic is reversed from Undo list
+                    if iCnt > 0:
+                        self.dec_card(oPhysCard, sCardSetName, False)
+                    else:
+                        self.add_card(oPhysCard, sCardSetName, False)
         self._aUndoList.append(dOperation)
         self._fix_undo_status()
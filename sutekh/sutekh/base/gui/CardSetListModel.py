@@ -9,7 +9,9 @@
 
 """The Gtk.TreeModel for the card set lists."""
 
-from gi.repository import Gdk, Gtk
+from collections import namedtuple
+
+from gi.repository import Gdk, GLib, Gtk
 
 from ..core.BaseFilters import (FilterAndBox, NullFilter,
                                 PhysicalCardFilter,
@@ -31,10 +33,12 @@ from ..core.DBSignals import (listen_changed, disconnect_changed,
                               listen_row_created,
                               disconnect_row_destroy, disconnect_row_created,
                               disconnect_row_update)
+from ..core.CardSetUtilities import (get_filtered_card_counts,
+                                     get_filtered_card_rows)
 from ..Utility import move_articles_to_back
 from .CardListModel import CardListModel, USE_ICONS, HIDE_ILLEGAL
 from .BaseConfigFile import CARDSET, FRAME
-from .MessageBus import MessageBus
+from .MessageBus import MessageBus, DATABASE_MSG
 
 # consts for the different modes we need (iExtraLevelsMode)
 NO_SECOND_LEVEL, SHOW_EXPANSIONS, SHOW_CARD_SETS, EXP_AND_CARD_SETS, \
@@ -85,6 +89,41 @@ CARD_SETS_LEVEL = set([SHOW_CARD_SETS, CARD_SETS_AND_EXP, EXP_AND_CARD_SETS])
 BOTH_EXP_CARD_SETS = set([CARD_SETS_AND_EXP, EXP_AND_CARD_SETS])
 PARENT_OR_MINUS = set([PARENT_COUNT, MINUS_THIS_SET])
 
+# Number of cards added to the model in each idle callback when loading
+# in the background
+LOAD_CHUNK = 200
+
+# The data for a card level row
+LoadRow = namedtuple('LoadRow', ['oAbsCard', 'oPhysCard', 'iCount',
+                                 'iParentCount'])
+# The result of gathering the rows for a load. dTarget maps group
+# name -> abstract card id -> LoadRow, dChildren maps abstract card id
+# -> the extra levels from _get_children. dCache and dAbs2Phys are the
+# caches filled in while gathering.
+LoadSnapshot = namedtuple('LoadSnapshot', ['dTarget', 'dChildren', 'aCards',
+                                           'dCache', 'dAbs2Phys'])
+# The rows added by the last load, and the layout they were added with
+LoadRecord = namedtuple('LoadRecord', ['tLayout', 'dTarget', 'dChildren'])
+
+
+def _run_steps(oSteps):
+    """Run all the steps of a load generator, and return its result"""
+    while True:
+        try:
+            next(oSteps)
+        except StopIteration as oStop:
+            return oStop.value
+
+
+def _get_card_groups(dTarget):
+    """Return a dictionary of abstract card id -> set of group names for
+       the rows in dTarget"""
+    dGroups = {}
+    for sGroup, dRows in dTarget.items():
+        for oAbsId in dRows:
+            dGroups.setdefault(oAbsId, set()).add(sGroup)
+    return dGroups
+
 
 class CardSetModelRow:
     """Object which holds the data needed for a card set row."""
@@ -191,6 +230,15 @@ class CardSetCardListModel(CardListModel):
         self._iShowCardMode = THIS_SET_ONLY
         self._iParentCountMode = PARENT_COUNT
 
+        # Background load state
+        self._oLoadSteps = None
+        self._fLoadDone = None
+        self._bLoadStale = False
+        self._iLoadGen = 0
+        self._tLoadSort = None
+        # The rows added by the last load, if the model still matches them
+        self._oLastLoad = None
+
         # Add database listeners
         listen_changed(self.card_changed, PhysicalCardSet)
         listen_row_update(self.card_set_changed, PhysicalCardSet)
@@ -199,6 +247,8 @@ class CardSetCardListModel(CardListModel):
         # We don't listen for card set creation, since newly created card
         # sets aren't inuse. If that changes, we'll need to add an additional
         # signal listen here
+        MessageBus.subscribe(DATABASE_MSG, 'prepare_for_db_update',
+                             self.prepare_for_db_update)
 
     def __get_frame_id(self):
         """Return the frame id, handling oController is None case"""
@@ -234,6 +284,9 @@ class CardSetCardListModel(CardListModel):
         disconnect_row_update(self.card_set_changed, PhysicalCardSet)
         disconnect_row_destroy(self.card_set_deleted_created, PhysicalCardSet)
         disconnect_row_created(self.card_set_deleted_created, PhysicalCardSet)
+        MessageBus.unsubscribe(DATABASE_MSG, 'prepare_for_db_update',
+                               self.prepare_for_db_update)
+        self.cancel_load()
         MessageBus.clear(self)
         super(CardSetCardListModel, self).cleanup()
 
@@ -247,15 +300,22 @@ class CardSetCardListModel(CardListModel):
         """Get the current color for counts"""
         return self._oCountColour
 
-    def set_par_count_colour(self, oIter, iParCnt, iCnt):
-        """Format the parent card count"""
+    def _get_par_count_colour(self, iParCnt, iCnt):
+        """Return the colour for the parent card count, or None if we
+           don't colour it"""
         if self._iParentCountMode != IGNORE_PARENT:
             if (self._iParentCountMode == PARENT_COUNT and iParCnt < iCnt) or \
                     iParCnt < 0:
-                self.set_value(oIter, 7, RED)
-            else:
-                # Needed so we fix colours when editing
-                self.set_value(oIter, 7, BLACK)
+                return RED
+            # Needed so we fix colours when editing
+            return BLACK
+        return None
+
+    def set_par_count_colour(self, oIter, iParCnt, iCnt):
+        """Format the parent card count"""
+        oColour = self._get_par_count_colour(iParCnt, iCnt)
+        if oColour is not None:
+            self.set_value(oIter, 7, oColour)
 
     def _check_if_empty(self):
         """Add the empty entry if needed"""
@@ -266,38 +326,202 @@ class CardSetCardListModel(CardListModel):
                                                  [], BLACK, None, None))
 
     def load(self):
-        # pylint: disable=too-many-locals
-        # we use many local variables for clarity
-        """Clear and reload the underlying store. For use after initialisation,
+        """Reload the underlying store. For use after initialisation,
            when the filter or grouping changes or when card set relationships
            change.
+
+           Rather than clearing the store and rebuilding it, we work out
+           the rows we need and then only add, remove and update the rows
+           that differ from the current contents, so unchanged rows are
+           left alone.
+
+           This does all the work before returning, cancelling any
+           background load. See load_in_background.
            """
-        self.set_count_colour()
-        self.clear()
+        self.cancel_load()
+        self._prepare_load()
         self._dAbs2Phys = {}
-        self._dAbs2Iter = {}
-        self._dAbsSecondLevel2Iter = {}
-        self._dAbs2nd3rdLevel2Iter = {}
-        self._dGroupName2Iter = {}
-        # Clear cache (we can't do this in grouped_card_iter, since that
-        # is also called by add_new_card)
-        self._init_cache(True)
+        for _oStep in self._load_steps():
+            pass
+
+    def load_in_background(self, fDone=None):
+        """Reload the underlying store without blocking the main loop.
+
+           The load is split into steps, which are run from idle
+           callbacks. The first steps query the database and gather the
+           rows we need, LOAD_CHUNK cards at a time, and the remaining
+           steps apply them to the model, so the rows appear
+           progressively.
+
+           Starting another load cancels this one. fDone is called once
+           all the rows are in place.
+           """
+        self.cancel_load()
+        self._prepare_load()
+        self._fLoadDone = fDone
+        self._oLoadSteps = self._background_steps()
+        GLib.idle_add(self._load_step, self._iLoadGen)
+
+    def is_loading(self):
+        """Return True if a background load hasn't finished yet"""
+        return self._oLoadSteps is not None
+
+    def wait_for_load(self):
+        """Finish any background load immediately, blocking until all the
+           rows are in place."""
+        if self._oLoadSteps is None:
+            return
+        while self._next_load_step():
+            pass
+        self._finish_background_load()
+
+    def cancel_load(self):
+        """Abandon any background load.
+
+           The model keeps the rows it has at this point."""
+        self._iLoadGen += 1
+        self._oLoadSteps = None
+        self._fLoadDone = None
+        self._bLoadStale = False
+        self._restore_sorting()
+
+    def prepare_for_db_update(self):
+        """Abandon any background load before the database changes
+           underneath it."""
+        self.cancel_load()
+
+    def _defer_changes(self):
+        """Handle a database change while a background load is running.
+
+           The change may not be included in the rows gathered so far,
+           and the rows may be part way through being replaced, so we
+           can't update them as usual. Instead, we note the change, and
+           bring the model up to date once the load has finished (see
+           _finish_background_load). Restarting the load instead would
+           mean it never finished while the card set was being edited.
+
+           Returns False if there is no background load in progress."""
+        if self._oLoadSteps is None:
+            return False
+        self._bLoadStale = True
+        return True
 
+    def _prepare_load(self):
+        """Setup the state needed for loading"""
+        self.set_count_colour()
         self._bPhysicalFilter = False
         if self.applyfilter and self.selectfilter:
             self._bPhysicalFilter = self.selectfilter.is_physical_card_only()
         elif self.configfilter is not None:
             self._bPhysicalFilter = self.configfilter.is_physical_card_only()
 
+    def _load_steps(self):
+        """Gather the rows and apply them to the model.
+
+           This is a generator, yielding after every LOAD_CHUNK cards."""
+        oSnapshot = yield from self._gather_rows()
+        yield from self._apply_snapshot(oSnapshot)
+
+    def _background_steps(self):
+        """The steps for load_in_background.
+
+           The rows are gathered using a copy of the cache, since other
+           events may reset or update the cache between the steps. The
+           copy replaces the cache once the rows are applied."""
+        dCache, dAbs2Phys = dict(self._dCache), {}
+        oGather = self._gather_rows()
+        while True:
+            dMainCache, dMainAbs2Phys = self._dCache, self._dAbs2Phys
+            self._dCache, self._dAbs2Phys = dCache, dAbs2Phys
+            try:
+                next(oGather)
+            except StopIteration as oStop:
+                oSnapshot = oStop.value
+                break
+            finally:
+                self._dCache, self._dAbs2Phys = dMainCache, dMainAbs2Phys
+            yield
+        yield from self._apply_snapshot(oSnapshot)
+
+    def _gather_rows(self):
+        """Work out the rows the model needs.
+
+           This only queries the database and fills in the caches, and
+           doesn't touch the model. This is a generator, yielding after
+           every LOAD_CHUNK cards, which returns a LoadSnapshot."""
+        # Clear cache (we can't do this in grouped_card_iter, since that
+        # is also called by add_new_card)
+        self._init_cache(True)
+
         oCardIter = self.get_card_iterator(self.get_current_filter())
         # pylint: disable=unbalanced-tuple-unpacking
         # pylint misinterprets the number of iterms grouped_card_iter returns
-        oGroupedIter, aCards = self.grouped_card_iter(oCardIter)
+        oGroupedIter, aCards = yield from self._grouped_card_steps(oCardIter,
+                                                                   True)
         # pylint: enable=unbalanced-tuple-unpacking
-        self.oEmptyIter = None
+        dTarget = {}
+        dChildren = {}
+        iDone = 0
+        for sGroup, oGroupIter in oGroupedIter:
+            # Check for null group
+            dRows = dTarget[self._fix_group_name(sGroup)] = {}
+            for oAbsId, oRow in oGroupIter:
+                dRows[oAbsId] = LoadRow(oRow.oAbsCard, oRow.oPhysCard,
+                                        oRow.iCount, oRow.iParentCount)
+                if oAbsId not in dChildren:
+                    dChildren[oAbsId] = self._get_children(oRow)
+                iDone += 1
+                if iDone % LOAD_CHUNK == 0:
+                    yield
+        return LoadSnapshot(dTarget, dChildren, aCards, self._dCache,
+                            self._dAbs2Phys)
+
+    def _load_step(self, iGen):
+        """Idle callback to run the next step of a background load"""
+        if iGen != self._iLoadGen or self._oLoadSteps is None:
+            # Cancelled, or finished by wait_for_load
+            return False
+        if self._next_load_step():
+            return True
+        self._finish_background_load()
+        return False
+
+    def _next_load_step(self):
+        """Run the next step of a background load. Returns False once
+           all the rows are in place."""
+        try:
+            next(self._oLoadSteps)
+        except StopIteration:
+            return False
+        except Exception:
+            # Don't leave the failed load pending
+            self.cancel_load()
+            raise
+        return True
 
-        # Disable sorting while we do the insertions
+    def _finish_background_load(self):
+        """Clean up after a background load and notify the caller.
+
+           If the database changed while we were loading, we reload,
+           which only needs to update the rows that changed."""
+        fDone = self._fLoadDone
+        bStale = self._bLoadStale
+        self._oLoadSteps = None
+        self._fLoadDone = None
+        self._bLoadStale = False
+        if bStale:
+            self._dCache = {}
+            self.load()
+        if fDone:
+            fDone()
+
+    def _disable_sorting(self):
+        """Disable sorting while we change the rows"""
+        if self._tLoadSort is not None:
+            # Still disabled by an unfinished load
+            return
         iSortColumn, iSortOrder = self.get_sort_column_id()
+        self._tLoadSort = (iSortColumn, iSortOrder)
         # iSortColumn can be None or 0
         # None => defaults, so we do nothing, but 0 is a column to sort on
         # so we do need to unset in that case
@@ -305,103 +529,242 @@ class CardSetCardListModel(CardListModel):
             # Gtk+ docs says this disables sorting
             self.set_sort_column_id(-2, 0)
 
-        # Iterate over groups
+    def _restore_sorting(self):
+        """Restore the sorting disabled by _disable_sorting"""
+        if self._tLoadSort is None:
+            return
+        iSortColumn, iSortOrder = self._tLoadSort
+        self._tLoadSort = None
+        # See comments in CardListModel
+        if iSortColumn is not None:
+            self.set_sort_column_id(iSortColumn, iSortOrder)
 
-        bPostfix = self._oConfig.get_postfix_the_display()
+    def _get_load_layout(self):
+        """Return the settings which decide how the rows are laid out.
 
-        for sGroup, oGroupIter in oGroupedIter:
-            # Check for null group
-            sGroup = self._fix_group_name(sGroup)
+           The rows from the last load can only be reused if these haven't
+           changed."""
+        return (self.groupby, self._iExtraLevelsMode, self._iShowCardMode,
+                self._iParentCountMode, self.bEditable,
+                self._oConfig.get_postfix_the_display())
 
-            # Create Group Section
-            oSectionIter = self.insert_with_values(None, 0, [0], [sGroup])
-            self._dGroupName2Iter[sGroup] = oSectionIter
+    def _apply_snapshot(self, oSnapshot):
+        """Update the model to match the rows in oSnapshot.
 
-            # Fill in Cards
-            iGrpCnt = 0
-            iParGrpCnt = 0
-            for _oId, oRow in oGroupIter:
-                oCard = oRow.oAbsCard
-                iCnt = oRow.iCount
-                iParCnt = oRow.iParentCount
-                iGrpCnt += iCnt
-                iParGrpCnt += iParCnt
-                bIncCard, bDecCard = self.check_inc_dec(iCnt)
-                # Direct lookup, for same reason as in CardListModel
-                # We skip name here, as that gets reset in _set_display_name
-                sName = oCard.name
-                if bPostfix:
-                    sName = move_articles_to_back(sName)
-                oChildIter = self.insert_with_values(oSectionIter, 0, [0, 1, 2, 3, 4, 8, 9],
-                                                     [sName, iCnt, iParCnt, bIncCard, bDecCard,
-                                                      oCard, oRow.oPhysCard])
-                self.set_par_count_colour(oChildIter, iParCnt, iCnt)
-                self._dAbs2Iter.setdefault(oCard.id, []).append(oChildIter)
-                self._add_children(oChildIter, oRow)
-            # Update Group Section
-            aTexts, aIcons = self.lookup_icons(sGroup)
-            if aTexts:
-                self.set(oSectionIter, 1, iGrpCnt, 2, iParGrpCnt,
-                         5, aTexts, 6, aIcons,
-                        )
-            else:
-                self.set(oSectionIter, 1, iGrpCnt, 2, iParGrpCnt)
+           If the model still holds the rows from the last load, with the
+           same layout, we only change the rows that differ between the
+           two loads. Otherwise, we clear the model and add all the rows.
 
-            self.set_par_count_colour(oSectionIter, iParGrpCnt, iGrpCnt)
+           This is a generator, which yields after every LOAD_CHUNK cards,
+           so background loads can spread the work over several idle
+           callbacks."""
+        self._dCache = oSnapshot.dCache
+        self._dAbs2Phys = oSnapshot.dAbs2Phys
+        self._disable_sorting()
+
+        tLayout = self._get_load_layout()
+        # If we're interrupted part way through, the model won't match
+        # either load, so the next load must start from scratch
+        oLastLoad, self._oLastLoad = self._oLastLoad, None
+
+        if self.oEmptyIter:
+            self.remove(self.oEmptyIter)
+            self.oEmptyIter = None
+
+        if oLastLoad is not None and oLastLoad.tLayout == tLayout:
+            yield from self._apply_load_diff(oLastLoad, oSnapshot.dTarget,
+                                             oSnapshot.dChildren)
+        else:
+            yield from self._add_load_rows(oSnapshot.dTarget,
+                                           oSnapshot.dChildren)
+        for sGroup, dRows in oSnapshot.dTarget.items():
+            self._update_group_row(sGroup, dRows)
+
+        self._oLastLoad = LoadRecord(tLayout, oSnapshot.dTarget,
+                                     oSnapshot.dChildren)
 
         self._check_if_empty()
 
         # Notify Listeners
-        MessageBus.publish(self, 'load', aCards)
+        MessageBus.publish(self, 'load', oSnapshot.aCards)
 
-        # Restore sorting
-        # See comments in CardListModel
-        if iSortColumn is not None:
-            self.set_sort_column_id(iSortColumn, iSortOrder)
+        self._restore_sorting()
+
+    def _add_card_row(self, sGroup, oAbsId, oRow, bPostfix):
+        """Add a card level row for oRow to the given group, creating the
+           group row if needed."""
+        oSectionIter = self._dGroupName2Iter.get(sGroup)
+        if oSectionIter is None:
+            oSectionIter = self.insert_with_values(None, 0, [0], [sGroup])
+            self._dGroupName2Iter[sGroup] = oSectionIter
+        iCnt = oRow.iCount
+        iParCnt = oRow.iParentCount
+        bIncCard, bDecCard = self.check_inc_dec(iCnt)
+        # Direct lookup, for same reason as in CardListModel
+        sName = oRow.oAbsCard.name
+        if bPostfix:
+            sName = move_articles_to_back(sName)
+        oChildIter = self.insert_with_values(
+            oSectionIter, 0, [0, 1, 2, 3, 4, 8, 9],
+            [sName, iCnt, iParCnt, bIncCard, bDecCard, oRow.oAbsCard,
+             oRow.oPhysCard])
+        self.set_par_count_colour(oChildIter, iParCnt, iCnt)
+        self._dAbs2Iter.setdefault(oAbsId, []).append(oChildIter)
+        return oChildIter
+
+    def _update_group_row(self, sGroup, dRows):
+        """Set the totals, icons and colour of a group row"""
+        oSectionIter = self._dGroupName2Iter[sGroup]
+        iGrpCnt = sum(oRow.iCount for oRow in dRows.values())
+        iParGrpCnt = sum(oRow.iParentCount for oRow in dRows.values())
+        if self.get(oSectionIter, 1, 2) != (iGrpCnt, iParGrpCnt):
+            self.set(oSectionIter, 1, iGrpCnt, 2, iParGrpCnt)
+        aTexts, aIcons = self.lookup_icons(sGroup)
+        if (self.get_value(oSectionIter, 5) or []) != aTexts:
+            self.set(oSectionIter, 5, aTexts, 6, aIcons)
+        oColour = self._get_par_count_colour(iParGrpCnt, iGrpCnt)
+        if not self._same_colour(oSectionIter, oColour):
+            self.set_value(oSectionIter, 7, oColour)
+
+    def _same_colour(self, oIter, oColour):
+        """Check if the colour of oIter matches oColour"""
+        oCurColour = self.get_value(oIter, 7)
+        if oColour is None or oCurColour is None:
+            return oColour is None and oCurColour is None
+        return oCurColour.equal(oColour)
+
+    def _add_load_rows(self, dTarget, dChildren):
+        """Clear the model and add all the rows in dTarget (group name ->
+           abstract card id -> row) and dChildren (abstract card id -> extra
+           levels).
+
+           This yields after every LOAD_CHUNK cards (see _apply_snapshot).
+           """
+        self.clear()
+        self.oEmptyIter = None
+        self._dAbs2Iter = {}
+        self._dAbsSecondLevel2Iter = {}
+        self._dAbs2nd3rdLevel2Iter = {}
+        self._dGroupName2Iter = {}
+        bPostfix = self._oConfig.get_postfix_the_display()
+        iDone = 0
+        for sGroup, dRows in dTarget.items():
+            for oAbsId, oRow in dRows.items():
+                oChildIter = self._add_card_row(sGroup, oAbsId, oRow,
+                                                bPostfix)
+                self._add_children(oChildIter, oAbsId, dChildren[oAbsId])
+                iDone += 1
+                if iDone % LOAD_CHUNK == 0:
+                    yield
+
+    def _apply_load_diff(self, oLastLoad, dTarget, dChildren):
+        """Update the model from the rows of oLastLoad to dTarget and
+           dChildren (as for _add_load_rows).
+
+           We compare the two loads, rather than the rows in the model,
+           so cards which haven't changed cost a few comparisons, and we
+           only touch the model for the cards which have.
+
+           This yields after every LOAD_CHUNK changed cards (see
+           _apply_snapshot)."""
+        dOldGroups = _get_card_groups(oLastLoad.dTarget)
+        dNewGroups = _get_card_groups(dTarget)
+        bPostfix = self._oConfig.get_postfix_the_display()
+        # Remove the cards we no longer need
+        for oAbsId in dOldGroups:
+            if oAbsId not in dNewGroups:
+                self._remove_card_rows(oAbsId)
+        iDone = 0
+        for oAbsId, aGroups in dNewGroups.items():
+            aOldGroups = dOldGroups.get(oAbsId)
+            oRow = dTarget[next(iter(aGroups))][oAbsId]
+            aChildren = dChildren[oAbsId]
+            if aOldGroups != aGroups:
+                # Moved between groups, or new, so add the card afresh
+                self._remove_card_rows(oAbsId)
+                for sGroup in aGroups:
+                    oChildIter = self._add_card_row(sGroup, oAbsId, oRow,
+                                                    bPostfix)
+                    self._add_children(oChildIter, oAbsId, aChildren)
+            else:
+                oOldRow = oLastLoad.dTarget[next(iter(aGroups))][oAbsId]
+                bNewChildren = aChildren != oLastLoad.dChildren[oAbsId]
+                if oRow == oOldRow and not bNewChildren:
+                    continue
+                if oRow != oOldRow:
+                    for oChildIter in self._dAbs2Iter[oAbsId]:
+                        self._update_card_row(oChildIter, oRow)
+                if bNewChildren:
+                    self._remove_sub_iters(oAbsId)
+                    for oChildIter in self._dAbs2Iter[oAbsId]:
+                        self._add_children(oChildIter, oAbsId, aChildren)
+            iDone += 1
+            if iDone % LOAD_CHUNK == 0:
+                yield
+        # Remove the groups we no longer need. Their cards have already
+        # been removed
+        for sGroup in list(self._dGroupName2Iter):
+            if sGroup not in dTarget:
+                self.remove(self._dGroupName2Iter.pop(sGroup))
+
+    def _update_card_row(self, oIter, oRow):
+        """Update the counts of an existing card level row"""
+        iCnt = oRow.iCount
+        iParCnt = oRow.iParentCount
+        bIncCard, bDecCard = self.check_inc_dec(iCnt)
+        self.set(oIter, 1, iCnt, 2, iParCnt, 3, bIncCard, 4, bDecCard,
+                 9, oRow.oPhysCard)
+        oColour = self._get_par_count_colour(iParCnt, iCnt)
+        if not self._same_colour(oIter, oColour):
+            self.set_value(oIter, 7, oColour)
+
+    def _remove_card_rows(self, oAbsId):
+        """Remove all the rows for a card, without updating the groups"""
+        self._remove_sub_iters(oAbsId)
+        for oIter in self._dAbs2Iter.pop(oAbsId, []):
+            self.remove(oIter)
 
     def _try_queue_reload(self):
         """Attempt to setup a call to queue_reload, otherwise just reload"""
         if self._oController:
+            # Any background load is out of date
+            self.cancel_load()
             self._oController.frame.queue_reload()
         else:
             self.load()
 
-    def _add_children(self, oChildIter, oRow):
-        """Add the needed children for a card in the model."""
+    def _get_children(self, oRow):
+        """Return the extra level entries needed for a card in the model,
+           as a list of (name, info, list of (name, info) for the third
+           level)."""
         dExpansionInfo = oRow.get_expansion_info()
         dChildInfo = oRow.get_child_info()
-        oAbsId = oRow.oAbsCard.id
+        aChildren = []
         if self._iExtraLevelsMode == SHOW_EXPANSIONS:
-            for sExpansion in dExpansionInfo:
-                self._add_extra_level(oChildIter, sExpansion,
-                                      dExpansionInfo[sExpansion],
-                                      (2, oAbsId))
+            for sExpansion, tInfo in dExpansionInfo.items():
+                aChildren.append((sExpansion, tInfo, []))
         elif self._iExtraLevelsMode == SHOW_CARD_SETS:
-            for sChildSet in dChildInfo:
-                self._add_extra_level(oChildIter, sChildSet,
-                                      dChildInfo[sChildSet],
-                                      (2, oAbsId))
+            for sChildSet, tInfo in dChildInfo.items():
+                aChildren.append((sChildSet, tInfo, []))
         elif self._iExtraLevelsMode == EXP_AND_CARD_SETS:
-            for sExpansion in dExpansionInfo:
-                oSubIter = self._add_extra_level(oChildIter,
-                                                 sExpansion,
-                                                 dExpansionInfo[sExpansion],
-                                                 (2, oAbsId))
-                for sChildSet in dChildInfo[sExpansion]:
-                    self._add_extra_level(oSubIter, sChildSet,
-                                          dChildInfo[sExpansion][sChildSet],
-                                          (3, (oAbsId, sExpansion)))
+            for sExpansion, tInfo in dExpansionInfo.items():
+                aChildren.append((sExpansion, tInfo,
+                                  list(dChildInfo[sExpansion].items())))
         elif self._iExtraLevelsMode == CARD_SETS_AND_EXP:
-            for sChildSet in dChildInfo:
-                oSubIter = self._add_extra_level(oChildIter,
-                                                 sChildSet,
-                                                 dChildInfo[sChildSet],
-                                                 (2, oAbsId))
-                for sExpansion in dExpansionInfo[sChildSet]:
-                    self._add_extra_level(
-                        oSubIter, sExpansion,
-                        dExpansionInfo[sChildSet][sExpansion],
-                        (3, (oAbsId, sChildSet)))
+            for sChildSet, tInfo in dChildInfo.items():
+                aChildren.append((sChildSet, tInfo,
+                                  list(dExpansionInfo[sChildSet].items())))
+        return aChildren
+
+    def _add_children(self, oChildIter, oAbsId, aChildren):
+        """Add the extra level entries from _get_children for a card in
+           the model."""
+        for sName, tInfo, aSubChildren in aChildren:
+            oSubIter = self._add_extra_level(oChildIter, sName, tInfo,
+                                             (2, oAbsId))
+            for sSubName, tSubInfo in aSubChildren:
+                self._add_extra_level(oSubIter, sSubName, tSubInfo,
+                                      (3, (oAbsId, sName)))
 
     def check_inc_dec(self, iCnt):
         """Helper function to get correct flags"""
@@ -635,8 +998,25 @@ class CardSetCardListModel(CardListModel):
         if self._iExtraLevelsMode == EXP_AND_CARD_SETS:
             dChildInfo.setdefault(sExpName, {})
 
+    def _read_card_rows(self, oFilter):
+        """Read the mapping table rows selected by oFilter.
+
+           The ids are read in a single query, and the physical cards are
+           looked up LOAD_CHUNK rows at a time. This is a generator,
+           yielding after every LOAD_CHUNK rows, which returns a list of
+           (physical card, card set id) pairs."""
+        aRows = []
+        for iCardId, iSetId in get_filtered_card_rows(oFilter):
+            aRows.append((PhysicalCard.get(iCardId), iSetId))
+            if len(aRows) % LOAD_CHUNK == 0:
+                yield
+        return aRows
+
     def _get_child_filters(self, oCurFilter):
-        """Get the filters for the child card sets of this card set."""
+        """Get the filters for the child card sets of this card set.
+
+           This is a generator, yielding after every LOAD_CHUNK child
+           cards, which returns the child card cache."""
         # pylint: disable=too-many-branches
         # The various cache cases intoduce many branches, but can't
         # reasonably split away.
@@ -679,7 +1059,7 @@ class CardSetCardListModel(CardListModel):
         elif self._dCache['all children filter']:
             oFullFilter = FilterAndBox([self._dCache['all children filter'],
                                         oCurFilter])
-            aChildCards = list(oFullFilter.select(self.cardclass).distinct())
+            aChildCards = yield from self._read_card_rows(oFullFilter)
             if not self.is_filtered():
                 self._dCache['full child card list'] = aChildCards
         if self._iExtraLevelsMode in CARD_SETS_LEVEL and \
@@ -690,23 +1070,28 @@ class CardSetCardListModel(CardListModel):
                 self._dCache['child card sets'].setdefault(sName, {})
                 dChildCardCache.setdefault(sName, {})
             # Pull all cards of interest in a single query
-            for oMapCard in aChildCards:
-                sName = dChildren[oMapCard.physicalCardSetID]
-                oCard = IPhysicalCard(oMapCard)
+            for iDone, (oCard, iSetId) in enumerate(aChildCards, 1):
+                sName = dChildren[iSetId]
                 oAbsId = _update_child_caches(oCard)
                 dChildCardCache[sName].setdefault(oAbsId, []).append(oCard)
                 self._dCache['child card sets'][sName].setdefault(oCard, 0)
                 self._dCache['child card sets'][sName][oCard] += 1
+                if iDone % LOAD_CHUNK == 0:
+                    yield
         elif self._iShowCardMode == CHILD_CARDS and \
                 self._dCache['child filters']:
             # Need to setup the cache
-            for oMapCard in aChildCards:
-                oCard = IPhysicalCard(oMapCard)
+            for iDone, (oCard, _iSetId) in enumerate(aChildCards, 1):
                 _update_child_caches(oCard)
+                if iDone % LOAD_CHUNK == 0:
+                    yield
         return dChildCardCache
 
     def _get_parent_list(self, oCurFilter, oCardIter, iIterCnt):
-        """Get a list object for the cards in the parent card set."""
+        """Get a list object for the cards in the parent card set.
+
+           This is a generator, yielding after every LOAD_CHUNK parent
+           cards."""
         if self._oCardSet.parentID and not (
                 self._iParentCountMode == IGNORE_PARENT and
                 self._iShowCardMode != PARENT_CARDS):
@@ -730,18 +1115,19 @@ class CardSetCardListModel(CardListModel):
                         MultiSpecificCardIdFilter(aAbsCardIds))
                     aFilters.append(self._dCache['cardset cards filter'])
                 oParentFilter = FilterAndBox(aFilters)
-                aParentCards = [
-                    IPhysicalCard(x) for x in
-                    oParentFilter.select(self.cardclass).distinct()]
+                aParentRows = yield from self._read_card_rows(oParentFilter)
+                aParentCards = [x[0] for x in aParentRows]
                 if not self.is_filtered():
                     self._dCache['full parent card list'] = aParentCards
-            for oPhysCard in aParentCards:
+            for iDone, oPhysCard in enumerate(aParentCards, 1):
                 self._dCache['parent cards'].setdefault(oPhysCard, 0)
                 self._dCache['parent abstract cards'].setdefault(
                     oPhysCard.abstractCardID, 0)
                 self._dCache['parent cards'][oPhysCard] += 1
                 self._dCache['parent abstract cards'][
                     oPhysCard.abstractCardID] += 1
+                if iDone % LOAD_CHUNK == 0:
+                    yield
 
     def _get_extra_cards(self, oCurFilter):
         """Return any extra cards not in this card set that need to be
@@ -804,13 +1190,39 @@ class CardSetCardListModel(CardListModel):
         self._dCache['filtered cards'] = None
         self._dCache['cardset cards filter'] = None
 
-    def grouped_card_iter(self, oCardIter):
+    def _get_counted_cards(self, oCurFilter):
+        """Get the list of physical cards in this card set, using the
+           database to count the copies.
+
+           This matches iterating over the filtered physical_map entries,
+           but only needs to read a single row for each distinct card."""
+        oFilter = FilterAndBox([self._oBaseFilter, oCurFilter])
+        aCards = []
+        for iCardId, iCount in get_filtered_card_counts(oFilter).items():
+            aCards.extend([PhysicalCard.get(iCardId)] * iCount)
+        return aCards
+
+    def grouped_card_iter(self, oCardIter, bUseCounts=False):
         """Get the data that needs to fill the model, handling the different
            CardShow modes, the different counts, the filter, etc.
 
+           If bUseCounts is True, the cards in this card set are read
+           as grouped counts from the mapping table rather than
+           oCardIter. This is only valid if oCardIter covers the entire
+           card set with the current filter, as in load.
+
            Returns a iterator over the groupings, and a list of all the
            abstract cards in the card set considered.
            """
+        return _run_steps(self._grouped_card_steps(oCardIter, bUseCounts))
+
+    def _grouped_card_steps(self, oCardIter, bUseCounts):
+        """The steps for grouped_card_iter.
+
+           This is a generator, yielding after every LOAD_CHUNK cards
+           processed, so background loads can spread the work over
+           several idle callbacks. It returns the same result as
+           grouped_card_iter."""
         # pylint: disable=too-many-locals, too-many-branches, too-many-statements
         # We use lots of local variables for clarity
         # Lots of cases to consider, so several branches
@@ -845,24 +1257,33 @@ class CardSetCardListModel(CardListModel):
                 # Stomp on the cache, as we have a physical filter
                 self._dCache['all cards'] = self._dCache['filtered cards']
 
-        dChildCardCache = self._get_child_filters(oCurFilter)
+        dChildCardCache = yield from self._get_child_filters(oCurFilter)
 
-        self._get_parent_list(oCurFilter, oCardIter, iIterCnt)
+        yield from self._get_parent_list(oCurFilter, oCardIter, iIterCnt)
 
         # Other card show modes
-        for oPhysCard in self._get_extra_cards(oCurFilter):
+        for iDone, oPhysCard in enumerate(
+                self._get_extra_cards(oCurFilter), 1):
             self._adjust_row(dAbsCards, oPhysCard, dChildCardCache, False)
+            if iDone % LOAD_CHUNK == 0:
+                yield
 
         if not self.is_filtered() and self._dCache['this card list']:
-            for oPhysCard in self._dCache['this card list']:
+            for iDone, oPhysCard in enumerate(
+                    self._dCache['this card list'], 1):
                 self._adjust_row(dAbsCards, oPhysCard,
                                  dChildCardCache, True)
                 dPhysCards.setdefault(oPhysCard, 0)
                 dPhysCards[oPhysCard] += 1
+                if iDone % LOAD_CHUNK == 0:
+                    yield
             aCards = self._dCache['this card list']
         else:
-            for oCard in oCardIter:
-                oPhysCard = IPhysicalCard(oCard)
+            if bUseCounts:
+                aThisCards = self._get_counted_cards(oCurFilter)
+            else:
+                aThisCards = (IPhysicalCard(x) for x in oCardIter)
+            for oPhysCard in aThisCards:
                 self._adjust_row(dAbsCards, oPhysCard,
                                  dChildCardCache, True)
                 dPhysCards.setdefault(oPhysCard, 0)
@@ -879,10 +1300,12 @@ class CardSetCardListModel(CardListModel):
                     self._dAbs2Phys.setdefault(oAbsId, {})
                     self._dAbs2Phys[oAbsId].setdefault(oPhysCard, 0)
                     self._dAbs2Phys[oAbsId][oPhysCard] += 1
+                if len(aCards) % LOAD_CHUNK == 0:
+                    yield
             if not self.is_filtered():
                 self._dCache['this card list'] = aCards
 
-        self._add_parent_info(dAbsCards, dPhysCards, oCurFilter)
+        yield from self._add_parent_info(dAbsCards, dPhysCards, oCurFilter)
 
         # expire caches
         self._dCache['filtered cards'] = None
@@ -933,7 +1356,11 @@ class CardSetCardListModel(CardListModel):
                     dChildInfo[sExpName][sCardSetName] += 1
 
     def _get_sibling_cards(self, oCurFilter):
-        """Get the list of cards in sibling card sets"""
+        """Get the list of cards in sibling card sets.
+
+           This is a generator, yielding after every LOAD_CHUNK sibling
+           cards, which returns a dictionary of abstract card id : list
+           of physical cards."""
         dSiblingCards = {}
         if self._dCache['sibling filter'] is None:
             aChildren = [x.name for x in PhysicalCardSet.selectBy(
@@ -961,18 +1388,19 @@ class CardSetCardListModel(CardListModel):
                         oCurFilter,
                         ])
 
-                aInUseCards = [IPhysicalCard(x)
-                               for x in
-                               oSibFilter.select(self.cardclass).distinct()]
+                aSibRows = yield from self._read_card_rows(oSibFilter)
+                aInUseCards = [x[0] for x in aSibRows]
                 if not self.is_filtered():
                     self._dCache['full sibling card list'] = aInUseCards
-            for oPhysCard in aInUseCards:
+            for iDone, oPhysCard in enumerate(aInUseCards, 1):
                 oAbsId = oPhysCard.abstractCardID
                 dSiblingCards.setdefault(oAbsId, []).append(oPhysCard)
                 self._dCache['sibling cards'].setdefault(oPhysCard, 0)
                 self._dCache['sibling abstract cards'].setdefault(oAbsId, 0)
                 self._dCache['sibling cards'][oPhysCard] += 1
                 self._dCache['sibling abstract cards'][oAbsId] += 1
+                if iDone % LOAD_CHUNK == 0:
+                    yield
         return dSiblingCards
 
     def _update_parent_info(self, oSetInfo, dPhysCards):
@@ -995,27 +1423,33 @@ class CardSetCardListModel(CardListModel):
                             dParentExp[sExpansion] = -dPhysCards[oPhysCard]
 
     def _add_parent_info(self, dAbsCards, dPhysCards, oCurFilter):
-        """Add the parent count info into the mix"""
+        """Add the parent count info into the mix.
+
+           This is a generator, yielding after every LOAD_CHUNK cards."""
         if (self._iParentCountMode == IGNORE_PARENT and
                 self._iShowCardMode != PARENT_CARDS) or \
                     not self._oCardSet.parentID:
             return  # No point in doing anything at all
         if self._iParentCountMode == MINUS_SETS_IN_USE:
-            dSiblingCards = self._get_sibling_cards(oCurFilter)
-            for oAbsId, oRow in dAbsCards.items():
+            dSiblingCards = yield from self._get_sibling_cards(oCurFilter)
+            for iDone, (oAbsId, oRow) in enumerate(dAbsCards.items(), 1):
                 if oAbsId in dSiblingCards:
                     for oPhysCard in dSiblingCards[oAbsId]:
                         oRow.iParentCount -= 1
                         sExpansion = IPrintingName(oPhysCard)
                         oRow.dParentExpansions.setdefault(sExpansion, 0)
                         oRow.dParentExpansions[sExpansion] -= 1
+                if iDone % LOAD_CHUNK == 0:
+                    yield
 
         elif self._iParentCountMode == MINUS_THIS_SET:
-            for oRow in dAbsCards.values():
+            for iDone, oRow in enumerate(dAbsCards.values(), 1):
                 oRow.iParentCount = -oRow.iCount
                 self._update_parent_info(oRow, dPhysCards)
+                if iDone % LOAD_CHUNK == 0:
+                    yield
 
-        for oPhysCard in self._dCache['parent cards']:
+        for iDone, oPhysCard in enumerate(self._dCache['parent cards'], 1):
             oAbsId = oPhysCard.abstractCardID
             if oAbsId in dAbsCards and self.check_card_visible(oPhysCard):
                 sExpansion = IPrintingName(oPhysCard)
@@ -1025,6 +1459,8 @@ class CardSetCardListModel(CardListModel):
                     iNum = self._dCache['parent cards'][oPhysCard]
                     dAbsCards[oAbsId].iParentCount += iNum
                     dParentExp[sExpansion] += iNum
+            if iDone % LOAD_CHUNK == 0:
+                yield
 
     def _remove_sub_iters(self, oAbsId):
         """Remove the children rows for the card entry sCardName"""
@@ -1176,7 +1612,8 @@ class CardSetCardListModel(CardListModel):
                 self.set_par_count_colour(oChildIter, iParCnt, iCnt)
                 self._dAbs2Iter.setdefault(oCard.id, []).append(oChildIter)
                 # Handle as for loading
-                self._add_children(oChildIter, oRow)
+                self._add_children(oChildIter, oCard.id,
+                                   self._get_children(oRow))
 
             # Update Group Section
             self.set(oSectionIter, 1, iGrpCnt, 2, iParGrpCnt)
@@ -1193,9 +1630,11 @@ class CardSetCardListModel(CardListModel):
 
     def update_to_new_db(self, sSetName):
         """Update internal card set to the new DB."""
+        self.cancel_load()
         self._oCardSet = IPhysicalCardSet(sSetName)
         self._oBaseFilter = CachedFilter(PhysicalCardSetFilter(sSetName))
         self._dCache = {}
+        self._oLastLoad = None
 
     def is_sibling(self, oCS):
         """Return true if oCS is an inuse sibling"""
@@ -1304,6 +1743,8 @@ class CardSetCardListModel(CardListModel):
            """
         # pylint: disable=too-many-branches
         # We do need all these branches
+        if self._defer_changes():
+            return
         if oCardSet.id == self._oCardSet.id and \
                 'parentID' in dChanges:
             # This card set's parent is changing
@@ -1377,6 +1818,8 @@ class CardSetCardListModel(CardListModel):
 
            Needed if child card sets are deleted, for instance.
            """
+        if self._defer_changes():
+            return
         if self.is_child(oCardSet):
             # inuse child card set added or removed, so we need to reload
             self._dCache['child filters'] = None
@@ -1396,43 +1839,78 @@ class CardSetCardListModel(CardListModel):
         # here, since the fiddling on parents should generate changed
         # signals for us.
 
-    def card_changed(self, oCardSet, oPhysCard, iChg):
+    def card_changed(self, oCardSet, dChanges):
         """Listen on card changes.
 
            We listen to the special signal, so we can hook in after the
            database has been updated. This simplifies the update logic
            as we can query the database and obtain accurate results.
-           Does rely on everyone calling send_changed_signal.
+           Does rely on everyone calling send_changed_signal or
+           send_card_set_changes.
+
+           dChanges holds all the changes to oCardSet (physical card:
+           change in count), so we only need to decide how the card set
+           affects us once, and then make a single pass over the changed
+           cards.
            """
-        # pylint: disable=too-many-branches, too-many-statements
-        # need to consider several cases, so lots of branches and statements
-        oAbsId = oPhysCard.abstractCardID
+        if self._defer_changes():
+            return
+        # If we update the rows, they no longer match the last load
         if self._bPhysicalFilter:
-            oCurFilter = self.get_current_filter()
-            # Physical filters checks are quite expensive, due to the
-            # calls to add_new_Card and iter fiddling, so it's worth trying
-            # to avoid going down this path if at all possible.
-            if oCardSet.id != self._oCardSet.id \
-                    and not oCurFilter.involves(oCardSet) \
-                    and not (self.changes_with_parent() and
-                             self.is_parent(oCardSet)) \
-                    and not (self.changes_with_children() and
-                             self.is_child(oCardSet))  \
-                    and not (self.changes_with_siblings() and
-                             self.is_sibling(oCardSet)):
-                return
+            self._oLastLoad = None
+            self._physical_filter_changes(oCardSet, dChanges)
+        elif oCardSet.id == self._oCardSet.id:
+            self._oLastLoad = None
+            self._this_set_changes(dChanges)
+        elif self.changes_with_children() and self.is_child(oCardSet):
+            self._oLastLoad = None
+            self._child_set_changes(oCardSet, dChanges)
+        elif self.changes_with_parent() and self.is_parent(oCardSet):
+            self._oLastLoad = None
+            self._parent_set_changes(dChanges)
+        elif self.changes_with_siblings() and self.is_sibling(oCardSet):
+            self._oLastLoad = None
+            self._sibling_set_changes(dChanges)
+        # Doesn't affect us, so ignore
+        # expire short-lived cache
+        self._dCache['visible'] = {}
+
+    def _physical_filter_changes(self, oCardSet, dChanges):
+        """Handle card changes when we have a physical card filter"""
+        oCurFilter = self.get_current_filter()
+        # Physical filters checks are quite expensive, due to the
+        # calls to add_new_Card and iter fiddling, so it's worth trying
+        # to avoid going down this path if at all possible.
+        if oCardSet.id != self._oCardSet.id \
+                and not oCurFilter.involves(oCardSet) \
+                and not (self.changes_with_parent() and
+                         self.is_parent(oCardSet)) \
+                and not (self.changes_with_children() and
+                         self.is_child(oCardSet))  \
+                and not (self.changes_with_siblings() and
+                         self.is_sibling(oCardSet)):
+            return
+        if oCardSet.id == self._oCardSet.id:
+            # This cache is no longer valid
+            self._dCache['this card list'] = None
+        # add_new_card rebuilds the entries for all the physical cards
+        # with the same abstract card, so we only need to do this once
+        # for each abstract card
+        dAbsCards = {}
+        for oPhysCard in dChanges:
+            dAbsCards.setdefault(oPhysCard.abstractCardID, []).append(
+                oPhysCard)
+        for oAbsId, aPhysCards in dAbsCards.items():
             # If we have a card count filter, any change can affect us,
             # so we always consider these cases.
-            if not self._needs_update(oAbsId, oPhysCard):
-                self._dCache['visible'] = {}
-                return
+            if not any(self._needs_update(oAbsId, oPhysCard)
+                       for oPhysCard in aPhysCards):
+                continue
+            oPhysCard = aPhysCards[0]
             dStates = {}
             if self._oController and oAbsId in self._dAbs2Iter:
                 dStates = self._oController.save_iter_state(
                     self._dAbs2Iter[oAbsId])
-            if oCardSet.id == self._oCardSet.id:
-                # This cache is no longer valid
-                self._dCache['this card list'] = None
             # clear existing info about the card
             self._clear_card_iter(oAbsId)
             # We hand off to add_new_card to do the right thing
@@ -1440,17 +1918,21 @@ class CardSetCardListModel(CardListModel):
             if self._oController and oAbsId in self._dAbs2Iter:
                 self._oController.restore_iter_state(self._dAbs2Iter[oAbsId],
                                                      dStates)
-        elif oCardSet.id == self._oCardSet.id:
-            # Changing a card from this card set
+
+    def _this_set_changes(self, dChanges):
+        """Handle changes to cards in this card set"""
+        for oPhysCard, iChg in dChanges.items():
+            oAbsId = oPhysCard.abstractCardID
             if self._oCardSet.inuse:
                 self._update_cache(oPhysCard, iChg, 'sibling')
-            if (iChg > 0 and self._dCache['this card list'] is not None
-                    and self.configfilter is None):
+            if self.configfilter is None:
                 # this card list can be empty
-                self._dCache['this card list'].append(oPhysCard)
-            elif (self._dCache['this card list']
-                  and self.configfilter is None):
-                self._dCache['this card list'].remove(oPhysCard)
+                if iChg > 0 and self._dCache['this card list'] is not None:
+                    self._dCache['this card list'].extend(
+                        [oPhysCard] * iChg)
+                elif iChg < 0 and self._dCache['this card list']:
+                    for _iNum in range(-iChg):
+                        self._dCache['this card list'].remove(oPhysCard)
             if self._iShowCardMode == THIS_SET_ONLY and iChg > 0:
                 # This cache may no longer be valid in this case
                 self._dCache['full parent card list'] = None
@@ -1464,8 +1946,11 @@ class CardSetCardListModel(CardListModel):
                     self._dCache['full sibling card list'] = None
             if self._oCardSet.inuse:
                 self._clean_cache(oPhysCard, 'sibling')
-        elif self.changes_with_children() and self.is_child(oCardSet):
-            # Changing a child card set
+
+    def _child_set_changes(self, oCardSet, dChanges):
+        """Handle changes to an inuse child card set"""
+        for oPhysCard, iChg in dChanges.items():
+            oAbsId = oPhysCard.abstractCardID
             self._update_cache(oPhysCard, iChg, 'child')
             self._update_child_set_cache(oPhysCard, iChg, oCardSet.name)
             if oAbsId in self._dAbs2Iter:
@@ -1474,8 +1959,11 @@ class CardSetCardListModel(CardListModel):
                 self.add_new_card(oPhysCard)
             self._clean_cache(oPhysCard, 'child')
             self._clean_child_set_cache(oPhysCard, oCardSet.name)
-        elif self.changes_with_parent() and self.is_parent(oCardSet):
-            # Changing parent card set
+
+    def _parent_set_changes(self, dChanges):
+        """Handle changes to the parent card set"""
+        for oPhysCard, iChg in dChanges.items():
+            oAbsId = oPhysCard.abstractCardID
             self._update_cache(oPhysCard, iChg, 'parent')
             if oAbsId in self._dAbs2Iter:
                 self.alter_parent_count(oPhysCard, iChg)
@@ -1484,19 +1972,19 @@ class CardSetCardListModel(CardListModel):
                 # to add it
                 self.add_new_card(oPhysCard)
             self._clean_cache(oPhysCard, 'parent')
-        elif self.changes_with_siblings() and self.is_sibling(oCardSet):
-            # Changing sibling card set
+
+    def _sibling_set_changes(self, dChanges):
+        """Handle changes to an inuse sibling card set"""
+        for oPhysCard, iChg in dChanges.items():
+            oAbsId = oPhysCard.abstractCardID
             self._update_cache(oPhysCard, iChg, 'sibling')
             if oAbsId in self._dAbs2Iter:
                 # This is only called when using MINUS_SETS_IN_USE,
-                # So this changes the available pool of parent cards (by -iChg)
-                # There's no possiblity of this adding or deleting a card from
-                # the model
+                # So this changes the available pool of parent cards
+                # (by -iChg). There's no possiblity of this adding or
+                # deleting a card from the model
                 self.alter_parent_count(oPhysCard, -iChg, False)
             self._clean_cache(oPhysCard, 'sibling')
-        # Doesn't affect us, so ignore
-        # expire short-lived cache
-        self._dCache['visible'] = {}
 
     def check_card_visible(self, oPhysCard):
         """Returns true if oPhysCard should be shown.
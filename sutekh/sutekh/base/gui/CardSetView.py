@@ -138,6 +138,9 @@ class CardSetView(CardListView):
 
         self.oCellColor = None
 
+        # View state to restore after a background reload
+        self._tReloadState = None
+
         self.set_fixed_height_mode(True)
 
     # pylint: enable=too-many-statements
@@ -382,6 +385,54 @@ class CardSetView(CardListView):
         self.thaw_child_notify()
         if hasattr(self._oMainWin, 'restore_cursor'):
             self._oMainWin.restore_cursor()
+        if self._tReloadState is not None:
+            # We've replaced a background reload, so finish it off
+            self._reload_done()
+
+    def reload_keep_expanded(self, bRestoreSelection=False):
+        """Reload with current expanded state.
+
+           Card sets are loaded in the background (see
+           CardSetCardListModel.load_in_background), so large card sets
+           don't block the rest of the interface. The expanded rows,
+           selection and cursor are restored once the load finishes.
+           """
+        if self.__iMapID is not None:
+            # skip loading until we're mapped, as for load
+            return
+        if self._tReloadState is None:
+            sCurId = None
+            oCurPath, _oCol = self.get_cursor()
+            if oCurPath:
+                sCurId = self.get_iter_identifier(
+                    self._oModel.get_iter(oCurPath))
+            self._tReloadState = (self._get_expanded_list(),
+                                  self._get_selected_rows(), sCurId,
+                                  bRestoreSelection)
+        else:
+            # A reload is still in progress, so the rows are only partly
+            # updated. We keep the state from before it started.
+            self._tReloadState = self._tReloadState[:3] + (
+                self._tReloadState[3] or bRestoreSelection,)
+        if hasattr(self._oMainWin, 'set_busy_cursor'):
+            self._oMainWin.set_busy_cursor()
+        self._oModel.load_in_background(self._reload_done)
+
+    def _reload_done(self):
+        """Restore the view state once a background reload finishes"""
+        aExpandedSet, aSelectedRows, sCurId, bRestoreSelection = \
+            self._tReloadState
+        self._tReloadState = None
+        self.oNumCell.set_property('foreground-rgba',
+                                   self._oModel.get_count_colour())
+        self._expand_list(aExpandedSet)
+        if bRestoreSelection and aSelectedRows:
+            self._reset_selected_rows(aSelectedRows)
+        if sCurId is not None:
+            # Restore cursor position if possible
+            self._oModel.foreach(self._restore_cursor, sCurId)
+        if hasattr(self._oMainWin, 'restore_cursor'):
+            self._oMainWin.restore_cursor()
 
     def set_color_edit_cue(self):
         """Set a visual cue that the card set is editable."""
@@ -6,6 +6,7 @@
 """Lookup AbstractCards for a list of card names, presenting the user with a
    GUI to pick unknown cards from.  """
 
+import logging
 import re
 
 from gi.repository import GObject, Gtk, Pango
@@ -17,6 +18,7 @@ from ..core.BaseAdapters import (IAbstractCard, IPhysicalCard, IExpansion,
 from ..core.CardLookup import (AbstractCardLookup, PhysicalCardLookup,
                                PrintingLookup, LookupFailed)
 from ..core.BaseFilters import best_guess_filter
+from ..core.CardNameIndex import get_card_name_index
 from .SutekhDialog import SutekhDialog, do_complaint_error
 from .CellRendererSutekhButton import CellRendererSutekhButton
 from .PhysicalCardView import PhysicalCardView
@@ -339,7 +341,15 @@ class GuiLookup(AbstractCardLookup, PhysicalCardLookup, PrintingLookup):
                     oAbs = IAbstractCard(sName)
                     dCards[sName] = oAbs
                 except SQLObjectNotFound:
-                    dUnknownCards[sName] = None
+                    # Accept clear close matches without asking, so bulk
+                    # imports aren't held up by common misspellings
+                    oAbs = get_card_name_index().best_match(sName)
+                    if oAbs is not None:
+                        logging.info("%s: Using %s for unknown card %s",
+                                     sInfo, oAbs.name, sName)
+                        dCards[sName] = oAbs
+                    else:
+                        dUnknownCards[sName] = None
 
             aNewNames.append(sName)
 
@@ -619,6 +629,10 @@ class GuiLookup(AbstractCardLookup, PhysicalCardLookup, PrintingLookup):
         for sName in dUnknownCards:
             oBestGuessFilter = best_guess_filter(sName)
             aCards = list(oBestGuessFilter.select(AbstractCard))
+            if len(aCards) != 1:
+                # Fall back to the closest match from the name index
+                aCards = [oCard for oCard, _fConfidence in
+                          get_card_name_index().lookup(sName, 1)]
             if len(aCards) == 1:
                 sBestGuess = aCards[0].name
                 iWeight = Pango.Weight.NORMAL
@@ -31,6 +31,9 @@ class PhysicalCardView(CardListView):
     def __init__(self, oController, oWindow, oConfig):
         oModel = CardListModel(oConfig)
         oModel.enable_sorting()
+        # The full card list has many expansion rows, so we only add
+        # them when the card is expanded
+        oModel.bLazyExpansions = True
         super(PhysicalCardView, self).__init__(oController, oWindow,
                                                oModel, oConfig)
 
@@ -45,3 +48,12 @@ class PhysicalCardView(CardListView):
         self.append_column(oColumn)
 
         self.set_expander_column(oColumn)
+
+        self.connect('test-expand-row', self.load_children)
+
+    def load_children(self, _oView, oIter, _oPath):
+        """Add the expansion rows to the model before the card is
+           expanded."""
+        self._oModel.load_children(oIter)
+        # Allow the row to be expanded
+        return False
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Least recently used cache for decoded images."""
+
+from collections import OrderedDict
+
+# Default memory limit for the cached images
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class PixbufCache:
+    """Cache pixbufs, discarding the least recently used ones when the
+       total size of the pixel data exceeds the limit.
+
+       Keys are arbitrary hashable values. This is not thread safe, so
+       should only be used from the main Gtk thread."""
+
+    def __init__(self, iMaxBytes=DEFAULT_CACHE_BYTES):
+        self._dCache = OrderedDict()
+        self._iMaxBytes = iMaxBytes
+        self._iBytes = 0
+
+    def __contains__(self, tKey):
+        return tKey in self._dCache
+
+    def __len__(self):
+        return len(self._dCache)
+
+    size = property(fget=lambda self: self._iBytes,
+                    doc="Number of bytes used by the cached pixbufs")
+
+    def get(self, tKey):
+        """Return the pixbuf for tKey, or None if it isn't cached."""
+        tEntry = self._dCache.get(tKey)
+        if tEntry is None:
+            return None
+        self._dCache.move_to_end(tKey)
+        return tEntry[0]
+
+    def add(self, tKey, oPixbuf):
+        """Add the pixbuf to the cache, evicting old entries as required.
+
+           Pixbufs larger than the cache limit are not cached."""
+        self.remove(tKey)
+        iSize = oPixbuf.get_byte_length()
+        if iSize > self._iMaxBytes:
+            return
+        self._dCache[tKey] = (oPixbuf, iSize)
+        self._iBytes += iSize
+        while self._iBytes > self._iMaxBytes:
+            _tOldKey, (_oOld, iOldSize) = self._dCache.popitem(last=False)
+            self._iBytes -= iOldSize
+
+    def remove(self, tKey):
+        """Remove tKey from the cache, if present."""
+        tEntry = self._dCache.pop(tKey, None)
+        if tEntry is not None:
+            self._iBytes -= tEntry[1]
+
+    def clear(self):
+        """Empty the cache."""
+        self._dCache.clear()
+        self._iBytes = 0
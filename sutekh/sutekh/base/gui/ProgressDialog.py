@@ -80,7 +80,8 @@ class SutekhCountLogHandler(SutekhLogHandler):
     """LogHandler class for dealing with database upgrade messages.
 
        Each message (Card List, card set, etc). is taken as a step in the
-       process.
+       process, unless the record has an iSteps attribute giving the
+       number of steps it covers.
        """
     def __init__(self):
         super(SutekhCountLogHandler, self).__init__()
@@ -92,11 +93,11 @@ class SutekhCountLogHandler(SutekhLogHandler):
         self.fTot = float(iTot)
         self.iCount = 0
 
-    def emit(self, _oRecord):
+    def emit(self, oRecord):
         """Handle a emitted signal, updating the progress count."""
         if self.oDialog is None:
             return  # No point
-        self.iCount += 1
+        self.iCount += getattr(oRecord, 'iSteps', 1)
         fBarPos = self.iCount / self.fTot
         self.oDialog.update_bar(fBarPos)
 
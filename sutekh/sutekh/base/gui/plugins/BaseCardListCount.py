@@ -195,7 +195,9 @@ class BaseCardListCount(BasePlugin):
         elif self.model.iter_depth(oIter) == 2 and \
                 self._iMode == self.COUNT_EXP:
             oPhysCard = self.model.get_physical_card_from_iter(oIter)
-            if oPhysCard.printingID:
+            # oPhysCard is None for the placeholder rows of cards whose
+            # expansions haven't been loaded yet
+            if oPhysCard is not None and oPhysCard.printingID:
                 return 1
         return 0
 
@@ -5,8 +5,6 @@
 # GPL - see COPYING for details
 """Calculate probabilities for drawing the current selection."""
 
-from copy import copy
-
 from gi.repository import Gtk
 
 from ...core.BaseTables import PhysicalCardSet
@@ -16,48 +14,57 @@ from ..SutekhDialog import (SutekhDialog, do_complaint_error,
 from ..AutoScrolledWindow import AutoScrolledWindow
 
 
-def _choose(iChoices, iTotal):
-    """Returns number of unordered combinations of iChoices objects from
-       iTotal (iTotal)(iTotal-1)...(iTotal-iChoices+1)/iChoices!"""
-    if iChoices > 0:
-        iDenom = iChoices
-    else:
-        return 1  # 0!/0! = 1, since 0! = 1
-    iNumerator = iTotal
-    for iNum in range(1, iChoices):
-        iNumerator *= (iTotal - iNum)
-        iDenom *= iNum
-    return iNumerator // iDenom
+# Cache of the rows of Pascal's triangle used by _binomial_row
+BINOMIAL_ROWS = {}
+
+
+def _binomial_row(iTotal):
+    """Return the list [choose(0, iTotal), choose(1, iTotal), ...
+       choose(iTotal, iTotal)].
+
+       The rows are cached, since the same few totals are used for
+       every entry in the results table."""
+    aRow = BINOMIAL_ROWS.get(iTotal)
+    if aRow is None:
+        aRow = [1]
+        for iNum in range(iTotal):
+            aRow.append(aRow[-1] * (iTotal - iNum) // (iNum + 1))
+        BINOMIAL_ROWS[iTotal] = aRow
+    return aRow
+
 
+def _gen_choice_list(dSelectedCounts, iMaxSum=None):
+    """Generate all possible choices, ordered by the total number of
+       cards and then by the individual counts.
+
+       If iMaxSum is given, only choices with at most iMaxSum cards are
+       generated, rather than the full cartesian product."""
+    aCounts = [x[1] for x in sorted(dSelectedCounts.items(),
+                                    key=lambda x: (x[1], x[0]),
+                                    reverse=True)]
+    if iMaxSum is None:
+        iMaxSum = sum(aCounts)
+
+    def _gen_sum(iPos, iSum):
+        """Generate the choices for aCounts[iPos:] totalling iSum, in
+           order"""
+        if iPos == len(aCounts) - 1:
+            if iSum <= aCounts[iPos]:
+                yield [iSum]
+            return
+        for iChoice in range(min(iSum, aCounts[iPos]) + 1):
+            for aRest in _gen_sum(iPos + 1, iSum - iChoice):
+                yield [iChoice] + aRest
 
-def _gen_choice_list(dSelectedCounts):
-    """Recursively generate all possible choices"""
     aList = []
-    aSelectOrder = sorted(dSelectedCounts.items(), key=lambda x: (x[1], x[0]),
-                          reverse=True)
-    sThisItem = aSelectOrder[0][0]
-    if len(dSelectedCounts) > 1:
-        dNew = copy(dSelectedCounts)
-        del dNew[sThisItem]
-        aSubLists = _gen_choice_list(dNew)
-        for iChoice in range(dSelectedCounts[sThisItem] + 1):
-            for aChoices in aSubLists:
-                aThisList = [iChoice]
-                aThisList.extend(aChoices)
-                aList.append(aThisList)
-    else:
-        aList = [[x] for x in range(dSelectedCounts[sThisItem] + 1)]
-    aList.sort(key=lambda x: [sum(x)] + x)
+    for iSum in range(min(iMaxSum, sum(aCounts)) + 1):
+        aList.extend(_gen_sum(0, iSum))
     return aList
 
 
-def _multi_hyper_prob(aFound, iDraws, aObjects, iTotal):
-    """Multivariate hypergeometric probability:
-
-       Given a list of draw numbers: aFound = [iFound1, iFound2 ... iFoundN]
-       form aObjects = [iObjects1, iObjects2 ... iObjectsN]
-       return the probably of seeing exactly aFound from iDraws
-       """
+def _check_hyper_args(aFound, iDraws, aObjects, iTotal):
+    """Raise a RuntimeError if the arguments aren't valid for the
+       hypergeometric probability calculations"""
     # Complain about impossible cases
     if len(aFound) != len(aObjects):
         raise RuntimeError('Invalid input: aFound : %s, aObjects: %s' % (
@@ -76,48 +83,76 @@ def _multi_hyper_prob(aFound, iDraws, aObjects, iTotal):
                                iDraws, ','.join([str(x) for x in aObjects]),
                                iTotal))
     # pylint: enable=too-many-boolean-expressions
-    # Eliminate trivial cases
-    if sum(aFound) > iDraws:
-        return 0.0
+
+
+def _poly_mult(aFirst, aSecond, iMaxDegree):
+    """Multiply the polynomials with the given coefficient lists,
+       dropping terms above iMaxDegree"""
+    aResult = [0] * min(len(aFirst) + len(aSecond) - 1, iMaxDegree + 1)
+    for iPos, iCoeff in enumerate(aFirst):
+        if not iCoeff:
+            continue
+        for iOther, iOtherCoeff in enumerate(aSecond[:len(aResult) - iPos]):
+            aResult[iPos + iOther] += iCoeff * iOtherCoeff
+    return aResult
+
+
+def _draw_probs(aFound, aDraws, aObjects, iTotal, bAtLeast):
+    """Return the probabilities of drawing exactly aFound (or at least
+       aFound if bAtLeast is True) from aObjects objects of interest from
+       iTotal objects, for each number of draws in aDraws.
+
+       The number of ways of drawing the cards is the coefficient of
+       x^iDraws in the product of the generating polynomials
+       sum(choose(iFound, iObjects) x^iFound) for each group, restricted
+       to the allowed values of iFound, and the polynomial for the
+       remaining objects. We build the product once, using exact
+       integers, and then read off the entries for all the draws."""
+    if not aDraws:
+        return []
+    iMaxDraws = max(aDraws)
+    aWays = [1]
     for iFound, iObjects in zip(aFound, aObjects):
-        if iFound > iObjects:
-            return 0.0
+        aRow = _binomial_row(iObjects)
+        if bAtLeast:
+            aTerms = [0] * iFound + aRow[iFound:]
+        else:
+            aTerms = [0] * iFound + aRow[iFound:iFound + 1]
+        aWays = _poly_mult(aWays, aTerms, iMaxDraws)
+    aWays = _poly_mult(aWays, _binomial_row(iTotal - sum(aObjects)),
+                       iMaxDraws)
+    aProbs = []
+    for iDraws in aDraws:
+        if iDraws >= len(aWays):
+            aProbs.append(0.0)
+        else:
+            aProbs.append(aWays[iDraws] / _binomial_row(iTotal)[iDraws])
+    return aProbs
+
+
+def _multi_hyper_prob(aFound, iDraws, aObjects, iTotal):
+    """Multivariate hypergeometric probability:
+
+       Given a list of draw numbers: aFound = [iFound1, iFound2 ... iFoundN]
+       form aObjects = [iObjects1, iObjects2 ... iObjectsN]
+       return the probably of seeing exactly aFound from iDraws
+       """
+    _check_hyper_args(aFound, iDraws, aObjects, iTotal)
     # Hypergeomteric probability: P(X = iFound) = choose iFound from iObjects *
     #           choose (iDraws - iFound) from (iTotal - iObjects) /
     #           choose iDraws from iTotal
     # Multivariate: P(X_i = iFound[i]) = choose(iFound1, iObjects1) *
     #           choose(iFound2, iObject2) * ... / choose(iDraws, iTotal)
-    fDemon = float(_choose(iDraws, iTotal))
-    # Ensure we handle last entry
-    iRemObjects = iTotal - sum(aObjects)
-    iRemFound = iDraws - sum(aFound)
-    fNumerator = 1.0
-    for iFound, iObjects in zip(aFound, aObjects):
-        fNumerator *= _choose(iFound, iObjects)
-    if iRemFound > 0 and iRemObjects > 0:
-        fNumerator *= _choose(iRemFound, iRemObjects)
-    return fNumerator / fDemon
+    return _draw_probs(aFound, [iDraws], aObjects, iTotal, False)[0]
 
 
-def _hyper_prob_at_least(aFound, iDraws, aObjects, iTotal, iCurCol=0):
+def _hyper_prob_at_least(aFound, iDraws, aObjects, iTotal):
     """Returns the probablity of drawing at least aFound from aObjects objects
        of interest from iTotal objects in iDraw draws."""
-    # This is the sum of hyper_prob(iCur, Draws, iObjects, iTotal) where
-    # iCur in [iFound, min(iDraws, iObjects)]
-    if len(aFound) != len(aObjects):
-        raise RuntimeError('Invalid input: aFound : %s, aObjects: %s' % (
-            ','.join([str(x) for x in aFound]),
-            ','.join([str(x) for x in aObjects])))
-    fProb = 0
-    aThisFound = copy(aFound)
-    for iCur in range(aFound[iCurCol], min(iDraws, aObjects[iCurCol]) + 1):
-        aThisFound[iCurCol] = iCur
-        if iCurCol < len(aFound) - 1:
-            fProb += _hyper_prob_at_least(aThisFound, iDraws,
-                                          aObjects, iTotal, iCurCol + 1)
-        else:
-            fProb += _multi_hyper_prob(aThisFound, iDraws, aObjects, iTotal)
-    return fProb
+    # This is the sum of _multi_hyper_prob(aCur, iDraws, aObjects, iTotal)
+    # over all aCur >= aFound, which _draw_probs accumulates directly
+    _check_hyper_args(aFound, iDraws, aObjects, iTotal)
+    return _draw_probs(aFound, [iDraws], aObjects, iTotal, True)[0]
 
 
 class BaseDrawProbPlugin(BasePlugin):
@@ -182,8 +217,9 @@ class BaseDrawProbPlugin(BasePlugin):
         # Look 15 cards into the deck by default, seems good start
         self.iMax = min(15, self.iTotal - self.iOpeningDraw)
         self.iDrawStep = 1  # Increments to use in table
-        self.aAllChoices = _gen_choice_list(self.dSelectedCounts)
         self.iCardsToDraw = min(3, self.iSelectedCount)
+        self.aAllChoices = _gen_choice_list(self.dSelectedCounts,
+                                            self.iCardsToDraw)
 
         if self.iTotal <= self.iOpeningDraw:
             self._complain_size()
@@ -289,8 +325,9 @@ class BaseDrawProbPlugin(BasePlugin):
            'connect' signal.
            """
         # This is messy, but does the job
-        iNumCardRows = len([sum(x) for x in self.aAllChoices if
-                            sum(x) <= self.iCardsToDraw])
+        self.aAllChoices = _gen_choice_list(self.dSelectedCounts,
+                                            self.iCardsToDraw)
+        iNumCardRows = len(self.aAllChoices)
         iNumRows = 2 * iNumCardRows + 5
         if len(self.aAllChoices[0]) > 1:
             iNumCols = 2 * self.iNumSteps + 5
@@ -377,16 +414,20 @@ class BaseDrawProbPlugin(BasePlugin):
         """Fill a single row of the results table"""
         iTableRow = 2 * iRow + 4
         aThisDraw = self._gen_draw(iRow)
-        for iCol in range(self.iNumSteps):
-            iNumDraws = iCol * self.iDrawStep + self.iOpeningDraw
+        aDraws = [iCol * self.iDrawStep + self.iOpeningDraw for iCol in
+                  range(self.iNumSteps)]
+        # Calculate the probabilities for the whole row at once
+        aValid = [x for x in aDraws if x < self.iTotal]
+        aProbExact = _draw_probs(aThisDraw, aValid, aCardCounts,
+                                 self.iTotal, False)
+        if not bZero:
+            aProbAccum = _draw_probs(aThisDraw, aValid, aCardCounts,
+                                     self.iTotal, True)
+        for iCol, iNumDraws in enumerate(aDraws):
             if iNumDraws < self.iTotal:
-                fProbExact = _multi_hyper_prob(aThisDraw, iNumDraws,
-                                               aCardCounts,
-                                               self.iTotal) * 100
+                fProbExact = aProbExact[iCol] * 100
                 if not bZero:
-                    fProbAccum = _hyper_prob_at_least(aThisDraw, iNumDraws,
-                                                      aCardCounts,
-                                                      self.iTotal) * 100
+                    fProbAccum = aProbAccum[iCol] * 100
                     oResLabel = Gtk.Label('%3.2f (%3.2f)' % (fProbAccum,
                                                              fProbExact))
                 else:
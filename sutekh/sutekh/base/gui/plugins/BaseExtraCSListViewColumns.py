@@ -10,9 +10,9 @@ from sqlobject import SQLObjectNotFound
 
 from gi.repository import Pango
 
-from ...core.BaseTables import (PhysicalCardSet,
-                                MapPhysicalCardToPhysicalCardSet)
+from ...core.BaseTables import PhysicalCardSet
 from ...core.BaseAdapters import IPhysicalCardSet
+from ...core.CardSetUtilities import get_total_card_count
 from ...core.DBSignals import (listen_row_destroy, listen_row_update,
                                listen_row_created, listen_changed,
                                disconnect_changed,
@@ -135,8 +135,7 @@ class BaseExtraCSListViewColumns(BaseExtraColumns):
         """Return the total number of cards in the card set"""
         def query(oCardSet):
             """Query the database"""
-            return MapPhysicalCardToPhysicalCardSet.selectBy(
-                physicalCardSetID=oCardSet.id).count()
+            return get_total_card_count(oCardSet)
 
         if sCardSet:
             # lookup totals
@@ -263,7 +262,7 @@ class BaseExtraCSListViewColumns(BaseExtraColumns):
            invalidate the cache when that occurs"""
         self._dCache = {}
 
-    def card_changed(self, oCardSet, _oPhysCard, _iChg):
+    def card_changed(self, oCardSet, _dChanges):
         """Listen for card changes.
 
            We invalidate card counts for the card set if it's in the cache.
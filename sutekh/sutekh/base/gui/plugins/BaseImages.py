@@ -5,6 +5,7 @@
 
 """Adds a frame which will display card images from ARDB in the GUI"""
 
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 import logging
 import os
@@ -13,18 +14,21 @@ import unicodedata
 from urllib.error import HTTPError
 import zipfile
 
-from gi.repository import Gdk, GdkPixbuf, GObject, Gtk
+from gi.repository import Gdk, GdkPixbuf, GLib, GObject, Gtk
 
 from ...core.BaseTables import PhysicalCard
 from ...core.BaseAdapters import IPrintingName
 
 from ...io.UrlOps import urlopen_with_timeout
+from ...io.ImageDownloader import ImageDownloadManager
+from ...io.ImageManifest import ImageManifest
 
 from ...Utility import prefs_dir, ensure_dir_exists, get_printing_date
 
 from ..BasePluginManager import BasePlugin
 from ..ProgressDialog import ProgressDialog, SutekhCountLogHandler
 from ..MessageBus import MessageBus, CARD_TEXT_MSG
+from ..PixbufCache import PixbufCache
 from ..GuiDataPack import progress_fetch_data, gui_error_handler
 from ..BasicFrame import BasicFrame
 from ..SutekhDialog import (SutekhDialog, do_complaint_buttons,
@@ -61,6 +65,56 @@ def _scale_dims(iImageWidth, iImageHeight, iPaneWidth, iPaneHeight):
     return int(fDestWidth), int(fDestHeight)
 
 
+def load_scaled_pixbuf(aFullFilenames, iZoomMode, iPaneWidth, iPaneHeight):
+    """Load the images, side by side, and scale them for the zoom mode.
+
+       Returns None if the pane is too small to show the image.
+       This only uses GdkPixbuf, so is safe to call from other threads."""
+    aPixbufs = []
+    iHeight = 0
+    iWidth = 0
+    for sFullFilename in aFullFilenames:
+        oPixbuf = GdkPixbuf.Pixbuf.new_from_file(sFullFilename)
+        iWidth = max(iWidth, oPixbuf.get_width())
+        iHeight = max(iHeight, oPixbuf.get_height())
+        aPixbufs.append(oPixbuf)
+    if len(aPixbufs) > 1:
+        # Create composite pixbuf
+        oPixbuf = GdkPixbuf.Pixbuf.new(aPixbufs[0].get_colorspace(),
+                                       aPixbufs[0].get_has_alpha(),
+                                       aPixbufs[0].get_bits_per_sample(),
+                                       (iWidth + 4) * len(aPixbufs) - 4,
+                                       iHeight)
+        oPixbuf.fill(0x00000000)  # fill with transparent black
+        iPos = 0
+        for oThisPixbuf in aPixbufs:
+            # Scale all images to the same size
+            oThisPixbuf = oThisPixbuf.scale_simple(
+                iWidth, iHeight, GdkPixbuf.InterpType.HYPER)
+            # Add to the composite pixbuf
+            oThisPixbuf.copy_area(0, 0, iWidth, iHeight, oPixbuf, iPos, 0)
+            iPos += iWidth + 4
+        # Make iWidth the total width
+        iWidth = (iWidth + 4) * len(aPixbufs) - 4
+    else:
+        oPixbuf = aPixbufs[0]
+    if iZoomMode == FIT:
+        # Need to fix aspect ratios
+        iDestWidth, iDestHeight = _scale_dims(iWidth, iHeight,
+                                              iPaneWidth, iPaneHeight)
+        if iDestWidth <= 0 or iDestHeight <= 0:
+            return None
+        return oPixbuf.scale_simple(iDestWidth, iDestHeight,
+                                    GdkPixbuf.InterpType.HYPER)
+    if iZoomMode == VIEW_FIXED:
+        iDestWidth, iDestHeight = _scale_dims(iWidth, iHeight,
+                                              RATIO[0], RATIO[1])
+        return oPixbuf.scale_simple(iDestWidth, iDestHeight,
+                                    GdkPixbuf.InterpType.HYPER)
+    # Full size, so no scaling
+    return oPixbuf
+
+
 def check_file(sFileName):
     """Check if file exists and is readable"""
     bRes = True
@@ -222,6 +276,10 @@ class BaseImageFrame(BasicFrame):
         self._tPaneSize = (0, 0)
         self._dFailedUrls = {}
         self._dDateCache = {}
+        self._oPixbufCache = PixbufCache()
+        self._oManifest = None
+        self._oPrefetchPool = None
+        self._iPrefetchGen = 0
 
     type = property(fget=lambda self: "Card Image Frame", doc="Frame Type")
 
@@ -235,20 +293,47 @@ class BaseImageFrame(BasicFrame):
         dOutdated = {}
         # Download date check if needed
         self._get_date_data()
+        dFiles = self._get_image_manifest().get_files()
+        dExpPaths = {}
         for oCard in PhysicalCard.select():
             if oCard.printing:
                 # We're only interested in cards with expansion info,
                 # as the "No expansion" case is a subset of those
-                aNames = self.lookup_filename(oCard)
+                aNames = self.lookup_filename(oCard, dExpPaths)
                 for sName in aNames:
-                    if not check_file(sName):
+                    if sName not in dFiles:
                         dMissing.setdefault(oCard, [])
                         dMissing[oCard].append(sName)
-                    elif self._check_outdated(sName):
+                    elif self._check_outdated(sName, dFiles[sName][1]):
                         dOutdated.setdefault(oCard, [])
                         dOutdated[oCard].append(sName)
         return dMissing, dOutdated
 
+    def _get_manifest_file(self):
+        """Return the file used to store the image manifest between
+           runs"""
+        return os.path.join(prefs_dir(self.APP_NAME), 'image_manifest.json')
+
+    def _get_image_manifest(self):
+        """Return the manifest of the image directory, updated from the
+           filesystem."""
+        if (self._oManifest is None or
+                self._oManifest.sRoot != self._sPrefsPath):
+            self._oManifest = ImageManifest(self._sPrefsPath)
+            self._oManifest.load(self._get_manifest_file())
+        self._oManifest.scan()
+        if self._oManifest.bDirty:
+            ensure_dir_exists(prefs_dir(self.APP_NAME))
+            self._oManifest.save(self._get_manifest_file())
+        return self._oManifest
+
+    def invalidate_image_manifest(self, sFileName=None):
+        """Mark an image as changed outside the usual download paths, so
+           the manifest is updated on the next scan. If sFileName is None,
+           the whole image directory is scanned again."""
+        if self._oManifest is not None:
+            self._oManifest.invalidate(sFileName)
+
     def check_for_all_cards(self):
         """Print details of missing card images.
         
@@ -277,40 +362,74 @@ class BaseImageFrame(BasicFrame):
         dMissing, dOutdated = self._find_missing_outdated_images()
         return len(dMissing), len(dOutdated)
 
-    def _download_dict(self, dImages, oLogger):
-        """Download the images in the given dict"""
+    def _get_download_jobs(self, dMissing, dOutdated):
+        """Build the (urls, filename) download jobs for the missing and
+           outdated images."""
+        dJobs = {}
         sCurName, sCurPrint = self._sCardName, self._sCurExpPrint
-        for oCard, aToGrab in dImages.items():
-            for sName in aToGrab:
-                # make_urls may require card info, so we set it
-                self._sCardName = oCard.abstractCard.canonicalName
-                self._sCurExpPrint = IPrintingName(oCard)
-                # This pops up another progress dialog, but that
-                # is OK
-                self._download_image(sName)
-                # Update the image list progress bar
-                oLogger.info('image download attempted')
-        self._sCardName, self._sCurExpPrint = sCurName, sCurPrint
+        try:
+            for dImages in (dMissing, dOutdated):
+                for oCard, aToGrab in dImages.items():
+                    # make_urls may require card info, so we set it
+                    self._sCardName = oCard.abstractCard.canonicalName
+                    self._sCurExpPrint = IPrintingName(oCard)
+                    for sName in aToGrab:
+                        if sName in dJobs:
+                            # Several printings can share an image
+                            continue
+                        aUrls = self._filter_failed_urls(
+                            self._make_card_urls(sName))
+                        if aUrls:
+                            dJobs[sName] = aUrls
+        finally:
+            self._sCardName, self._sCurExpPrint = sCurName, sCurPrint
+        return [(aUrls, sName) for sName, aUrls in dJobs.items()]
+
+    def _filter_failed_urls(self, aUrls):
+        """Remove the urls that have failed recently from the list"""
+        if not aUrls:
+            return []
+        oNow = datetime.datetime.now()
+        aResult = []
+        for sUrl in aUrls:
+            oLastChecked = self._dFailedUrls.get(sUrl)
+            if oLastChecked is not None:
+                if oNow - oLastChecked <= datetime.timedelta(hours=2):
+                    continue
+                # Will retry this time
+                logging.info('Removing %s from the failed cache', sUrl)
+                del self._dFailedUrls[sUrl]
+            aResult.append(sUrl)
+        return aResult
 
     def download_all_missing_outdated_images(self):
-        """Download all images that are missing from the filesystem."""
+        """Download all images that are missing from the filesystem.
+
+           The downloads are done concurrently, with a single progress
+           dialog for the whole batch."""
         dMissing, dOutdated = self._find_missing_outdated_images()
-        if not dMissing and not dOutdated:
+        aJobs = self._get_download_jobs(dMissing, dOutdated)
+        if not aJobs:
             return
         oProgress = ProgressDialog()
-        sCurName, sCurPrint = self._sCardName, self._sCurExpPrint
         try:
             oLogHandler = SutekhCountLogHandler()
             oLogHandler.set_dialog(oProgress)
-            oLogHandler.set_total(len(dMissing) + len(dOutdated))
+            oLogHandler.set_total(len(aJobs))
             oLogger = logging.Logger('Sutekh card image fetcher')
             oLogger.addHandler(oLogHandler)
             oProgress.set_description("Downloading missing or outdated images")
-            self._download_dict(dMissing, oLogger)
-            self._download_dict(dOutdated, oLogger)
+            oManager = ImageDownloadManager(dHeaders=self._dReqHeaders)
+            aResults = oManager.download(aJobs, oLogger)
         finally:
-            self._sCardName, self._sCurExpPrint = sCurName, sCurPrint
             oProgress.destroy()
+        oNow = datetime.datetime.now()
+        for oResult in aResults:
+            for sUrl in oResult.aPermanent:
+                # Cache missing images, so we don't retry for a while.
+                # Other failures, such as timeouts, may be transient, so
+                # we retry those next time.
+                self._dFailedUrls[sUrl] = oNow
 
     def frame_setup(self):
         """Subscribe to the set_card_text signal"""
@@ -319,12 +438,22 @@ class BaseImageFrame(BasicFrame):
                                         Gtk.IconSize.DIALOG)
         MessageBus.subscribe(CARD_TEXT_MSG, 'set_card_text',
                              self.set_card_text)
+        MessageBus.subscribe(CARD_TEXT_MSG, 'prefetch_cards',
+                             self.prefetch_cards)
         super(BaseImageFrame, self).frame_setup()
 
     def cleanup(self, bQuit=False):
         """Remove the listener"""
         MessageBus.unsubscribe(CARD_TEXT_MSG, 'set_card_text',
                                self.set_card_text)
+        MessageBus.unsubscribe(CARD_TEXT_MSG, 'prefetch_cards',
+                               self.prefetch_cards)
+        # Abandon any pending prefetches
+        self._iPrefetchGen += 1
+        if self._oPrefetchPool is not None:
+            self._oPrefetchPool.shutdown(wait=False)
+            self._oPrefetchPool = None
+        self._oPixbufCache.clear()
         super(BaseImageFrame, self).cleanup(bQuit)
 
     def _config_download_images(self):
@@ -422,16 +551,19 @@ class BaseImageFrame(BasicFrame):
             self._dDateCache[LAST_DOWNLOADED] = \
                     datetime.datetime.now() - datetime.timedelta(hours=21)
 
-    def _check_outdated(self, sFullFilename):
+    def _check_outdated(self, sFullFilename, fMTime=None):
         """Check if the image we're displaying has a more recent version
-           available to download."""
+           available to download.
+
+           fMTime is the file's modification time, if already known."""
         # Entries not in the cache are automatically older than we are, so
         # we don't try download local files
         oCacheDate = self._dDateCache.get(
             sFullFilename, datetime.datetime.utcfromtimestamp(0))
         # We assume the cache dates are utc, so we convert to that
-        oCurDate = datetime.datetime.utcfromtimestamp(
-            os.path.getmtime(sFullFilename))
+        if fMTime is None:
+            fMTime = os.path.getmtime(sFullFilename)
+        oCurDate = datetime.datetime.utcfromtimestamp(fMTime)
         # We allow some fuzz to add a bit of protection against weird
         # filesystems and timezone issues - this is probably too generous
         return oCacheDate - oCurDate > datetime.timedelta(seconds=60)
@@ -463,8 +595,11 @@ class BaseImageFrame(BasicFrame):
         aFullFilenames = self._make_paths(self._sCardName, sCurExpansionPath)
         return aFullFilenames
 
-    def lookup_filename(self, oPhysCard):
-        """Return the list of possible filenames for use by other plugins"""
+    def lookup_filename(self, oPhysCard, dExpPaths=None):
+        """Return the list of possible filenames for use by other plugins
+
+           dExpPaths can be used to cache the expansion paths when looking
+           up many cards."""
         sExpansionPath = ''
         sCardName = oPhysCard.abstractCard.canonicalName
         if self._bShowExpansions:
@@ -475,7 +610,13 @@ class BaseImageFrame(BasicFrame):
                 # No expansion, so find the latest expansion for this card
                 aExpPrints = get_printing_info(oPhysCard.abstractCard)
                 sExpPrintName = aExpPrints[0]
-            sExpansionPath = self._convert_expansion(sExpPrintName)
+            if dExpPaths is None:
+                sExpansionPath = self._convert_expansion(sExpPrintName)
+            else:
+                if sExpPrintName not in dExpPaths:
+                    dExpPaths[sExpPrintName] = self._convert_expansion(
+                        sExpPrintName)
+                sExpansionPath = dExpPaths[sExpPrintName]
         aFullFilenames = self._make_paths(sCardName, sExpansionPath)
         return aFullFilenames
 
@@ -512,6 +653,7 @@ class BaseImageFrame(BasicFrame):
                     oOutFile = open(sFullFilename, 'wb')
                     oOutFile.write(sImgData)
                     oOutFile.close()
+                    self.invalidate_image_manifest(sFullFilename)
                     logging.info('Using image data from %s', sUrl)
                     # We remove this from the url cache
                 else:
@@ -527,7 +669,7 @@ class BaseImageFrame(BasicFrame):
 
     def _load_image(self, aFullFilenames):
         """Load an image into the pane, show broken image if needed"""
-        # pylint: disable=too-many-branches, too-many-locals, too-many-statements
+        # pylint: disable=too-many-branches
         # This is has to handle a number of special cases
         # and subdividing it further won't help clarity
         self._oImage.set_alignment(0.5, 0.5)  # Centre image
@@ -553,73 +695,127 @@ class BaseImageFrame(BasicFrame):
                     # We don't handle failure specially here - if it fails,
                     # we will show the existing image
                     self._download_image(sFullFilename)
+        if self._bShowExpansions:
+            self.oExpPrintLabel.set_markup(
+                '<i>Image from expansion : </i> %s' % self._sCurExpPrint)
+            self.oExpPrintLabel.show()
+        else:
+            self.oExpPrintLabel.hide()  # config changes can cause this
+        iPaneWidth, iPaneHeight = self._get_pane_size()
+        if self._iZoomMode == FIT:
+            # don't centre image under label
+            self._oImage.set_alignment(0, 0.5)
+        tKey = self._get_cache_key(aFullFilenames, iPaneWidth, iPaneHeight)
+        oPixbuf = self._oPixbufCache.get(tKey)
         try:
-            if self._bShowExpansions:
-                self.oExpPrintLabel.set_markup(
-                    '<i>Image from expansion : </i> %s' % self._sCurExpPrint)
-                self.oExpPrintLabel.show()
-                iHeightOffset = self.oExpPrintLabel.get_allocation().height + 2
-            else:
-                self.oExpPrintLabel.hide()  # config changes can cause this
-                iHeightOffset = 0
-            aPixbufs = []
-            iHeight = 0
-            iWidth = 0
-            for sFullFilename in aFullFilenames:
-                oPixbuf = GdkPixbuf.Pixbuf.new_from_file(sFullFilename)
-                iWidth = max(iWidth, oPixbuf.get_width())
-                iHeight = max(iHeight, oPixbuf.get_height())
-                aPixbufs.append(oPixbuf)
-            if len(aPixbufs) > 1:
-                # Create composite pixbuf
-                oPixbuf = Gdk.Pixbuf(aPixbufs[0].get_colorspace(),
-                                     aPixbufs[0].get_has_alpha(),
-                                     aPixbufs[0].get_bits_per_sample(),
-                                     (iWidth + 4) * len(aPixbufs) - 4,
-                                     iHeight)
-                oPixbuf.fill(0x00000000)  # fill with transparent black
-                iPos = 0
-                for oThisPixbuf in aPixbufs:
-                    # Scale all images to the same size
-                    oThisPixbuf.scale_simple(iWidth, iHeight,
-                                             GdkPixbuf.InterpType.HYPER)
-                    # Add to the composite pixbuf
-                    oThisPixbuf.copy_area(0, 0, iWidth, iHeight,
-                                          oPixbuf, iPos, 0)
-                    iPos += iWidth + 4
-                # Make iWidth the total width
-                iWidth = (iWidth + 4) * len(aPixbufs) - 4
-            else:
-                oPixbuf = aPixbufs[0]
-            if self._iZoomMode == FIT:
-                # Need to fix aspect ratios
-                iPaneHeight = (self._oView.get_vadjustment().get_page_size() -
-                               iHeightOffset)
-                iPaneWidth = self._oView.get_hadjustment().get_page_size()
-                # don't centre image under label
-                self._oImage.set_alignment(0, 0.5)
-                iDestWidth, iDestHeight = _scale_dims(iWidth, iHeight,
-                                                      iPaneWidth, iPaneHeight)
-                if iDestWidth > 0 and iDestHeight > 0:
-                    self._oImage.set_from_pixbuf(
-                        oPixbuf.scale_simple(iDestWidth, iDestHeight,
-                                             GdkPixbuf.InterpType.HYPER))
-                    self._tPaneSize = (self._oView.get_hadjustment().get_page_size(),
-                                       self._oView.get_vadjustment().get_page_size())
-            elif self._iZoomMode == VIEW_FIXED:
-                iDestWidth, iDestHeight = _scale_dims(iWidth, iHeight,
-                                                      RATIO[0], RATIO[1])
-                self._oImage.set_from_pixbuf(
-                    oPixbuf.scale_simple(iDestWidth, iDestHeight,
-                                         GdkPixbuf.InterpType.HYPER))
-            else:
-                # Full size, so no scaling
+            if oPixbuf is None:
+                oPixbuf = load_scaled_pixbuf(aFullFilenames, self._iZoomMode,
+                                             iPaneWidth, iPaneHeight)
+                if oPixbuf is not None and tKey is not None:
+                    self._oPixbufCache.add(tKey, oPixbuf)
+            if oPixbuf is not None:
                 self._oImage.set_from_pixbuf(oPixbuf)
+                if self._iZoomMode == FIT:
+                    self._tPaneSize = (
+                        self._oView.get_hadjustment().get_page_size(),
+                        self._oView.get_vadjustment().get_page_size())
         except GObject.GError:
             self._oImage.set_from_icon_name("image-missing",
                                             Gtk.IconSize.DIALOG)
         self._oImage.queue_draw()
 
+    def _get_pane_size(self):
+        """Return the space available for the image in the pane"""
+        if self._bShowExpansions:
+            iHeightOffset = self.oExpPrintLabel.get_allocation().height + 2
+        else:
+            iHeightOffset = 0
+        iPaneHeight = (self._oView.get_vadjustment().get_page_size() -
+                       iHeightOffset)
+        iPaneWidth = self._oView.get_hadjustment().get_page_size()
+        return int(iPaneWidth), int(iPaneHeight)
+
+    def _get_cache_key(self, aFullFilenames, iPaneWidth, iPaneHeight):
+        """Return the key for the scaled images in the pixbuf cache.
+
+           The file modification times are included, so downloading a
+           new image invalidates the cached version. Returns None if
+           a file is missing."""
+        try:
+            tFiles = tuple((sFullFilename, os.path.getmtime(sFullFilename))
+                           for sFullFilename in aFullFilenames)
+        except OSError:
+            return None
+        if self._iZoomMode != FIT:
+            # Pane size doesn't affect the image
+            iPaneWidth = iPaneHeight = 0
+        return (tFiles, self._iZoomMode, (iPaneWidth, iPaneHeight))
+
+    def _get_existing_filenames(self, oPhysCard):
+        """Return the image files set_card_text would show for the card,
+           or None if the files don't exist"""
+        sCardName = oPhysCard.abstractCard.canonicalName
+        if not self._bShowExpansions:
+            aExpPaths = ['']
+        elif oPhysCard.printing:
+            aExpPaths = [self._convert_expansion(IPrintingName(oPhysCard))]
+        else:
+            aExpPaths = [self._convert_expansion(x) for x in
+                         get_printing_info(oPhysCard.abstractCard)]
+        for sExpansionPath in aExpPaths:
+            aFullFilenames = self._make_paths(sCardName, sExpansionPath)
+            if aFullFilenames and all(os.path.exists(x)
+                                      for x in aFullFilenames):
+                return aFullFilenames
+        return None
+
+    def prefetch_cards(self, aPhysCards):
+        """Load the images for the given cards in the background, so they
+           can be shown without delay when selected.
+
+           Pending prefetches for earlier requests are abandoned."""
+        self._iPrefetchGen += 1
+        iPaneWidth, iPaneHeight = self._get_pane_size()
+        for oPhysCard in aPhysCards:
+            aFullFilenames = self._get_existing_filenames(oPhysCard)
+            if not aFullFilenames:
+                continue
+            tKey = self._get_cache_key(aFullFilenames, iPaneWidth,
+                                       iPaneHeight)
+            if tKey is None or tKey in self._oPixbufCache:
+                continue
+            if self._oPrefetchPool is None:
+                self._oPrefetchPool = ThreadPoolExecutor(max_workers=1)
+            self._oPrefetchPool.submit(self._prefetch_image,
+                                       self._iPrefetchGen, tKey,
+                                       aFullFilenames, self._iZoomMode,
+                                       iPaneWidth, iPaneHeight)
+
+    def _prefetch_image(self, iGen, tKey, aFullFilenames, iZoomMode,
+                        iPaneWidth, iPaneHeight):
+        """Load the image in the prefetch thread.
+
+           Only the pixbuf library is used here. The result is added to
+           the cache from the main thread."""
+        # pylint: disable=too-many-arguments
+        # We need all the state from the main thread
+        if iGen != self._iPrefetchGen:
+            # The selection has moved on
+            return
+        try:
+            oPixbuf = load_scaled_pixbuf(aFullFilenames, iZoomMode,
+                                         iPaneWidth, iPaneHeight)
+        except GObject.GError:
+            return
+        if oPixbuf is not None:
+            GLib.idle_add(self._add_prefetched, tKey, oPixbuf)
+
+    def _add_prefetched(self, tKey, oPixbuf):
+        """Add a prefetched image to the cache"""
+        self._oPixbufCache.add(tKey, oPixbuf)
+        # Only run once
+        return False
+
     def check_images(self, sTestPath=''):
         """Check if dir contains images in the right structure"""
         self._bShowExpansions = self._have_expansions(sTestPath)
@@ -966,6 +1162,8 @@ class BaseImagePlugin(BasePlugin):
             oOutputFile.write(oData)
             oOutputFile.close()
         oProgressDialog.destroy()
+        # Existing images may have been overwritten
+        self.image_frame.invalidate_image_manifest()
         if self.image_frame.check_images(sPrefsPath):
             return True
         return False
@@ -5,8 +5,16 @@
 # GPL - see COPYING for details
 """Simulate the opening hand draw."""
 
+import random
 from copy import copy
-from random import choice
+
+# pylint: disable=import-error
+# numpy is optional, so pylint may not find it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+# pylint: enable=import-error
 
 from gi.repository import GObject, Gtk
 
@@ -16,6 +24,9 @@ from ..BasePluginManager import BasePlugin
 from ..SutekhDialog import SutekhDialog
 from ..AutoScrolledWindow import AutoScrolledWindow
 
+# Number of hands drawn at once when simulating with NumPy
+SIM_BATCH = 10000
+
 
 # Utility functions
 def convert_to_abs(aCards):
@@ -115,13 +126,130 @@ def draw_cards(aCards, iDraw, bCopy=False):
         aCards = copy(aCards)
     dHand = {}
     for _iCard in range(iDraw):
-        oCard = choice(aCards)
-        aCards.remove(oCard)  # drawing without replacement
+        # Swap the drawn card with the last card, so we can remove it
+        # without shifting the rest of the list
+        iPos = random.randrange(len(aCards))
+        aCards[iPos], aCards[-1] = aCards[-1], aCards[iPos]
+        oCard = aCards.pop()  # drawing without replacement
         dHand.setdefault(oCard.name, 0)
         dHand[oCard.name] += 1
     return dHand, aCards
 
 
+def _simulate_numpy(aMembers, iNumGroups, iTotal, iDraw, iHands, iSeed):
+    """Draw the hands with NumPy, a batch at a time.
+
+       Each hand is the iDraw cards with the smallest random keys, which
+       is a uniformly random draw without replacement."""
+    oRng = numpy.random.default_rng(iSeed)
+    aGroups = numpy.zeros((iTotal, iNumGroups), dtype=numpy.int16)
+    for iCard, aCardGroups in enumerate(aMembers):
+        aGroups[iCard, aCardGroups] = 1
+    aCounts = numpy.zeros((iNumGroups, iDraw + 1), dtype=numpy.int64)
+    iDone = 0
+    while iDone < iHands:
+        iBatch = min(SIM_BATCH, iHands - iDone)
+        aKeys = oRng.random((iBatch, iTotal), dtype=numpy.float32)
+        if iDraw < iTotal:
+            aHands = numpy.argpartition(aKeys, iDraw, axis=1)[:, :iDraw]
+        else:
+            aHands = numpy.broadcast_to(numpy.arange(iTotal),
+                                        (iBatch, iTotal))
+        # (hands x groups) number of cards from each group
+        aHandCounts = aGroups[aHands].sum(axis=1)
+        for iGroup in range(iNumGroups):
+            aCounts[iGroup] += numpy.bincount(aHandCounts[:, iGroup],
+                                              minlength=iDraw + 1)
+        iDone += iBatch
+    return aCounts.tolist()
+
+
+def _simulate_python(aMembers, iNumGroups, iTotal, iDraw, iHands, iSeed):
+    """Draw the hands using the random module."""
+    oRandom = random.Random(iSeed)
+    aCounts = [[0] * (iDraw + 1) for _iGroup in range(iNumGroups)]
+    aCardIds = range(iTotal)
+    aHandCounts = [0] * iNumGroups
+    for _iHand in range(iHands):
+        for iCard in oRandom.sample(aCardIds, iDraw):
+            for iGroup in aMembers[iCard]:
+                aHandCounts[iGroup] += 1
+        for iGroup, iCount in enumerate(aHandCounts):
+            aCounts[iGroup][iCount] += 1
+            aHandCounts[iGroup] = 0
+    return aCounts
+
+
+def simulate_draws(aCards, iDraw, dGroups, iHands=100000, iSeed=None):
+    """Simulate drawing iHands hands of iDraw cards from aCards.
+
+       dGroups is a dictionary of group key : set of card names. Returns
+       a dictionary of group key : list of the fraction of hands with
+       exactly 0, 1, ... iDraw cards from the group. iSeed can be used
+       to get repeatable results.
+
+       This uses NumPy to draw the hands in batches if it's available,
+       and falls back to drawing the hands one at a time otherwise."""
+    aKeys = list(dGroups)
+    dCardGroups = {}
+    aMembers = []
+    for oCard in aCards:
+        # Group lookups by card name, since cards repeat in the deck
+        if oCard.name not in dCardGroups:
+            dCardGroups[oCard.name] = [iGroup for iGroup, oKey in
+                                       enumerate(aKeys) if
+                                       oCard.name in dGroups[oKey]]
+        aMembers.append(dCardGroups[oCard.name])
+    iDraw = min(iDraw, len(aCards))
+    if numpy is not None:
+        aCounts = _simulate_numpy(aMembers, len(aKeys), len(aCards), iDraw,
+                                  iHands, iSeed)
+    else:
+        aCounts = _simulate_python(aMembers, len(aKeys), len(aCards), iDraw,
+                                   iHands, iSeed)
+    return dict((oKey, [x / float(iHands) for x in aCounts[iGroup]]) for
+                iGroup, oKey in enumerate(aKeys))
+
+
+def get_distribution_mean(aDist):
+    """Return the mean of a distribution from simulate_draws"""
+    return sum(iNum * fFrac for iNum, fFrac in enumerate(aDist))
+
+
+def format_distribution(aDist):
+    """Construct a string for the distribution from simulate_draws,
+       skipping very unlikely counts."""
+    return ', '.join(['%d: %2.1f%%' % (iNum, 100 * fFrac) for iNum, fFrac
+                      in enumerate(aDist) if fFrac >= 0.0005])
+
+
+def make_simulation_view(aCategories, dResults, iWidth):
+    """Setup a tree view of the simulated distributions.
+
+       aCategories is a list of (category name, list of group keys), and
+       dResults is the result from simulate_draws."""
+    oStore = Gtk.TreeStore(GObject.TYPE_STRING, GObject.TYPE_STRING,
+                           GObject.TYPE_STRING, GObject.TYPE_STRING)
+    for sCategory, aKeys in aCategories:
+        oParentIter = oStore.append(None, (sCategory, '', '', ''))
+        for oKey in aKeys:
+            aDist = dResults[oKey]
+            oStore.append(oParentIter, (
+                oKey[-1], '%2.2f' % get_distribution_mean(aDist),
+                '%2.1f%%' % (100 * (1.0 - aDist[0])),
+                format_distribution(aDist)))
+    oView = Gtk.TreeView(oStore)
+    for iCol, sHeading in enumerate(['Group', 'Mean', 'At least one',
+                                     'Number in hand']):
+        oCell = Gtk.CellRendererText()
+        oCol = Gtk.TreeViewColumn(sHeading, oCell, text=iCol)
+        oCol.set_sort_column_id(iCol)
+        oView.append_column(oCol)
+    oView.get_column(0).set_min_width(iWidth // 2)
+    oView.expand_all()
+    return AutoScrolledWindow(oView)
+
+
 def make_flat_view(dProbs, iDraw, sHeading, iWidth):
     """Setup a tree store with a flat probablity list."""
     oStore = Gtk.TreeStore(GObject.TYPE_STRING, GObject.TYPE_STRING,
@@ -189,6 +317,8 @@ class BaseOpeningDraw(BasePlugin):
     BACK, FORWARD, BREAKDOWN = range(1, 4)
     MAXSIZE = 500
     COLUMN_WIDTH = 450
+    # Number of hands drawn for the simulation summary
+    SIM_HANDS = 100000
 
     sMenuName = "Simulate opening hand"
 
@@ -232,6 +362,11 @@ class BaseOpeningDraw(BasePlugin):
 
         oDialog.vbox.pack_start(oShowButton, False, False, 0)
 
+        if self._get_simulation_groups():
+            oSimButton = Gtk.Button('simulate %d hands' % self.SIM_HANDS)
+            oSimButton.connect('clicked', self._show_simulation)
+            oDialog.vbox.pack_start(oSimButton, False, False, 0)
+
         oDialog.show_all()
 
         oDialog.run()
@@ -269,6 +404,48 @@ class BaseOpeningDraw(BasePlugin):
         """Add all the stats to the dialog."""
         raise NotImplementedError("implement _fill_stats")
 
+    def _get_simulation_groups(self):
+        """Return a list of (cards, draw size, category name, dictionary of
+           group name : set of card names) for the simulation summary.
+
+           The default is no groups, which disables the simulation."""
+        return []
+
+    def _show_simulation(self, _oButton):
+        """Simulate many hands and show the distribution for each of
+           the groups."""
+        aCategories = []
+        dResults = {}
+        # Draw the hands once for each set of cards, and count all the
+        # groups for that set of cards together
+        dDraws = {}
+        for aCards, iDraw, sCategory, dGroups in \
+                self._get_simulation_groups():
+            tDraw = (id(aCards), iDraw)
+            dDraws.setdefault(tDraw, (aCards, iDraw, {}))
+            aKeys = []
+            for sGroup in sorted(dGroups):
+                dDraws[tDraw][2][(sCategory, sGroup)] = dGroups[sGroup]
+                aKeys.append((sCategory, sGroup))
+            aCategories.append((sCategory, aKeys))
+        for aCards, iDraw, dGroups in dDraws.values():
+            dResults.update(simulate_draws(aCards, iDraw, dGroups,
+                                           self.SIM_HANDS))
+        oDialog = SutekhDialog('Simulated Hands', self.parent,
+                               Gtk.DialogFlags.MODAL |
+                               Gtk.DialogFlags.DESTROY_WITH_PARENT,
+                               ("_Close", Gtk.ResponseType.CLOSE))
+        oDialog.set_size_request(800, 500)
+        oDialog.vbox.pack_start(Gtk.Label(
+            'Results from %d simulated hands' % self.SIM_HANDS),
+            False, False, 0)
+        oDialog.vbox.pack_start(make_simulation_view(aCategories, dResults,
+                                                     self.COLUMN_WIDTH),
+                                True, True, 0)
+        oDialog.show_all()
+        oDialog.run()
+        oDialog.destroy()
+
     def _fill_dialog(self, _oButton):
         """Fill the dialog with the draw results"""
         oDialog = SutekhDialog('Sample Hands', self.parent,
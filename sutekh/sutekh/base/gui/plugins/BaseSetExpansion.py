@@ -5,11 +5,10 @@
 """Force all cards which can only belong to 1 expansion to that expansion"""
 
 from gi.repository import Gtk
-from ...core.BaseTables import (PhysicalCardSet,
-                                MapPhysicalCardToPhysicalCardSet)
+from ...core.BaseTables import PhysicalCardSet
 from ...core.BaseAdapters import (IExpansion, IPhysicalCard,
                                   IAbstractCard, IPrinting)
-from ...core.DBSignals import send_changed_signal
+from ...core.CardSetUtilities import change_card_sets
 from ..BasePluginManager import BasePlugin
 from ..SutekhDialog import SutekhDialog, do_complaint_error
 from ..ScrolledList import ScrolledList
@@ -75,6 +74,7 @@ class BaseSetExpansion(BasePlugin):
         """Iterate over the cards, setting the correct expansion"""
         # Dealing with selected cards, so filter list is the correct one
         oCS = self._get_card_set()
+        dChanges = {}
         for oCard in self.model.get_card_iterator(
                 self.model.get_current_filter()):
             oAbsCard = IAbstractCard(oCard)
@@ -85,12 +85,10 @@ class BaseSetExpansion(BasePlugin):
                 if oPhysCard.id in dSelected[oAbsCard.id]:
                     oNewCard = IPhysicalCard((oAbsCard, oPrinting))
                     # Card in the selection, so replace with changed card
-                    MapPhysicalCardToPhysicalCardSet.delete(oCard.id)
-                    oCS.addPhysicalCard(oNewCard.id)
-                    oCS.syncUpdate()
-                    # Handle updates
-                    send_changed_signal(oCS, oPhysCard, -1)
-                    send_changed_signal(oCS, oNewCard, +1)
+                    dChanges[oPhysCard] = dChanges.get(oPhysCard, 0) - 1
+                    dChanges[oNewCard] = dChanges.get(oNewCard, 0) + 1
+        # Apply all the changes together
+        change_card_sets({oCS: dChanges})
         self.view.reload_keep_expanded()
 
     def find_common_expansions(self, aCardList):
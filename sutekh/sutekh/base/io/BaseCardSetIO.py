@@ -6,10 +6,15 @@
 """Base classes for the app specific XML card set parsers and writers.
    """
 
-from xml.etree.ElementTree import Element, SubElement
+from xml.etree.ElementTree import Element, SubElement, tostring
 
 from .IOBase import BaseXMLParser, BaseXMLWriter
 from ..core.BaseTables import MAX_ID_LENGTH
+from ..Utility import pretty_xml, norm_xml_quotes
+
+# Number of card elements serialized before writing them out in
+# BaseCardXMLWriter.write_counts
+WRITE_BLOCK = 500
 
 
 class BaseCardXMLParser(BaseXMLParser):
@@ -114,11 +119,9 @@ class BaseCardXMLWriter(BaseXMLWriter):
     sTypeTag = "none"
     sVersionTag = "none"
 
-    def _gen_tree(self, oHolder):
-        """Convert the card set wrapped in oHolder to an ElementTree."""
-        dPhys = {}
-        bInUse = oHolder.inuse
-
+    def _gen_root(self, oHolder):
+        """Create the root element for the card set wrapped in oHolder,
+           without any of the cards."""
         oRoot = Element(self.sTypeTag,
                         name=oHolder.name)
         oRoot.attrib[self.sVersionTag] = self.sMyVersion
@@ -133,8 +136,14 @@ class BaseCardXMLWriter(BaseXMLWriter):
         if oHolder.parent:
             oRoot.attrib['parent'] = oHolder.parent
 
-        if bInUse:
+        if oHolder.inuse:
             oRoot.attrib['inuse'] = 'Yes'
+        return oRoot
+
+    def _gen_tree(self, oHolder):
+        """Convert the card set wrapped in oHolder to an ElementTree."""
+        dPhys = {}
+        oRoot = self._gen_root(oHolder)
 
         for oCard in oHolder.cards:
             # ElementTree 1.2 doesn't support searching for attributes,
@@ -160,3 +169,39 @@ class BaseCardXMLWriter(BaseXMLWriter):
             SubElement(oRoot, 'card', name=sName, count=str(iNum),
                        expansion=sExpName, printing=sPrinting)
         return oRoot
+
+    def write_counts(self, fOut, oHolder, dCounts):
+        """Write the card set to the binary file-like object fOut.
+
+           dCounts is a dictionary of (card name, expansion name,
+           printing name) : count, using None for the expansion and
+           printing names as get_physical_card_names does. The output
+           is the same as write, but the card elements are serialized
+           and written a block at a time, rather than building the
+           whole tree and string in memory."""
+        dPhys = {}
+        for (sName, sExpName, sPrinting), iNum in dCounts.items():
+            if sExpName is None:
+                sExpName = 'None Specified'
+            if sPrinting is None:
+                sPrinting = 'No Printing'
+            tKey = (sName, sExpName, sPrinting)
+            dPhys[tKey] = dPhys.get(tKey, 0) + iNum
+        oRoot = self._gen_root(oHolder)
+        pretty_xml(oRoot)
+        sData = norm_xml_quotes(tostring(oRoot))
+        # The root always has children, so the closing tag is on its
+        # own line, and we can insert the cards before it
+        sClose = b'</' + self.sTypeTag.encode('ascii') + b'>'
+        fOut.write(sData[:-len(sClose)])
+        aBlock = []
+        for tKey in sorted(dPhys):
+            sName, sExpName, sPrinting = tKey
+            oElem = Element('card', name=sName, count=str(dPhys[tKey]),
+                            expansion=sExpName, printing=sPrinting)
+            aBlock.append(b'  ' + norm_xml_quotes(tostring(oElem)) + b'\n')
+            if len(aBlock) >= WRITE_BLOCK:
+                fOut.write(b''.join(aBlock))
+                aBlock = []
+        aBlock.append(sClose)
+        fOut.write(b''.join(aBlock))
@@ -17,17 +17,24 @@ except ImportError:
     from xml.parsers.expat import ExpatError as ParseError
 # pylint: enable=no-name-in-module, import-error
 
+from ..core.CardSetUtilities import check_cs_exists
+
 
 class BaseIdXMLFile:
     """Tries to identify the XML file type.
 
        Parse the file into an ElementTree, and then tests the Root element
        to see which xml file it matches.
+
+       If bCheckDB is False, we don't query the database, and exists and
+       parent_exists are always False. This allows files to be identified
+       on other threads.
        """
-    def __init__(self):
+    def __init__(self, bCheckDB=True):
         self._bSetExists = self._bParentExists = False
         self._sType = 'Unknown'
         self._sName = self._sParent = None
+        self._bCheckDB = bCheckDB
 
     def _clear_id_results(self):
         """Reset identifier state."""
@@ -58,6 +65,12 @@ class BaseIdXMLFile:
         """Process the ElementTree to identify the XML file type."""
         raise NotImplementedError("provide _identify_tree")
 
+    def _check_cs_exists(self, sName):
+        """Check if the card set exists, if database checks are enabled"""
+        if not self._bCheckDB:
+            return False
+        return check_cs_exists(sName)
+
     def can_parse(self):
         """Return True if this file can be parsed."""
         raise NotImplementedError("provide can_parse")
@@ -75,6 +88,10 @@ class BaseIdXMLFile:
             return
         self._identify_tree(oTree)
 
+    def parse_tree(self, oTree):
+        """Identify an already parsed ElementTree"""
+        self._identify_tree(oTree)
+
     def parse(self, fIn, _oDummyHolder=None):
         """Parse the file fIn into the ElementTree."""
         try:
@@ -11,8 +11,10 @@
 
 import zipfile
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from logging import Logger
+from xml.etree.ElementTree import ElementTree, fromstring, ParseError
 
 from sqlobject import sqlhub
 
@@ -20,8 +22,16 @@ from ..core.BaseTables import PhysicalCardSet, PHYSICAL_SET_LIST
 from ..core.BaseAdapters import IPhysicalCardSet
 from ..core.CardLookup import DEFAULT_LOOKUP
 from ..core.CardSetHolder import CachedCardSetHolder, CardSetWrapper
+from ..core.CardSetUtilities import (get_physical_card_counts,
+                                     get_physical_card_names)
 from ..core.DBUtility import refresh_tables
-from ..core.CardSetUtilities import check_cs_exists
+
+# Number of worker threads used to decompress and parse the zip file
+# entries when restoring
+RESTORE_WORKERS = 4
+
+# Number of card sets read from the database at a time when writing
+WRITE_PAGE_SIZE = 100
 
 
 def parse_string(oParser, sIn, oHolder):
@@ -34,6 +44,21 @@ def parse_string(oParser, sIn, oHolder):
     oParser.parse(oFile, oHolder)
 
 
+def _get_pages(aCSList):
+    """Split the list of card sets into lists of at most WRITE_PAGE_SIZE
+       card sets.
+
+       Slicing select results uses LIMIT and OFFSET, so only one page of
+       card sets is fetched from the database at a time."""
+    iStart = 0
+    while True:
+        aPage = list(aCSList[iStart:iStart + WRITE_PAGE_SIZE])
+        if not aPage:
+            break
+        yield aPage
+        iStart += WRITE_PAGE_SIZE
+
+
 def write_string(oWriter, oPCSet):
     """Utility function.
 
@@ -83,42 +108,116 @@ class BaseZipFileWrapper:
         self.oZip = None
 
     def _write_pcs_list_to_zip(self, aPCSList, oLogger):
-        """Write the given list of card sets to the zip file"""
+        """Write the given list of card sets to the zip file.
+
+           The card sets are read a page at a time, with the card counts
+           for each page grouped from the card set mapping table in a
+           single query, and each card set is streamed straight into its
+           zip entry, so memory use doesn't grow with the size of the
+           database."""
         bClose = False
         tTime = datetime.datetime.now().timetuple()
         if self.oZip is None:
             self._open_zip_for_write()
             bClose = True
         aList = []
-        for oPCSet in aPCSList:
-            sZName = oPCSet.name
-            # pylint: disable=not-callable
-            # subclasses will provide a callable cWriter
-            oWriter = self._cWriter()
-            # pylint: enable=not-callable
-            oString = write_string(oWriter, oPCSet)
-            sZName = sZName.replace(" ", "_")
-            sZName = sZName.replace("/", "_")
-            sZipName = '%s.xml' % sZName
-            sZipName = sZipName.encode('ascii', 'xmlcharrefreplace').decode('ascii')
-            aList.append(sZipName)
-            # ZipInfo will just use the 1st 6 fields in tTime
-            oInfoObj = zipfile.ZipInfo(sZipName, tTime)
-            # Set permissions on the created file - see issue 3394 on the
-            # python bugtracker. Docs say this is safe on all platforms
-            oInfoObj.external_attr = 0o600 << 16
-            oInfoObj.compress_type = zipfile.ZIP_DEFLATED
-            self.oZip.writestr(oInfoObj, oString)
-            oLogger.info('PCS: %s written', oPCSet.name)
+        for aPage in _get_pages(aPCSList):
+            dContents = get_physical_card_counts([x.id for x in aPage])
+            aCardIds = set()
+            for dCards in dContents.values():
+                aCardIds.update(dCards)
+            dNames = get_physical_card_names(aCardIds)
+            for oPCSet in aPage:
+                dCounts = {}
+                for iCardId, iCount in dContents.get(oPCSet.id, {}).items():
+                    tKey = dNames[iCardId]
+                    dCounts[tKey] = dCounts.get(tKey, 0) + iCount
+                sZName = oPCSet.name
+                # pylint: disable=not-callable
+                # subclasses will provide a callable cWriter
+                oWriter = self._cWriter()
+                # pylint: enable=not-callable
+                sZName = sZName.replace(" ", "_")
+                sZName = sZName.replace("/", "_")
+                sZipName = '%s.xml' % sZName
+                sZipName = sZipName.encode('ascii',
+                                           'xmlcharrefreplace').decode('ascii')
+                aList.append(sZipName)
+                # ZipInfo will just use the 1st 6 fields in tTime
+                oInfoObj = zipfile.ZipInfo(sZipName, tTime)
+                # Set permissions on the created file - see issue 3394 on the
+                # python bugtracker. Docs say this is safe on all platforms
+                oInfoObj.external_attr = 0o600 << 16
+                oInfoObj.compress_type = zipfile.ZIP_DEFLATED
+                with self.oZip.open(oInfoObj, 'w') as oEntry:
+                    oWriter.write_counts(oEntry, CardSetWrapper(oPCSet),
+                                         dCounts)
+                oLogger.info('PCS: %s written', oPCSet.name)
         if bClose:
             self._close_zip()
         return aList
 
+    def _parse_entry(self, oItem):
+        """Decompress and parse a single entry in the zip file.
+
+           Returns a (oItem, oIdParser, oHolder) tuple, where oHolder is
+           None if the entry isn't a card set we can read. The XML is only
+           parsed once, and we don't touch the database, so this is safe
+           to run on a worker thread."""
+        # pylint: disable=not-callable
+        # subclasses will provide a callable cIdentifyFile
+        oIdParser = self._cIdentifyFile(bCheckDB=False)
+        # pylint: enable=not-callable
+        oData = self.oZip.read(oItem.filename)
+        try:
+            oTree = ElementTree(fromstring(oData))
+        except ParseError:
+            # Not an XML file, so we skip it
+            return oItem, oIdParser, None
+        oIdParser.parse_tree(oTree)
+        if not oIdParser.can_parse():
+            return oItem, oIdParser, None
+        oHolder = CachedCardSetHolder()
+        oIdParser.get_parser().parse_tree(oTree, oHolder)
+        return oItem, oIdParser, oHolder
+
+    def _get_restore_order(self, aEntries):
+        """Order the parsed entries so parents are created before their
+           children.
+
+           Returns the list of entries to create, in order, and the list
+           of entries whose parents aren't in the zip file. Siblings are
+           kept in the zip file order."""
+        aOrder = []
+        dChildren = {}
+        for tEntry in aEntries:
+            _oItem, oIdParser, oHolder = tEntry
+            if oHolder is None:
+                continue
+            if self._check_forced_reparent(oIdParser):
+                oHolder.parent = 'My Collection'
+            if oHolder.parent is None:
+                aOrder.append(tEntry)
+            else:
+                dChildren.setdefault(oHolder.parent, []).append(tEntry)
+        # aOrder grows as we add the children of each entry
+        iPos = 0
+        while iPos < len(aOrder):
+            aOrder.extend(dChildren.pop(aOrder[iPos][2].name, []))
+            iPos += 1
+        aUnresolved = [tEntry for tEntry in aEntries
+                       if tEntry[2] is not None and
+                       tEntry[2].parent in dChildren]
+        return aOrder, aUnresolved
+
     def do_restore_from_zip(self, oCardLookup=DEFAULT_LOOKUP,
                             oLogHandler=None):
-        """Recover data from the zip file"""
+        """Recover data from the zip file.
+
+           The entries are decompressed and parsed on a pool of worker
+           threads, and the card sets are then created, parents first,
+           in a single transaction."""
         self._aWarnings = []
-        bTablesRefreshed = False
         self._bForceReparent = False
         self._open_zip_for_read()
         oLogger = Logger('Restore zip file')
@@ -126,82 +225,49 @@ class BaseZipFileWrapper:
             oLogger.addHandler(oLogHandler)
             if hasattr(oLogHandler, 'set_total'):
                 oLogHandler.set_total(len(self.oZip.infolist()))
+        try:
+            with ThreadPoolExecutor(RESTORE_WORKERS) as oPool:
+                aEntries = list(oPool.map(self._parse_entry,
+                                          self.oZip.infolist()))
+        finally:
+            self._close_zip()
         # We do this so we can accomodate user created zipfiles,
         # that don't nessecarily have the ordering we want
-        # pylint: disable=not-callable
-        # subclasses will provide a callable cIdentifyFile
-        oIdParser = self._cIdentifyFile()
-        # pylint: enable=not-callable
-        # check that the zip file contains at least 1 Physical Card Set
-        for oItem in self.oZip.infolist():
-            oData = self.oZip.read(oItem.filename)
-            oIdParser.parse_string(oData)
-            if not bTablesRefreshed and self._check_refresh(oIdParser):
-                # We delete the Physical Card Sets
-                # Since this is restoring the contents of a zip file,
-                # hopefully this is safe to do
-                # if we fail, the database will be in an inconsitent state,
-                # but that's going to be true anyway
-                refresh_tables(PHYSICAL_SET_LIST, sqlhub.processConnection)
-                bTablesRefreshed = True
+        bRefresh = False
+        for _oItem, oIdParser, _oHolder in aEntries:
+            if self._check_refresh(oIdParser):
+                bRefresh = True
             if self._should_force_reparent(oIdParser):
                 self._bForceReparent = True
-        if not bTablesRefreshed:
+        # check that the zip file contains at least 1 Physical Card Set
+        if not bRefresh:
             raise IOError("No valid card sets found in the zip file.")
-        # We try and restore the card sets ensuring parents exist
+        # We delete the Physical Card Sets
+        # Since this is restoring the contents of a zip file,
+        # hopefully this is safe to do
+        # if we fail, the database will be in an inconsitent state,
+        # but that's going to be true anyway
+        refresh_tables(PHYSICAL_SET_LIST, sqlhub.processConnection)
+        aOrder, aUnresolved = self._get_restore_order(aEntries)
         dLookupCache = {}
-        aToRead = self.oZip.infolist()
-        while aToRead:
-            aToRead = self.read_items(aToRead, oCardLookup, oLogger,
-                                      dLookupCache)
-        self._close_zip()
-
-    def read_items(self, aList, oCardLookup, oLogger, dLookupCache):
-        """Read a list of CardSet items from the card list, reaturning
-           a list of those that couldn't be read because their parents
-           weren't read first"""
-        aToRead = []
-        # pylint: disable=not-callable
-        # subclasses will provide a callable cIdentifyFile
-        oIdParser = self._cIdentifyFile()
-        # pylint: enable=not-callable
         oOldConn = sqlhub.processConnection
         oTrans = oOldConn.transaction()
         sqlhub.processConnection = oTrans
-        for oItem in aList:
-            bReparent = False
-            oData = self.oZip.read(oItem.filename)
-            oIdParser.parse_string(oData)
-            if not oIdParser.can_parse():
-                # Unreadable item, so skip it
-                continue
-            # We check whether the parent has been read already
-            if not oIdParser.parent_exists:
-                aToRead.append(oItem)
-                continue
-            if self._check_forced_reparent(oIdParser):
-                # We need to reparent this card set
-                if check_cs_exists('My Collection'):
-                    bReparent = True
-                else:
-                    # Card Collection not there yet, so delay
-                    aToRead.append(oItem)
-                    continue
-            oParser = oIdParser.get_parser()
-            oHolder = CachedCardSetHolder()
-            parse_string(oParser, oData, oHolder)
-            if bReparent:
-                oHolder.parent = 'My Collection'
-            oHolder.create_pcs(oCardLookup, dLookupCache)
-            self._aWarnings.extend(oHolder.get_warnings())
-            oLogger.info('%s %s read', oIdParser.type, oItem.filename)
-        oTrans.commit(close=True)
-        sqlhub.processConnection = oOldConn
-        if len(aToRead) == len(aList):
-            # We were unable to read any items this loop, so we fail
+        try:
+            for oItem, oIdParser, oHolder in aOrder:
+                oHolder.create_pcs(oCardLookup, dLookupCache)
+                self._aWarnings.extend(oHolder.get_warnings())
+                oLogger.info('%s %s read', oIdParser.type, oItem.filename)
+        except Exception:
+            oTrans.rollback()
+            raise
+        else:
+            oTrans.commit(close=True)
+        finally:
+            sqlhub.processConnection = oOldConn
+        if aUnresolved:
             raise IOError('Card sets with unstatisfiable parents %s' %
-                          ','.join([x.filename for x in aToRead]))
-        return aToRead
+                          ','.join([x[0].filename for x in aUnresolved]))
 
     # Helper methods for influencing how the zip files are handled
     # subclasses should override these
@@ -221,7 +287,8 @@ class BaseZipFileWrapper:
 
     def do_dump_all_to_zip(self, oLogHandler=None):
         """Dump all the database contents to the zip file"""
-        aPhysicalCardSets = PhysicalCardSet.select()
+        # Order by id, so the pages are consistent
+        aPhysicalCardSets = PhysicalCardSet.select(orderBy='id')
         return self.do_dump_list_to_zip(aPhysicalCardSets, oLogHandler)
 
     def do_dump_list_to_zip(self, aCSList, oLogHandler=None):
@@ -269,17 +336,8 @@ class BaseZipFileWrapper:
     def read_single_card_set(self, sFilename):
         """Read a single card set into a card set holder."""
         self._open_zip_for_read()
-        # pylint: disable=not-callable
-        # subclasses will provide a callable cIdentifyFile
-        oIdParser = self._cIdentifyFile()
-        # pylint: enable=not-callable
-        oData = self.oZip.read(sFilename)
-        oIdParser.parse_string(oData)
-        oHolder = None
-        if oIdParser.can_parse():
-            oHolder = CachedCardSetHolder()
-            oParser = oIdParser.get_parser()
-            parse_string(oParser, oData, oHolder)
+        _oItem, _oIdParser, oHolder = self._parse_entry(
+            self.oZip.getinfo(sFilename))
         self._close_zip()
         return oHolder
 
@@ -21,7 +21,7 @@ except ImportError:
 from sqlobject import sqlhub
 
 from ..Utility import pretty_xml, norm_xml_quotes
-from ..core.DBUtility import flush_cache
+from ..core.DBUtility import flush_cache, mark_database_changed
 
 
 class CardSetParser:
@@ -88,9 +88,14 @@ class BaseXMLParser:
     def parse(self, fIn, oHolder):
         """Read the XML tree from the file-like object fIn"""
         try:
-            self._oTree = parse(fIn)
+            oTree = parse(fIn)
         except ParseError as oExp:
             raise IOError('Not an XML file: %s' % oExp)
+        self.parse_tree(oTree, oHolder)
+
+    def parse_tree(self, oTree, oHolder):
+        """Fill the card set holder from an already parsed ElementTree"""
+        self._oTree = oTree
         self._convert_tree(oHolder)
 
 
@@ -165,6 +170,8 @@ def safe_parser(oFile, oParser):
     try:
         fIn = oFile.open()
         oParser.parse(fIn)
+        # Parsers may update existing rows, so let cache files know
+        mark_database_changed()
         sqlhub.processConnection.commit(close=True)
     finally:
         # We use the fIn check so we don't swallow any exceptions raised
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Download many files concurrently, reusing HTTP connections and
+   resuming partial downloads."""
+
+import base64
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import glob
+import hashlib
+import http.client
+import logging
+import os
+import socket
+import threading
+from urllib.parse import urlsplit, urljoin, unquote
+from urllib.request import getproxies, proxy_bypass
+
+from ..Utility import ensure_dir_exists
+
+# Number of downloads to run at once
+DEFAULT_WORKERS = 4
+
+# Size of the chunks we read from the connection
+CHUNK_SIZE = 64 * 1024
+
+# HTTP errors which mean retrying the url later is pointless
+PERMANENT_FAILURES = (404, 410)
+
+# Redirects we follow before giving up on a url
+MAX_REDIRECTS = 5
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class DownloadError(Exception):
+    """Raised when a url can't be downloaded"""
+
+    def __init__(self, sUrl, sReason, iStatus=None):
+        super(DownloadError, self).__init__('%s: %s' % (sUrl, sReason))
+        self.sUrl = sUrl
+        self.iStatus = iStatus
+
+
+class DownloadResult:
+    """The result of a single download job.
+
+       sUrl is the url the file was downloaded from, or None if no url
+       succeeded. dFailed maps the urls that failed to the reason, and
+       aPermanent is the set of failed urls which the server reports
+       don't exist, so there's no point in retrying them."""
+    # pylint: disable=too-few-public-methods
+    # Simple data holder
+
+    def __init__(self, sFileName):
+        self.sFileName = sFileName
+        self.sUrl = None
+        self.dFailed = {}
+        self.aPermanent = set()
+
+    def __repr__(self):
+        return 'DownloadResult(%r, %r, %r)' % (self.sFileName, self.sUrl,
+                                               self.dFailed)
+
+
+def get_part_file(sFileName, sUrl):
+    """Name of the partial download file for sFileName from sUrl.
+
+       The url is included, so we never resume a download with data from
+       a different source."""
+    sHash = hashlib.sha1(sUrl.encode('utf-8')).hexdigest()[:10]
+    return '%s.%s.part' % (sFileName, sHash)
+
+
+def _remove_part_files(sFileName):
+    """Remove any left over partial downloads for sFileName"""
+    for sPartFile in glob.glob(glob.escape(sFileName) + '.*.part'):
+        try:
+            os.remove(sPartFile)
+        except OSError:
+            pass
+
+
+def _check_range(oResp, iStart):
+    """Check the partial content response starts where we asked"""
+    sRange = oResp.getheader('Content-Range', '')
+    try:
+        sUnit, sRest = sRange.split(' ', 1)
+        iFirst = int(sRest.split('-', 1)[0])
+    except ValueError:
+        return False
+    return iStart > 0 and sUnit == 'bytes' and iFirst == iStart
+
+
+def _get_proxy_headers(oProxy):
+    """Return the headers needed to authenticate with the proxy"""
+    if oProxy.username is None:
+        return {}
+    sAuth = '%s:%s' % (unquote(oProxy.username),
+                       unquote(oProxy.password or ''))
+    return {'Proxy-Authorization': 'Basic %s' % base64.b64encode(
+        sAuth.encode('utf-8')).decode('ascii')}
+
+
+class ImageDownloadManager:
+    """Download a list of jobs with a bounded pool of worker threads.
+
+       Each job is a (list of urls, filename) pair. The urls are tried in
+       order, and the first url that succeeds is used.
+
+       Each worker thread keeps a persistent connection for every host it
+       talks to, so a large batch of downloads from the same site doesn't
+       pay for a new connection per file. The user's proxy settings, as
+       returned by urllib's getproxies, are honoured, with https
+       connections tunnelled through the proxy. Data is written to a
+       '.part' file alongside the destination, and an interrupted
+       download is resumed with a Range request the next time the file
+       is fetched.
+
+       Progress is reported on oLogger (one record per finished job) from
+       the thread calling download, so it's safe to use with the gui
+       progress dialog handlers."""
+
+    def __init__(self, iWorkers=DEFAULT_WORKERS, dHeaders=None):
+        self._iWorkers = max(1, iWorkers)
+        self._dHeaders = dict(dHeaders or {})
+        self._dProxies = getproxies()
+        self._oLocal = threading.local()
+        self._oLock = threading.Lock()
+        self._aConnections = []
+
+    def _get_proxy(self, sScheme, sHost):
+        """Return the split proxy url to use for the host, or None to
+           connect directly."""
+        sProxy = self._dProxies.get(sScheme)
+        if not sProxy or proxy_bypass(sHost):
+            return None
+        if '://' not in sProxy:
+            # Follow urllib in assuming a bare host:port is http
+            sProxy = 'http://' + sProxy
+        return urlsplit(sProxy)
+
+    def _get_connection(self, sScheme, sHost, iPort):
+        """Return the (connection, proxy) pair for the host for the
+           current thread, creating the connection if needed."""
+        dConns = getattr(self._oLocal, 'dConns', None)
+        if dConns is None:
+            dConns = self._oLocal.dConns = {}
+        tKey = (sScheme, sHost, iPort)
+        tConn = dConns.get(tKey)
+        if tConn is None:
+            # The global timeout is set from the config
+            fTimeout = socket.getdefaulttimeout()
+            if sScheme == 'https':
+                cConn = http.client.HTTPSConnection
+            else:
+                cConn = http.client.HTTPConnection
+            oProxy = self._get_proxy(sScheme, sHost)
+            if oProxy is None:
+                oConn = cConn(sHost, iPort, timeout=fTimeout)
+            else:
+                iProxyPort = oProxy.port
+                if iProxyPort is None:
+                    iProxyPort = 443 if oProxy.scheme == 'https' else 80
+                oConn = cConn(oProxy.hostname, iProxyPort, timeout=fTimeout)
+                if sScheme == 'https':
+                    oConn.set_tunnel(sHost, iPort,
+                                     headers=_get_proxy_headers(oProxy))
+            tConn = dConns[tKey] = (oConn, oProxy)
+            with self._oLock:
+                self._aConnections.append(oConn)
+        return tConn
+
+    def _drop_connection(self, sScheme, sHost, iPort):
+        """Close the current thread's connection to the host, so the next
+           request reconnects."""
+        tConn = self._oLocal.dConns.pop((sScheme, sHost, iPort), None)
+        if tConn is not None:
+            tConn[0].close()
+
+    def _drop_thread_connections(self):
+        """Close all the current thread's connections, after an error
+           that may have left a response half read."""
+        dConns = getattr(self._oLocal, 'dConns', {})
+        for oConn, _oProxy in dConns.values():
+            oConn.close()
+        dConns.clear()
+
+    def close(self):
+        """Close all the open connections."""
+        with self._oLock:
+            for oConn in self._aConnections:
+                oConn.close()
+            self._aConnections = []
+
+    def _request(self, sUrl, dHeaders):
+        """Send a GET request for sUrl and return the response.
+
+           A request on a reused connection that the server has closed is
+           retried once on a new connection."""
+        oSplit = urlsplit(sUrl)
+        if oSplit.scheme not in ('http', 'https') or not oSplit.hostname:
+            raise DownloadError(sUrl, 'Unsupported url')
+        iPort = oSplit.port
+        if iPort is None:
+            iPort = 443 if oSplit.scheme == 'https' else 80
+        sPath = oSplit.path or '/'
+        if oSplit.query:
+            sPath += '?' + oSplit.query
+        tHost = (oSplit.scheme, oSplit.hostname, iPort)
+        bRetry = True
+        while True:
+            oConn, oProxy = self._get_connection(*tHost)
+            dReqHeaders = dHeaders
+            if oProxy is not None and oSplit.scheme == 'http':
+                # Plain http proxies want the full url
+                sPath = oSplit._replace(fragment='').geturl()
+                dReqHeaders = dict(dHeaders)
+                dReqHeaders.update(_get_proxy_headers(oProxy))
+            try:
+                oConn.request('GET', sPath, headers=dReqHeaders)
+                return oConn.getresponse()
+            except (http.client.RemoteDisconnected,
+                    http.client.BadStatusLine, ConnectionError):
+                # The server may have closed the kept alive connection
+                self._drop_connection(*tHost)
+                if not bRetry:
+                    raise
+                bRetry = False
+            except (OSError, http.client.HTTPException):
+                self._drop_connection(*tHost)
+                raise
+
+    def _fetch_url(self, sUrl, sFileName):
+        """Download sUrl to sFileName, resuming a partial download if
+           there is one."""
+        sPartFile = get_part_file(sFileName, sUrl)
+        sCurUrl = sUrl
+        iRedirects = 0
+        while True:
+            iHave = 0
+            if os.path.exists(sPartFile):
+                iHave = os.path.getsize(sPartFile)
+            dHeaders = dict(self._dHeaders)
+            if iHave:
+                dHeaders['Range'] = 'bytes=%d-' % iHave
+            oResp = self._request(sCurUrl, dHeaders)
+            iStatus = oResp.status
+            bRangeOK = iStatus == 206 and _check_range(oResp, iHave)
+            if bRangeOK:
+                self._save_response(oResp, sPartFile, 'ab')
+            elif iStatus == 200:
+                self._save_response(oResp, sPartFile, 'wb')
+            else:
+                # Finish reading the response, so the connection can be
+                # reused
+                oResp.read()
+            if iStatus in REDIRECT_CODES:
+                sLocation = oResp.getheader('Location')
+                iRedirects += 1
+                if not sLocation:
+                    raise DownloadError(sUrl, 'Bad redirect', iStatus)
+                if iRedirects > MAX_REDIRECTS:
+                    raise DownloadError(sUrl, 'Too many redirects', iStatus)
+                sCurUrl = urljoin(sCurUrl, sLocation)
+                continue
+            if iStatus == 416 and iHave:
+                # Our partial file doesn't match the server, so start over
+                os.remove(sPartFile)
+                continue
+            if iStatus == 206 and not bRangeOK:
+                if not iHave:
+                    raise DownloadError(sUrl, 'Unexpected partial content',
+                                        iStatus)
+                # The range doesn't match our partial file, so start over
+                os.remove(sPartFile)
+                continue
+            if iStatus not in (200, 206):
+                raise DownloadError(sUrl, 'HTTP error %d' % iStatus,
+                                    iStatus)
+            break
+        if os.path.getsize(sPartFile) == 0:
+            os.remove(sPartFile)
+            raise DownloadError(sUrl, 'No data')
+        os.replace(sPartFile, sFileName)
+
+    def _save_response(self, oResp, sPartFile, sMode):
+        """Write the response body to the partial file.
+
+           Anything written before an error is kept, so the download can
+           be resumed later."""
+        ensure_dir_exists(os.path.dirname(sPartFile))
+        with open(sPartFile, sMode) as oOutFile:
+            while True:
+                sData = oResp.read(CHUNK_SIZE)
+                if not sData:
+                    break
+                oOutFile.write(sData)
+
+    def _run_job(self, aUrls, sFileName):
+        """Try each of the urls in turn for sFileName"""
+        oResult = DownloadResult(sFileName)
+        for sUrl in aUrls:
+            try:
+                self._fetch_url(sUrl, sFileName)
+            except DownloadError as oErr:
+                oResult.dFailed[sUrl] = str(oErr)
+                if oErr.iStatus in PERMANENT_FAILURES:
+                    oResult.aPermanent.add(sUrl)
+                    logging.info('%s not found', sUrl)
+                else:
+                    logging.warning('Failed to download %s', oErr)
+                continue
+            except (OSError, http.client.HTTPException) as oErr:
+                self._drop_thread_connections()
+                oResult.dFailed[sUrl] = str(oErr)
+                logging.warning('Failed to download %s: %s', sUrl, oErr)
+                continue
+            logging.info('Using image data from %s', sUrl)
+            oResult.sUrl = sUrl
+            _remove_part_files(sFileName)
+            break
+        return oResult
+
+    def download(self, aJobs, oLogger=None):
+        """Download all the jobs, returning a list of DownloadResults in
+           the same order as aJobs."""
+        aResults = [None] * len(aJobs)
+        try:
+            with ThreadPoolExecutor(max_workers=self._iWorkers) as oPool:
+                dFutures = {}
+                for iPos, (aUrls, sFileName) in enumerate(aJobs):
+                    oFuture = oPool.submit(self._run_job, aUrls, sFileName)
+                    dFutures[oFuture] = iPos
+                for oFuture in as_completed(dFutures):
+                    aResults[dFutures[oFuture]] = oFuture.result()
+                    if oLogger:
+                        oLogger.info('image download attempted')
+        finally:
+            self.close()
+        return aResults
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Keep a manifest of the files in the card image directory, so we can
+   check for missing images without testing each file individually."""
+
+import json
+import logging
+import os
+import time
+
+# Increase this if the manifest format changes
+MANIFEST_VERSION = 1
+
+# Directories modified this close to when they were listed may have
+# changed within the timestamp resolution, so we list them again
+RACY_WINDOW_NS = 2 * 10**9
+
+
+class ImageManifest:
+    """Manifest of (size, modification time) for every file below the
+       root directory.
+
+       Each directory's listing is cached along with the directory's
+       modification time. Adding, removing or renaming a file updates
+       the directory's modification time, so unchanged directories
+       are not listed again when rescanning.
+
+       Overwriting a file in place doesn't change the directory, so code
+       that does this should call invalidate for the file."""
+
+    def __init__(self, sRoot):
+        self.sRoot = sRoot
+        # relative dir path : [dir mtime ns, {name : [size, mtime]},
+        #                      sub-directories, time listed ns]
+        self._dDirs = {}
+        self._dFiles = None
+        self.bDirty = False
+
+    def scan(self):
+        """Update the manifest from the filesystem.
+
+           Returns the number of directories that were listed."""
+        dDirs = {}
+        iListed = self._scan_dir('', dDirs)
+        # Drop directories that no longer exist
+        if set(dDirs) != set(self._dDirs):
+            self.bDirty = True
+        self._dDirs = dDirs
+        if iListed:
+            self.bDirty = True
+        self._dFiles = None
+        return iListed
+
+    def _scan_dir(self, sRelDir, dDirs):
+        """Scan the directory, and recurse into the sub-directories"""
+        sDir = os.path.join(self.sRoot, sRelDir)
+        try:
+            iDirTime = os.stat(sDir).st_mtime_ns
+        except OSError:
+            return 0
+        iListed = 0
+        aCached = self._dDirs.get(sRelDir)
+        if (aCached is not None and aCached[0] == iDirTime and
+                iDirTime < aCached[3] - RACY_WINDOW_NS):
+            dEntries, aSubDirs, iListTime = aCached[1:]
+        else:
+            iListTime = time.time_ns()
+            dEntries = {}
+            aSubDirs = []
+            try:
+                with os.scandir(sDir) as oIter:
+                    for oEntry in oIter:
+                        try:
+                            if oEntry.is_dir():
+                                aSubDirs.append(oEntry.name)
+                            elif oEntry.is_file():
+                                oStat = oEntry.stat()
+                                dEntries[oEntry.name] = [oStat.st_size,
+                                                         oStat.st_mtime]
+                        except OSError:
+                            # File removed while we were scanning
+                            continue
+            except OSError as oErr:
+                logging.warning('Unable to list %s: %s', sDir, oErr)
+                return 0
+            iListed = 1
+        dDirs[sRelDir] = [iDirTime, dEntries, sorted(aSubDirs), iListTime]
+        for sSubDir in aSubDirs:
+            iListed += self._scan_dir(os.path.join(sRelDir, sSubDir), dDirs)
+        return iListed
+
+    def invalidate(self, sFileName=None):
+        """Force the directory containing sFileName to be listed again
+           on the next scan. If sFileName is None, everything is listed
+           again."""
+        if sFileName is None:
+            self._dDirs = {}
+        else:
+            sRelDir = os.path.relpath(os.path.dirname(sFileName),
+                                      self.sRoot)
+            if sRelDir == os.curdir:
+                sRelDir = ''
+            self._dDirs.pop(sRelDir, None)
+        self._dFiles = None
+        self.bDirty = True
+
+    def get_files(self):
+        """Return a dictionary of full path : (size, mtime) for all the
+           files in the manifest."""
+        if self._dFiles is None:
+            self._dFiles = {}
+            for sRelDir, aCached in self._dDirs.items():
+                dEntries = aCached[1]
+                sDir = os.path.join(self.sRoot, sRelDir)
+                for sName, (iSize, fMTime) in dEntries.items():
+                    self._dFiles[os.path.join(sDir, sName)] = (iSize, fMTime)
+        return self._dFiles
+
+    def get_file_info(self, sFileName):
+        """Return the (size, mtime) for the file, or None if it isn't in
+           the manifest."""
+        return self.get_files().get(sFileName)
+
+    def save(self, sFileName):
+        """Save the manifest to a file."""
+        dData = {
+            'version': MANIFEST_VERSION,
+            'root': self.sRoot,
+            'dirs': self._dDirs,
+        }
+        try:
+            with open(sFileName, 'w') as oFile:
+                json.dump(dData, oFile)
+            self.bDirty = False
+        except (OSError, TypeError, ValueError) as oErr:
+            logging.warning('Unable to save image manifest %s: %s',
+                            sFileName, oErr)
+
+    def load(self, sFileName):
+        """Load a manifest saved by save, if it is for the same root
+           directory. Returns True if it was loaded."""
+        try:
+            with open(sFileName, 'r') as oFile:
+                dData = json.load(oFile)
+        except (OSError, ValueError) as oErr:
+            logging.info('Unable to load image manifest %s: %s',
+                         sFileName, oErr)
+            return False
+        if (not isinstance(dData, dict) or
+                dData.get('version') != MANIFEST_VERSION or
+                dData.get('root') != self.sRoot):
+            return False
+        self._dDirs = dData['dirs']
+        self._dFiles = None
+        self.bDirty = False
+        return True
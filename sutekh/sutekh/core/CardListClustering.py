@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2006 Simon Cross <hodgestar@gmail.com>
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""K-means clustering of tables created by CardListTabulator.
+
+   If NumPy is available, the distances from every card to every centroid
+   are calculated as a single array operation for each iteration.
+   Otherwise we fall back to the pure python implementation using Vector.
+   """
+
+import random
+import math
+
+# pylint: disable=import-error
+# numpy is optional, so pylint may not find it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+# pylint: enable=import-error
+
+
+EUCLIDEAN = 'Euclidean Distance'
+SUTEKH = 'Sutekh Distance'
+
+
+class Vector:
+    """Really simple class representing a row of card table data."""
+
+    METRICS = {}
+
+    def __init__(self, aData):
+        self._aData = aData
+
+    # We do want to access _aData on other Vectors.
+    # pylint: disable=protected-access
+
+    def euclidian_distance(self, oVec2):
+        """Euclidean distance between two vectors."""
+        assert len(self._aData) == len(oVec2._aData)
+        fSum = sum(((x - y) ** 2 for (x, y) in zip(self._aData, oVec2._aData)))
+        return math.sqrt(fSum)
+
+    METRICS[EUCLIDEAN] = euclidian_distance
+
+    def sutekh_distance(self, oVec2):
+        """Like Euclidean distance, but -1 is distance 0.25 to anything
+           (including 0 and -1) and 0 is distance 4.0 from anything other
+           than 0.
+           """
+        assert len(self._aData) == len(oVec2._aData)
+        fSum = sum((
+            ((x == -1 or y == -1) and 0.25) or
+            (((x == 0) ^ (y == 0) and 4.0)) or
+            (x - y) ** 2 for (x, y) in zip(self._aData, oVec2._aData)
+        ))
+        return math.sqrt(fSum)
+
+    METRICS[SUTEKH] = sutekh_distance
+
+    # Other possibile metrics:
+    #  'City Block Distance',
+    #  'Correlation',
+    #  'Absolute Value of the Correlation',
+    #  'Uncentered Correlation',
+    #  'Absolute Value of the Uncentered Correlation',
+    #  "Spearman's Rank Correlation"
+    #  "Kendall's Tau"
+
+    def __add__(self, oOther):
+        """Sum this vector with another."""
+        if oOther == 0:
+            return self
+        assert len(self._aData) == len(oOther._aData)
+        return Vector([x + y for (x, y) in zip(self._aData, oOther._aData)])
+
+    def __radd__(self, oOther):
+        """Sum this vector with another."""
+        if oOther == 0:
+            return self
+        assert len(self._aData) == len(oOther._aData)
+        return Vector([x + y for (x, y) in zip(self._aData, oOther._aData)])
+
+    def __mul__(self, fScale):
+        """Multiply this vector by a scalar."""
+        fScale = float(fScale)
+        return Vector([x * fScale for x in self._aData])
+
+    def __rmul__(self, fScale):
+        """Multiply this vector by a scalar."""
+        fScale = float(fScale)
+        return Vector([x * fScale for x in self._aData])
+
+    def __len__(self):
+        """Length of this vector."""
+        return len(self._aData)
+
+    def __str__(self):
+        """String representation of this vector."""
+        return str(self._aData)
+
+    def __iter__(self):
+        """Iterator."""
+        return iter(self._aData)
+
+
+def _euclidean_sq_array(aTable, aMean):
+    """Squared Euclidean distance from every row of aTable to aMean."""
+    aDiff = aTable - aMean
+    return numpy.einsum('ij,ij->i', aDiff, aDiff)
+
+
+def _sutekh_sq_array(aTable, aMean):
+    """Squared Sutekh distance from every row of aTable to aMean.
+
+       This applies the same rules as Vector.sutekh_distance to every
+       element at once."""
+    aTerms = numpy.where(
+        (aTable == -1) | (aMean == -1), 0.25,
+        numpy.where((aTable == 0) ^ (aMean == 0), 4.0,
+                    (aTable - aMean) ** 2))
+    return aTerms.sum(axis=1)
+
+
+ARRAY_METRICS = {
+    EUCLIDEAN: _euclidean_sq_array,
+    SUTEKH: _sutekh_sq_array,
+}
+
+
+def _array_distances(aTable, aMeans, fSqDist):
+    """Return a (cards x clusters) array of squared distances.
+
+       We loop over the clusters, since there are few of them, and
+       handle all the cards at once for each, which keeps memory use
+       proportional to the size of the table."""
+    aDists = numpy.empty((aTable.shape[0], len(aMeans)))
+    for iClust, aMean in enumerate(aMeans):
+        aDists[:, iClust] = fSqDist(aTable, aMean)
+    return aDists
+
+
+def k_means_plus_plus(aCards, iNumClust, fDist):
+    """Find a set of initial centers using the k-means++ algorithm.
+
+       See http://www.stanford.edu/~darthur/kMeansPlusPlus.pdf.
+       """
+    aMeans = [random.choice(aCards)]
+
+    while len(aMeans) < iNumClust:
+        aDists = []
+        for oVec in aCards:
+            fMinD = min((fDist(oVec, oMean) for oMean in aMeans)) ** 2
+            aDists.append(fMinD)
+
+        fSumSq = sum(aDists)
+        fPick = random.uniform(0, fSumSq)
+
+        for iCard, fMinD in enumerate(aDists):
+            fPick -= fMinD
+            if fPick <= 0:
+                break
+
+        # iCard is defined because k_means doesn't call
+        # this unless aCards is non-empty
+        # pylint: disable=undefined-loop-variable
+
+        if iCard == len(aCards):
+            # guard against slight possibility of being very close
+            # to end of fSumSq.
+            iCard -= 1
+
+        aMeans.append(aCards[iCard])
+
+    return aMeans
+
+
+def _array_k_means_plus_plus(aTable, iNumClust, fSqDist):
+    """Array version of k_means_plus_plus.
+
+       This draws from random in the same way as k_means_plus_plus, so
+       a given seed picks the same initial centers."""
+    iCards = aTable.shape[0]
+    aChosen = [random.choice(range(iCards))]
+    aMinDists = fSqDist(aTable, aTable[aChosen[0]])
+
+    while len(aChosen) < iNumClust:
+        aCumulative = numpy.cumsum(aMinDists)
+        fPick = random.uniform(0, aCumulative[-1])
+        iCard = min(int(numpy.searchsorted(aCumulative, fPick)), iCards - 1)
+        aChosen.append(iCard)
+        aMinDists = numpy.minimum(aMinDists, fSqDist(aTable, aTable[iCard]))
+
+    return aTable[aChosen].copy()
+
+
+def _array_k_means(aCards, iNumClust, iIterations, sMetric):
+    """Lloyd's algorithm using NumPy arrays."""
+    aTable = numpy.asarray(aCards, dtype=float)
+    fSqDist = ARRAY_METRICS[sMetric]
+    aMeans = _array_k_means_plus_plus(aTable, iNumClust, fSqDist)
+    aAssigned = None
+
+    for _iIter in range(iIterations):
+        aNewAssigned = numpy.argmin(
+            _array_distances(aTable, aMeans, fSqDist), axis=1)
+        if aAssigned is not None and numpy.array_equal(aAssigned,
+                                                        aNewAssigned):
+            # Converged, so further iterations won't change anything
+            break
+        aAssigned = aNewAssigned
+        aCounts = numpy.bincount(aAssigned, minlength=iNumClust)
+        aSums = numpy.zeros_like(aMeans)
+        numpy.add.at(aSums, aAssigned, aTable)
+        aFilled = aCounts > 0
+        # empty clusters keep their previous centre
+        aMeans[aFilled] = aSums[aFilled] / aCounts[aFilled][:, None]
+
+    aClusters = [[] for _iClust in range(iNumClust)]
+    for iCard, iClust in enumerate(aAssigned.tolist()):
+        aClusters[iClust].append(iCard)
+    return [Vector(x) for x in aMeans.tolist()], aClusters
+
+
+def _vector_k_means(aCards, iNumClust, iIterations, sMetric):
+    """Lloyd's algorithm using the pure python Vector class."""
+    fDist = Vector.METRICS[sMetric]
+    aCards = [Vector(x) for x in aCards]
+    aMeans = k_means_plus_plus(aCards, iNumClust, fDist)
+    iCards = len(aCards)
+    aLastClusters = None
+
+    for _iIter in range(iIterations):
+        # empty clusters
+        aClusters = []
+        for iClust in range(iNumClust):
+            aClusters.append([])
+
+        # calculate membership in clusters
+        for iCard in range(iCards):
+            oVec = aCards[iCard]
+            # pylint: disable=cell-var-from-loop
+            # Since we use key immediately, this warning isn't
+            # an issue
+            iVmin = min(range(iNumClust),
+                        key=lambda iV: fDist(oVec, aMeans[iV]))
+            # pylint: enable=cell-var-from-loop
+            aClusters[iVmin].append(iCard)
+
+        if aClusters == aLastClusters:
+            # Converged, so further iterations won't change anything
+            break
+        aLastClusters = aClusters
+
+        # recompute the centroids
+        for iClust in range(iNumClust):
+            if aClusters[iClust]:
+                aMeans[iClust] = (1.0 / len(aClusters[iClust])) * sum(
+                    (aCards[x] for x in aClusters[iClust])
+                )
+
+    return aMeans, aClusters
+
+
+def k_means(aCards, iNumClust, iIterations, sMetric=EUCLIDEAN,
+            bUseNumpy=True):
+    """Perform k-means clustering on a table of cards using Lloyd's
+       algorithm.
+
+       aCards is the table from CardListTabulator.tabulate (or a NumPy
+       array from CardListTabulator.tabulate_array) and sMetric is one
+       of the keys of Vector.METRICS. Iteration stops early if the
+       cluster membership doesn't change.
+
+       Returns a list of the cluster centers and a list of clusters,
+       each of which is a list of indexes into aCards."""
+    if len(aCards) == 0 or len(aCards[0]) == 0:
+        # empty card set or zero-length vectors
+        return [], []
+    if bUseNumpy and numpy is not None:
+        return _array_k_means(aCards, iNumClust, iIterations, sMetric)
+    return _vector_k_means(aCards, iNumClust, iIterations, sMetric)
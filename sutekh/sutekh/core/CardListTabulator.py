@@ -3,11 +3,186 @@
 # Copyright 2006 Simon Cross <hodgestar@gmail.com>
 # GPL - see COPYING for details
 
-"""Create a table (as a list of list) from a list of cards"""
+"""Create a table (as a list of list) from a list of cards.
 
-from sutekh.base.core.BaseTables import Rarity, Expansion, CardType
+   The default properties are also available as a columnar table for the
+   whole card list, built once from the card table and the cached joins,
+   which can be sliced to give the table for any list of cards."""
+
+from sqlobject.sqlbuilder import Table, Select, func
+
+# pylint: disable=import-error
+# numpy is optional, so pylint may not find it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+# pylint: enable=import-error
+
+from sutekh.base.core.BaseTables import (Rarity, Expansion, CardType,
+                                         RarityPair, AbstractCard,
+                                         PhysicalCard)
 from sutekh.base.core.BaseAdapters import IAbstractCard
-from sutekh.core.SutekhTables import Discipline, Clan
+from sutekh.base.core.CachedRelatedJoin import get_cached_join
+from sutekh.base.core.DBUtility import get_cardlist_key
+from sutekh.core.SutekhTables import (Discipline, Clan, DisciplinePair,
+                                      SutekhAbstractCard)
+
+# The columnar table for the current card list
+_oCardTable = None
+
+
+class CardTable:
+    """Columnar table of the default card properties (see
+       CardListTabulator.get_default_prop_funcs) for every card in the
+       card list.
+
+       Each column is stored sparsely as a dictionary of abstract card
+       id : value, containing only the non-zero values. If NumPy is
+       available, we also keep a dense (cards x columns) array, so
+       tables for a list of cards are a single indexing operation."""
+
+    def __init__(self, tKey=None):
+        self.tKey = tKey
+        self.aColNames = []
+        self._dColumns = {}
+        self._dColPos = {}
+        self._dRows = {}
+        self._aData = None
+        self._build()
+
+    def _add_column(self, sName, dValues):
+        """Add a column, dropping the zero values"""
+        if sName not in self._dColumns:
+            self.aColNames.append(sName)
+        self._dColumns[sName] = dict((iId, iVal) for iId, iVal in
+                                     dValues.items() if iVal)
+
+    def _add_join_columns(self, sPrefix, dIdMap, dNames, dMapIds=None):
+        """Add a boolean column for each of the objects in dNames (id :
+           name), from the join id map.
+
+           dMapIds maps the ids in the join to the ids in dNames, for
+           joins to pair tables."""
+        dValues = dict((iId, {}) for iId in dNames)
+        for iCardId, tOtherIds in dIdMap.items():
+            for iOtherId in tOtherIds:
+                if dMapIds is not None:
+                    iOtherId = dMapIds.get(iOtherId)
+                if iOtherId in dValues:
+                    dValues[iOtherId][iCardId] = 1
+        for iId, sName in dNames.items():
+            self._add_column(sPrefix + sName, dValues[iId])
+
+    def _build(self):
+        """Fill the table from the database"""
+        # pylint: disable=protected-access, too-many-locals, not-an-iterable
+        # We need to access _connection here
+        # We use lots of local variables for clarity
+        # SQLObject confuses pylint
+        oConn = AbstractCard._connection
+        oCards = Table(SutekhAbstractCard.sqlmeta.table)
+        dCols = SutekhAbstractCard.sqlmeta.columns
+        aRows = oConn.queryAll(oConn.sqlrepr(Select(
+            [oCards.id] + [getattr(oCards, dCols[sCol].dbName) for sCol in
+                           ('group', 'capacity', 'cost', 'costtype',
+                            'level')])))
+        dGroup, dCapacity, dAdvanced = {}, {}, {}
+        dCosts = {'pool': {}, 'blood': {}, 'conviction': {}}
+        for iId, iGroup, iCapacity, iCost, sCostType, sLevel in aRows:
+            self._dRows[iId] = len(self._dRows)
+            dGroup[iId] = iGroup or 0
+            dCapacity[iId] = iCapacity or 0
+            if sCostType in dCosts:
+                dCosts[sCostType][iId] = iCost or 0
+            dAdvanced[iId] = 1 if sLevel == 'advanced' else 0
+        oPhys = Table(PhysicalCard.sqlmeta.table)
+        dCount = dict(oConn.queryAll(oConn.sqlrepr(Select(
+            [oPhys.abstract_card_id, func.COUNT(oPhys.id)],
+            groupBy=oPhys.abstract_card_id))))
+
+        self._add_column('group', dGroup)
+        self._add_column('capacity', dCapacity)
+        for sCostType, dCost in dCosts.items():
+            self._add_column('%s cost' % sCostType, dCost)
+        self._add_column('advanced', dAdvanced)
+        self._add_column('physical card count', dCount)
+
+        dDisPairs = dict((oPair.id, oPair.disciplineID) for oPair in
+                         DisciplinePair.select())
+        self._add_join_columns(
+            'discipline: ',
+            get_cached_join(SutekhAbstractCard, 'discipline').get_id_map(),
+            dict((oDis.id, oDis.fullname) for oDis in Discipline.select()),
+            dDisPairs)
+        aRarPairs = list(RarityPair.select())
+        dRarityIds = get_cached_join(AbstractCard, 'rarity').get_id_map()
+        self._add_join_columns(
+            'rarity: ', dRarityIds,
+            dict((oRar.id, oRar.name) for oRar in Rarity.select()),
+            dict((oPair.id, oPair.rarityID) for oPair in aRarPairs))
+        self._add_join_columns(
+            'expansion: ', dRarityIds,
+            dict((oExp.id, oExp.name) for oExp in Expansion.select()),
+            dict((oPair.id, oPair.expansionID) for oPair in aRarPairs))
+        self._add_join_columns(
+            'clan: ',
+            get_cached_join(SutekhAbstractCard, 'clan').get_id_map(),
+            dict((oClan.id, oClan.name) for oClan in Clan.select()))
+        self._add_join_columns(
+            'card type: ',
+            get_cached_join(AbstractCard, 'cardtype').get_id_map(),
+            dict((oType.id, oType.name) for oType in CardType.select()))
+
+        self._dColPos = dict((sName, iPos) for iPos, sName in
+                             enumerate(self.aColNames))
+        if numpy is not None:
+            self._aData = numpy.zeros((len(self._dRows),
+                                       len(self.aColNames)),
+                                      dtype=numpy.int32)
+            for sName, dValues in self._dColumns.items():
+                if dValues:
+                    aRows = [self._dRows[iId] for iId in dValues]
+                    self._aData[aRows, self._dColPos[sName]] = list(
+                        dValues.values())
+
+    def has_column(self, sName):
+        """Return True if sName is one of the table's columns"""
+        return sName in self._dColPos
+
+    def get_column(self, sName):
+        """Return the non-zero values of the column as a dictionary of
+           abstract card id : value. Callers must not modify the
+           result."""
+        return self._dColumns[sName]
+
+    def get_rows(self, aCardIds, aColNames, bArray=True):
+        """Return the table for the given abstract card ids and columns.
+
+           If bArray is True and NumPy is available, this is a float
+           NumPy array, otherwise it's a nested list, as returned by
+           CardListTabulator.tabulate."""
+        if bArray and self._aData is not None:
+            aRows = numpy.asarray([self._dRows[iId] for iId in aCardIds],
+                                  dtype=numpy.intp)
+            aCols = numpy.asarray([self._dColPos[x] for x in aColNames],
+                                  dtype=numpy.intp)
+            return self._aData[numpy.ix_(aRows, aCols)].astype(float)
+        aColumns = [self._dColumns[x] for x in aColNames]
+        return [[dCol.get(iId, 0) for dCol in aColumns]
+                for iId in aCardIds]
+
+
+def get_card_table():
+    """Return the columnar table for the current card list, building it
+       if the card list has changed."""
+    # pylint: disable=global-statement
+    # We deliberately use a module level variable here
+    global _oCardTable
+    tKey = get_cardlist_key()
+    if _oCardTable is None or _oCardTable.tKey != tKey:
+        _oCardTable = CardTable(tKey)
+    return _oCardTable
 
 
 class CardListTabulator:
@@ -111,6 +286,11 @@ class CardListTabulator:
         for oType in CardType.select():
             dProps['card type: ' + oType.name] = make_card_type_func(oType)
 
+        # Mark the functions, so tabulate_array can tell which columns
+        # can be taken from the columnar table
+        for sName, fProp in dProps.items():
+            fProp.sDefaultColumn = sName
+
         return dProps
 
     def tabulate(self, aCards):
@@ -136,3 +316,40 @@ class CardListTabulator:
             aTable.append(aRow)
 
         return aTable
+
+    def tabulate_array(self, aCards, bArray=True):
+        """Create a table from the list of cards using the shared
+           columnar table for the card list.
+
+           The rows and columns are ordered as for tabulate. If NumPy is
+           available and bArray is True, the result is a NumPy array,
+           otherwise it's a nested list. Columns that aren't in the
+           columnar table, or which don't use the default property
+           function, are filled in using the property functions."""
+        aCards = [IAbstractCard(x) for x in aCards]
+        oCardTable = get_card_table()
+
+        def use_table(sName):
+            """Can we take this column from the columnar table?"""
+            fProp = self._dPropFuncs[sName]
+            return (getattr(fProp, 'sDefaultColumn', None) == sName and
+                    oCardTable.has_column(sName))
+
+        aKnown = [x for x in self._aColNames if use_table(x)]
+        aTable = oCardTable.get_rows([x.id for x in aCards], aKnown,
+                                     bArray)
+        if len(aKnown) == len(self._aColNames):
+            return aTable
+        # Add the extra columns
+        aExtra = [(iPos, self._dPropFuncs[sName]) for iPos, sName in
+                  enumerate(self._aColNames) if not use_table(sName)]
+        aFullTable = []
+        for oCard, aRow in zip(aCards, aTable):
+            aRow = list(aRow)
+            for iPos, fProp in aExtra:
+                aRow.insert(iPos, fProp(oCard))
+            aFullTable.append(aRow)
+        if bArray and numpy is not None:
+            return numpy.asarray(aFullTable, dtype=float).reshape(
+                (len(aCards), len(self._aColNames)))
+        return aFullTable
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""In-memory index of crypt cards by group and disciplines or virtues,
+   used to find crypt cards like a given card."""
+
+from itertools import combinations
+
+from sutekh.base.core.BaseTables import AbstractCard
+from sutekh.base.core.BaseFilters import CardTypeFilter
+from sutekh.base.core.DBUtility import get_cardlist_key
+from sutekh.SutekhUtility import is_vampire
+
+# The index for the current card list
+_oCryptIndex = None
+
+
+def get_card_traits(oCard, bSuperior):
+    """Return the set of superior disciplines, disciplines or virtues
+       we match on for the card"""
+    if bSuperior:
+        return frozenset(oP.discipline for oP in oCard.discipline
+                         if oP.level == 'superior')
+    if is_vampire(oCard):
+        return frozenset(oP.discipline for oP in oCard.discipline)
+    # Imbued
+    return frozenset(oCard.virtue)
+
+
+def make_key(aSet, bSuperior):
+    """Create a suitable key for the subset"""
+    if bSuperior:
+        return " & ".join(sorted([x.name.upper() for x in aSet]))
+    return " & ".join(sorted([x.name for x in aSet]))
+
+
+class CryptCardIndex:
+    """Index the vampires and imbued by their traits (disciplines,
+       superior disciplines or virtues) and group window.
+
+       The posting sets for each (vampire, superior, trait, group window)
+       are built once, so finding similar cards is a handful of set
+       intersections rather than a database query."""
+
+    def __init__(self, tKey=None):
+        self.tKey = tKey
+        # (bVampire, bSuperior) : {trait : set of cards}
+        self._dTraits = {}
+        # bVampire : {group : set of cards in the group window}
+        self._dWindows = {}
+        # (bVampire, bSuperior, trait, group) : set of cards
+        self._dPostings = {}
+        self._build()
+
+    def _build(self):
+        """Build the trait and group indexes from the card list"""
+        dGroups = {}
+        for sType, bVampire in (('Vampire', True), ('Imbued', False)):
+            dGroups[bVampire] = {}
+            for oCard in CardTypeFilter(sType).select(AbstractCard):
+                # We ignore the any group cases as they are currently
+                # uninteresting and excluded by the discipline check.
+                # If this ever changes, this will need to be revisited.
+                if oCard.group < 1:
+                    continue
+                dGroups[bVampire].setdefault(oCard.group, set()).add(oCard)
+                for bSuperior in ((False, True) if bVampire else (False,)):
+                    dTraits = self._dTraits.setdefault(
+                        (bVampire, bSuperior), {})
+                    for oTrait in get_card_traits(oCard, bSuperior):
+                        dTraits.setdefault(oTrait, set()).add(oCard)
+        for bVampire, dCards in dGroups.items():
+            self._dWindows[bVampire] = {}
+            for iGroup in dCards:
+                aWindow = set()
+                for iWinGroup in (iGroup - 1, iGroup, iGroup + 1):
+                    aWindow.update(dCards.get(iWinGroup, ()))
+                self._dWindows[bVampire][iGroup] = aWindow
+
+    def _get_postings(self, bVampire, bSuperior, oTrait, iGroup):
+        """Return the cards in the group window of iGroup with the
+           given trait"""
+        tKey = (bVampire, bSuperior, oTrait, iGroup)
+        if tKey not in self._dPostings:
+            aWindow = self._dWindows.get(bVampire, {}).get(iGroup, set())
+            aCards = self._dTraits.get((bVampire, bSuperior), {}).get(
+                oTrait, set())
+            self._dPostings[tKey] = aWindow & aCards
+        return self._dPostings[tKey]
+
+    def find_like(self, oCard, iNum, bSuperior=False, aCandidates=None):
+        """Find the crypt cards in a compatible group that share at least
+           iNum of oCard's traits.
+
+           Returns a dictionary with the key 'all' for the set of all the
+           matching cards, and a key for each subset of iNum traits
+           listing the matching cards with all the traits in the subset.
+           If aCandidates is given, only those cards are matched."""
+        bVampire = is_vampire(oCard)
+        aTraits = sorted(get_card_traits(oCard, bSuperior),
+                         key=lambda x: x.name)
+        dCounts = {}
+        for oTrait in aTraits:
+            for oMatch in self._get_postings(bVampire, bSuperior, oTrait,
+                                             oCard.group):
+                dCounts[oMatch] = dCounts.get(oMatch, 0) + 1
+        aAll = set(oMatch for oMatch, iCount in dCounts.items()
+                   if iCount >= iNum)
+        aAll.discard(oCard)  # Don't match ourselves
+        if aCandidates is not None:
+            aAll.intersection_update(aCandidates)
+        dResults = {'all': aAll}
+        if iNum < 1:
+            return dResults
+        for aSubset in combinations(aTraits, iNum):
+            aMatches = set(aAll)
+            for oTrait in aSubset:
+                aMatches.intersection_update(self._get_postings(
+                    bVampire, bSuperior, oTrait, oCard.group))
+            if aMatches:
+                dResults[make_key(aSubset, bSuperior)] = list(aMatches)
+        return dResults
+
+    def find_like_many(self, aCards, iNum, bSuperior=False,
+                       aCandidates=None):
+        """Run find_like for each of aCards.
+
+           Cards with fewer than iNum traits are matched on all their
+           traits. Returns a dictionary of card : results."""
+        dResults = {}
+        for oCard in aCards:
+            iCardNum = min(iNum, len(get_card_traits(oCard, bSuperior)))
+            if iCardNum < 1:
+                dResults[oCard] = {'all': set()}
+                continue
+            dResults[oCard] = self.find_like(oCard, iCardNum, bSuperior,
+                                             aCandidates)
+        return dResults
+
+
+def get_crypt_index():
+    """Return the index for the current card list, building it if the
+       card list has changed."""
+    # pylint: disable=global-statement
+    # We deliberately use a module level variable here
+    global _oCryptIndex
+    tKey = get_cardlist_key()
+    if _oCryptIndex is None or _oCryptIndex.tKey != tKey:
+        _oCryptIndex = CryptCardIndex(tKey)
+    return _oCryptIndex
@@ -486,9 +486,7 @@ class DBUpgradeManager(BaseDBUpgradeManager):
 
     def _copy_discipline(self, oOrigConn, oTrans):
         """Copy Discipline, assuming versions match"""
-        for oObj in Discipline.select(connection=oOrigConn):
-            _oCopy = Discipline(id=oObj.id, name=oObj.name,
-                                fullname=oObj.fullname, connection=oTrans)
+        self._bulk_copy(Discipline, oOrigConn, oTrans)
 
     def _copy_old_discipline(self, oOrigConn, oTrans, oVer):
         """Copy disciplines, upgrading as needed."""
@@ -502,9 +500,7 @@ class DBUpgradeManager(BaseDBUpgradeManager):
 
     def _copy_clan(self, oOrigConn, oTrans):
         """Copy Clan, assuming database versions match"""
-        for oObj in Clan.select(connection=oOrigConn):
-            _oCopy = Clan(id=oObj.id, name=oObj.name, shortname=oObj.shortname,
-                          connection=oTrans)
+        self._bulk_copy(Clan, oOrigConn, oTrans)
 
     def _copy_old_clan(self, oOrigConn, oTrans, oVer):
         """Copy clan, upgrading as needed."""
@@ -517,9 +513,7 @@ class DBUpgradeManager(BaseDBUpgradeManager):
 
     def _copy_creed(self, oOrigConn, oTrans):
         """Copy Creed, assuming versions match"""
-        for oObj in Creed.select(connection=oOrigConn):
-            _oCopy = Creed(id=oObj.id, name=oObj.name,
-                           shortname=oObj.shortname, connection=oTrans)
+        self._bulk_copy(Creed, oOrigConn, oTrans)
 
     def _copy_old_creed(self, oOrigConn, oTrans, oVer):
         """Copy Creed, updating if needed"""
@@ -532,9 +526,7 @@ class DBUpgradeManager(BaseDBUpgradeManager):
 
     def _copy_virtue(self, oOrigConn, oTrans):
         """Copy Virtue, assuming versions match"""
-        for oObj in Virtue.select(connection=oOrigConn):
-            _oCopy = Virtue(id=oObj.id, name=oObj.name, fullname=oObj.fullname,
-                            connection=oTrans)
+        self._bulk_copy(Virtue, oOrigConn, oTrans)
 
     def _copy_old_virtue(self, oOrigConn, oTrans, oVer):
         """Copy Virtue, updating if needed"""
@@ -547,15 +539,7 @@ class DBUpgradeManager(BaseDBUpgradeManager):
 
     def _copy_discipline_pair(self, oOrigConn, oTrans):
         """Copy DisciplinePair, assuming versions match"""
-        for oObj in DisciplinePair.select(connection=oOrigConn):
-            # pylint: disable=protected-access
-            # Need to access _connection here
-            # Force for SQLObject >= 0.11.4
-            oObj._connection = oOrigConn
-            # pylint: enable=protected-access
-            _oCopy = DisciplinePair(id=oObj.id, level=oObj.level,
-                                    discipline=oObj.discipline,
-                                    connection=oTrans)
+        self._bulk_copy(DisciplinePair, oOrigConn, oTrans)
 
     def _copy_old_discipline_pair(self, oOrigConn, oTrans, oVer):
         """Copy DisciplinePair, upgrading if needed"""
@@ -607,8 +591,7 @@ class DBUpgradeManager(BaseDBUpgradeManager):
 
     def _copy_sect(self, oOrigConn, oTrans):
         """Copy Sect, assuming versions match"""
-        for oObj in Sect.select(connection=oOrigConn):
-            _oCopy = Sect(id=oObj.id, name=oObj.name, connection=oTrans)
+        self._bulk_copy(Sect, oOrigConn, oTrans)
 
     def _copy_old_sect(self, oOrigConn, oTrans, oVer):
         """Copy Sect, updating if needed"""
@@ -621,8 +604,7 @@ class DBUpgradeManager(BaseDBUpgradeManager):
 
     def _copy_title(self, oOrigConn, oTrans):
         """Copy Title, assuming versions match"""
-        for oObj in Title.select(connection=oOrigConn):
-            _oCopy = Title(id=oObj.id, name=oObj.name, connection=oTrans)
+        self._bulk_copy(Title, oOrigConn, oTrans)
 
     def _copy_old_title(self, oOrigConn, oTrans, oVer):
         """Copy Title, updating if needed"""
@@ -637,38 +619,6 @@ class DBUpgradeManager(BaseDBUpgradeManager):
         """Nothing to drop on the upgrade from 0.8"""
         return True
 
-    def _make_abs_card(self, oOldCard, oTrans):
-        """Copy SutekhAbstractCard, assuming versions match"""
-        # pylint: disable=too-many-branches
-        # need the branches for this
-        # pylint: disable=no-member
-        # SQLObject confuses pylint
-        oCardCopy = SutekhAbstractCard(
-            id=oOldCard.id, canonicalName=oOldCard.canonicalName,
-            name=oOldCard.name, text=oOldCard.text,
-            search_text=oOldCard.search_text, connection=oTrans)
-        # If I don't do things this way, I get encoding issues
-        # I don't really feel like trying to understand why
-        oCardCopy.group = oOldCard.group
-        oCardCopy.capacity = oOldCard.capacity
-        oCardCopy.cost = oOldCard.cost
-        oCardCopy.costtype = oOldCard.costtype
-        oCardCopy.level = oOldCard.level
-        oCardCopy.life = oOldCard.life
-        for oData in oOldCard.discipline:
-            oCardCopy.addDisciplinePair(oData)
-        for oData in oOldCard.clan:
-            oCardCopy.addClan(oData)
-        for oData in oOldCard.sect:
-            oCardCopy.addSect(oData)
-        for oData in oOldCard.title:
-            oCardCopy.addTitle(oData)
-        for oData in oOldCard.creed:
-            oCardCopy.addCreed(oData)
-        for oData in oOldCard.virtue:
-            oCardCopy.addVirtue(oData)
-        return oCardCopy
-
     def _upgrade_abstract_card(self, oOrigConn, oTrans, oLogger, oVer):
         """Copy AbstractCard, upgrading as needed"""
         # pylint: disable=too-many-branches, too-many-statements
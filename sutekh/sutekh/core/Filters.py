@@ -82,6 +82,12 @@ class SutekhCardFilter(Filter):
         return [LEFTJOINOn(None, self._oMapTable,
                            AbstractCard.q.id == self._oMapTable.q.id)]
 
+    def _get_column_bitmap(self, oIndex, sColumn, aValues, bNull=False):
+        """Helper for get_card_bitmap, to find the cards with the given
+           values for the SutekhAbstractCard column."""
+        return oIndex.column_bitmap(SutekhAbstractCard.sqlmeta.table, sColumn,
+                                    aValues, bNull)
+
 
 # Individual Filters
 class ClanFilter(SingleFilter):
@@ -353,6 +359,9 @@ class GroupFilter(SutekhCardFilter):
     def _get_expression(self):
         return self._oMapTable.q.grp == self.__iGroup
 
+    def get_card_bitmap(self, oIndex):
+        return self._get_column_bitmap(oIndex, 'grp', [self.__iGroup])
+
 
 class MultiGroupFilter(SutekhCardFilter):
     """Filter on multiple Groups"""
@@ -381,6 +390,9 @@ class MultiGroupFilter(SutekhCardFilter):
     def _get_expression(self):
         return IN(self._oMapTable.q.grp, self.__aGroups)
 
+    def get_card_bitmap(self, oIndex):
+        return self._get_column_bitmap(oIndex, 'grp', self.__aGroups)
+
 
 class CapacityFilter(SutekhCardFilter):
     """Filter on Capacity"""
@@ -395,6 +407,9 @@ class CapacityFilter(SutekhCardFilter):
     def _get_expression(self):
         return self._oMapTable.q.capacity == self.__iCap
 
+    def get_card_bitmap(self, oIndex):
+        return self._get_column_bitmap(oIndex, 'capacity', [self.__iCap])
+
 
 class MultiCapacityFilter(SutekhCardFilter):
     """Filter on a list of Capacities"""
@@ -421,6 +436,9 @@ class MultiCapacityFilter(SutekhCardFilter):
     def _get_expression(self):
         return IN(self._oMapTable.q.capacity, self.__aCaps)
 
+    def get_card_bitmap(self, oIndex):
+        return self._get_column_bitmap(oIndex, 'capacity', self.__aCaps)
+
 
 class CostFilter(SutekhCardFilter):
     """Filter on Cost"""
@@ -440,6 +458,11 @@ class CostFilter(SutekhCardFilter):
     def _get_expression(self):
         return self._oMapTable.q.cost == self.__iCost
 
+    def get_card_bitmap(self, oIndex):
+        # A cost of None is compared with IS NULL
+        return self._get_column_bitmap(oIndex, 'cost', [self.__iCost],
+                                       self.__iCost is None)
+
 
 class MultiCostFilter(SutekhCardFilter):
     """Filter on a list of Costs"""
@@ -478,6 +501,10 @@ class MultiCostFilter(SutekhCardFilter):
             return self._oMapTable.q.cost == None
         return IN(self._oMapTable.q.cost, self.__aCost)
 
+    def get_card_bitmap(self, oIndex):
+        return self._get_column_bitmap(oIndex, 'cost', self.__aCost,
+                                       self.__bZeroCost)
+
 
 class CostTypeFilter(SutekhCardFilter):
     """Filter on cost type"""
@@ -493,6 +520,9 @@ class CostTypeFilter(SutekhCardFilter):
     def _get_expression(self):
         return self._oMapTable.q.costtype == self.__sCostType.lower()
 
+    def get_card_bitmap(self, oIndex):
+        return self._get_column_bitmap(oIndex, 'costtype', [self.__sCostType])
+
 
 class MultiCostTypeFilter(SutekhCardFilter):
     """Filter on a list of cost types"""
@@ -520,6 +550,9 @@ class MultiCostTypeFilter(SutekhCardFilter):
     def _get_expression(self):
         return IN(self._oMapTable.q.costtype, self.__aCostTypes)
 
+    def get_card_bitmap(self, oIndex):
+        return self._get_column_bitmap(oIndex, 'costtype', self.__aCostTypes)
+
 
 class LifeFilter(SutekhCardFilter):
     """Filter on life"""
@@ -534,6 +567,9 @@ class LifeFilter(SutekhCardFilter):
     def _get_expression(self):
         return self._oMapTable.q.life == self.__iLife
 
+    def get_card_bitmap(self, oIndex):
+        return self._get_column_bitmap(oIndex, 'life', [self.__iLife])
+
 
 class MultiLifeFilter(SutekhCardFilter):
     """Filter on a list of list values"""
@@ -562,6 +598,9 @@ class MultiLifeFilter(SutekhCardFilter):
     def _get_expression(self):
         return IN(self._oMapTable.q.life, self.__aLife)
 
+    def get_card_bitmap(self, oIndex):
+        return self._get_column_bitmap(oIndex, 'life', self.__aLife)
+
 
 class CardTextFilter(BaseCardTextFilter):
     """Filter on Card Text"""
@@ -591,6 +630,12 @@ class CardTextFilter(BaseCardTextFilter):
         return LIKE(func.LOWER(self._oMapTable.q.search_text),
                     '%' + self._sPattern + '%')
 
+    def get_card_bitmap(self, oIndex):
+        if self._bBraces:
+            return super(CardTextFilter, self).get_card_bitmap(oIndex)
+        return oIndex.like_bitmap(SutekhAbstractCard.sqlmeta.table,
+                                  'search_text', '%' + self._sPattern + '%')
+
 
 class CardFunctionFilter(DirectFilter):
     """Filter for various interesting card properties - unlock,
@@ -691,3 +736,7 @@ class CardFunctionFilter(DirectFilter):
     def _get_expression(self):
         """Expression for the constructed filter"""
         return self._oFilter._get_expression()
+
+    def get_card_bitmap(self, oIndex):
+        """Card ids for the constructed filter"""
+        return oIndex.card_bitmap(self._oFilter)
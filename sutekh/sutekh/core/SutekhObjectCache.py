@@ -5,18 +5,30 @@
 
 """Cache various objects used by sutekh to speed up database queries."""
 
+import os
+
 from sutekh.core.SutekhTables import (SutekhAbstractCard, Clan,
                                       Discipline, DisciplinePair, Sect,
                                       Title, Creed, Virtue)
 from sutekh.base.core.ObjectCache import ObjectCache
+from sutekh.base.Utility import prefs_dir, ensure_dir_exists
+from sutekh.SutekhInfo import SutekhInfo
+
+
+def get_snapshot_file():
+    """Return the default location for the object cache snapshot."""
+    sPrefsDir = prefs_dir(SutekhInfo.NAME)
+    ensure_dir_exists(sPrefsDir)
+    return os.path.join(sPrefsDir, "sutekh_cache.json")
 
 
 class SutekhObjectCache(ObjectCache):
     """Add Sutekh specific classes to the generic database cache.
        """
 
-    def __init__(self):
+    def __init__(self, sSnapshotFile=None):
         aExtraTypesToCache = [Discipline, DisciplinePair, Clan,
                               Creed, Virtue, Sect, Title,
                               SutekhAbstractCard]
-        super(SutekhObjectCache, self).__init__(aExtraTypesToCache)
+        super(SutekhObjectCache, self).__init__(aExtraTypesToCache,
+                                                sSnapshotFile)
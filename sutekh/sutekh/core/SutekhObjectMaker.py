@@ -6,10 +6,13 @@
 
 """The Sutekh Card and related database objects creation helper"""
 
-from sqlobject import SQLObjectNotFound
+from sqlobject import SQLObjectNotFound, joins
+from sqlobject.sqlbuilder import Select, Table
 
 from sutekh.base.core.BaseAdapters import IAbstractCard
 from sutekh.base.core.BaseObjectMaker import BaseObjectMaker
+from sutekh.base.core.BaseTables import AbstractCard, PhysicalCard
+from sutekh.base.core.DBUtility import bulk_insert, flush_cache
 
 from sutekh.core.SutekhTables import (SutekhAbstractCard, Clan, Creed,
                                       Discipline, DisciplinePair, Sect,
@@ -69,3 +72,146 @@ class SutekhObjectMaker(BaseObjectMaker):
         except SQLObjectNotFound:
             oDis = self.make_discipline(sDiscipline)
             return DisciplinePair(discipline=oDis, level=sLevel)
+
+
+def _get_card_joins():
+    """Return the RelatedJoins on SutekhAbstractCard, including those
+       inherited from AbstractCard."""
+    return [oJoin for oJoin in (AbstractCard.sqlmeta.joins +
+                                SutekhAbstractCard.sqlmeta.joins)
+            if isinstance(oJoin, joins.SORelatedJoin)]
+
+
+def _get_db_columns(cCls, aNames):
+    """Map the column attribute names of cCls to the database names."""
+    return [cCls.sqlmeta.columns[sName].dbName for sName in aNames]
+
+
+class CardRecord:
+    """In-memory stand-in for a new SutekhAbstractCard.
+
+       This supports the column attributes, the join lists and the
+       add<Join> methods used when building a card, so the card list
+       parser can fill it in exactly as it would fill in a database
+       object. The physical cards are recorded as a list of printings.
+       """
+    # pylint: disable=too-many-instance-attributes, invalid-name
+    # We mirror the SutekhAbstractCard columns, so we have lots of
+    # attributes using the table naming conventions
+
+    def __init__(self, sName):
+        self.name = sName
+        self.canonicalName = sName.lower()
+        self.text = ""
+        self.search_text = ""
+        self.group = None
+        self.capacity = None
+        self.cost = None
+        self.life = None
+        self.costtype = None
+        self.level = None
+        self.aPrintings = []
+        self._dAdders = {}
+        for oJoin in _get_card_joins():
+            aItems = []
+            setattr(self, oJoin.joinMethodName, aItems)
+            self._dAdders['add' + oJoin.addRemoveName] = aItems.append
+
+    def __getattr__(self, sName):
+        """Provide the add<Join> methods."""
+        dAdders = self.__dict__.get('_dAdders', {})
+        if sName in dAdders:
+            return dAdders[sName]
+        raise AttributeError(sName)
+
+
+class SutekhBulkObjectMaker(SutekhObjectMaker):
+    """Object maker which holds new abstract and physical cards in memory.
+
+       Cards which don't already exist in the database are created as
+       CardRecords, and are only written to the database, using multi-row
+       inserts, when write_cards is called. Cards which do exist are
+       returned and updated as usual. All the other objects are small
+       lookup tables, so they are created immediately.
+       """
+
+    def __init__(self):
+        super(SutekhBulkObjectMaker, self).__init__()
+        self._dRecords = {}
+
+    def make_abstract_card(self, sCard):
+        sName = sCard.strip()
+        sCanonical = sName.lower()
+        if sCanonical in self._dRecords:
+            return self._dRecords[sCanonical]
+        try:
+            return IAbstractCard(sCard)
+        except SQLObjectNotFound:
+            oRecord = CardRecord(sName)
+            self._dRecords[sCanonical] = oRecord
+            return oRecord
+
+    def make_physical_card(self, oCard, oPrinting):
+        if isinstance(oCard, CardRecord):
+            if oPrinting not in oCard.aPrintings:
+                oCard.aPrintings.append(oPrinting)
+            return None
+        return super(SutekhBulkObjectMaker, self).make_physical_card(
+            oCard, oPrinting)
+
+    def write_cards(self):
+        """Write all the new cards, and the entries in their join tables,
+           to the database, and then flush the caches.
+
+           This should be called inside a transaction."""
+        # pylint: disable=protected-access, too-many-locals
+        # We need to access _connection here
+        # We use lots of local variables for clarity
+        if not self._dRecords:
+            return
+        oConn = SutekhAbstractCard._connection
+        aRecords = list(self._dRecords.values())
+        self._dRecords = {}
+
+        sChildName = SutekhAbstractCard.sqlmeta.childName
+        bulk_insert(oConn, AbstractCard.sqlmeta.table,
+                    _get_db_columns(AbstractCard, ['canonicalName', 'name',
+                                                   'text', 'childName']),
+                    [(oRec.canonicalName, oRec.name, oRec.text, sChildName)
+                     for oRec in aRecords])
+
+        oTable = Table(AbstractCard.sqlmeta.table)
+        sCanonicalCol = _get_db_columns(AbstractCard, ['canonicalName'])[0]
+        dIds = dict((sCanonical, iId) for iId, sCanonical in oConn.queryAll(
+            oConn.sqlrepr(Select([getattr(oTable, AbstractCard.sqlmeta.idName),
+                                  getattr(oTable, sCanonicalCol)]))))
+        aIds = [dIds[oRec.canonicalName] for oRec in aRecords]
+
+        aChildCols = ['search_text', 'group', 'capacity', 'cost', 'life',
+                      'costtype', 'level']
+        bulk_insert(oConn, SutekhAbstractCard.sqlmeta.table,
+                    [SutekhAbstractCard.sqlmeta.idName] +
+                    _get_db_columns(SutekhAbstractCard, aChildCols),
+                    [[iId] + [getattr(oRec, sCol) for sCol in aChildCols]
+                     for iId, oRec in zip(aIds, aRecords)])
+
+        for oJoin in _get_card_joins():
+            aRows = []
+            for iId, oRec in zip(aIds, aRecords):
+                for oOther in getattr(oRec, oJoin.joinMethodName):
+                    aRows.append((iId, oOther.id))
+            bulk_insert(oConn, oJoin.intermediateTable,
+                        [oJoin.joinColumn, oJoin.otherColumn], aRows)
+
+        aRows = []
+        for iId, oRec in zip(aIds, aRecords):
+            for oPrinting in oRec.aPrintings:
+                iPrintingId = oPrinting.id if oPrinting is not None else None
+                aRows.append((iId, iPrintingId))
+        bulk_insert(oConn, PhysicalCard.sqlmeta.table,
+                    _get_db_columns(PhysicalCard,
+                                    ['abstractCardID', 'printingID']),
+                    aRows)
+        # The inserts bypass SQLObject, so the cached joins, the adapter
+        # caches and the card indexes don't know about the new cards
+        flush_cache()
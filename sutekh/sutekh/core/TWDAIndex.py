@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Inverted index from cards to the TWDA decks that contain them."""
+
+import json
+import logging
+import os
+import re
+
+from sqlobject.sqlbuilder import Table, Select
+
+from sutekh.base.core.BaseTables import PhysicalCardSet
+from sutekh.base.core.CardSetUtilities import (get_abstract_card_counts,
+                                               get_card_set_checksums)
+from sutekh.base.core.DBUtility import (get_connection_key,
+                                        get_database_change_marker)
+from sutekh.base.core.DBSignals import (listen_changed, listen_row_destroy,
+                                        listen_row_update, listen_row_created,
+                                        disconnect_changed,
+                                        disconnect_row_destroy,
+                                        disconnect_row_update,
+                                        disconnect_row_created)
+from sutekh.base.Utility import prefs_dir, ensure_dir_exists
+from sutekh.SutekhInfo import SutekhInfo
+
+# pattern for TWDA holders
+TWDA_HOLDER_REGEX = re.compile('^TWDA ([0-9]{4})$')
+
+# Increase this if the index format changes
+TWDA_INDEX_VERSION = 2
+
+# Changes to these card set columns can change the list of TWDA decks
+TWDA_MEMBERSHIP_COLUMNS = frozenset(['name', 'parent', 'parentID', 'inuse'])
+
+
+def get_twda_index_file():
+    """Return the default location for the saved TWDA index."""
+    sPrefsDir = prefs_dir(SutekhInfo.NAME)
+    ensure_dir_exists(sPrefsDir)
+    return os.path.join(sPrefsDir, "sutekh_twda_index.json")
+
+
+def get_twda_deck_ids():
+    """Return the ids of the TWDA decks in the database.
+
+       These are the card sets in use with a TWDA holder as parent."""
+    # pylint: disable=protected-access
+    # We need to access _connection here
+    oConn = PhysicalCardSet._connection
+    oTable = Table(PhysicalCardSet.sqlmeta.table)
+    aRows = oConn.queryAll(oConn.sqlrepr(
+        Select([oTable.id, oTable.name, oTable.parent_id, oTable.inuse])))
+    aHolders = set(iId for iId, sName, _iParent, _bInUse in aRows
+                   if TWDA_HOLDER_REGEX.match(sName))
+    return sorted(iId for iId, _sName, iParent, bInUse in aRows
+                  if bInUse and iParent in aHolders)
+
+
+def _get_key_decks(dKey):
+    """Return a dictionary of deck id : checksum for a key returned by
+       TWDAIndex.get_key."""
+    dDecks = dict((iDeckId, [0, 0, 0]) for iDeckId in dKey['decks'])
+    for aChecksum in dKey['checksums']:
+        dDecks[aChecksum[0]] = list(aChecksum[1:])
+    return dDecks
+
+
+class TWDAIndex:
+    """Map each abstract card to the TWDA decks it is in, and the number
+       of copies in each deck.
+
+       The index is keyed on the database and a checksum of each TWDA
+       deck, so a saved index can be reused until the TWDA data
+       changes.
+
+       The key is only checked against the database when the index is
+       loaded, or when the database change marker changes. Call listen
+       to keep the index up to date as card sets are changed."""
+
+    def __init__(self):
+        # Database hash from get_key
+        self._sDatabase = None
+        # TWDA deck id : [number of cards, sum of the physical card ids,
+        # sum of the squares of the ids], or None if the index is empty
+        self._dDecks = None
+        self._dCards = {}
+        # The database change marker when the key was last checked
+        self._sMarker = None
+        self._bChecked = False
+        # True if the index has changed since it was loaded or saved
+        self._bChanged = False
+        self._bListening = False
+
+    def get_key(self, aDeckIds):
+        """Describe the current TWDA data.
+
+           We use the deck ids, along with a checksum of each deck's
+           contents (the number of cards, and the sum and sum of squares
+           of the physical card ids), so changes to the card sets are
+           also caught. The database is identified by a hash, so the
+           connection details aren't written to the saved index."""
+        # pylint: disable=protected-access
+        # We need to access _connection here
+        oConn = PhysicalCardSet._connection
+        aChecksums = []
+        if aDeckIds:
+            aChecksums = sorted([iDeckId] + aChecksum for iDeckId, aChecksum
+                                in get_card_set_checksums(aDeckIds).items())
+        return {
+            'version': TWDA_INDEX_VERSION,
+            'database': get_connection_key(oConn),
+            'decks': aDeckIds,
+            'checksums': aChecksums,
+        }
+
+    def _make_key(self):
+        """Return the key for the data in the index, in the form returned
+           by get_key."""
+        if self._dDecks is None:
+            return None
+        return {
+            'version': TWDA_INDEX_VERSION,
+            'database': self._sDatabase,
+            'decks': sorted(self._dDecks),
+            'checksums': sorted([iDeckId] + aChecksum for iDeckId, aChecksum
+                                in self._dDecks.items() if aChecksum[0]),
+        }
+
+    def _mark_checked(self):
+        """Note that the index matches the database"""
+        self._sMarker = get_database_change_marker()
+        self._bChecked = True
+
+    def rebuild(self, aDeckIds=None):
+        """Rebuild the index from the database."""
+        if aDeckIds is None:
+            aDeckIds = get_twda_deck_ids()
+        dKey = self.get_key(aDeckIds)
+        self._sDatabase = dKey['database']
+        self._dDecks = _get_key_decks(dKey)
+        self._dCards = {}
+        for iDeckId, dCounts in get_abstract_card_counts(aDeckIds).items():
+            for iAbsId, iCount in dCounts.items():
+                self._dCards.setdefault(iAbsId, {})[iDeckId] = iCount
+        self._bChanged = True
+        self._mark_checked()
+
+    def update(self):
+        """Rebuild the index if the TWDA data has changed.
+
+           This reads every card set and a checksum of every TWDA deck, so
+           ensure_current should be used before each query."""
+        aDeckIds = get_twda_deck_ids()
+        if self._dDecks is None or self._make_key() != self.get_key(
+                aDeckIds):
+            self.rebuild(aDeckIds)
+            return True
+        self._mark_checked()
+        return False
+
+    def invalidate(self):
+        """Check the index against the database on the next call to
+           ensure_current."""
+        self._bChecked = False
+
+    def ensure_current(self):
+        """Check the index against the database if it hasn't been checked
+           since it was loaded, or the database change marker has changed
+           since it was last checked. Other changes are tracked by the
+           card set signals.
+
+           Returns True if the index has changed since it was loaded or
+           last saved."""
+        if (not self._bChecked or
+                self._sMarker != get_database_change_marker()):
+            self.update()
+        return self._bChanged
+
+    def save(self, sFileName):
+        """Write the index to sFileName.
+
+           Failures are logged and ignored, since we can always rebuild
+           the index."""
+        dData = {
+            'key': self._make_key(),
+            'cards': [[iAbsId, iDeckId, iCount]
+                      for iAbsId, dDecks in self._dCards.items()
+                      for iDeckId, iCount in dDecks.items()],
+        }
+        try:
+            with open(sFileName, 'w') as fIndex:
+                json.dump(dData, fIndex)
+        except (IOError, OSError, TypeError, ValueError) as oErr:
+            logging.warning('Unable to save TWDA index %s: %s',
+                            sFileName, oErr)
+            return
+        self._bChanged = False
+
+    def load(self, sFileName):
+        """Load the index from sFileName.
+
+           Returns False if the file is missing or can't be read. This
+           doesn't check that the index is current, which is left to
+           the next call to ensure_current."""
+        try:
+            with open(sFileName, 'r') as fIndex:
+                dData = json.load(fIndex)
+            dKey = dData['key']
+            if dKey['version'] != TWDA_INDEX_VERSION:
+                logging.info('Ignoring old TWDA index %s', sFileName)
+                return False
+            dDecks = _get_key_decks(dKey)
+            dCards = {}
+            for iAbsId, iDeckId, iCount in dData['cards']:
+                dCards.setdefault(iAbsId, {})[iDeckId] = iCount
+        except (IOError, OSError) as oErr:
+            # Most likely, there is no saved index yet
+            logging.info('Unable to read TWDA index %s: %s', sFileName, oErr)
+            return False
+        except (ValueError, KeyError, TypeError) as oErr:
+            logging.warning('Invalid TWDA index %s: %s', sFileName, oErr)
+            return False
+        self._sDatabase = dKey['database']
+        self._dDecks = dDecks
+        self._dCards = dCards
+        self._bChecked = False
+        self._bChanged = False
+        return True
+
+    def find_decks(self, aAbsCards, iMinCards=None):
+        """Find the decks containing at least iMinCards of the given
+           distinct cards.
+
+           iMinCards defaults to all the cards. Returns a dictionary of
+           deck id : {card : count} for the matching cards in each deck."""
+        aAbsCards = set(aAbsCards)
+        if iMinCards is None:
+            iMinCards = len(aAbsCards)
+        iMinCards = max(iMinCards, 1)
+        dDecks = {}
+        for oCard in aAbsCards:
+            for iDeckId, iCount in self._dCards.get(oCard.id, {}).items():
+                dDecks.setdefault(iDeckId, {})[oCard] = iCount
+        if iMinCards > 1:
+            dDecks = dict((iDeckId, dCards) for iDeckId, dCards
+                          in dDecks.items() if len(dCards) >= iMinCards)
+        return dDecks
+
+    # Signal handling
+
+    def listen(self):
+        """Listen for changes to card sets so we can update the index."""
+        if not self._bListening:
+            listen_changed(self.card_changed, PhysicalCardSet)
+            listen_row_destroy(self.card_set_deleted, PhysicalCardSet)
+            listen_row_update(self.card_set_updated, PhysicalCardSet)
+            listen_row_created(self.card_set_created, PhysicalCardSet)
+            self._bListening = True
+
+    def cleanup(self):
+        """Stop listening for card set changes."""
+        if self._bListening:
+            disconnect_changed(self.card_changed, PhysicalCardSet)
+            disconnect_row_destroy(self.card_set_deleted, PhysicalCardSet)
+            disconnect_row_update(self.card_set_updated, PhysicalCardSet)
+            disconnect_row_created(self.card_set_created, PhysicalCardSet)
+            self._bListening = False
+
+    def card_changed(self, oCardSet, dChanges):
+        """Update the counts and checksum for changes to a TWDA deck."""
+        if self._dDecks is None or oCardSet.id not in self._dDecks:
+            return
+        aChecksum = self._dDecks[oCardSet.id]
+        for oPhysCard, iChg in dChanges.items():
+            aChecksum[0] += iChg
+            aChecksum[1] += iChg * oPhysCard.id
+            aChecksum[2] += iChg * oPhysCard.id * oPhysCard.id
+            dDecks = self._dCards.setdefault(oPhysCard.abstractCardID, {})
+            iCount = dDecks.get(oCardSet.id, 0) + iChg
+            if iCount > 0:
+                dDecks[oCardSet.id] = iCount
+            else:
+                dDecks.pop(oCardSet.id, None)
+            if not dDecks:
+                del self._dCards[oPhysCard.abstractCardID]
+        self._bChanged = True
+
+    def card_set_deleted(self, oCardSet, _fPostFuncs=None):
+        """Remove deleted TWDA decks from the index."""
+        if TWDA_HOLDER_REGEX.match(oCardSet.name):
+            # The decks will no longer be TWDA decks
+            self.invalidate()
+        if self._dDecks is None or oCardSet.id not in self._dDecks:
+            return
+        del self._dDecks[oCardSet.id]
+        for iAbsId in list(self._dCards):
+            dDecks = self._dCards[iAbsId]
+            if dDecks.pop(oCardSet.id, None) and not dDecks:
+                del self._dCards[iAbsId]
+        self._bChanged = True
+
+    def card_set_updated(self, _oCardSet, dChanges):
+        """Check the index again if a card set may have become, or
+           stopped being, a TWDA deck or holder."""
+        if TWDA_MEMBERSHIP_COLUMNS.intersection(dChanges):
+            self.invalidate()
+
+    def card_set_created(self, oCardSet, _dKW=None, _fPostFuncs=None):
+        """Check the index again if a TWDA deck or holder is added."""
+        oParent = oCardSet.parent
+        if TWDA_HOLDER_REGEX.match(oCardSet.name) or (
+                oParent and TWDA_HOLDER_REGEX.match(oParent.name)):
+            self.invalidate()
+
+
+def get_twda_index(sFileName=None):
+    """Load the TWDA index from sFileName, rebuilding and saving it if
+       it's missing or out of date."""
+    oIndex = TWDAIndex()
+    if sFileName:
+        oIndex.load(sFileName)
+    if oIndex.ensure_current() and sFileName:
+        oIndex.save(sFileName)
+    return oIndex
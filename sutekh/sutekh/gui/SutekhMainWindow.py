@@ -22,7 +22,8 @@ from sutekh.base.gui.GuiDataPack import gui_error_handler
 from sutekh.base.gui.SutekhDialog import do_complaint
 from sutekh.base.gui.UpdateDialog import UpdateDialog
 
-from sutekh.core.SutekhObjectCache import SutekhObjectCache
+from sutekh.core.SutekhObjectCache import (SutekhObjectCache,
+                                           get_snapshot_file)
 
 from sutekh.io.PhysicalCardSetWriter import PhysicalCardSetWriter
 from sutekh.io.WwUrls import WW_CARDLIST_DATAPACK
@@ -74,7 +75,7 @@ class SutekhMainWindow(AppMainWindow):
                 self.do_refresh_card_list()
 
         # Create object cache
-        self.__oSutekhObjectCache = SutekhObjectCache()
+        self.__oSutekhObjectCache = SutekhObjectCache(get_snapshot_file())
 
     def setup(self, oConfig):
         """After database checks are passed, setup what we need to display
@@ -102,7 +103,7 @@ class SutekhMainWindow(AppMainWindow):
         # Flush the caches, so we don't hit stale lookups
         flush_cache()
         # Reset the lookup cache holder
-        self.__oSutekhObjectCache = SutekhObjectCache()
+        self.__oSutekhObjectCache = SutekhObjectCache(get_snapshot_file())
         # We publish here, after we've cleared the caches
         super(SutekhMainWindow, self).update_to_new_db()
 
@@ -5,9 +5,6 @@
 
 """Plugin to find clusters in the card lists."""
 
-import random
-import math
-
 from gi.repository import Gtk
 
 from sutekh.base.core.BaseTables import PhysicalCard, PhysicalCardSet
@@ -17,6 +14,7 @@ from sutekh.base.gui.AutoScrolledWindow import AutoScrolledWindow
 from sutekh.base.gui.SutekhDialog import NotebookDialog, do_complaint_error
 
 from sutekh.core.CardListTabulator import CardListTabulator
+from sutekh.core.CardListClustering import Vector, k_means, EUCLIDEAN
 from sutekh.gui.PluginManager import SutekhPlugin
 
 
@@ -41,6 +39,7 @@ class ClusterCardList(SutekhPlugin):
         self._fMakeCardSetFromCluster = self._make_pcs_from_cluster
         self._dPropButtons = {}
         self._dGroups = {}
+        self._dColNames = {}
         self._oResultsVbox = None
         self._aDistanceMeasureGroup = None
 
@@ -92,16 +91,18 @@ class ClusterCardList(SutekhPlugin):
         """Extract the list of possible properties to cluster on."""
         dPropFuncs = CardListTabulator.get_default_prop_funcs()
         self._dGroups = {}
+        # Map the displayed names back to the tabulator column names
+        self._dColNames = {}
 
         for sName, fProp in dPropFuncs.items():
             aParts = sName.split(":")
             if len(aParts) == 1:
-                self._dGroups.setdefault("Miscellaneous",
-                                         {})[sName.capitalize()] = fProp
+                sGroup, sRest = "Miscellaneous", sName.capitalize()
             else:
                 sGroup, sRest = (aParts[0].strip().capitalize(),
                                  ":".join(aParts[1:]).strip().capitalize())
-                self._dGroups.setdefault(sGroup, {})[sRest] = fProp
+            self._dGroups.setdefault(sGroup, {})[sRest] = fProp
+            self._dColNames[sGroup + ": " + sRest] = sName
 
     def _make_table_section(self):
         """Create a notebook, and populate the first tabe with a list of
@@ -318,79 +319,6 @@ class ClusterCardList(SutekhPlugin):
             if oBut.get_active():
                 self._fMakeCardSetFromCluster(iId)
 
-    @staticmethod
-    def k_means_plus_plus(aCards, iNumClust, fDist):
-        """Find a set of initial centers using the k-means++ algorithm.
-
-           See http://www.stanford.edu/~darthur/kMeansPlusPlus.pdf.
-           """
-        aMeans = [random.choice(aCards)]
-
-        while len(aMeans) < iNumClust:
-            aDists = []
-            for oVec in aCards:
-                fMinD = min((fDist(oVec, oMean) for oMean in aMeans)) ** 2
-                aDists.append(fMinD)
-
-            fSumSq = sum(aDists)
-            fPick = random.uniform(0, fSumSq)
-
-            for iCard, fMinD in enumerate(aDists):
-                fPick -= fMinD
-                if fPick <= 0:
-                    break
-
-            # iCard is defined because k_means doesn't call
-            # this unless aCards is non-empty
-            # pylint: disable=undefined-loop-variable
-
-            if iCard == len(aCards):
-                # guard against slight possibility of being very close
-                # to end of fSumSq.
-                iCard -= 1
-
-            aMeans.append(aCards[iCard])
-
-        return aMeans
-
-    def k_means(self, aCards, iNumClust, iIterations, fDist):
-        """Perform k-means clustering on a list of cards using Lloyd's
-           algorithm."""
-        if (not aCards) or (not aCards[0]):
-            # empty card set or zero-length vectors
-            return [], []
-
-        aCards = [Vector(x) for x in aCards]
-        aMeans = self.k_means_plus_plus(aCards, iNumClust, fDist)
-        iCards = len(aCards)
-
-        # just do a fixed number of interations (no complex stopping condition)
-        for _iIter in range(iIterations):
-            # empty clusters
-            aClusters = []
-            for iClust in range(iNumClust):
-                aClusters.append([])
-
-            # calculate membership in clusters
-            for iCard in range(iCards):
-                oVec = aCards[iCard]
-                # pylint: disable=cell-var-from-loop
-                # Since we use key immediately, this warning isn't
-                # an issue
-                iVmin = min(range(iNumClust),
-                            key=lambda iV: fDist(oVec, aMeans[iV]))
-                # pylint: enable=cell-var-from-loop
-                aClusters[iVmin].append(iCard)
-
-            # recompute the centroids
-            for iClust in range(iNumClust):
-                if aClusters[iClust]:
-                    aMeans[iClust] = (1.0 / len(aClusters[iClust])) * sum(
-                        (aCards[x] for x in aClusters[iClust])
-                    )
-
-        return aMeans, aClusters
-
     def do_clustering(self):
         """Call the chosen clustering algorithm"""
         # gather cards
@@ -407,9 +335,12 @@ class ClusterCardList(SutekhPlugin):
         # sort column names
         aColNames = sorted(dPropFuncs.keys())
 
-        # make tabulator and get table
-        oTab = CardListTabulator(aColNames, dPropFuncs)
-        aTable = oTab.tabulate(aCards)
+        # make tabulator and get table, using the shared columnar table
+        # for the card list
+        oTab = CardListTabulator([self._dColNames[x] for x in aColNames],
+                                 dict((self._dColNames[x], fProp) for x, fProp
+                                      in dPropFuncs.items()))
+        aTable = oTab.tabulate_array(aCards)
 
         # set k-means parameters
         if self._oAutoNumClusters.get_active():
@@ -419,17 +350,15 @@ class ClusterCardList(SutekhPlugin):
         iIterations = max(2, int(self._oNumIterSpin.get_value()))
         for oBut in self._aDistanceMeasureGroup:
             if oBut.get_active():
-                sName = oBut.get_label()
-                fDist = Vector.METRICS[sName]
+                sMetric = oBut.get_label()
                 break
         else:
-            fDist = Vector.METRICS['Euclidean Distance']
+            sMetric = EUCLIDEAN
 
         # aMeans -> list of vectors of cluster centroids
         # aClusters -> list of clusters, each cluster is a list of card indexes
 
-        aMeans, aClusters = self.k_means(aTable, iNumClusts, iIterations,
-                                         fDist)
+        aMeans, aClusters = k_means(aTable, iNumClusts, iIterations, sMetric)
 
         self._populate_results(aCards, aColNames, aMeans, aClusters)
 
@@ -454,83 +383,4 @@ class ClusterCardList(SutekhPlugin):
         self._open_cs(sDeckName, True)
 
 
-class Vector:
-    """Really simple class representing a row of card table data."""
-
-    METRICS = {}
-
-    def __init__(self, aData):
-        self._aData = aData
-
-    # We do want to access _aData on other Vectors.
-    # pylint: disable=protected-access
-
-    def euclidian_distance(self, oVec2):
-        """Euclidean distance between two vectors."""
-        assert len(self._aData) == len(oVec2._aData)
-        fSum = sum(((x - y) ** 2 for (x, y) in zip(self._aData, oVec2._aData)))
-        return math.sqrt(fSum)
-
-    METRICS['Euclidean Distance'] = euclidian_distance
-
-    def sutekh_distance(self, oVec2):
-        """Like Euclidean distance, but -1 is distance 0.25 to anything
-           (including 0 and -1) and 0 is distance 4.0 from anything other
-           than 0.
-           """
-        assert len(self._aData) == len(oVec2._aData)
-        fSum = sum((
-            ((x == -1 or y == -1) and 0.25) or
-            (((x == 0) ^ (y == 0) and 4.0)) or
-            (x - y) ** 2 for (x, y) in zip(self._aData, oVec2._aData)
-        ))
-        return math.sqrt(fSum)
-
-    METRICS['Sutekh Distance'] = sutekh_distance
-
-    # Other possibile metrics:
-    #  'City Block Distance',
-    #  'Correlation',
-    #  'Absolute Value of the Correlation',
-    #  'Uncentered Correlation',
-    #  'Absolute Value of the Uncentered Correlation',
-    #  "Spearman's Rank Correlation"
-    #  "Kendall's Tau"
-
-    def __add__(self, oOther):
-        """Sum this vector with another."""
-        if oOther == 0:
-            return self
-        assert len(self._aData) == len(oOther._aData)
-        return Vector([x + y for (x, y) in zip(self._aData, oOther._aData)])
-
-    def __radd__(self, oOther):
-        """Sum this vector with another."""
-        if oOther == 0:
-            return self
-        assert len(self._aData) == len(oOther._aData)
-        return Vector([x + y for (x, y) in zip(self._aData, oOther._aData)])
-
-    def __mul__(self, fScale):
-        """Multiply this vector by a scalar."""
-        fScale = float(fScale)
-        return Vector([x * fScale for x in self._aData])
-
-    def __rmul__(self, fScale):
-        """Multiply this vector by a scalar."""
-        fScale = float(fScale)
-        return Vector([x * fScale for x in self._aData])
-
-    def __len__(self):
-        """Length of this vector."""
-        return len(self._aData)
-
-    def __str__(self):
-        """String representation of this vector."""
-        return str(self._aData)
-
-    def __iter__(self):
-        """Iterator."""
-        return iter(self._aData)
-
 plugin = ClusterCardList
@@ -9,6 +9,7 @@
 from sutekh.gui.PluginManager import SutekhPlugin
 from sutekh.base.core.BaseTables import MapPhysicalCardToPhysicalCardSet
 from sutekh.base.core.BaseFilters import PhysicalCardSetFilter, FilterAndBox
+from sutekh.base.core.CardSetUtilities import get_total_card_count
 from sutekh.core.Filters import CryptCardFilter
 from sutekh.base.gui.plugins.BaseExtraColumns import (get_number,
                                                       format_number)
@@ -76,8 +77,7 @@ class ExtraCardSetListViewColumns(SutekhPlugin, BaseExtraCSListViewColumns):
                                     CryptCardFilter()])
             iCrypt = oFilter.select(
                 MapPhysicalCardToPhysicalCardSet).distinct().count()
-            iTot = MapPhysicalCardToPhysicalCardSet.selectBy(
-                physicalCardSetID=oCardSet.id).count()
+            iTot = get_total_card_count(oCardSet)
             return iTot - iCrypt
 
         if sCardSet:
@@ -7,15 +7,10 @@
 
 from gi.repository import GObject, Gtk, Pango
 
-from sutekh.base.core.BaseTables import (PhysicalCardSet, PhysicalCard,
-                                         AbstractCard)
+from sutekh.base.core.BaseTables import PhysicalCardSet, PhysicalCard
 from sutekh.base.core.BaseAdapters import (IAbstractCard, IPhysicalCard,
                                            IPhysicalCardSet)
-from sutekh.core.SutekhTables import SutekhAbstractCard
-from sutekh.base.core.BaseFilters import CardTypeFilter, FilterAndBox
-from sutekh.core.Filters import (MultiGroupFilter, MultiVirtueFilter,
-                                 MultiDisciplineFilter,
-                                 MultiDisciplineLevelFilter)
+from sutekh.core.CryptCardIndex import get_crypt_index, get_card_traits
 from sutekh.SutekhUtility import is_crypt_card, is_vampire
 from sutekh.gui.PluginManager import SutekhPlugin
 from sutekh.base.gui.SutekhDialog import (SutekhDialog, NotebookDialog,
@@ -24,60 +19,6 @@ from sutekh.base.gui.AutoScrolledWindow import AutoScrolledWindow
 from sutekh.base.gui.GuiCardSetFunctions import create_card_set
 
 
-def _gen_subsets(aData, iSetSize, iDepth=1):
-    """Generate subsets of the given size from a list"""
-    if iDepth > iSetSize:
-        return []
-    elif iDepth < 1:
-        return []
-    elif iDepth == iSetSize:
-        return [set([x]) for x in aData]
-    # I'm arguably overly fond of recursion
-    aNewSets = []
-    aSets = _gen_subsets(aData, iSetSize, iDepth + 1)
-    for oVal in aData:
-        for oSet in aSets:
-            if oVal not in oSet:
-                oNewSet = oSet.union(set([oVal]))
-                if oNewSet not in aNewSets:
-                    aNewSets.append(oNewSet)
-    return aNewSets
-
-
-def _get_groups(oCard):
-    """Get compatible groups ranges"""
-    # We ignore the any group cases as they are currently uninteresing
-    # and excluded by the discipline check
-    # If this ever changes, this will need to be revisited.
-    # pylint: disable=no-member
-    # SQLObject confuses pylint
-    iGrp = oCard.group
-    iMaxGrp = SutekhAbstractCard.select().max(SutekhAbstractCard.q.group)
-    iMax = min(iMaxGrp, iGrp + 1)
-    iMin = max(1, iGrp - 1)
-    return MultiGroupFilter(range(iMin, iMax + 1))
-
-
-def make_key(aSet, bSuperior):
-    """Create a suitable key"""
-    if bSuperior:
-        sKey = " & ".join(sorted([x.name.upper() for x in aSet]))
-    else:
-        sKey = " & ".join(sorted([x.name for x in aSet]))
-    return sKey
-
-
-def _make_superset(oCard, bSuperior, bVampire):
-    """Check if all elements of aSet match oCard"""
-    if bSuperior:
-        return set([oP.discipline for oP in oCard.discipline if
-                    oP.level == 'superior'])
-    elif bVampire:
-        return set([oP.discipline for oP in oCard.discipline])
-    # Imbued
-    return set(oCard.virtue)
-
-
 class FindLikeVampires(SutekhPlugin):
     """Create a list of vampires 'like' the selected vampire."""
 
@@ -93,6 +34,11 @@ class FindLikeVampires(SutekhPlugin):
                    compatible grouping that share the specified number of
                    disciplines or virtues with the selected crypt card.
 
+                   Several vampires (or several imbued) can be selected at
+                   once. The matches for each selected card are then listed
+                   separately, and cards with fewer disciplines or virtues
+                   than the number specified are matched on all of them.
+
                    More complex queries are possible by frist filtering the
                    card set and then using the 'Only match cards visible in
                    this pane' option to restrict the results of the crypt card
@@ -112,94 +58,107 @@ class FindLikeVampires(SutekhPlugin):
 
            Prompt the user for attributes that are important and so forth
            """
-        self.oSelCard = self._get_selected_crypt_card()
-        if not self.oSelCard:
-            do_complaint_error("Please select only 1 crypt card.")
+        self.aSelCards = self._get_selected_crypt_cards()
+        if not self.aSelCards:
+            do_complaint_error("Please select either vampires or imbued.")
             return
         # We treat imbued and vampires differently
         # pylint: disable=no-member
         # SQLObject confuses pylint
-        if is_vampire(self.oSelCard):
-            if not self.oSelCard.discipline:
+        if is_vampire(self.aSelCards[0]):
+            if not any(oCard.discipline for oCard in self.aSelCards):
                 do_complaint_error("Please select a vampire with disciplines.")
                 return
-            dGroups = self.find_vampires_like()
+            tOptions = self.ask_vampire_options()
         else:
-            if not self.oSelCard.virtue:
+            if not any(oCard.virtue for oCard in self.aSelCards):
                 do_complaint_error("Please select an Imbued with virtues.")
                 return
-            dGroups = self.find_imbued_like()
+            tOptions = self.ask_imbued_options()
+        if tOptions is None:
+            return
+        dGroups = self.find_like(*tOptions)
         if dGroups:
             self.display_results(dGroups)
     # pylint: enable=attribute-defined-outside-init
 
-    # pylint: disable=too-many-arguments
-    # need all these arguments to format results nicely
-    def _group_cards(self, aCards, iNum, aSubSets, bSuperior, bUseCardSet):
-        """Group the cards and return only cards with iNum or more
-           instances.
-
-           This works because of our database structure and query, which
-           ends up returning a match for each discipline in the discipline
-           filter that matches."""
-        aDistinct = set(aCards)
-        dResults = {}
-        aDistinct.remove(self.oSelCard)  # Don't match ourselves
-        bVampire = is_vampire(self.oSelCard)
+    def find_like(self, iNum, bSuperior, bUseCardSet):
+        """Look up the cards like the selected cards in the crypt index.
+
+           For a single card, we group the results by the subsets of iNum
+           disciplines or virtues. For several cards, we group the results
+           by the selected card."""
         if bUseCardSet:
-            aCardSetCards = set([IAbstractCard(x) for x in
-                                 self.model.get_card_iterator(
-                                     self.model.get_current_filter())])
+            aCandidates = set([IAbstractCard(x) for x in
+                               self.model.get_card_iterator(
+                                   self.model.get_current_filter())])
         else:
-            aCardSetCards = None
-        for oCard in list(aDistinct):
-            if aCards.count(oCard) < iNum:
-                aDistinct.remove(oCard)
-            elif bUseCardSet and oCard not in aCardSetCards:
-                # Remove cards not in the view from the results
-                aDistinct.remove(oCard)
-        dResults['all'] = aDistinct
-        for oCard in aDistinct:
-            aFullSet = _make_superset(oCard, bSuperior, bVampire)
-            for aSet in aSubSets:
-                # We only add the card if it has all elements of the set
-                if aSet.issubset(aFullSet):
-                    dResults.setdefault(make_key(aSet, bSuperior),
-                                        []).append(oCard)
-        return dResults
-    # pylint: enable=too-many-arguments
-
-    def _get_selected_crypt_card(self):
-        """Extract selected crypt card from the model."""
+            aCandidates = None
+        oIndex = get_crypt_index()
+        if len(self.aSelCards) == 1:
+            return oIndex.find_like(self.aSelCards[0], iNum, bSuperior,
+                                    aCandidates)
+        aSelected = set(self.aSelCards)
+        dGroups = {'all': set()}
+        for oCard, dResults in oIndex.find_like_many(
+                self.aSelCards, iNum, bSuperior, aCandidates).items():
+            aMatches = dResults['all'] - aSelected
+            dGroups['all'].update(aMatches)
+            if aMatches:
+                dGroups['Like %s' % oCard.name] = aMatches
+        return dGroups
+
+    def _get_selected_crypt_cards(self):
+        """Extract the selected crypt cards from the model.
+
+           The cards must either all be vampires or all be imbued."""
         # Only interested in distinct cards
-        aAbsCards = set(self._get_selected_abs_cards())
-        if len(aAbsCards) != 1:
+        aAbsCards = sorted(set(self._get_selected_abs_cards()),
+                           key=lambda x: x.name)
+        if not aAbsCards:
             return None
-        oCard = aAbsCards.pop()
-        if not is_crypt_card(oCard):
-            # Only want crypt cards
+        for oCard in aAbsCards:
+            if not is_crypt_card(oCard):
+                # Only want crypt cards
+                return None
+        if len(set([is_vampire(x) for x in aAbsCards])) != 1:
             return None
-        return oCard
+        return aAbsCards
+
+    def _get_card_names(self):
+        """Format the names of the selected cards"""
+        return ', '.join([x.name for x in self.aSelCards])
 
-    def find_vampires_like(self):
-        """Construct a vampire search from the card"""
+    def _make_options_dialog(self, sTitle):
+        """Create the dialog for the search options"""
         # pylint: disable=no-member
-        # SQLObject & Gtk confuse pylint
-        aFilters = [CardTypeFilter('Vampire'), _get_groups(self.oSelCard)]
-        oDialog = SutekhDialog('Find Vampires like', self.parent,
+        # Gtk confuses pylint
+        oDialog = SutekhDialog(sTitle, self.parent,
                                Gtk.DialogFlags.MODAL |
                                Gtk.DialogFlags.DESTROY_WITH_PARENT,
                                ("_OK", Gtk.ResponseType.OK,
                                 "_Cancel", Gtk.ResponseType.CANCEL))
-        oDialog.vbox.pack_start(
-            Gtk.Label(label='Find Vampires like %s' % self.oSelCard.name),
-            False, False, 0)
-        aDisciplines = [oP.discipline for oP in self.oSelCard.discipline]
-        aSuperior = [oP.discipline for oP in self.oSelCard.discipline if
-                     oP.level == 'superior']
+        oLabel = Gtk.Label(label='%s %s' % (sTitle, self._get_card_names()))
+        oLabel.set_line_wrap(True)
+        oDialog.vbox.pack_start(oLabel, False, False, 0)
         oUseCardSet = Gtk.CheckButton("Only match cards visible in this pane")
         oDialog.vbox.pack_start(oUseCardSet, False, True, 0)
-        if aSuperior:
+        return oDialog, oUseCardSet
+
+    def ask_vampire_options(self):
+        """Ask for the vampire search options.
+
+           Returns a tuple (number of disciplines, match superior, only
+           match the card set), or None if the user cancels."""
+        # pylint: disable=no-member
+        # SQLObject & Gtk confuse pylint
+        oDialog, oUseCardSet = self._make_options_dialog(
+            'Find Vampires like')
+        iDisciplines = max([len(get_card_traits(x, False)) for x in
+                            self.aSelCards])
+        iSuperior = max([len(get_card_traits(x, True)) for x in
+                         self.aSelCards])
+        if iSuperior:
             oDisciplines = Gtk.RadioButton(
                     group=None, label="Match Disciplines")
             oSuperior = Gtk.RadioButton(
@@ -213,10 +172,10 @@ class FindLikeVampires(SutekhPlugin):
         if oSuperior:
             oDialog.vbox.pack_start(oSuperior, False, True, 0)
             oDisciplines.connect('toggled', self._update_combo_box,
-                                 oComboBox, aDisciplines, aSuperior)
-        for iNum in range(1, len(aDisciplines) + 1):
+                                 oComboBox, iDisciplines, iSuperior)
+        for iNum in range(1, iDisciplines + 1):
             oComboBox.append_text('%d' % iNum)
-        if len(aDisciplines) > 1:
+        if iDisciplines > 1:
             oComboBox.set_active(1)
         else:
             oComboBox.set_active(0)
@@ -231,44 +190,24 @@ class FindLikeVampires(SutekhPlugin):
             oDialog.destroy()
             return None
         bUseCardSet = oUseCardSet.get_active()
-        sText = oComboBox.get_active_text()
-        iNum = int(sText)
-        bSuperior = oSuperior and oSuperior.get_active()
-        if bSuperior:
-            oDisciplineFilter = MultiDisciplineLevelFilter(
-                [(x.fullname, 'superior') for x in aSuperior])
-            aSets = _gen_subsets(aSuperior, iNum)
-        else:
-            oDisciplineFilter = MultiDisciplineFilter([
-                x.fullname for x in aDisciplines])
-            aSets = _gen_subsets(aDisciplines, iNum)
-        aFilters.append(oDisciplineFilter)
-        oFullFilter = FilterAndBox(aFilters)
+        iNum = int(oComboBox.get_active_text())
+        bSuperior = bool(oSuperior and oSuperior.get_active())
         oDialog.destroy()
-        aCandCards = list(oFullFilter.select(AbstractCard))
-        return self._group_cards(aCandCards, iNum, aSets, bSuperior,
-                                 bUseCardSet)
+        return iNum, bSuperior, bUseCardSet
+
+    def ask_imbued_options(self):
+        """Ask for the imbued search options.
 
-    def find_imbued_like(self):
-        """Construct a imbued search from the card"""
+           Returns a tuple as for ask_vampire_options."""
         # pylint: disable=no-member
         # SQLObject & Gtk confuse pylint
-        aFilters = [CardTypeFilter('Imbued'), _get_groups(self.oSelCard)]
-        oDialog = SutekhDialog('Find Imbued like', self.parent,
-                               Gtk.DialogFlags.MODAL |
-                               Gtk.DialogFlags.DESTROY_WITH_PARENT,
-                               ("_OK", Gtk.ResponseType.OK,
-                                "_Cancel", Gtk.ResponseType.CANCEL))
-        oDialog.vbox.pack_start(
-            Gtk.Label(label='Find Imbued like %s' % self.oSelCard.name),
-            False, False, 0)
-        oUseCardSet = Gtk.CheckButton("Only match cards visible in this pane")
-        oDialog.vbox.pack_start(oUseCardSet, False, True, 0)
+        oDialog, oUseCardSet = self._make_options_dialog('Find Imbued like')
         oDialog.vbox.pack_start(Gtk.Label(label="Match Virtues"), False, True, 0)
+        iVirtues = max([len(x.virtue) for x in self.aSelCards])
         oComboBox = Gtk.ComboBoxText()
-        for iNum in range(1, len(self.oSelCard.virtue) + 1):
+        for iNum in range(1, iVirtues + 1):
             oComboBox.append_text('%d' % iNum)
-        if len(self.oSelCard.virtue) > 1:
+        if iVirtues > 1:
             oComboBox.set_active(1)
         else:
             oComboBox.set_active(0)
@@ -282,34 +221,22 @@ class FindLikeVampires(SutekhPlugin):
         if iRes == Gtk.ResponseType.CANCEL:
             oDialog.destroy()
             return None
-        bUseCardSet = False
-        if oUseCardSet.get_active():
-            bUseCardSet = True
-        sText = oComboBox.get_active_text()
-        iNum = int(sText)
-        oVirtueFilter = MultiVirtueFilter([x.fullname for x in
-                                           self.oSelCard.virtue])
-        aSets = _gen_subsets(self.oSelCard.virtue, iNum)
-        aFilters.append(oVirtueFilter)
-        oFullFilter = FilterAndBox(aFilters)
+        bUseCardSet = oUseCardSet.get_active()
+        iNum = int(oComboBox.get_active_text())
         oDialog.destroy()
-        aCandCards = list(oFullFilter.select(AbstractCard))
-        return self._group_cards(aCandCards, iNum, aSets, False,
-                                 bUseCardSet)
+        return iNum, False, bUseCardSet
 
-    def _update_combo_box(self, oDiscipline, oComboBox, aDisciplines,
-                          aSuperior):
+    def _update_combo_box(self, oDiscipline, oComboBox, iDisciplines,
+                          iSuperior):
         """Update the combo box as required"""
         sText = oComboBox.get_active_text()
         iCurNum = int(sText)
         if oDiscipline.get_active():
             # Set to inf
-            iMax = len(aDisciplines)
-            iOldMax = len(aSuperior)
+            iMax = iDisciplines
         else:
             # set to superior
-            iMax = len(aSuperior)
-            iOldMax = len(aDisciplines)
+            iMax = iSuperior
         # clear combo box
         oComboBox.remove_all()
         # refill
@@ -326,11 +253,11 @@ class FindLikeVampires(SutekhPlugin):
         """Display the results nicely"""
         # pylint: disable=no-member
         # SQLObject and Gtk confuse pylint
-        bVampire = is_vampire(self.oSelCard)
+        bVampire = is_vampire(self.aSelCards[0])
         if bVampire:
-            sTitle = 'Vampires like %s' % self.oSelCard.name
+            sTitle = 'Vampires like %s' % self._get_card_names()
         else:
-            sTitle = 'Imbued like %s' % self.oSelCard.name
+            sTitle = 'Imbued like %s' % self._get_card_names()
         oResults = NotebookDialog(sTitle, self.parent,
                                   Gtk.DialogFlags.MODAL |
                                   Gtk.DialogFlags.DESTROY_WITH_PARENT,
@@ -348,7 +275,7 @@ class FindLikeVampires(SutekhPlugin):
             oView = LikeCardsView(dGroups[sSet], bVampire)
             oResults.add_widget_page(AutoScrolledWindow(oView), sSet)
         oActions = Gtk.HBox()
-        oToggle = Gtk.CheckButton('Include original card')
+        oToggle = Gtk.CheckButton('Include original cards')
         oToggle.connect('toggled', self._update_notebook, oResults)
         oActions.pack_start(oToggle, False, True, 0)
         oCreateCardSet = Gtk.Button(label='Create card set from selection')
@@ -364,10 +291,11 @@ class FindLikeVampires(SutekhPlugin):
         bInclude = oCheckBox.get_active()
         for oScroll in oDlg.iter_all_page_widgets():
             oModel = oScroll.get_child().get_model()
-            if bInclude:
-                oModel.add_card(self.oSelCard)
-            else:
-                oModel.remove_card(self.oSelCard)
+            for oCard in self.aSelCards:
+                if bInclude:
+                    oModel.add_card(oCard)
+                else:
+                    oModel.remove_card(oCard)
 
     def _make_cs(self, _oButton, oDlg):
         """Create a card set with the given cards"""
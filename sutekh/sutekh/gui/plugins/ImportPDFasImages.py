@@ -462,6 +462,7 @@ class ImportPDFImagesPlugin(SutekhPlugin):
                                              self._iScale * CARD_DIM[0],
                                              self._iScale * CARD_DIM[1])
         oPixbuf.savev(sFileName, "jpeg", ("quality",), ("98",))
+        self._oImageFrame.invalidate_image_manifest(sFileName)
         # Mark the card as used
         oAbsView.set_selected_used()
         # Advance to the next image
@@ -47,12 +47,19 @@ class OpeningHandSimulator(SutekhPlugin, BaseOpeningDraw):
                    hand and crypt. It is intended to give you some idea of how
                    the deck will work in practice. In addition, you can
                    generate example opening hands and crypts by clicking the
-                   _Draw sample hand_ button."""
+                   _Draw sample hand_ button.
+
+                   The _simulate hands_ button draws many opening hands,
+                   and shows how often each card type, card property,
+                   discipline and the selected cards appear in them, as
+                   well as how often the hand includes a master or event
+                   card which can be played on the first turn."""
 
     def __init__(self, *args, **kwargs):
         super(OpeningHandSimulator, self).__init__(*args, **kwargs)
         self.dCardTypes = {}
         self.dCardProperties = {}
+        self.dSelected = {}
         self.aLibrary = []
         self.aCrypt = []
         self.iMoreLib = 0
@@ -85,15 +92,45 @@ class OpeningHandSimulator(SutekhPlugin, BaseOpeningDraw):
             if aList:
                 self.dCardProperties[sFunction] = set([oC.name for oC in
                                                        aList])
+
+        aSelected = set(oC.name for oC in self._get_selected_abs_cards())
+        aSelected.intersection_update(oC.name for oC in self.aLibrary)
+        if aSelected:
+            self.dSelected['Selected cards'] = aSelected
         return True
 
     def _cleanup(self):
         """Cleanup"""
         self.dCardTypes = {}
         self.dCardProperties = {}
+        self.dSelected = {}
         self.aLibrary = []
         super(OpeningHandSimulator, self)._cleanup()
 
+    def _get_simulation_groups(self):
+        """Group the library cards by type, property and discipline"""
+        dDisciplines = {}
+        for oCard in self.aLibrary:
+            for oPair in oCard.discipline:
+                dDisciplines.setdefault(oPair.discipline.fullname,
+                                        set()).add(oCard.name)
+        # Masters and events can be played before we control any
+        # vampires
+        aTurnOne = set()
+        for sType in ('Master', 'Event'):
+            aTurnOne.update(self.dCardTypes.get(sType, set()))
+        aGroups = [
+            (self.aLibrary, 7, 'Card Types', self.dCardTypes),
+            (self.aLibrary, 7, 'Card Properties', self.dCardProperties),
+            (self.aLibrary, 7, 'Disciplines', dDisciplines),
+            (self.aLibrary, 7, 'Turn one',
+             {'Playable on turn one (Masters & Events)': aTurnOne}),
+        ]
+        if self.dSelected:
+            aGroups.append((self.aLibrary, 7, 'Custom groups',
+                            self.dSelected))
+        return aGroups
+
     def _fill_stats(self, oDialog):
         """Fill in the stats from the draws"""
         oHBox = Gtk.HBox(True, 3)
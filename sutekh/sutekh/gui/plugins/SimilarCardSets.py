@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Find the TWDA decks or card sets most similar to the current card set"""
+
+from gi.repository import Gtk
+
+from sutekh.base.core.BaseTables import PhysicalCardSet
+from sutekh.base.core.CardSetSimilarity import (CardSetSimilarityIndex,
+                                                COSINE, JACCARD)
+from sutekh.base.gui.SutekhDialog import SutekhDialog, do_complaint_error
+from sutekh.base.gui.AutoScrolledWindow import AutoScrolledWindow
+
+from sutekh.core.TWDAIndex import get_twda_deck_ids
+from sutekh.gui.PluginManager import SutekhPlugin
+
+TWDA_DECKS = 'TWDA decks'
+ALL_SETS = 'All card sets'
+
+METRIC_NAMES = {
+    'Cosine similarity': COSINE,
+    'Weighted Jaccard index': JACCARD,
+}
+
+
+class SimilarCardSets(SutekhPlugin):
+    """Find the card sets with the most similar card lists to the current
+       card set."""
+    dTableVersions = {PhysicalCardSet: (5, 6, 7)}
+    aModelsSupported = (PhysicalCardSet,)
+
+    sMenuName = "Find similar card sets"
+
+    sHelpCategory = "card_sets:analysis"
+
+    sHelpText = """This finds the card sets whose card lists are closest to
+                   the current card set, ignoring the card expansions. You
+                   can search either the tournament winning decks (if you
+                   have downloaded them) or all the card sets in the
+                   database.
+
+                   _Cosine similarity_ compares the proportions of each
+                   card in the card sets, so a card set is similar to a
+                   card set with twice as many copies of each card. The
+                   _Weighted Jaccard index_ is the number of cards in
+                   common divided by the total number of cards in either
+                   card set, so it also takes the card set size into
+                   account.
+
+                   The matching card sets can be opened as new panes by
+                   choosing the "Open cardset" option."""
+
+    # Shared by all the plugin instances, since it covers all the card
+    # sets and is kept up to date by listening for card set changes
+    _oIndex = None
+
+    def get_menu_item(self):
+        """Register with the 'Analyze' Menu"""
+        oSimilar = Gtk.MenuItem(label=self.sMenuName)
+        oSimilar.connect("activate", self.activate)
+        return ('Analyze', oSimilar)
+
+    @classmethod
+    def _get_index(cls):
+        """Return the similarity index, building it if needed."""
+        if cls._oIndex is None:
+            cls._oIndex = CardSetSimilarityIndex()
+            cls._oIndex.rebuild()
+            cls._oIndex.listen()
+        else:
+            cls._oIndex.ensure_current()
+        return cls._oIndex
+
+    def activate(self, _oWidget):
+        """Ask for the search options and show the results"""
+        # pylint: disable=no-member
+        # Gtk confuses pylint
+        oCardSet = self._get_card_set()
+        oDlg = SutekhDialog(self.sMenuName, self.parent,
+                            Gtk.DialogFlags.MODAL |
+                            Gtk.DialogFlags.DESTROY_WITH_PARENT,
+                            ("_OK", Gtk.ResponseType.OK,
+                             "_Cancel", Gtk.ResponseType.CANCEL))
+        oDlg.vbox.pack_start(
+            Gtk.Label(label='Find card sets like %s' % oCardSet.name),
+            False, False, 0)
+        oScope = Gtk.ComboBoxText()
+        for sScope in (TWDA_DECKS, ALL_SETS):
+            oScope.append_text(sScope)
+        oScope.set_active(0)
+        oMetric = Gtk.ComboBoxText()
+        for sName in sorted(METRIC_NAMES):
+            oMetric.append_text(sName)
+        oMetric.set_active(0)
+        oNumber = Gtk.SpinButton()
+        oNumber.set_adjustment(Gtk.Adjustment(value=20, lower=1, upper=500,
+                                              step_incr=1))
+        for sLabel, oWidget in (('Search: ', oScope), ('Using: ', oMetric),
+                                ('Number of results: ', oNumber)):
+            oHBox = Gtk.HBox(False, 2)
+            oHBox.pack_start(Gtk.Label(label=sLabel), False, True, 0)
+            oHBox.pack_start(oWidget, False, True, 0)
+            oDlg.vbox.pack_start(oHBox, False, True, 0)
+        oDlg.show_all()
+        iRes = oDlg.run()
+        sScope = oScope.get_active_text()
+        sMetric = METRIC_NAMES[oMetric.get_active_text()]
+        iTop = oNumber.get_value_as_int()
+        oDlg.destroy()
+        if iRes != Gtk.ResponseType.OK:
+            return
+
+        aCandidates = None
+        if sScope == TWDA_DECKS:
+            aCandidates = set(get_twda_deck_ids())
+            if not aCandidates:
+                do_complaint_error('No TWDA decks found in the database')
+                return
+        aResults = self._get_index().find_similar_card_sets(
+            oCardSet, iTop, sMetric, aCandidates)
+        self._show_results(oCardSet, aResults)
+
+    def _show_results(self, oCardSet, aResults):
+        """Show the results in a non-modal dialog"""
+        # pylint: disable=no-member
+        # Gtk confuses pylint
+        oDlg = SutekhDialog("Card sets similar to %s" % oCardSet.name,
+                            self.parent,
+                            Gtk.DialogFlags.DESTROY_WITH_PARENT,
+                            ("_Close", Gtk.ResponseType.CLOSE))
+        oDlg.connect('response', lambda dlg, but: dlg.destroy())
+        if not aResults:
+            oDlg.vbox.pack_start(Gtk.Label(label="No similar card sets found"),
+                                 True, True, 0)
+        else:
+            oInfo = Gtk.VBox(homogeneous=False, spacing=2)
+            for fScore, iSetId in aResults:
+                oCS = PhysicalCardSet.get(iSetId)
+                sName = oCS.name
+                if oCS.parent:
+                    sName = '%s (%s)' % (oCS.name, oCS.parent.name)
+                oHBox = Gtk.HBox(False, 2)
+                oHBox.pack_start(Gtk.Label(label='%.3f' % fScore),
+                                 False, True, 4)
+                oHBox.pack_start(Gtk.Label(label=sName), False, True, 4)
+                oButton = Gtk.Button(label="Open cardset")
+                oButton.connect('clicked', self._open_card_set, oCS.name)
+                oHBox.pack_end(oButton, False, True, 0)
+                oInfo.pack_start(oHBox, False, True, 0)
+            oDlg.vbox.pack_start(AutoScrolledWindow(oInfo), True, True, 0)
+            oDlg.set_default_size(600, 500)
+        oDlg.show_all()
+
+    def _open_card_set(self, _oButton, sName):
+        """Wrapper around open_cs to handle being called directly from a
+           Gtk widget"""
+        self._open_cs(sName)
+
+
+plugin = SimilarCardSets
@@ -5,7 +5,6 @@
 
 """Adds info about the TWDA decks cards are found in"""
 
-import re
 import datetime
 from logging import Logger
 from io import BytesIO
@@ -14,12 +13,8 @@ from gi.repository import Gtk
 
 from sqlobject import SQLObjectNotFound
 
-from sutekh.base.core.BaseTables import (PhysicalCardSet, PhysicalCard,
-                                         MapPhysicalCardToPhysicalCardSet)
-from sutekh.base.core.BaseAdapters import IAbstractCard, IPhysicalCardSet
-from sutekh.base.core.BaseFilters import (FilterOrBox, FilterAndBox,
-                                          SpecificCardFilter,
-                                          MultiPhysicalCardSetMapFilter)
+from sutekh.base.core.BaseTables import PhysicalCardSet, PhysicalCard
+from sutekh.base.core.BaseAdapters import IPhysicalCardSet
 from sutekh.base.io.UrlOps import urlopen_with_timeout, fetch_data, HashError
 from sutekh.base.gui.SutekhDialog import (SutekhDialog, NotebookDialog,
                                           do_complaint_error)
@@ -31,6 +26,8 @@ from sutekh.base.gui.SutekhFileWidget import add_filter
 from sutekh.base.gui.AutoScrolledWindow import AutoScrolledWindow
 from sutekh.base.gui.GuiDataPack import gui_error_handler
 
+from sutekh.core.TWDAIndex import (TWDA_HOLDER_REGEX, TWDAIndex,
+                                   get_twda_index, get_twda_index_file)
 from sutekh.io.DataPack import find_all_data_packs, DOC_URL
 from sutekh.io.ZipFileWrapper import ZipFileWrapper
 from sutekh.gui.PluginManager import SutekhPlugin
@@ -128,13 +125,44 @@ class TWDAConfigDialog(SutekhDialog):
         return find_all_data_packs('twd', fErrorHandler=gui_error_handler)
 
 
+class TWDAMinCardsDialog(SutekhDialog):
+    # pylint: disable=too-many-public-methods
+    # Gtk Widget, so has many public methods
+    """Dialog for choosing how many of the selected cards must match."""
+
+    def __init__(self, oParent, iTotCards):
+        super(TWDAMinCardsDialog, self).__init__(
+            'Find TWDA decks', oParent,
+            Gtk.DialogFlags.MODAL | Gtk.DialogFlags.DESTROY_WITH_PARENT,
+            ("_OK", Gtk.ResponseType.OK,
+             "_Cancel", Gtk.ResponseType.CANCEL))
+        oAdj = Gtk.Adjustment(value=min(2, iTotCards), lower=1,
+                              upper=iTotCards, step_incr=1)
+        self._oMinCards = Gtk.SpinButton()
+        self._oMinCards.set_adjustment(oAdj)
+
+        oHbox = Gtk.HBox()
+        oHbox.pack_start(Gtk.Label(
+            label="Match at least (of %d cards):" % iTotCards),
+            False, True, 5)
+        oHbox.pack_start(self._oMinCards, False, True, 0)
+        # pylint: disable=no-member
+        # vbox confuses pylint
+        self.vbox.pack_start(oHbox, False, True, 0)
+        self.show_all()
+
+    def get_min_cards(self):
+        """Return the number of cards chosen"""
+        return self._oMinCards.get_value_as_int()
+
+
 class TWDAInfoPlugin(SutekhPlugin):
     """Plugin providing access to TWDA decks."""
     dTableVersions = {PhysicalCardSet: (5, 6, 7)}
     aModelsSupported = (PhysicalCardSet, PhysicalCard, 'MainWindow')
 
     # pattern for TWDA holders
-    oTWDARegex = re.compile('^TWDA ([0-9]{4})$')
+    oTWDARegex = TWDA_HOLDER_REGEX
 
     dGlobalConfig = {
         'twda configured': 'option("Yes", "No", "Unasked", default="Unasked")',
@@ -142,6 +170,10 @@ class TWDAInfoPlugin(SutekhPlugin):
 
     sMenuName = "Find TWDA decks containing"
 
+    # Shared by all the plugin instances, since it covers all the TWDA
+    # decks and is kept up to date by listening for card set changes
+    _oIndex = None
+
     sHelpCategory = "card_sets:analysis"
 
     sHelpText = """If you have downloaded the database of tournament winning
@@ -149,8 +181,10 @@ class TWDAInfoPlugin(SutekhPlugin):
                    deck archive for decks containing specific combinations of
                    cards.
 
-                   You can either search for all the selected cards or for
-                   those that contain at least 1 of the selected cards.
+                   You can search for decks containing all the selected
+                   cards, those that contain at least 1 of the selected
+                   cards, or those containing at least a given number of the
+                   selected cards.
 
                    The results are grouped by year, and list the number of
                    matching card found in each listed deck. The matching
@@ -165,6 +199,7 @@ class TWDAInfoPlugin(SutekhPlugin):
         super(TWDAInfoPlugin, self).__init__(*args, **kwargs)
         self.oAllTWDA = None
         self.oAnyTWDA = None
+        self.oSomeTWDA = None
 
     def get_menu_item(self):
         """Overrides method from base class.
@@ -186,12 +221,12 @@ class TWDAInfoPlugin(SutekhPlugin):
         self.oAnyTWDA = Gtk.MenuItem(label="ANY selected cards")
         oSubMenu.add(self.oAnyTWDA)
         self.oAnyTWDA.connect("activate", self.find_twda, "any")
-        if self.check_enabled():
-            self.oAnyTWDA.set_sensitive(True)
-            self.oAllTWDA.set_sensitive(True)
-        else:
-            self.oAnyTWDA.set_sensitive(False)
-            self.oAllTWDA.set_sensitive(False)
+        self.oSomeTWDA = Gtk.MenuItem(label="AT LEAST N selected cards")
+        oSubMenu.add(self.oSomeTWDA)
+        self.oSomeTWDA.connect("activate", self.find_twda, "some")
+        bEnabled = self.check_enabled()
+        for oItem in (self.oAllTWDA, self.oAnyTWDA, self.oSomeTWDA):
+            oItem.set_sensitive(bEnabled)
         return ('Analyze', oTWDMenu)
 
     def find_twda(self, _oWidget, sMode):
@@ -201,45 +236,32 @@ class TWDAInfoPlugin(SutekhPlugin):
         if not aAbsCards:
             do_complaint_error('Need to select some cards for this plugin')
             return
-        if len(aAbsCards) > 20:
-            do_complaint_error('Too many cards selected (%d). Please select '
-                               'no more than 20 cards' % len(aAbsCards))
-            return
-        aCardFilters = []
         iTotCards = len(aAbsCards)
-        for oCard in aAbsCards:
-            aCardFilters.append(SpecificCardFilter(oCard))
-        # needs to be OR, since we're matching against the card to card set
-        # mapping table
-        oCardFilter = FilterOrBox(aCardFilters)
-        aNames = self._get_twda_names()
-        oMapFilter = MultiPhysicalCardSetMapFilter(aNames)
-        oFullFilter = FilterAndBox([oCardFilter, oMapFilter])
+        if sMode == 'any':
+            iMinCards = 1
+        elif sMode == 'all':
+            iMinCards = iTotCards
+        else:
+            oDlg = TWDAMinCardsDialog(self.parent, iTotCards)
+            iResponse = oDlg.run()
+            iMinCards = oDlg.get_min_cards()
+            oDlg.destroy()
+            if iResponse != Gtk.ResponseType.OK:
+                return
 
-        # pylint: disable=no-member
-        # SQLObject confuses pylint
         dCardSets = {}
-        for oMapCard in oFullFilter.select(MapPhysicalCardToPhysicalCardSet):
-            oCS = oMapCard.physicalCardSet
-            sCardName = IAbstractCard(oMapCard).name
-            dCardSets.setdefault(oCS, {})
-            dCardSets[oCS].setdefault(sCardName, 0)
-            dCardSets[oCS][sCardName] += 1
-
-        if sMode == 'all' and iTotCards > 1:
-            # This is a little clunky, but, because of how we construct the
-            # filters, we currently have the any match set, so we need to
-            # filter this down to those that match all the cards
-            for oCS in list(dCardSets):
-                if len(dCardSets[oCS]) != iTotCards:
-                    # Not all, so drop this one
-                    del dCardSets[oCS]
+        for iDeckId, dCards in self._get_index().find_decks(
+                aAbsCards, iMinCards).items():
+            dCardSets[PhysicalCardSet.get(iDeckId)] = dict(
+                (oCard.name, iCount) for oCard, iCount in dCards.items())
 
         sCards = '",  "'.join(sorted([x.name for x in aAbsCards]))
         if sMode == 'any':
             sMatchText = 'Matching ANY of "%s"' % sCards
-        else:
+        elif sMode == 'all':
             sMatchText = 'Matching ALL of "%s"' % sCards
+        else:
+            sMatchText = 'Matching AT LEAST %d of "%s"' % (iMinCards, sCards)
 
         # Create a dialog showing the results
         if dCardSets:
@@ -304,6 +326,43 @@ class TWDAInfoPlugin(SutekhPlugin):
            Gtk widget"""
         self._open_cs(oCS.name)
 
+    @classmethod
+    def _get_index(cls):
+        """Return the TWDA index, loading it if needed.
+
+           The index listens for card set changes, so it's only checked
+           against the database again after changes the signals don't
+           cover."""
+        if cls._oIndex is None:
+            cls._oIndex = get_twda_index(get_twda_index_file())
+            cls._oIndex.listen()
+        elif cls._oIndex.ensure_current():
+            cls._oIndex.save(get_twda_index_file())
+        return cls._oIndex
+
+    def update_to_new_db(self):
+        """Check the TWDA index against the new database before it's next
+           used."""
+        if self._oIndex is not None:
+            self._oIndex.invalidate()
+
+    @classmethod
+    def _rebuild_index(cls):
+        """Rebuild the TWDA index after the TWDA data has been replaced"""
+        if cls._oIndex is None:
+            cls._oIndex = TWDAIndex()
+            cls._oIndex.listen()
+        cls._oIndex.rebuild()
+        cls._oIndex.save(get_twda_index_file())
+
+    def _unzip_twda(self, aZipFiles, aToDelete):
+        """Unzip the TWDA data and rebuild the index"""
+        bResult = unzip_files_into_db(aZipFiles, "Adding TWDA Data",
+                                      self.parent, aToDelete)
+        if bResult:
+            self._rebuild_index()
+        return bResult
+
     def check_enabled(self):
         """check for TWD decks in the database and disable menu if not"""
         bEnabled = False
@@ -497,8 +556,7 @@ class TWDAInfoPlugin(SutekhPlugin):
             if oCS.parent.name in aToReplace:
                 aToDelete.append(oCS.name)
 
-        return unzip_files_into_db(aZipHolders, "Adding TWDA Data",
-                                   self.parent, aToDelete)
+        return self._unzip_twda(aZipHolders, aToDelete)
 
     def _unzip_twda_file(self, oFile):
         """Unzip a single zip file containing all the TWDA entries"""
@@ -516,8 +574,7 @@ class TWDAInfoPlugin(SutekhPlugin):
         # We do this to handle card sets being removed from the TWDA
         # correctly
         aToDelete = self._get_twda_names()
-        return unzip_files_into_db([oFile], "Adding TWDA Data", self.parent,
-                                   aToDelete)
+        return self._unzip_twda([oFile], aToDelete)
 
 
 plugin = TWDAInfoPlugin
@@ -15,7 +15,8 @@ from sutekh.base.io.SutekhBaseHTMLParser import LogStateWithInfo
 
 from sutekh.base.core.DBUtility import CARDLIST_UPDATE_DATE, set_metadata_date
 
-from sutekh.core.SutekhObjectMaker import SutekhObjectMaker
+from sutekh.core.SutekhObjectMaker import (SutekhObjectMaker,
+                                           SutekhBulkObjectMaker, CardRecord)
 from sutekh.base.Utility import move_articles_to_front
 
 BC_RARITIES = ['A1', 'A2', 'A3', 'A4', 'A5', 'A6',
@@ -267,10 +268,17 @@ class CardDict(dict):
         'Rebekka, Chantry Elder of Munich': {'stealth': 1},
     }
 
-    def __init__(self, oLogger):
+    def __init__(self, oLogger, oMaker=None):
         super(CardDict, self).__init__()
         self._oLogger = oLogger
-        self._oMaker = SutekhObjectMaker()
+        if oMaker is None:
+            oMaker = SutekhObjectMaker()
+        self._oMaker = oMaker
+
+    def make_new(self):
+        """Create an empty CardDict for the next card, sharing our
+           logger and object maker."""
+        return CardDict(self._oLogger, self._oMaker)
 
     def _find_crypt_keywords(self, oCard):
         """Extract the bleed, strength & stealth keywords from the card text"""
@@ -706,6 +714,10 @@ class CardDict(dict):
 
         self._add_physical_cards(oCard)
 
+        if isinstance(oCard, CardRecord):
+            # The bulk object maker will write this out later
+            return
+
         oCard.syncUpdate()
         # This is a bit hack'ish, but we also need to force an update of
         # the parent here.
@@ -755,7 +767,7 @@ class WaitingForCardName(LogStateWithInfo):
         if 'name' in self._dInfo:
             # Ensure we've saved existing card
             self._dInfo.save()
-        self._dInfo = CardDict(self._oLogger)
+        self._dInfo = self._dInfo.make_new()
 
 
 class InCard(LogStateWithInfo):
@@ -855,18 +867,30 @@ class InCardText(LogStateWithInfo):
 
 # Parser
 class WhiteWolfTextParser:
-    """Actual Parser for the WW cardlist text file(s)."""
+    """Actual Parser for the WW cardlist text file(s).
 
-    def __init__(self, oLogHandler):
+       If bBulk is True, new cards are held in memory while parsing and
+       written to the database with multi-row inserts once the entire
+       file has been parsed. This gives the same database contents,
+       but is much faster for full card lists."""
+
+    def __init__(self, oLogHandler, bBulk=False):
         self._oLogger = Logger('White wolf card parser')
         if oLogHandler is not None:
             self._oLogger.addHandler(oLogHandler)
         self._oState = None
+        self._oMaker = None
+        self._bBulk = bBulk
         self.reset()
 
     def reset(self):
         """Reset the parser"""
-        self._oState = WaitingForCardName({}, self._oLogger)
+        if self._bBulk:
+            self._oMaker = SutekhBulkObjectMaker()
+        else:
+            self._oMaker = SutekhObjectMaker()
+        self._oState = WaitingForCardName(
+            CardDict(self._oLogger, self._oMaker), self._oLogger)
 
     def parse(self, fIn):
         """Feed lines to the state machine"""
@@ -876,6 +900,8 @@ class WhiteWolfTextParser:
         self.feed('')
         if hasattr(self._oState, 'flush'):
             self._oState.flush()
+            if self._bBulk:
+                self._oMaker.write_cards()
             # We reached here without errors, so we set the update date to
             # today as the most sensible default for most situations and
             # assume the caller will fix it if that's not correct.
@@ -22,7 +22,7 @@ from sutekh.tests.TestData import (TEST_CARD_LIST, TEST_RULINGS,
 from sutekh.tests.TestCore import SutekhTest
 
 
-def create_db():
+def create_db(bBulk=True):
     """Create the database"""
     assert refresh_tables(TABLE_LIST, sqlhub.processConnection)
 
@@ -33,7 +33,7 @@ def create_db():
 
     oLogHandler = make_null_handler()
     read_lookup_data(EncodedFile(sLookupData), oLogHandler)
-    read_white_wolf_list(EncodedFile(sCardList), oLogHandler)
+    read_white_wolf_list(EncodedFile(sCardList), oLogHandler, bBulk)
     read_exp_info_file(EncodedFile(sExpJSON), oLogHandler)
     read_rulings(EncodedFile(sRulings), oLogHandler)
 
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the id cache of the cached related joins"""
+
+import unittest
+
+from sqlobject import sqlhub
+from sqlobject.sqlbuilder import Delete, Insert, Table, AND
+
+from sutekh.base.core.BaseAdapters import IAbstractCard
+from sutekh.base.core.BaseTables import AbstractCard, Keyword
+from sutekh.base.core.CachedRelatedJoin import get_cached_join, get_join_ids
+from sutekh.base.core.DBUtility import flush_cache, init_cache
+from sutekh.tests.TestCore import SutekhTest
+
+
+class CachedRelatedJoinTests(SutekhTest):
+    """Class for the cached join tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def test_ids(self):
+        """Test the id accessors match the joined objects"""
+        init_cache()
+        oJoin = get_cached_join(AbstractCard, 'keywords')
+        dIdMap = oJoin.get_id_map()
+        # pylint: disable=protected-access
+        # We check the object cache is only filled when needed
+        oCard = IAbstractCard('Ossian')
+        self.assertFalse(oCard.id in oJoin._dJoinCache)
+        aKeywords = oCard.keywords
+        self.assertTrue(oJoin._dJoinCache[oCard.id] is aKeywords)
+        for oCard in AbstractCard.select():
+            tIds = get_join_ids(oCard, 'keywords')
+            self.assertEqual(tIds, oJoin.get_ids(oCard.id))
+            self.assertEqual(sorted(tIds),
+                             sorted(x.id for x in oCard.keywords))
+            self.assertEqual(tIds, dIdMap.get(oCard.id, ()))
+
+    def test_invalidate(self):
+        """Test that changing the join updates the ids"""
+        for bInit in (True, False):
+            flush_cache()
+            if bInit:
+                init_cache()
+            oCard = IAbstractCard('Abebe')
+            tOrig = get_join_ids(oCard, 'keywords')
+            oKeyword = [x for x in Keyword.select() if x.id not in tOrig][0]
+            oCard.addKeyword(oKeyword)
+            self.assertTrue(oKeyword.id in get_join_ids(oCard, 'keywords'))
+            self.assertTrue(oKeyword in oCard.keywords)
+            oCard.removeKeyword(oKeyword)
+            self.assertEqual(get_join_ids(oCard, 'keywords'), tOrig)
+            self.assertFalse(oKeyword in oCard.keywords)
+
+    def test_unknown_ids(self):
+        """Test that rows added directly after filling the cache are seen"""
+        flush_cache()
+        init_cache()
+        oJoin = get_cached_join(AbstractCard, 'keywords')
+        oCard = [x for x in AbstractCard.select()
+                 if x.id not in oJoin.get_id_map()][0]
+        oKeyword = Keyword.select()[0]
+        # pylint: disable=protected-access
+        # We need to access _connection here
+        oConn = AbstractCard._connection
+        oConn.query(oConn.sqlrepr(Insert(
+            oJoin.intermediateTable,
+            values={oJoin.joinColumn: oCard.id,
+                    oJoin.otherColumn: oKeyword.id})))
+        self.assertEqual(get_join_ids(oCard, 'keywords'), (oKeyword.id,))
+        self.assertEqual(oCard.keywords, [oKeyword])
+        oTable = Table(oJoin.intermediateTable)
+        oConn.query(oConn.sqlrepr(Delete(oJoin.intermediateTable, where=AND(
+            getattr(oTable, oJoin.joinColumn) == oCard.id,
+            getattr(oTable, oJoin.otherColumn) == oKeyword.id))))
+        flush_cache()
+
+    def test_transaction(self):
+        """Test that reading a join inside a transaction keeps the cache"""
+        flush_cache()
+        init_cache()
+        oJoin = get_cached_join(AbstractCard, 'rarity')
+        iVersion = oJoin.iCacheVersion
+
+        def _read_rarity():
+            """Read the join using the transaction's connection"""
+            return IAbstractCard('Ossian').rarity
+
+        aRarity = sqlhub.doInTransaction(_read_rarity)
+        # pylint: disable=protected-access
+        # We check the cache isn't flushed
+        self.assertTrue(oJoin._bComplete)
+        self.assertEqual(oJoin.iCacheVersion, iVersion)
+        oCard = IAbstractCard('Ossian')
+        self.assertEqual(sorted(x.id for x in oCard.rarity),
+                         sorted(x.id for x in aRarity))
+        self.assertTrue(oJoin._bComplete)
+        self.assertEqual(oJoin.iCacheVersion, iVersion)
+
+
+if __name__ == "__main__":
+    unittest.main()
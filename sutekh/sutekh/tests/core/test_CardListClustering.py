@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the k-means clustering of card tables"""
+
+import random
+import unittest
+
+from sutekh.base.core.BaseAdapters import IAbstractCard
+from sutekh.base.core.BaseTables import AbstractCard
+from sutekh.core.CardListTabulator import CardListTabulator
+from sutekh.core.CardListClustering import (k_means, numpy, Vector,
+                                            ARRAY_METRICS, EUCLIDEAN, SUTEKH)
+from sutekh.tests.TestCore import SutekhTest
+
+
+class CardListClusteringTests(SutekhTest):
+    """Class for the clustering tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def _get_table(self):
+        """Tabulate the test card list"""
+        dPropFuncs = CardListTabulator.get_default_prop_funcs()
+        aColNames = sorted(dPropFuncs)
+        oTab = CardListTabulator(aColNames, dPropFuncs)
+        # pylint: disable=not-an-iterable
+        # SQLObject confuses pylint
+        aCards = [IAbstractCard(x) for x in AbstractCard.select()]
+        return oTab.tabulate(aCards)
+
+    def _check_result(self, aTable, aMeans, aClusters, iNumClust):
+        """Check that the clustering result is consistent"""
+        self.assertEqual(len(aMeans), iNumClust)
+        self.assertEqual(len(aClusters), iNumClust)
+        self.assertEqual(sorted(sum(aClusters, [])),
+                         list(range(len(aTable))))
+        for oMean in aMeans:
+            self.assertEqual(len(list(oMean)), len(aTable[0]))
+
+    def test_pure_python(self):
+        """Test the fallback implementation"""
+        self.assertEqual(k_means([], 4, 10, EUCLIDEAN, False), ([], []))
+        aTable = self._get_table()
+        for sMetric in (EUCLIDEAN, SUTEKH):
+            random.seed(42)
+            aMeans, aClusters = k_means(aTable, 4, 10, sMetric, False)
+            self._check_result(aTable, aMeans, aClusters, 4)
+
+    def test_simple_clusters(self):
+        """Test that obvious clusters are found"""
+        aTable = [[0, 0], [0, 1], [1, 0], [10, 10], [10, 11], [11, 10]]
+        for bUseNumpy in (True, False):
+            random.seed(1)
+            aMeans, aClusters = k_means(aTable, 2, 10, EUCLIDEAN, bUseNumpy)
+            self.assertEqual(sorted(aClusters), [[0, 1, 2], [3, 4, 5]])
+            aMeans = sorted(list(x) for x in aMeans)
+            self.assertAlmostEqual(aMeans[0][0], 1 / 3.0)
+            self.assertAlmostEqual(aMeans[1][1], 31 / 3.0)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_matches(self):
+        """Test that the NumPy implementation matches the pure python one"""
+        aTable = self._get_table()
+        aVectors = [Vector(x) for x in aTable]
+        for sMetric in (EUCLIDEAN, SUTEKH):
+            # Check the distance calculations agree
+            aArray = numpy.asarray(aTable, dtype=float)
+            fDist = Vector.METRICS[sMetric]
+            for iRow in (0, len(aTable) // 2, len(aTable) - 1):
+                aDists = ARRAY_METRICS[sMetric](aArray, aArray[iRow])
+                for iCard, oVec in enumerate(aVectors):
+                    self.assertAlmostEqual(
+                        aDists[iCard], fDist(oVec, aVectors[iRow]) ** 2)
+            # With the same seed, we should get the same clustering
+            for iNumClust in (2, 5):
+                random.seed(1234)
+                aMeans1, aClusters1 = k_means(aTable, iNumClust, 20,
+                                              sMetric, False)
+                random.seed(1234)
+                aMeans2, aClusters2 = k_means(aTable, iNumClust, 20,
+                                              sMetric, True)
+                self._check_result(aTable, aMeans2, aClusters2, iNumClust)
+                self.assertEqual(aClusters1, aClusters2)
+                for oMean1, oMean2 in zip(aMeans1, aMeans2):
+                    for fVal1, fVal2 in zip(oMean1, oMean2):
+                        self.assertAlmostEqual(fVal1, fVal2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the card list tabulator"""
+
+import unittest
+
+from sutekh.base.core.BaseTables import AbstractCard, PhysicalCard
+from sutekh.base.core.BaseAdapters import IAbstractCard
+from sutekh.core.CardListTabulator import (CardListTabulator, numpy,
+                                           get_card_table)
+from sutekh.tests.TestCore import SutekhTest
+
+
+class CardListTabulatorTests(SutekhTest):
+    """Class for the card list tabulator tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def test_columnar(self):
+        """Test the columnar table matches the property functions"""
+        # pylint: disable=not-an-iterable
+        # SQLObject confuses pylint
+        dPropFuncs = CardListTabulator.get_default_prop_funcs()
+        aColNames = sorted(dPropFuncs)
+        oTab = CardListTabulator(aColNames, dPropFuncs)
+        aCards = list(AbstractCard.select())
+        aTable = oTab.tabulate(aCards)
+        self.assertEqual(oTab.tabulate_array(aCards, False), aTable)
+        self.assertTrue(get_card_table() is get_card_table())
+        self.assertEqual(sorted(get_card_table().aColNames), aColNames)
+
+        # Subsets, with repeated cards, physical cards and a column
+        # that isn't in the columnar table
+        aSubset = [IAbstractCard('Abebe'), IAbstractCard('AK-47'),
+                   IAbstractCard('Abebe')] + list(PhysicalCard.select())[:5]
+        dPropFuncs['name length'] = lambda card: len(card.name)
+        aColNames = ['name length', 'group', 'discipline: Animalism',
+                     'card type: Vampire', 'name length']
+        oTab = CardListTabulator(aColNames, dPropFuncs)
+        aTable = oTab.tabulate(aSubset)
+        self.assertEqual(aTable[0][:4], [5, 4, 0, 1])
+        self.assertEqual(oTab.tabulate_array(aSubset, False), aTable)
+        if numpy is not None:
+            aArray = oTab.tabulate_array(aSubset)
+            self.assertEqual(aArray.shape, (8, 5))
+            self.assertEqual(aArray.tolist(), aTable)
+            oTab = CardListTabulator(aColNames[1:4], dPropFuncs)
+            self.assertEqual(oTab.tabulate_array(aSubset).tolist(),
+                             [x[1:4] for x in aTable])
+            self.assertEqual(oTab.tabulate_array([]).shape, (0, 3))
+
+        # Replacing a default property function overrides the columnar
+        # table
+        dPropFuncs['group'] = lambda card: 7
+        oTab = CardListTabulator(['group', 'card type: Vampire'],
+                                 dPropFuncs)
+        self.assertEqual(oTab.tabulate_array(aSubset[:2], False),
+                         [[7, 1], [7, 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
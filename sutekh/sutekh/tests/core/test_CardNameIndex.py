@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the card name index used to resolve misspelt card names"""
+
+import random
+import unittest
+
+from sutekh.base.core.BaseAdapters import IAbstractCard
+from sutekh.base.core.CardLookup import IndexedLookup
+from sutekh.base.core.CardNameIndex import (CardNameIndex, edit_distance,
+                                            normalise_card_name,
+                                            get_card_name_index)
+from sutekh.base.core.DBUtility import flush_cache
+from sutekh.tests.TestCore import SutekhTest
+
+
+class DummyCard:
+    """Minimal card, since the index only uses the name"""
+    # pylint: disable=too-few-public-methods
+    # Only need the name
+
+    def __init__(self, sName):
+        self.name = sName
+
+
+def _ref_edit_distance(sFirst, sSecond):
+    """Reference edit distance, filling in the full table"""
+    aTable = [[0] * (len(sSecond) + 1) for _iRow in range(len(sFirst) + 1)]
+    for iRow in range(len(sFirst) + 1):
+        aTable[iRow][0] = iRow
+    for iCol in range(len(sSecond) + 1):
+        aTable[0][iCol] = iCol
+    for iRow in range(1, len(sFirst) + 1):
+        for iCol in range(1, len(sSecond) + 1):
+            iCost = int(sFirst[iRow - 1] != sSecond[iCol - 1])
+            aTable[iRow][iCol] = min(aTable[iRow - 1][iCol] + 1,
+                                     aTable[iRow][iCol - 1] + 1,
+                                     aTable[iRow - 1][iCol - 1] + iCost)
+            if (iRow > 1 and iCol > 1 and
+                    sFirst[iRow - 1] == sSecond[iCol - 2] and
+                    sFirst[iRow - 2] == sSecond[iCol - 1]):
+                aTable[iRow][iCol] = min(aTable[iRow][iCol],
+                                         aTable[iRow - 2][iCol - 2] + 1)
+    return aTable[-1][-1]
+
+
+class CardNameIndexTests(SutekhTest):
+    """Class for the card name index tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def test_edit_distance(self):
+        """Test the edit distance calculation"""
+        self.assertEqual(edit_distance('kitten', 'sitting'), 3)
+        self.assertEqual(edit_distance('abcd', 'abdc'), 1)
+        self.assertEqual(edit_distance('', 'abc'), 3)
+        self.assertEqual(edit_distance('abc', ''), 3)
+        self.assertEqual(edit_distance('same', 'same'), 0)
+        oRandom = random.Random(42)
+        for _iNum in range(2000):
+            sFirst = ''.join(oRandom.choice('abc ') for _iChar in
+                             range(oRandom.randint(0, 10)))
+            sSecond = ''.join(oRandom.choice('abc ') for _iChar in
+                              range(oRandom.randint(0, 10)))
+            self.assertEqual(edit_distance(sFirst, sSecond),
+                             _ref_edit_distance(sFirst, sSecond),
+                             '%r %r' % (sFirst, sSecond))
+
+    def test_normalise(self):
+        """Test normalising card names"""
+        self.assertEqual(normalise_card_name('Path of Blood, The'),
+                         'path of blood')
+        self.assertEqual(normalise_card_name(u'L\xe1z\xe1r  Dobrescu'),
+                         'lazar dobrescu')
+        self.assertEqual(normalise_card_name('Anna "Dictatrix11" Suljic'),
+                         'anna dictatrix11 suljic')
+        self.assertEqual(normalise_card_name('...'), '')
+
+    def test_lookup(self):
+        """Test looking up misspelt names"""
+        oIndex = get_card_name_index()
+        self.assertTrue(get_card_name_index() is oIndex)
+        oCard = IAbstractCard('Anastasz di Zagreb')
+        aMatches = oIndex.lookup('Anastasz de Zagreb')
+        self.assertEqual(aMatches[0][0], oCard)
+        self.assertTrue(0.9 < aMatches[0][1] < 1.0)
+        self.assertEqual(oIndex.best_match('Anastasz de Zagreb'), oCard)
+        # Transposed letters
+        self.assertEqual(oIndex.best_match('Aaron Bathrust'),
+                         IAbstractCard('Aaron Bathurst'))
+        # Accents and articles are ignored
+        self.assertEqual(oIndex.lookup('Swallowed by Night', 1),
+                         [(IAbstractCard('Swallowed by the Night'), 1.0)])
+        self.assertEqual(oIndex.best_match('Etienne Fauberge'),
+                         IAbstractCard(u'\xc9tienne Fauberge'))
+        # Misspelt lookup hint
+        self.assertEqual(oIndex.best_match('Ankara Citadl'),
+                         IAbstractCard('The Ankara Citadel, Turkey'))
+        # Too far from any card to accept
+        self.assertEqual(oIndex.best_match('Hunting Ground'), None)
+        self.assertEqual(
+            [x[0].name for x in oIndex.lookup('Hunting Ground')],
+            ['Park Hunting Ground', 'Political Hunting Ground'])
+        self.assertEqual(oIndex.lookup('Completely Unrelated'), [])
+        self.assertEqual(oIndex.lookup(''), [])
+        # Flushing the caches clears the index
+        flush_cache()
+        self.assertFalse(get_card_name_index() is oIndex)
+
+    def test_ambiguous(self):
+        """Test that ambiguous matches aren't accepted"""
+        oIndex = CardNameIndex()
+        oFirst = DummyCard('Hidden Lurker')
+        oSecond = DummyCard('Hidden Lurkers')
+        oIndex.add_name(oFirst.name, oFirst)
+        self.assertEqual(oIndex.best_match('Hiden Lurker'), oFirst)
+        oIndex.add_name(oSecond.name, oSecond)
+        self.assertEqual(len(oIndex), 2)
+        self.assertEqual(oIndex.best_match('Hidden Lurkers'), oSecond)
+        self.assertEqual(oIndex.best_match('Hiden Lurker'), oFirst)
+        self.assertEqual(oIndex.best_match('Hidden Lurkerz'), None)
+        self.assertEqual(
+            [x[0] for x in oIndex.lookup('Hidden Lurkerz')],
+            [oFirst, oSecond])
+
+    def test_indexed_lookup(self):
+        """Test the lookup which accepts close matches"""
+        oLookup = IndexedLookup()
+        self.assertEqual(
+            oLookup.lookup(['Ghoul Retainr', 'Abebe', 'No such card', None],
+                           'Test'),
+            [IAbstractCard('Ghoul Retainer'), IAbstractCard('Abebe'), None,
+             None])
+        oLookup = IndexedLookup(1.0)
+        self.assertEqual(oLookup.lookup(['Ghoul Retainr'], 'Test'), [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the card set similarity index"""
+
+import math
+import unittest
+
+from sqlobject.sqlbuilder import Table, Update, AND
+
+from sutekh.base.core.BaseTables import (PhysicalCardSet,
+                                         MapPhysicalCardToPhysicalCardSet)
+from sutekh.base.core.BaseAdapters import IAbstractCard, IPhysicalCard
+from sutekh.base.core.CardSetUtilities import (change_card_sets,
+                                               delete_physical_card_set)
+from sutekh.base.core.CardSetSimilarity import (CardSetSimilarityIndex,
+                                                COSINE, JACCARD)
+from sutekh.tests.TestCore import SutekhTest
+
+
+def make_set(sName, dCards):
+    """Create a card set with the given card name : count"""
+    oCardSet = PhysicalCardSet(name=sName)
+    change_card_sets({oCardSet: dict(
+        (IPhysicalCard((IAbstractCard(sCard), None)), iCount)
+        for sCard, iCount in dCards.items())})
+    return oCardSet
+
+
+class CardSetSimilarityTests(SutekhTest):
+    """Class for the card set similarity tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def test_find_similar(self):
+        """Test the similarity measures"""
+        oBase = make_set('Base', {'AK-47': 2, 'Abebe': 1})
+        oDouble = make_set('Double', {'AK-47': 4, 'Abebe': 2})
+        oOverlap = make_set('Overlap', {'AK-47': 1, 'Aire of Elation': 3})
+        _oDisjoint = make_set('Disjoint', {'Alan Sovereign (Advanced)': 1})
+        oIndex = CardSetSimilarityIndex()
+        oIndex.rebuild()
+
+        aResults = oIndex.find_similar_card_sets(oBase, 10, COSINE)
+        self.assertEqual([x[1] for x in aResults], [oDouble.id, oOverlap.id])
+        self.assertAlmostEqual(aResults[0][0], 1.0)
+        self.assertAlmostEqual(aResults[1][0],
+                               2 / (math.sqrt(5) * math.sqrt(10)))
+
+        # min counts: 2 + 1 with Double, 1 with Overlap
+        aResults = oIndex.find_similar_card_sets(oBase, 10, JACCARD)
+        self.assertEqual(aResults, [(3 / 6, oDouble.id),
+                                    (1 / 6, oOverlap.id)])
+
+        self.assertEqual(len(oIndex.find_similar_card_sets(oBase, 1)), 1)
+        self.assertEqual([x[1] for x in oIndex.find_similar_card_sets(
+            oBase, 10, COSINE, set([oOverlap.id]))], [oOverlap.id])
+        self.assertRaises(ValueError, oIndex.find_similar, {1: 1}, 10,
+                          'unknown')
+
+    def test_updates(self):
+        """Test keeping the index up to date"""
+        oBase = make_set('Base', {'AK-47': 2, 'Abebe': 1})
+        oOther = make_set('Other', {'Aire of Elation': 1})
+        oIndex = CardSetSimilarityIndex()
+        oIndex.rebuild()
+        oIndex.listen()
+        try:
+            self.assertEqual(oIndex.find_similar_card_sets(oBase), [])
+            change_card_sets({oOther: {
+                IPhysicalCard((IAbstractCard('Abebe'), None)): 1}})
+            self.assertTrue(oIndex.is_current())
+            self.assertEqual([x[1] for x in
+                              oIndex.find_similar_card_sets(oBase)],
+                             [oOther.id])
+            oNew = make_set('New', {'AK-47': 2, 'Abebe': 1})
+            self.assertTrue(oIndex.is_current())
+            self.assertEqual([x[1] for x in
+                              oIndex.find_similar_card_sets(oBase)],
+                             [oNew.id, oOther.id])
+            delete_physical_card_set('New')
+            self.assertTrue(oIndex.is_current())
+            self.assertEqual([x[1] for x in
+                              oIndex.find_similar_card_sets(oBase)],
+                             [oOther.id])
+        finally:
+            oIndex.cleanup()
+        # Changes are no longer tracked, but are caught by ensure_current
+        make_set('Later', {'AK-47': 1})
+        self.assertFalse(oIndex.is_current())
+        oIndex.ensure_current()
+        self.assertTrue(oIndex.is_current())
+        self.assertEqual(len(oIndex.find_similar_card_sets(oBase)), 2)
+
+    def test_direct_changes(self):
+        """Test that replacing a card behind the index's back is caught"""
+        oBase = make_set('Base', {'AK-47': 2, 'Abebe': 1})
+        oOther = make_set('Other', {'Aire of Elation': 1})
+        oIndex = CardSetSimilarityIndex()
+        oIndex.rebuild()
+        self.assertTrue(oIndex.is_current())
+        self.assertEqual(oIndex.find_similar_card_sets(oBase), [])
+        # Same number of card sets and cards, but a different card
+        oOld = IPhysicalCard((IAbstractCard('Aire of Elation'), None))
+        oNew = IPhysicalCard((IAbstractCard('Abebe'), None))
+        # pylint: disable=protected-access
+        # We need to access _connection here
+        oConn = PhysicalCardSet._connection
+        oMap = Table(MapPhysicalCardToPhysicalCardSet.sqlmeta.table)
+        oConn.query(oConn.sqlrepr(Update(
+            MapPhysicalCardToPhysicalCardSet.sqlmeta.table,
+            {'physical_card_id': oNew.id},
+            where=AND(oMap.physical_card_set_id == oOther.id,
+                      oMap.physical_card_id == oOld.id))))
+        self.assertFalse(oIndex.is_current())
+        oIndex.ensure_current()
+        self.assertTrue(oIndex.is_current())
+        self.assertEqual([x[1] for x in
+                          oIndex.find_similar_card_sets(oBase)],
+                         [oOther.id])
+
+
+if __name__ == "__main__":
+    unittest.main()
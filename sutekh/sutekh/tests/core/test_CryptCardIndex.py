@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the crypt card index used to find similar crypt cards"""
+
+import unittest
+
+from sutekh.base.core.BaseTables import AbstractCard
+from sutekh.base.core.BaseAdapters import IAbstractCard
+from sutekh.base.core.BaseFilters import CardTypeFilter, FilterAndBox
+from sutekh.core.Filters import (MultiGroupFilter, MultiVirtueFilter,
+                                 MultiDisciplineFilter,
+                                 MultiDisciplineLevelFilter)
+from sutekh.core.CryptCardIndex import (get_crypt_index, get_card_traits,
+                                        make_key)
+from sutekh.tests.TestCore import SutekhTest
+
+
+def find_like_with_filters(oCard, iNum, bSuperior):
+    """Find the matching cards using the database filters"""
+    # pylint: disable=no-member
+    # SQLObject confuses pylint
+    if oCard.virtue:
+        sType = 'Imbued'
+        oTraitFilter = MultiVirtueFilter([x.fullname for x in
+                                          oCard.virtue])
+    elif bSuperior:
+        sType = 'Vampire'
+        oTraitFilter = MultiDisciplineLevelFilter(
+            [(x.fullname, 'superior') for x in
+             get_card_traits(oCard, True)])
+    else:
+        sType = 'Vampire'
+        oTraitFilter = MultiDisciplineFilter(
+            [x.fullname for x in get_card_traits(oCard, False)])
+    oFilter = FilterAndBox([
+        CardTypeFilter(sType),
+        MultiGroupFilter(range(max(1, oCard.group - 1), oCard.group + 2)),
+        oTraitFilter])
+    aCards = list(oFilter.select(AbstractCard))
+    return set([x for x in aCards if aCards.count(x) >= iNum]) - set([oCard])
+
+
+class CryptCardIndexTests(SutekhTest):
+    """Class for the crypt card index tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def test_matches_filters(self):
+        """Test the index gives the same results as the filters"""
+        oIndex = get_crypt_index()
+        self.assertTrue(get_crypt_index() is oIndex)
+        aCrypt = list(CardTypeFilter('Vampire').select(AbstractCard)) + \
+            list(CardTypeFilter('Imbued').select(AbstractCard))
+        iChecked = 0
+        for oCard in aCrypt:
+            for bSuperior in (False, True):
+                if bSuperior and oCard.virtue:
+                    continue
+                aTraits = get_card_traits(oCard, bSuperior)
+                for iNum in range(1, len(aTraits) + 1):
+                    dResults = oIndex.find_like(oCard, iNum, bSuperior)
+                    self.assertEqual(
+                        dResults['all'],
+                        find_like_with_filters(oCard, iNum, bSuperior),
+                        '%s %d %s' % (oCard.name, iNum, bSuperior))
+                    iChecked += 1
+        self.assertTrue(iChecked > 10)
+
+    def test_subsets(self):
+        """Test grouping by subsets and batched lookups"""
+        oIndex = get_crypt_index()
+        oCard = IAbstractCard('Abebe')
+        aTraits = get_card_traits(oCard, False)
+        dResults = oIndex.find_like(oCard, 1)
+        self.assertEqual(len(dResults['all']), 9)
+        for oDis in aTraits:
+            sKey = make_key([oDis], False)
+            for oMatch in dResults.get(sKey, []):
+                self.assertTrue(oDis in get_card_traits(oMatch, False))
+                self.assertTrue(oMatch in dResults['all'])
+        dResults = oIndex.find_like(oCard, 2)
+        self.assertEqual(sorted(dResults), ['all', 'nec & obf'])
+
+        oImbued = IAbstractCard('Inez "Nurse216" Villagrande')
+        aCards = [oImbued, oCard]
+        dMany = oIndex.find_like_many(aCards, 10)
+        self.assertEqual(sorted(dMany, key=lambda x: x.name),
+                         sorted(aCards, key=lambda x: x.name))
+        self.assertEqual(dMany[oCard]['all'],
+                         oIndex.find_like(oCard, len(aTraits))['all'])
+        self.assertEqual(
+            oIndex.find_like(oCard, 1, aCandidates=set())['all'], set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,17 +12,18 @@ from io import StringIO
 import sys
 
 from sqlobject import sqlhub, connectionForURI
+from sqlobject.sqlbuilder import Table, Select, Insert, Delete
 
 from sutekh.base.core.BaseDBManagement import copy_to_new_abstract_card_db
 from sutekh.base.core.CardLookup import SimpleLookup
-from sutekh.base.core.BaseTables import (AbstractCard, PhysicalCardSet,
-                                         PhysicalCard, Printing, Expansion,
-                                         VersionTable)
+from sutekh.base.core.BaseTables import (
+    AbstractCard, PhysicalCardSet, PhysicalCard, Printing, Expansion,
+    VersionTable, MapPhysicalCardToPhysicalCardSet)
 from sutekh.base.core.BaseAdapters import (IAbstractCard, IPhysicalCardSet,
                                            IPhysicalCard, IPrinting,
                                            IExpansion)
 from sutekh.base.core.DatabaseVersion import DatabaseVersion
-from sutekh.base.core.DBUtility import flush_cache
+from sutekh.base.core.DBUtility import flush_cache, refresh_tables
 from sutekh.base.tests.TestUtils import make_null_handler, make_card
 
 from sutekh.core.DatabaseUpgrade import DBUpgradeManager
@@ -1635,6 +1636,87 @@ class DatabaseUpgradeTests(SutekhTest):
         assert oPCS1.parent == oMyCollection
         oNewConn.close()
 
+    def test_bulk_copy(self):
+        """Test that copying the database preserves the table contents"""
+        # pylint: disable=no-member
+        # SQLObject confuses pylint
+        # Ensure the card set ids in the copy don't match the original
+        oDeleted = PhysicalCardSet(name="Deleted")
+        PhysicalCardSet.delete(oDeleted.id)
+        oMyCollection = PhysicalCardSet(name="My Collection")
+        oPCS1 = PhysicalCardSet(name="PCS1", parent=oMyCollection)
+        oMagnum = make_card(".44 magnum", "Jyhad")
+        oGrapple = make_card("Immortal Grapple", "KoT")
+        for oCard in (oMagnum, oMagnum, oGrapple):
+            oMyCollection.addPhysicalCard(oCard)
+        oPCS1.addPhysicalCard(oGrapple)
+
+        oOrigConn = sqlhub.processConnection
+        # Orphaned card set entries should be skipped, rather than
+        # aborting the copy
+        oOrigConn.query(oOrigConn.sqlrepr(Insert(
+            MapPhysicalCardToPhysicalCardSet.sqlmeta.table,
+            values={'physical_card_id': oGrapple.id,
+                    'physical_card_set_id': oDeleted.id})))
+        sDbFile = self._create_tmp_file()
+        # windows is different, since we don't have a starting / for the path
+        if sys.platform.startswith("win"):
+            oNewConn = connectionForURI("sqlite:///%s" % sDbFile)
+        else:
+            oNewConn = connectionForURI("sqlite://%s" % sDbFile)
+        refresh_tables(TABLE_LIST, oNewConn, False)
+
+        oDBUpgrade = DBUpgradeManager()
+        bResult, _aMsgs = oDBUpgrade.copy_database(oOrigConn, oNewConn,
+                                                   make_null_handler())
+        self.assertTrue(bResult)
+        oOrigConn.query(oOrigConn.sqlrepr(Delete(
+            MapPhysicalCardToPhysicalCardSet.sqlmeta.table,
+            where=MapPhysicalCardToPhysicalCardSet.q.physicalCardSet ==
+            oDeleted.id)))
+
+        def get_rows(cTable, oConn):
+            """Get the table contents, skipping the ids for the mapping
+               tables, which get new ids."""
+            oTable = Table(cTable.sqlmeta.table)
+            aCols = [getattr(oTable, oCol.dbName) for oCol in
+                     cTable.sqlmeta.columnList]
+            if not cTable.sqlmeta.table.endswith('_map'):
+                aCols.insert(0, getattr(oTable, cTable.sqlmeta.idName))
+            # Some columns may be NULL, so we sort on the repr
+            return sorted(oConn.queryAll(oConn.sqlrepr(Select(aCols))),
+                          key=repr)
+
+        for cTable in TABLE_LIST:
+            if cTable in (PhysicalCardSet, MapPhysicalCardToPhysicalCardSet):
+                continue
+            self.assertEqual(get_rows(cTable, oOrigConn),
+                             get_rows(cTable, oNewConn))
+
+        def get_cards(oConn):
+            """Get the card set contents by name"""
+            dSets = dict((oSet.id, oSet.name) for oSet in
+                         PhysicalCardSet.select(connection=oConn))
+            return sorted((dSets[oRow.physicalCardSetID],
+                           oRow.physicalCardID) for oRow in
+                          MapPhysicalCardToPhysicalCardSet.select(
+                              connection=oConn))
+
+        aMap = get_cards(oNewConn)
+        self.assertEqual(aMap, get_cards(oOrigConn))
+        self.assertEqual(aMap, sorted([('My Collection', oMagnum.id),
+                                       ('My Collection', oMagnum.id),
+                                       ('My Collection', oGrapple.id),
+                                       ('PCS1', oGrapple.id)]))
+        self.assertNotEqual(
+            PhysicalCardSet.selectBy(name='PCS1',
+                                     connection=oNewConn).getOne().id,
+            oPCS1.id)
+        self.assertEqual(
+            PhysicalCardSet.selectBy(name='PCS1', connection=oNewConn
+                                     ).getOne().parent.name, 'My Collection')
+        oNewConn.close()
+
     def test_upgrade_old_version(self):
         """Test upgrading from 0.8"""
         # We only run this test if using sqlite, since iterdump isn't part
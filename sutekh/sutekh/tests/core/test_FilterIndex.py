@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the in-memory filter evaluation"""
+
+import unittest
+
+from sutekh.base.core.BaseTables import AbstractCard, PhysicalCard
+from sutekh.base.core.BaseFilters import make_illegal_filter
+from sutekh.base.core.DBUtility import get_cached_joins
+from sutekh.base.core.BaseAdapters import IAbstractCard, IKeyword
+from sutekh.base.core.FilterIndex import (FilterIndex, set_filter_index,
+                                          like_to_regex, ids_to_bitmap,
+                                          bitmap_to_ids)
+from sutekh.core import Filters
+from sutekh.tests.core import test_Filters
+
+
+class FilterIndexTests(test_Filters.FilterTests):
+    """Rerun the filter tests using the filter index.
+
+       This also checks that the index gives the same results as
+       the SQL queries."""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    # pylint: disable=invalid-name
+    # setUp + tearDown names are needed by unittest - use their convention
+    def setUp(self):
+        """Enable the filter index"""
+        super().setUp()
+        self.oIndex = FilterIndex(get_cached_joins())
+        set_filter_index(self.oIndex)
+
+    def tearDown(self):
+        """Disable the filter index"""
+        set_filter_index(None)
+        super().tearDown()
+
+    # pylint: enable=invalid-name
+
+    def test_like(self):
+        """Test converting LIKE patterns"""
+        self.assertTrue(like_to_regex('%ab_c%').fullmatch('xxabxcyy'))
+        self.assertFalse(like_to_regex('%ab_c%').fullmatch('abc'))
+        self.assertTrue(like_to_regex('a.b%').fullmatch('a.b'))
+        self.assertFalse(like_to_regex('a.b%').fullmatch('axb'))
+
+    def test_bitmaps(self):
+        """Test the bitmap helpers"""
+        self.assertEqual(ids_to_bitmap([]), 0)
+        self.assertEqual(ids_to_bitmap([0, 3, 5]), 0b101001)
+        self.assertEqual(bitmap_to_ids(0), [])
+        self.assertEqual(bitmap_to_ids(0b101001), [0, 3, 5])
+        aIds = [1, 7, 64, 65, 300]
+        self.assertEqual(bitmap_to_ids(ids_to_bitmap(aIds)), aIds)
+
+    def test_join_changes(self):
+        """Test that the index follows changes to the joins"""
+        oKeyword = IKeyword('not for legal play')
+        oFilter = Filters.KeywordFilter('not for legal play')
+        aOrig = self.oIndex.card_ids(oFilter)
+        oCard = IAbstractCard('Abebe')
+        self.assertFalse(oCard.id in aOrig)
+        oCard.addKeyword(oKeyword)
+        self.assertTrue(oCard.id in self.oIndex.card_ids(oFilter))
+        oCard.removeKeyword(oKeyword)
+        self.assertEqual(self.oIndex.card_ids(oFilter), aOrig)
+
+    def test_backends(self):
+        """Test that the index and the SQL queries match"""
+        aFilters = [
+            Filters.MultiClanFilter(['Ravnos', 'Samedi']),
+            Filters.FilterAndBox([Filters.CardTypeFilter('Vampire'),
+                                  Filters.FilterNot(
+                                      Filters.DisciplineFilter('obf'))]),
+            Filters.FilterOrBox([Filters.MultiCostFilter([0, 2]),
+                                 Filters.CardNameFilter('%an%')]),
+            Filters.CardTextFilter('+1 stealth'),
+            Filters.MultiGroupFilter(['Any', '2']),
+            Filters.CardFunctionFilter(
+                Filters.CardFunctionFilter.get_values()),
+            make_illegal_filter(),
+        ]
+        for oFilter in aFilters:
+            # All of these can be evaluated without SQL
+            self.assertNotEqual(oFilter.get_card_bitmap(self.oIndex), None)
+            oPhysFilter = Filters.FilterAndBox(
+                [Filters.PhysicalCardFilter(), oFilter])
+            for cClass, oFullFilter in ((AbstractCard, oFilter),
+                                        (PhysicalCard, oPhysFilter)):
+                set_filter_index(None)
+                aSQL = sorted(oFullFilter.select(cClass).distinct(),
+                              key=lambda x: x.id)
+                set_filter_index(self.oIndex)
+                aIndex = sorted(oFullFilter.select(cClass).distinct(),
+                                key=lambda x: x.id)
+                self.assertEqual(aIndex, aSQL)
+        # Physical card filters can't be evaluated in memory
+        oFilter = Filters.FilterAndBox(
+            [Filters.PhysicalCardFilter(),
+             Filters.PhysicalExpansionFilter('Jyhad')])
+        self.assertEqual(self.oIndex.card_bitmap(oFilter), None)
+        self.assertEqual(self.oIndex.select(oFilter, PhysicalCard), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
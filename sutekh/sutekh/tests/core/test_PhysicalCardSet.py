@@ -7,13 +7,26 @@
 
 import unittest
 
+from mock import patch
 from sqlobject import SQLObjectNotFound
 
 from sutekh.base.core.BaseTables import (PhysicalCardSet,
                                          MapPhysicalCardToPhysicalCardSet)
 from sutekh.base.core.BaseAdapters import IAbstractCard, IPhysicalCardSet
 from sutekh.base.tests.TestUtils import make_card
-from sutekh.base.core.CardSetUtilities import delete_physical_card_set
+from sutekh.base.core.BaseFilters import (FilterAndBox,
+                                          PhysicalCardSetFilter,
+                                          CardTypeFilter)
+from sutekh.base.core.DBSignals import (listen_changed, disconnect_changed,
+                                        send_changed_signal,
+                                        batch_changed_signals)
+from sutekh.base.core.CardSetUtilities import (delete_physical_card_set,
+                                               get_card_counts,
+                                               get_card_count,
+                                               get_total_card_count,
+                                               iter_physical_cards,
+                                               get_filtered_card_counts,
+                                               change_card_sets)
 
 from sutekh.tests.TestCore import SutekhTest
 
@@ -257,6 +270,166 @@ class PhysicalCardSetTests(SutekhTest):
             MapPhysicalCardToPhysicalCardSet.selectBy(
                 physicalCardID=aAddedPhysCards[4].id).count(), 0)
 
+    def test_card_counts(self):
+        """Test counting the card set contents"""
+        # pylint: disable=no-member
+        # SQLObject confuses pylint
+        aAddedPhysCards = get_phys_cards()
+        oPhysCardSet1 = make_set_1()
+        oMagnum = aAddedPhysCards[0]
+        oAK = aAddedPhysCards[3]
+
+        dCounts = {}
+        for oCard in aAddedPhysCards:
+            dCounts.setdefault(oCard.id, 0)
+            dCounts[oCard.id] += 1
+        self.assertEqual(get_card_counts(oPhysCardSet1), dCounts)
+        self.assertEqual(get_card_count(oPhysCardSet1, oMagnum), 3)
+        self.assertEqual(get_total_card_count(oPhysCardSet1),
+                         len(aAddedPhysCards))
+        self.assertEqual(sorted(x.id for x in
+                                iter_physical_cards(oPhysCardSet1)),
+                         sorted(x.id for x in oPhysCardSet1.cards))
+        oFilter = PhysicalCardSetFilter(CARD_SET_NAMES[0])
+        self.assertEqual(get_filtered_card_counts(oFilter), dCounts)
+        # Filters which join on other tables don't change the counts
+        oFilter = FilterAndBox([oFilter, CardTypeFilter('Equipment')])
+        self.assertEqual(get_filtered_card_counts(oFilter),
+                         dict((oCard.id, dCounts[oCard.id]) for oCard in
+                              aAddedPhysCards if 'Equipment' in
+                              [x.name for x in
+                               oCard.abstractCard.cardtype]))
+
+        # Deleting a single mapping row only removes one copy
+        oEntry = MapPhysicalCardToPhysicalCardSet.selectBy(
+            physicalCardID=oMagnum.id,
+            physicalCardSetID=oPhysCardSet1.id)[0]
+        MapPhysicalCardToPhysicalCardSet.delete(oEntry.id)
+        self.assertEqual(get_card_count(oPhysCardSet1, oMagnum), 2)
+        self.assertEqual(get_total_card_count(oPhysCardSet1),
+                         len(aAddedPhysCards) - 1)
+
+        # removePhysicalCard removes all the copies
+        oPhysCardSet1.removePhysicalCard(oMagnum.id)
+        self.assertEqual(get_card_count(oPhysCardSet1, oMagnum), 0)
+        self.assertEqual(get_card_count(oPhysCardSet1, oAK), 1)
+        self.assertEqual(get_total_card_count(oPhysCardSet1),
+                         len(aAddedPhysCards) - 3)
+
+        oPhysCardSet2 = make_set_2()
+        self.assertEqual(get_total_card_count(oPhysCardSet2),
+                         len(oPhysCardSet2.cards))
+
+        delete_physical_card_set(CARD_SET_NAMES[0])
+        self.assertEqual(get_card_counts(oPhysCardSet1), {})
+        self.assertEqual(get_total_card_count(oPhysCardSet1), 0)
+        self.assertEqual(get_total_card_count(oPhysCardSet2),
+                         len(oPhysCardSet2.cards))
+
+    def test_batch_changes(self):
+        """Test applying batches of changes to card sets"""
+        # pylint: disable=no-member
+        # SQLObject confuses pylint
+        aAddedPhysCards = get_phys_cards()
+        oPhysCardSet1 = make_set_1()
+        oPhysCardSet2 = make_set_2()
+        oMagnum = aAddedPhysCards[0]
+        oAK = aAddedPhysCards[3]
+        oAbbot = aAddedPhysCards[4]
+        dCounts1 = get_card_counts(oPhysCardSet1)
+        dCounts2 = get_card_counts(oPhysCardSet2)
+
+        with patch('sutekh.base.core.CardSetUtilities.'
+                   'send_card_set_changes') as oMock:
+            # Removals are limited to the copies in the card set
+            dApplied = change_card_sets({
+                oPhysCardSet1: {oMagnum: -2, oAK: -5, oAbbot: 0},
+                oPhysCardSet2: {oMagnum: 4, oAK: 2},
+            })
+            self.assertEqual(dApplied, {
+                oPhysCardSet1: {oMagnum: -2, oAK: -1},
+                oPhysCardSet2: {oMagnum: 4, oAK: 2},
+            })
+            # One signal per card set
+            self.assertEqual(oMock.call_count, 2)
+            self.assertEqual(
+                sorted([(x[0][0].name, x[0][1]) for x in
+                        oMock.call_args_list], key=lambda x: x[0]),
+                [(CARD_SET_NAMES[0], {oMagnum: -2, oAK: -1}),
+                 (CARD_SET_NAMES[1], {oMagnum: 4, oAK: 2})])
+            oMock.reset_mock()
+            # Changes that do nothing don't send signals
+            self.assertEqual(change_card_sets({
+                oPhysCardSet1: {oAK: -1}}), {})
+            self.assertFalse(oMock.called)
+
+        dCounts1[oMagnum.id] -= 2
+        del dCounts1[oAK.id]
+        dCounts2[oMagnum.id] = dCounts2.get(oMagnum.id, 0) + 4
+        dCounts2[oAK.id] = dCounts2.get(oAK.id, 0) + 2
+        self.assertEqual(get_card_counts(oPhysCardSet1), dCounts1)
+        self.assertEqual(get_card_counts(oPhysCardSet2), dCounts2)
+        # The card set contents match the counts
+        for oCardSet, dCounts in ((oPhysCardSet1, dCounts1),
+                                  (oPhysCardSet2, dCounts2)):
+            dMapCounts = {}
+            for oCard in oCardSet.cards:
+                dMapCounts[oCard.id] = dMapCounts.get(oCard.id, 0) + 1
+            self.assertEqual(dMapCounts, dCounts)
+
+        # Single card operations still work after bulk changes
+        oPhysCardSet1.addPhysicalCard(oAK.id)
+        self.assertEqual(get_card_count(oPhysCardSet1, oAK), 1)
+        oEntry = MapPhysicalCardToPhysicalCardSet.selectBy(
+            physicalCardID=oMagnum.id,
+            physicalCardSetID=oPhysCardSet1.id)[0]
+        MapPhysicalCardToPhysicalCardSet.delete(oEntry.id)
+        self.assertEqual(get_card_count(oPhysCardSet1, oMagnum), 0)
+
+        # Bulk deletion of the card set contents
+        iTotal2 = get_total_card_count(oPhysCardSet2)
+        delete_physical_card_set(CARD_SET_NAMES[0])
+        self.assertEqual(MapPhysicalCardToPhysicalCardSet.selectBy(
+            physicalCardSetID=oPhysCardSet1.id).count(), 0)
+        self.assertEqual(get_total_card_count(oPhysCardSet2), iTotal2)
+
+    def test_batch_signals(self):
+        """Test coalescing the changed signals"""
+        aAddedPhysCards = get_phys_cards()
+        oPhysCardSet1 = make_set_1()
+        oPhysCardSet2 = make_set_2()
+        oMagnum = aAddedPhysCards[0]
+        oAK = aAddedPhysCards[3]
+        aSignals = []
+
+        def record_changes(oCardSet, dChanges):
+            """Record the signals"""
+            aSignals.append((oCardSet.name, dChanges))
+
+        listen_changed(record_changes, PhysicalCardSet)
+        try:
+            send_changed_signal(oPhysCardSet1, oMagnum, 1)
+            self.assertEqual(aSignals, [(CARD_SET_NAMES[0], {oMagnum: 1})])
+            aSignals[:] = []
+            with batch_changed_signals():
+                for _iNum in range(3):
+                    send_changed_signal(oPhysCardSet1, oMagnum, 1)
+                send_changed_signal(oPhysCardSet1, oAK, -1)
+                send_changed_signal(oPhysCardSet2, oAK, 1)
+                # Nested batches are merged
+                with batch_changed_signals():
+                    send_changed_signal(oPhysCardSet1, oMagnum, -1)
+                    send_changed_signal(oPhysCardSet2, oAK, -1)
+                self.assertEqual(aSignals, [])
+                # Batched changes from the bulk API are also merged
+                change_card_sets({oPhysCardSet1: {oAK: 2}})
+                self.assertEqual(aSignals, [])
+            # Changes that cancel out don't send signals
+            self.assertEqual(aSignals, [(CARD_SET_NAMES[0],
+                                         {oMagnum: 2, oAK: 1})])
+        finally:
+            disconnect_changed(record_changes, PhysicalCardSet)
+
 
 if __name__ == "__main__":
     unittest.main()
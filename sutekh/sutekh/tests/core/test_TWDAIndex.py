@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the TWDA card index"""
+
+import unittest
+
+from mock import patch
+
+from sutekh.base.core.BaseTables import PhysicalCardSet
+from sutekh.base.core.BaseAdapters import IAbstractCard, IPhysicalCard
+from sutekh.base.core.CardSetUtilities import (change_card_sets,
+                                               delete_physical_card_set)
+from sutekh.base.core.DBUtility import mark_database_changed
+from sutekh.core.TWDAIndex import (TWDAIndex, get_twda_index,
+                                   get_twda_deck_ids)
+from sutekh.tests.TestCore import SutekhTest
+
+
+DECKS = {
+    'Deck 1': {'AK-47': 2, 'Abebe': 1, 'Aire of Elation': 3},
+    'Deck 2': {'AK-47': 1, 'Abebe': 4},
+    'Deck 3': {'Aire of Elation': 1},
+}
+
+
+class TWDAIndexTests(SutekhTest):
+    """Class for the TWDA index tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def _make_decks(self):
+        """Create some TWDA decks and some other card sets"""
+        oHolder = PhysicalCardSet(name='TWDA 2010')
+        oOther = PhysicalCardSet(name='Not TWDA')
+        dIds = {}
+        for sDeck, dCards in sorted(DECKS.items()):
+            oDeck = PhysicalCardSet(name=sDeck, parent=oHolder, inuse=True)
+            dIds[sDeck] = oDeck.id
+            for sName, iCount in dCards.items():
+                oCard = IPhysicalCard((IAbstractCard(sName), None))
+                for _iNum in range(iCount):
+                    # pylint: disable=no-member
+                    # SQLObject confuses pylint
+                    oDeck.addPhysicalCard(oCard.id)
+                    oOther.addPhysicalCard(oCard.id)
+        # Not in use, so should be ignored
+        oUnused = PhysicalCardSet(name='Unused', parent=oHolder)
+        # pylint: disable=no-member
+        # SQLObject confuses pylint
+        oUnused.addPhysicalCard(
+            IPhysicalCard((IAbstractCard('AK-47'), None)).id)
+        return dIds
+
+    def test_find_decks(self):
+        """Test the any, all and at least N searches"""
+        dIds = self._make_decks()
+        self.assertEqual(get_twda_deck_ids(), sorted(dIds.values()))
+        oIndex = TWDAIndex()
+        oIndex.rebuild()
+
+        oAK = IAbstractCard('AK-47')
+        oAbebe = IAbstractCard('Abebe')
+        oAire = IAbstractCard('Aire of Elation')
+        oAlan = IAbstractCard('Alan Sovereign (Advanced)')
+
+        dAny = oIndex.find_decks([oAK, oAbebe, oAlan], 1)
+        self.assertEqual(dAny, {
+            dIds['Deck 1']: {oAK: 2, oAbebe: 1},
+            dIds['Deck 2']: {oAK: 1, oAbebe: 4},
+        })
+        dAll = oIndex.find_decks([oAK, oAbebe, oAire])
+        self.assertEqual(list(dAll), [dIds['Deck 1']])
+        self.assertEqual(dAll[dIds['Deck 1']][oAire], 3)
+        self.assertEqual(oIndex.find_decks([oAK, oAbebe, oAlan]), {})
+        dSome = oIndex.find_decks([oAK, oAire, oAlan], 2)
+        self.assertEqual(list(dSome), [dIds['Deck 1']])
+        self.assertEqual(sorted(oIndex.find_decks([oAire], 1)),
+                         sorted([dIds['Deck 1'], dIds['Deck 3']]))
+
+    def test_saved_index(self):
+        """Test saving and reusing the index"""
+        dIds = self._make_decks()
+        sIndexFile = self._create_tmp_file()
+        oAire = IAbstractCard('Aire of Elation')
+        # Empty file, so we should build and save the index
+        oIndex = get_twda_index(sIndexFile)
+        self.assertEqual(len(oIndex.find_decks([oAire], 1)), 2)
+
+        # Index is current, so we don't need to rebuild it
+        with patch.object(TWDAIndex, 'rebuild') as oMock:
+            oIndex = get_twda_index(sIndexFile)
+            self.assertFalse(oMock.called)
+        self.assertEqual(len(oIndex.find_decks([oAire], 1)), 2)
+
+        # Changing a deck invalidates the saved index
+        oDeck = PhysicalCardSet.get(dIds['Deck 2'])
+        # pylint: disable=no-member
+        # SQLObject confuses pylint
+        oDeck.addPhysicalCard(IPhysicalCard((oAire, None)).id)
+        self.assertTrue(oIndex.update())
+        self.assertEqual(len(oIndex.find_decks([oAire], 1)), 3)
+        self.assertEqual(len(get_twda_index(sIndexFile).find_decks(
+            [oAire], 1)), 3)
+
+        # Swapping cards, so the totals don't change, is also caught
+        oAK = IAbstractCard('AK-47')
+        oDeck = PhysicalCardSet.get(dIds['Deck 3'])
+        oDeck.removePhysicalCard(IPhysicalCard((oAire, None)).id)
+        oDeck.addPhysicalCard(IPhysicalCard((oAK, None)).id)
+        self.assertTrue(oIndex.update())
+        self.assertEqual(sorted(oIndex.find_decks([oAK], 1)),
+                         sorted([dIds['Deck 1'], dIds['Deck 2'],
+                                 dIds['Deck 3']]))
+
+        # The database URI isn't saved
+        with open(sIndexFile, 'r') as fIndex:
+            sData = fIndex.read()
+        # pylint: disable=protected-access
+        # We need to access _connection here
+        self.assertFalse(PhysicalCardSet._connection.uri() in sData)
+
+    def test_signals(self):
+        """Test keeping the index current without rereading the decks"""
+        dIds = self._make_decks()
+        oAK = IAbstractCard('AK-47')
+        oAire = IAbstractCard('Aire of Elation')
+        oIndex = TWDAIndex()
+        self.assertTrue(oIndex.ensure_current())
+        oIndex.listen()
+        try:
+            with patch.object(TWDAIndex, 'get_key') as oMock:
+                # Changes to the decks are applied from the signals
+                oDeck = PhysicalCardSet.get(dIds['Deck 3'])
+                change_card_sets({oDeck: {
+                    IPhysicalCard((oAire, None)): -1,
+                    IPhysicalCard((oAK, None)): 2}})
+                oIndex.ensure_current()
+                self.assertEqual(oIndex.find_decks([oAK], 1)[oDeck.id],
+                                 {oAK: 2})
+                self.assertEqual(list(oIndex.find_decks([oAire], 1)),
+                                 [dIds['Deck 1']])
+                delete_physical_card_set('Deck 1')
+                oIndex.ensure_current()
+                self.assertEqual(oIndex.find_decks([oAire], 1), {})
+                # Changes to other card sets are ignored
+                oOther = PhysicalCardSet.selectBy(name='Not TWDA')[0]
+                change_card_sets({oOther: {IPhysicalCard((oAire, None)): 1}})
+                oIndex.ensure_current()
+                self.assertFalse(oMock.called)
+            # The index matches the database
+            self.assertFalse(oIndex.update())
+            # Changing the parent means we check the database again
+            oDeck.parent = None
+            oDeck.syncUpdate()
+            self.assertTrue(oIndex.ensure_current())
+            self.assertFalse(oDeck.id in oIndex.find_decks([oAK], 1))
+            # As does marking the database as changed
+            oIndex.ensure_current()
+            with patch.object(TWDAIndex, 'update') as oMock:
+                oIndex.ensure_current()
+                self.assertFalse(oMock.called)
+                mark_database_changed()
+                oIndex.ensure_current()
+                self.assertTrue(oMock.called)
+        finally:
+            oIndex.cleanup()
+
+    def test_no_decks(self):
+        """Test the index with no TWDA decks"""
+        self.assertEqual(get_twda_deck_ids(), [])
+        oIndex = TWDAIndex()
+        self.assertTrue(oIndex.update())
+        self.assertFalse(oIndex.update())
+        self.assertEqual(oIndex.get_key([])['checksums'], [])
+        self.assertEqual(oIndex.find_decks([IAbstractCard('Abebe')], 1), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,11 +14,12 @@ from sutekh.base.tests.GuiTestUtils import (count_second_level,
                                             LocalTestListener)
 from sutekh.base.core.BaseTables import PhysicalCard, AbstractCard
 from sutekh.base.core.BaseAdapters import (IAbstractCard, IPhysicalCard,
-                                           IExpansion)
+                                           IExpansion, IPrintingName)
 from sutekh.base.core import BaseFilters
 from sutekh.base.core.BaseGroupings import NullGrouping, CardTypeGrouping
 from sutekh.base.gui.CardListModel import CardListModel
 from sutekh.base.gui.MessageBus import MessageBus
+from sutekh.base.gui.plugins.BaseCardListCount import BaseCardListCount
 
 from sutekh.core.Groupings import CryptLibraryGrouping
 from sutekh.tests.GuiSutekhTest import ConfigSutekhTest
@@ -185,6 +186,96 @@ class CardListModelTests(ConfigSutekhTest):
         self.assertEqual('Dramatic Upheaval' in aCards, True)
         self.assertEqual('Motivated by Gehenna' in aCards, True)
 
+    def test_lazy(self):
+        """Test deferring the expansion rows"""
+        oModel = CardListModel(self.oConfig)
+        oModel.hideillegal = False
+        oModel.groupby = NullGrouping
+        oModel.load()
+        # The full model, for comparison
+        aExpected = []
+        oGroupIter = oModel.get_iter_first()
+        for oIter in oModel.get_all_iter_children(oGroupIter):
+            aExpected.append(oModel.get_child_entries_from_iter(oIter))
+        oModel.bLazyExpansions = True
+        oModel.load()
+        self.assertEqual(count_all_cards(oModel),
+                         AbstractCard.select().count())
+        # Only a placeholder row for each card
+        self.assertEqual(count_second_level(oModel),
+                         AbstractCard.select().count())
+        # The path API adds the rows when needed
+        oPhysCard = oModel.get_physical_card_from_path('0:1:1')
+        self.assertEqual(oPhysCard, aExpected[1][1][0])
+        self.assertEqual(oModel.get_exp_name_from_path('0:1:1'),
+                         IPrintingName(oPhysCard))
+        self.assertEqual(count_second_level(oModel),
+                         AbstractCard.select().count() - 1 +
+                         len(aExpected[1]))
+        self.assertEqual(oModel.get_all_from_path('0:2:0')[3], 2)
+        # As does asking for the children
+        oGroupIter = oModel.get_iter_first()
+        aChildren = []
+        for oIter in oModel.get_all_iter_children(oGroupIter):
+            aChildren.append(oModel.get_child_entries_from_iter(oIter))
+        self.assertEqual(aChildren, aExpected)
+        self.assertEqual(count_second_level(oModel),
+                         PhysicalCard.select().count())
+        # Cards in several groups
+        oModel.groupby = CardTypeGrouping
+        oModel.bLazyExpansions = False
+        oModel.load()
+        iExpected = count_second_level(oModel)
+        oModel.bLazyExpansions = True
+        oModel.load()
+        oGroupIter = oModel.get_iter_first()
+        while oGroupIter:
+            for oIter in oModel.get_all_iter_children(oGroupIter):
+                oModel.load_children(oIter)
+            oGroupIter = oModel.iter_next(oGroupIter)
+        self.assertEqual(count_second_level(oModel), iExpected)
+        # No expansions means no placeholders
+        oModel.bExpansions = False
+        oModel.load()
+        self.assertEqual(count_second_level(oModel), 0)
+
+    def test_lazy_sorted(self):
+        """Test the lazy placeholder rows with sorting enabled"""
+        # pylint: disable=protected-access
+        # We test the sort and count functions directly
+        oModel = CardListModel(self.oConfig)
+        oModel.hideillegal = False
+        oModel.groupby = NullGrouping
+        oModel.bLazyExpansions = True
+        oModel.enable_sorting()
+        oModel.load()
+        oGroupIter = oModel.get_iter_first()
+        oFirst = oModel.iter_children(oGroupIter)
+        oSecond = oModel.iter_next(oFirst)
+        oModel.load_children(oFirst)
+        # Skip the unknown expansion row
+        oExpIter = oModel.iter_nth_child(oFirst, 1)
+        self.assertNotEqual(
+            oModel.get_physical_card_from_iter(oExpIter).printingID, None)
+        oPlaceholder = oModel.iter_children(oSecond)
+        self.assertEqual(oModel.get_physical_card_from_iter(oPlaceholder),
+                         None)
+        # The placeholder can be compared with the expansion rows
+        self.assertEqual(oModel._sort_col(oModel, oPlaceholder, oExpIter,
+                                          0), -1)
+        self.assertEqual(oModel._sort_col(oModel, oExpIter, oPlaceholder,
+                                          0), 1)
+        # The placeholder isn't counted as an expansion
+        oCount = BaseCardListCount.__new__(BaseCardListCount)
+        oCount._oModel = oModel
+        oCount._iMode = BaseCardListCount.COUNT_EXP
+        self.assertEqual(oCount._get_count(oPlaceholder), 0)
+        self.assertEqual(oCount._get_count(oExpIter), 1)
+        oModel.load_children(oSecond)
+        self.assertNotEqual(
+            oModel.get_physical_card_from_iter(
+                oModel.iter_children(oSecond)), None)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -10,6 +10,8 @@
 
 import unittest
 
+from mock import patch
+
 from sutekh.base.tests.TestUtils import make_card
 from sutekh.base.tests.GuiTestUtils import (LocalTestListener,
                                             DummyCardSetController,
@@ -1410,6 +1412,220 @@ class CardSetListModelTests(ConfigSutekhTest):
                 ])
 
 
+    def test_background_load(self):
+        """Test loading the model in the background"""
+        # pylint: disable=protected-access
+        # We need to step through the load
+        _oCache = SutekhObjectCache()
+        oPCS = self._setup_simple()
+        oModel = self._get_model(self.aNames[0])
+        oModel.groupby = CardTypeGrouping
+        # Start with nothing shown, so the load adds all the rows
+        oModel.selectfilter = BaseFilters.CardTypeFilter('Master')
+        oModel.applyfilter = True
+        oModel.load()
+        aInitial = get_all_counts(oModel)
+        aDone = []
+        oCheckModel = self._get_model(self.aNames[0])
+        oCheckModel.groupby = CardTypeGrouping
+        oFilter = BaseFilters.CardTypeFilter('Vampire')
+        oCheckModel.selectfilter = oFilter
+        oCheckModel.applyfilter = True
+
+        def run_steps(fStep=None):
+            """Run the idle callbacks for the current load, calling fStep
+               after each one. Returns the number of steps."""
+            iGen = oModel._iLoadGen
+            iSteps = 0
+            while oModel._load_step(iGen):
+                iSteps += 1
+                if fStep:
+                    fStep()
+            return iSteps
+
+        with patch('sutekh.base.gui.CardSetListModel.LOAD_CHUNK', 1):
+            oModel.load_in_background(lambda: aDone.append(1))
+            self.assertTrue(oModel.is_loading())
+            # Starting another load cancels the first one
+            oModel.selectfilter = oFilter
+            oModel.load_in_background(lambda: aDone.append(2))
+            # The rows aren't touched until they've all been gathered,
+            # which takes two steps for each card
+            iGen = oModel._iLoadGen
+            for _iStep in range(4):
+                self.assertTrue(oModel._load_step(iGen))
+                self.assertEqual(get_all_counts(oModel), aInitial)
+            # Then one step for each card, and then we're done
+            self.assertEqual(run_steps(), 2)
+            self.assertFalse(oModel.is_loading())
+            self.assertEqual(aDone, [2])
+            oCheckModel.load()
+            self.assertEqual(get_all_counts(oModel),
+                             get_all_counts(oCheckModel))
+
+            # Database changes while loading are applied once the load
+            # is done, even if they keep arriving
+            oCard = make_card('Alexandra', 'CE')
+
+            def add_card():
+                """Add a card to the card set"""
+                # pylint: disable=no-member
+                # SQLObject confuses pylint
+                oPCS.addPhysicalCard(oCard.id)
+                oPCS.syncUpdate()
+                send_changed_signal(oPCS, oCard, 1)
+
+            oModel.load_in_background(lambda: aDone.append(3))
+            # The gathered rows match the model, so there are only the
+            # steps gathering the rows
+            self.assertEqual(run_steps(add_card), 4)
+            self.assertFalse(oModel.is_loading())
+            self.assertEqual(aDone, [2, 3])
+            oCheckModel.load()
+            self.assertEqual(get_all_counts(oModel),
+                             get_all_counts(oCheckModel))
+            # One card added after each of the 4 steps
+            self.assertTrue((6, 0, 'Vampire') in get_all_counts(oModel))
+
+            # As does wait_for_load
+            oModel.load_in_background(lambda: aDone.append(4))
+            self.assertTrue(oModel._load_step(oModel._iLoadGen))
+            add_card()
+            oModel.wait_for_load()
+            self.assertFalse(oModel.is_loading())
+            self.assertEqual(aDone, [2, 3, 4])
+            oCheckModel.load()
+            self.assertEqual(get_all_counts(oModel),
+                             get_all_counts(oCheckModel))
+
+            # Cancelling leaves the rows alone
+            aLoaded = get_all_counts(oModel)
+            oModel.applyfilter = False
+            oModel.load_in_background(lambda: aDone.append(5))
+            oModel.cancel_load()
+            self.assertFalse(oModel._load_step(oModel._iLoadGen))
+            self.assertFalse(oModel.is_loading())
+            self.assertEqual(get_all_counts(oModel), aLoaded)
+            # As does a database update
+            oModel.load_in_background(lambda: aDone.append(6))
+            oModel.prepare_for_db_update()
+            self.assertFalse(oModel.is_loading())
+            self.assertEqual(get_all_counts(oModel), aLoaded)
+            self.assertEqual(aDone, [2, 3, 4])
+        cleanup_models([oModel, oCheckModel])
+
+    def test_background_helpers(self):
+        """Test that the background load spreads the parent, child and
+           sibling queries over several steps"""
+        # pylint: disable=protected-access
+        # We need to step through the load
+        _oCache = SutekhObjectCache()
+        self._setup_relationships()
+        oModel = self._get_model(self.aNames[1])
+        oModel._change_level_mode(SHOW_CARD_SETS)
+        oModel._change_parent_count_mode(MINUS_SETS_IN_USE)
+        oCheckModel = self._get_model(self.aNames[1])
+        oCheckModel._change_level_mode(SHOW_CARD_SETS)
+        oCheckModel._change_parent_count_mode(MINUS_SETS_IN_USE)
+        aHelpers = ['_get_child_filters', '_get_parent_list',
+                    '_add_parent_info']
+        aEvents = []
+
+        def track(sName, fHelper):
+            """Record when the helper starts and finishes"""
+            def _wrapped(*aArgs):
+                """Wrap the helper generator"""
+                aEvents.append(('start', sName))
+                oResult = yield from fHelper(*aArgs)
+                aEvents.append(('end', sName))
+                return oResult
+            return _wrapped
+
+        for sName in aHelpers:
+            setattr(oModel, sName, track(sName, getattr(oModel, sName)))
+        with patch('sutekh.base.gui.CardSetListModel.LOAD_CHUNK', 1):
+            oModel.load_in_background()
+            iGen = oModel._iLoadGen
+            aSteps = []
+            while oModel._load_step(iGen):
+                aSteps.append(aEvents[:])
+                del aEvents[:]
+            aSteps.append(aEvents[:])
+        for sName in aHelpers:
+            aStarted = [iStep for iStep, aStep in enumerate(aSteps)
+                        if ('start', sName) in aStep]
+            aEnded = [iStep for iStep, aStep in enumerate(aSteps)
+                      if ('end', sName) in aStep]
+            self.assertEqual(len(aStarted), 1)
+            self.assertEqual(len(aEnded), 1)
+            self.assertTrue(aStarted[0] < aEnded[0])
+        oCheckModel.load()
+        self.assertEqual(get_all_counts(oModel), get_all_counts(oCheckModel))
+        cleanup_models([oModel, oCheckModel])
+
+    def test_reload_diff(self):
+        """Test that reloading only changes the rows that differ"""
+        # pylint: disable=protected-access
+        # We need to check the model's internal state
+        _oCache = SutekhObjectCache()
+        oPCS = self._setup_simple()
+        for oCard in self.aPhysCards:
+            # pylint: disable=no-member
+            # SQLObject confuses pylint
+            oPCS.addPhysicalCard(oCard.id)
+        oPCS.syncUpdate()
+        oModel = self._get_model(self.aNames[0])
+        oModel.groupby = CardTypeGrouping
+        oModel._change_level_mode(SHOW_EXPANSIONS)
+        oCheckModel = self._get_model(self.aNames[0])
+        oCheckModel.groupby = CardTypeGrouping
+        oCheckModel._change_level_mode(SHOW_EXPANSIONS)
+        oModel.load()
+        self.assertTrue(oModel._oLastLoad is not None)
+        dIters = dict((oAbsId, list(aIters)) for oAbsId, aIters in
+                      oModel._dAbs2Iter.items())
+        oFilter = BaseFilters.CardTypeFilter('Vampire')
+        for oLoadModel in (oModel, oCheckModel):
+            oLoadModel.selectfilter = oFilter
+        for bApply in (True, False):
+            oModel.applyfilter = oCheckModel.applyfilter = bApply
+            oModel.load()
+            oCheckModel.load()
+            self.assertEqual(sorted(get_all_counts(oModel)),
+                             sorted(get_all_counts(oCheckModel)))
+            self.assertEqual(count_second_level(oModel),
+                             count_second_level(oCheckModel))
+            self.assertEqual(sorted(oModel._dGroupName2Iter),
+                             sorted(oCheckModel._dGroupName2Iter))
+            self.assertEqual(sorted(oModel._dAbsSecondLevel2Iter),
+                             sorted(oCheckModel._dAbsSecondLevel2Iter))
+        # The vampires are in both loads, so their rows are reused
+        oAlex = make_card('Alexandra', None).abstractCard
+        self.assertEqual(oModel._dAbs2Iter[oAlex.id], dIters[oAlex.id])
+        # Changing the layout rebuilds the rows, and resets the lookups
+        for oLoadModel in (oModel, oCheckModel):
+            oLoadModel._change_level_mode(NO_SECOND_LEVEL)
+            oLoadModel.groupby = ExpansionGrouping
+            oLoadModel.load()
+        self.assertNotEqual(oModel._dAbs2Iter[oAlex.id], dIters[oAlex.id])
+        self.assertEqual(oModel._dAbsSecondLevel2Iter, {})
+        self.assertEqual(sorted(oModel._dGroupName2Iter),
+                         sorted(oCheckModel._dGroupName2Iter))
+        self.assertEqual(sorted(get_all_counts(oModel)),
+                         sorted(get_all_counts(oCheckModel)))
+        # Editing the card set means the rows don't match the last load
+        oCard = make_card('Alexandra', 'CE')
+        # pylint: disable=no-member
+        # SQLObject confuses pylint
+        oPCS.addPhysicalCard(oCard.id)
+        oPCS.syncUpdate()
+        send_changed_signal(oPCS, oCard, 1)
+        self.assertTrue(oModel._oLastLoad is None)
+        oModel.load()
+        oCheckModel.load()
+        self.assertEqual(sorted(get_all_counts(oModel)),
+                         sorted(get_all_counts(oCheckModel)))
+        cleanup_models([oModel, oCheckModel])
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the draw probability calculations"""
+
+from copy import copy
+import itertools
+import unittest
+
+from sutekh.tests.TestCore import SutekhTest
+
+from sutekh.base.gui.plugins.BaseDrawProbabilities import (
+    _gen_choice_list, _multi_hyper_prob, _hyper_prob_at_least, _draw_probs)
+
+
+# The original implementations, from before the calculation was changed
+# to work a table row at a time, to check the new results against.
+# These are unchanged, apart from the names.
+
+def _orig_choose(iChoices, iTotal):
+    """Returns number of unordered combinations of iChoices objects from
+       iTotal (iTotal)(iTotal-1)...(iTotal-iChoices+1)/iChoices!"""
+    if iChoices > 0:
+        iDenom = iChoices
+    else:
+        return 1  # 0!/0! = 1, since 0! = 1
+    iNumerator = iTotal
+    for iNum in range(1, iChoices):
+        iNumerator *= (iTotal - iNum)
+        iDenom *= iNum
+    return iNumerator // iDenom
+
+
+def _orig_multi_hyper_prob(aFound, iDraws, aObjects, iTotal):
+    """Multivariate hypergeometric probability:
+
+       Given a list of draw numbers: aFound = [iFound1, iFound2 ... iFoundN]
+       form aObjects = [iObjects1, iObjects2 ... iObjectsN]
+       return the probably of seeing exactly aFound from iDraws
+       """
+    # Complain about impossible cases
+    if len(aFound) != len(aObjects):
+        raise RuntimeError('Invalid input: aFound : %s, aObjects: %s' % (
+            ','.join([str(x) for x in aFound]),
+            ','.join([str(x) for x in aObjects])))
+    # pylint: disable=too-many-boolean-expressions
+    # We do want to check all of these
+    if sum(aFound) < 0 or min(aFound) < 0 or sum(aObjects) < 0 or \
+            iTotal <= 0 or iDraws <= 0 or min(aObjects) < 0 or \
+            sum(aObjects) > iTotal or iDraws > iTotal:
+        raise RuntimeError('Invalid values for multivariate hypergeomtric'
+                           ' probability calculation: aFound: %s iDraws: %d'
+                           ' aObjects: %s iTotal: %d' % (
+                               ','.join([str(x) for x in
+                                         aFound]),
+                               iDraws, ','.join([str(x) for x in aObjects]),
+                               iTotal))
+    # pylint: enable=too-many-boolean-expressions
+    # Eliminate trivial cases
+    if sum(aFound) > iDraws:
+        return 0.0
+    for iFound, iObjects in zip(aFound, aObjects):
+        if iFound > iObjects:
+            return 0.0
+    # Hypergeomteric probability: P(X = iFound) = choose iFound from iObjects *
+    #           choose (iDraws - iFound) from (iTotal - iObjects) /
+    #           choose iDraws from iTotal
+    # Multivariate: P(X_i = iFound[i]) = choose(iFound1, iObjects1) *
+    #           choose(iFound2, iObject2) * ... / choose(iDraws, iTotal)
+    fDemon = float(_orig_choose(iDraws, iTotal))
+    # Ensure we handle last entry
+    iRemObjects = iTotal - sum(aObjects)
+    iRemFound = iDraws - sum(aFound)
+    fNumerator = 1.0
+    for iFound, iObjects in zip(aFound, aObjects):
+        fNumerator *= _orig_choose(iFound, iObjects)
+    if iRemFound > 0 and iRemObjects > 0:
+        fNumerator *= _orig_choose(iRemFound, iRemObjects)
+    return fNumerator / fDemon
+
+
+def _orig_hyper_prob_at_least(aFound, iDraws, aObjects, iTotal, iCurCol=0):
+    """Returns the probablity of drawing at least aFound from aObjects objects
+       of interest from iTotal objects in iDraw draws."""
+    # This is the sum of hyper_prob(iCur, Draws, iObjects, iTotal) where
+    # iCur in [iFound, min(iDraws, iObjects)]
+    if len(aFound) != len(aObjects):
+        raise RuntimeError('Invalid input: aFound : %s, aObjects: %s' % (
+            ','.join([str(x) for x in aFound]),
+            ','.join([str(x) for x in aObjects])))
+    fProb = 0
+    aThisFound = copy(aFound)
+    for iCur in range(aFound[iCurCol], min(iDraws, aObjects[iCurCol]) + 1):
+        aThisFound[iCurCol] = iCur
+        if iCurCol < len(aFound) - 1:
+            fProb += _orig_hyper_prob_at_least(aThisFound, iDraws,
+                                               aObjects, iTotal, iCurCol + 1)
+        else:
+            fProb += _orig_multi_hyper_prob(aThisFound, iDraws, aObjects,
+                                            iTotal)
+    return fProb
+
+
+class DrawProbabilitiesTest(SutekhTest):
+    """Class for the draw probability tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def test_choice_list(self):
+        """Test generating the choices"""
+        dCounts = {'a': 2, 'b': 1}
+        aFull = [list(x) for x in itertools.product(range(3), range(2))]
+        aFull.sort(key=lambda x: [sum(x)] + x)
+        self.assertEqual(_gen_choice_list(dCounts), aFull)
+        self.assertEqual(_gen_choice_list(dCounts, 1), [[0, 0], [0, 1],
+                                                        [1, 0]])
+        self.assertEqual(_gen_choice_list(dCounts, 10), aFull)
+        self.assertEqual(_gen_choice_list({'a': 3}), [[0], [1], [2], [3]])
+
+    def test_probabilities(self):
+        """Test the probabilities match the original calculation"""
+        # The original code got the case where every card is selected
+        # wrong, so that's checked separately below
+        for aObjects, iTotal in [([4], 40), ([3, 2], 12), ([4, 3, 2], 60),
+                                 ([2, 2, 1, 1, 1], 90)]:
+            aDraws = list(range(1, min(iTotal, 15) + 1))
+            for aFound in itertools.product(*[range(x + 2) for x in
+                                              aObjects]):
+                aFound = list(aFound)
+                aExact = _draw_probs(aFound, aDraws, aObjects, iTotal,
+                                     False)
+                aAtLeast = _draw_probs(aFound, aDraws, aObjects, iTotal,
+                                       True)
+                for iPos, iDraws in enumerate(aDraws):
+                    fExact = _orig_multi_hyper_prob(aFound, iDraws,
+                                                    aObjects, iTotal)
+                    fAtLeast = _orig_hyper_prob_at_least(aFound, iDraws,
+                                                         aObjects, iTotal)
+                    self.assertAlmostEqual(aExact[iPos], fExact, places=12)
+                    self.assertAlmostEqual(aAtLeast[iPos], fAtLeast,
+                                           places=12)
+                    self.assertEqual(_multi_hyper_prob(aFound, iDraws,
+                                                       aObjects, iTotal),
+                                     aExact[iPos])
+                    self.assertEqual(_hyper_prob_at_least(aFound, iDraws,
+                                                          aObjects, iTotal),
+                                     aAtLeast[iPos])
+        # Drawing all the cards of interest when they're all that's left
+        self.assertEqual(_multi_hyper_prob([2, 1], 3, [2, 1], 3), 1.0)
+        self.assertEqual(_multi_hyper_prob([1, 1], 3, [2, 1], 3), 0.0)
+        self.assertAlmostEqual(_hyper_prob_at_least([0, 0], 2, [2, 1], 3),
+                               1.0)
+        self.assertRaises(RuntimeError, _multi_hyper_prob, [1], 0, [2], 10)
+        self.assertRaises(RuntimeError, _hyper_prob_at_least, [1, 1], 3,
+                          [2], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the opening hand simulation"""
+
+import unittest
+from math import comb
+
+from sutekh.tests.TestCore import SutekhTest
+
+from sutekh.base.gui.plugins import BaseOpeningDraw
+from sutekh.base.gui.plugins.BaseOpeningDraw import (draw_cards,
+                                                     simulate_draws,
+                                                     get_distribution_mean)
+
+
+class DummyCard:
+    """Minimal card, since the simulation only uses the name"""
+    # pylint: disable=too-few-public-methods
+    # Only need the name
+
+    def __init__(self, sName):
+        self.name = sName
+
+
+def _make_deck():
+    """Create a 60 card deck with a few groups"""
+    aCards = []
+    for sName, iCount in [('A', 12), ('B', 6), ('C', 2), ('D', 40)]:
+        aCards.extend([DummyCard(sName) for _iNum in range(iCount)])
+    dGroups = {'A': set(['A']), 'A or B': set(['A', 'B']),
+               'C': set(['C']), 'None': set()}
+    return aCards, dGroups
+
+
+class OpeningDrawTest(SutekhTest):
+    """Class for the opening hand simulation tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def _check_results(self, dResults, dGroups, iHands):
+        """Compare the simulated results to the exact distribution"""
+        self.assertEqual(sorted(dResults), sorted(dGroups))
+        for sGroup, iCount in [('A', 12), ('A or B', 18), ('C', 2),
+                               ('None', 0)]:
+            aDist = dResults[sGroup]
+            self.assertEqual(len(aDist), 8)
+            self.assertAlmostEqual(sum(aDist), 1.0)
+            for iNum, fFrac in enumerate(aDist):
+                fExact = (comb(iCount, iNum) * comb(60 - iCount, 7 - iNum) /
+                          comb(60, 7))
+                # Well within the sampling error for this many hands
+                self.assertTrue(abs(fFrac - fExact) < 5.0 / iHands ** 0.5,
+                                '%s %d: %f != %f' % (sGroup, iNum, fFrac,
+                                                     fExact))
+            self.assertAlmostEqual(get_distribution_mean(aDist),
+                                   iCount * 7 / 60.0, places=1)
+
+    def test_draw_cards(self):
+        """Test drawing individual hands"""
+        aCards, _dGroups = _make_deck()
+        dHand, aRest = draw_cards(aCards, 7, True)
+        self.assertEqual(sum(dHand.values()), 7)
+        self.assertEqual(len(aRest), 53)
+        self.assertEqual(len(aCards), 60)
+        for sName, iCount in dHand.items():
+            self.assertEqual(len([x for x in aRest if x.name == sName]),
+                             len([x for x in aCards if x.name == sName]) -
+                             iCount)
+        dHand, aRest2 = draw_cards(aRest, 53, False)
+        self.assertTrue(aRest2 is aRest)
+        self.assertEqual(aRest, [])
+
+    def test_simulation(self):
+        """Test the simulated distributions"""
+        aCards, dGroups = _make_deck()
+        dResults = simulate_draws(aCards, 7, dGroups, 20000, 42)
+        self._check_results(dResults, dGroups, 20000)
+        # Seeded results are repeatable
+        self.assertEqual(simulate_draws(aCards, 7, dGroups, 20000, 42),
+                         dResults)
+        # Drawing everything
+        dAll = simulate_draws(aCards, 70, dGroups, 10, 1)
+        self.assertEqual(dAll['A'][12], 1.0)
+        self.assertEqual(len(dAll['A']), 61)
+
+    def test_python_fallback(self):
+        """Test the simulation without NumPy"""
+        aCards, dGroups = _make_deck()
+        oNumpy = BaseOpeningDraw.numpy
+        BaseOpeningDraw.numpy = None
+        try:
+            dResults = simulate_draws(aCards, 7, dGroups, 20000, 42)
+            self.assertEqual(simulate_draws(aCards, 7, dGroups, 20000, 42),
+                             dResults)
+        finally:
+            BaseOpeningDraw.numpy = oNumpy
+        self._check_results(dResults, dGroups, 20000)
+
+
+if __name__ == "__main__":
+    unittest.main()
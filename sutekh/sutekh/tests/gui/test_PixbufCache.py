@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the least recently used pixbuf cache"""
+
+import unittest
+
+from sutekh.tests.TestCore import SutekhTest
+
+from sutekh.base.gui.PixbufCache import PixbufCache
+
+
+class DummyPixbuf:
+    """Fake pixbuf, so we can control the size"""
+    # pylint: disable=too-few-public-methods
+    # Only need the size
+
+    def __init__(self, iSize):
+        self.iSize = iSize
+
+    def get_byte_length(self):
+        """Size of the pixel data"""
+        return self.iSize
+
+
+class TestPixbufCache(SutekhTest):
+    """Class for the PixbufCache test cases"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def test_basic(self):
+        """Test adding, lookups and eviction"""
+        oCache = PixbufCache(100)
+        aPixbufs = [DummyPixbuf(30) for _x in range(4)]
+        for iNum, oPixbuf in enumerate(aPixbufs[:3]):
+            oCache.add(iNum, oPixbuf)
+        self.assertEqual(len(oCache), 3)
+        self.assertEqual(oCache.size, 90)
+        self.assertTrue(oCache.get(0) is aPixbufs[0])
+        self.assertEqual(oCache.get(5), None)
+        # 1 is now the least recently used entry
+        oCache.add(3, aPixbufs[3])
+        self.assertFalse(1 in oCache)
+        self.assertEqual(sorted([x for x in range(4) if x in oCache]),
+                         [0, 2, 3])
+        self.assertEqual(oCache.size, 90)
+        # Replacing an entry updates the size
+        oCache.add(3, DummyPixbuf(10))
+        self.assertEqual(oCache.size, 70)
+        # Too large to cache
+        oCache.add(6, DummyPixbuf(101))
+        self.assertFalse(6 in oCache)
+        self.assertEqual(len(oCache), 3)
+        # A large entry pushes out several old ones
+        oCache.add(7, DummyPixbuf(80))
+        self.assertEqual(sorted([x for x in (0, 2, 3, 7) if x in oCache]),
+                         [3, 7])
+        self.assertEqual(oCache.size, 90)
+        oCache.remove(3)
+        self.assertEqual(oCache.size, 80)
+        oCache.clear()
+        self.assertEqual(len(oCache), 0)
+        self.assertEqual(oCache.size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the concurrent image downloader against a local http server"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from mock import patch
+
+from sutekh.base.io.ImageDownloader import (ImageDownloadManager,
+                                            get_part_file)
+from sutekh.tests.TestCore import SutekhTest
+
+
+class ImageRequestHandler(BaseHTTPRequestHandler):
+    """Serve the images in the server's dFiles, honouring Range
+       requests."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        """Handle a GET request"""
+        # pylint: disable=invalid-name
+        # Name required by BaseHTTPRequestHandler
+        oServer = self.server
+        with oServer.oLock:
+            oServer.aRequests.append((self.path, self.headers.get('Range')))
+            oServer.aPorts.add(self.client_address[1])
+        if self.path.startswith('http://'):
+            # Proxied request, so we serve it ourselves
+            self.path = '/' + self.path.split('/', 3)[3]
+        if self.path.startswith('/moved/'):
+            self.send_response(301)
+            self.send_header('Location', self.path[len('/moved'):])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        sData = oServer.dFiles.get(self.path)
+        sRange = self.headers.get('Range')
+        if self.path.startswith('/norange/') and (
+                sRange or sData is None):
+            self.send_response(416)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if sData is None:
+            # send_error closes the connection, which we don't want
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if sRange:
+            iStart = int(sRange.split('=')[1].split('-')[0])
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (
+                iStart, len(sData) - 1, len(sData)))
+            sData = sData[iStart:]
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(sData)))
+        self.end_headers()
+        self.wfile.write(sData)
+
+    def log_message(self, *_aArgs):
+        """Don't clutter the test output"""
+        # pylint: disable=arguments-differ
+        # We ignore all the arguments
+
+
+class ImageDownloaderTests(SutekhTest):
+    """Class for the image downloader tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def setUp(self):
+        """Start the local http server"""
+        super(ImageDownloaderTests, self).setUp()
+        self.oServer = ThreadingHTTPServer(('127.0.0.1', 0),
+                                           ImageRequestHandler)
+        self.oServer.dFiles = {}
+        self.oServer.aRequests = []
+        self.oServer.aPorts = set()
+        self.oServer.oLock = threading.Lock()
+        self.oThread = threading.Thread(target=self.oServer.serve_forever)
+        self.oThread.daemon = True
+        self.oThread.start()
+        self.sImageDir = tempfile.mkdtemp(suffix='dir', prefix='images')
+        self.sBase = 'http://127.0.0.1:%d' % self.oServer.server_address[1]
+        # Ignore any proxy settings in the test environment
+        dEnv = dict((sKey, sValue) for sKey, sValue in os.environ.items()
+                    if not sKey.lower().endswith('_proxy'))
+        self.oEnvPatch = patch.dict(os.environ, dEnv, clear=True)
+        self.oEnvPatch.start()
+
+    def tearDown(self):
+        """Stop the server"""
+        self.oEnvPatch.stop()
+        self.oServer.shutdown()
+        self.oServer.server_close()
+        self.oThread.join()
+        shutil.rmtree(self.sImageDir)
+        super(ImageDownloaderTests, self).tearDown()
+
+    def test_download(self):
+        """Test downloading a batch of files"""
+        aJobs = []
+        for iNum in range(20):
+            sPath = '/cards/card%d.jpg' % iNum
+            self.oServer.dFiles[sPath] = (b'%d' % iNum) * 1000
+            aJobs.append(([self.sBase + sPath],
+                          os.path.join(self.sImageDir, 'exp',
+                                       'card%d.jpg' % iNum)))
+        aJobs.append(([self.sBase + '/cards/missing.jpg'],
+                      os.path.join(self.sImageDir, 'missing.jpg')))
+
+        oLogger = logging.Logger('test image fetcher')
+        aRecords = []
+        oHandler = logging.Handler()
+        oHandler.emit = aRecords.append
+        oLogger.addHandler(oHandler)
+        oManager = ImageDownloadManager(iWorkers=3)
+        aResults = oManager.download(aJobs, oLogger)
+
+        self.assertEqual(len(aRecords), len(aJobs))
+        self.assertEqual([x.sFileName for x in aResults],
+                         [x[1] for x in aJobs])
+        for iNum in range(20):
+            self.assertEqual(aResults[iNum].sUrl, aJobs[iNum][0][0])
+            with open(aJobs[iNum][1], 'rb') as oFile:
+                self.assertEqual(oFile.read(), (b'%d' % iNum) * 1000)
+        self.assertEqual(aResults[-1].sUrl, None)
+        self.assertEqual(list(aResults[-1].dFailed),
+                         [self.sBase + '/cards/missing.jpg'])
+        self.assertEqual(aResults[-1].aPermanent,
+                         set([self.sBase + '/cards/missing.jpg']))
+        self.assertFalse(os.path.exists(aJobs[-1][1]))
+        self.assertEqual(len(self.oServer.aRequests), 21)
+        # Each worker reuses its connection, so there are at most 3
+        self.assertTrue(len(self.oServer.aPorts) <= 3)
+
+    def test_keep_alive(self):
+        """Test that a single worker fetches everything over one
+           connection, including after errors and redirects"""
+        aJobs = []
+        for iNum in range(5):
+            sPath = '/cards/card%d.jpg' % iNum
+            self.oServer.dFiles[sPath] = b'card data %d' % iNum
+            aJobs.append(([self.sBase + '/cards/missing.jpg',
+                           self.sBase + '/moved' + sPath],
+                          os.path.join(self.sImageDir, 'card%d.jpg' % iNum)))
+        oManager = ImageDownloadManager(iWorkers=1)
+        aResults = oManager.download(aJobs)
+        self.assertEqual([x.sUrl for x in aResults],
+                         [x[0][1] for x in aJobs])
+        self.assertEqual(len(self.oServer.aRequests), 15)
+        self.assertEqual(len(self.oServer.aPorts), 1)
+
+    def test_proxy(self):
+        """Test that the proxy settings are used"""
+        self.oServer.dFiles['/cards/card.jpg'] = b'proxied data'
+        sUrl = 'http://images.example.com/cards/card.jpg'
+        sFileName = os.path.join(self.sImageDir, 'card.jpg')
+        with patch.dict(os.environ, {'http_proxy': self.sBase}):
+            oManager = ImageDownloadManager(iWorkers=1)
+            [oResult] = oManager.download([([sUrl], sFileName)])
+        self.assertEqual(oResult.sUrl, sUrl)
+        with open(sFileName, 'rb') as oFile:
+            self.assertEqual(oFile.read(), b'proxied data')
+        self.assertEqual(self.oServer.aRequests, [(sUrl, None)])
+
+    def test_fallback_and_resume(self):
+        """Test trying several urls, redirects and resuming a partial
+           download"""
+        sData = bytes(range(256)) * 20
+        self.oServer.dFiles['/new/card.jpg'] = sData
+        sUrl = self.sBase + '/moved/new/card.jpg'
+        sFileName = os.path.join(self.sImageDir, 'card.jpg')
+        with open(get_part_file(sFileName, sUrl), 'wb') as oFile:
+            oFile.write(sData[:1000])
+
+        oManager = ImageDownloadManager(iWorkers=1)
+        [oResult] = oManager.download([([self.sBase + '/old/card.jpg',
+                                         sUrl], sFileName)])
+        self.assertEqual(oResult.sUrl, sUrl)
+        self.assertEqual(list(oResult.dFailed),
+                         [self.sBase + '/old/card.jpg'])
+        with open(sFileName, 'rb') as oFile:
+            self.assertEqual(oFile.read(), sData)
+        self.assertFalse(os.path.exists(get_part_file(sFileName, sUrl)))
+        self.assertEqual(self.oServer.aRequests[-1],
+                         ('/new/card.jpg', 'bytes=1000-'))
+
+    def test_bad_range(self):
+        """Test starting over when the server rejects the range"""
+        sData = b'card data' * 100
+        self.oServer.dFiles['/norange/card.jpg'] = sData
+        sUrl = self.sBase + '/norange/card.jpg'
+        sFileName = os.path.join(self.sImageDir, 'card.jpg')
+        with open(get_part_file(sFileName, sUrl), 'wb') as oFile:
+            oFile.write(b'stale data')
+        sMissing = self.sBase + '/norange/missing.jpg'
+        sOther = os.path.join(self.sImageDir, 'missing.jpg')
+
+        oManager = ImageDownloadManager(iWorkers=1)
+        oResult, oMissing = oManager.download([([sUrl], sFileName),
+                                               ([sMissing], sOther)])
+        self.assertEqual(oResult.sUrl, sUrl)
+        with open(sFileName, 'rb') as oFile:
+            self.assertEqual(oFile.read(), sData)
+        self.assertEqual(self.oServer.aRequests[:2],
+                         [('/norange/card.jpg', 'bytes=10-'),
+                          ('/norange/card.jpg', None)])
+        # A 416 without a partial file is just a failure
+        self.assertEqual(oMissing.sUrl, None)
+        self.assertTrue('416' in oMissing.dFailed[sMissing])
+        self.assertEqual(oMissing.aPermanent, set())
+        self.assertFalse(os.path.exists(sOther))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Test the card image directory manifest"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from sutekh.base.io.ImageManifest import ImageManifest
+from sutekh.tests.TestCore import SutekhTest
+
+
+class ImageManifestTests(SutekhTest):
+    """Class for the image manifest tests"""
+    # pylint: disable=too-many-public-methods
+    # unittest.TestCase, so many public methods
+
+    def setUp(self):
+        """Create the image directory"""
+        super(ImageManifestTests, self).setUp()
+        self.sImageDir = tempfile.mkdtemp(suffix='dir', prefix='images')
+
+    def tearDown(self):
+        """Remove the image directory"""
+        shutil.rmtree(self.sImageDir)
+        super(ImageManifestTests, self).tearDown()
+
+    def _write(self, sName, sData=b'image'):
+        """Write an image file, creating the directory if needed"""
+        sFileName = os.path.join(self.sImageDir, sName)
+        if not os.path.exists(os.path.dirname(sFileName)):
+            os.makedirs(os.path.dirname(sFileName))
+        with open(sFileName, 'wb') as oFile:
+            oFile.write(sData)
+        return sFileName
+
+    def _age_dirs(self):
+        """Move the directory times into the past, so the cached listings
+           aren't considered racy"""
+        for sDir, _aDirs, _aFiles in os.walk(self.sImageDir):
+            os.utime(sDir, (1000000, 1000000))
+
+    def test_scan(self):
+        """Test scanning, rescanning and reloading the manifest"""
+        sTop = self._write('acrobatics.jpg')
+        sExp = self._write(os.path.join('jyhad', 'abebe.jpg'), b'abebe')
+        self._age_dirs()
+        oManifest = ImageManifest(self.sImageDir)
+        self.assertEqual(oManifest.scan(), 2)
+        dFiles = oManifest.get_files()
+        self.assertEqual(sorted(dFiles), sorted([sTop, sExp]))
+        self.assertEqual(dFiles[sExp][0], 5)
+        self.assertEqual(dFiles[sExp][1], os.path.getmtime(sExp))
+        self.assertTrue(oManifest.bDirty)
+
+        # Unchanged directories aren't listed again
+        self.assertEqual(oManifest.scan(), 0)
+        self.assertEqual(sorted(oManifest.get_files()), sorted([sTop, sExp]))
+
+        sSaved = self._create_tmp_file()
+        oManifest.save(sSaved)
+        self.assertFalse(oManifest.bDirty)
+
+        # Adding a file is noticed
+        sNew = self._write(os.path.join('jyhad', 'ak47.jpg'))
+        self.assertEqual(oManifest.scan(), 1)
+        self.assertTrue(sNew in oManifest.get_files())
+        os.remove(sNew)
+        self.assertEqual(oManifest.scan(), 1)
+        self.assertEqual(oManifest.get_file_info(sNew), None)
+
+        # Removing a directory is noticed
+        shutil.rmtree(os.path.join(self.sImageDir, 'jyhad'))
+        oManifest.scan()
+        self.assertEqual(list(oManifest.get_files()), [sTop])
+
+        # Reloading the saved manifest
+        oLoaded = ImageManifest(self.sImageDir)
+        self.assertTrue(oLoaded.load(sSaved))
+        self.assertEqual(sorted(oLoaded.get_files()), sorted([sTop, sExp]))
+        oLoaded.scan()
+        self.assertEqual(list(oLoaded.get_files()), [sTop])
+        # Only for the same directory
+        self.assertFalse(ImageManifest(sTop).load(sSaved))
+
+    def test_invalidate(self):
+        """Test forcing a rescan after overwriting a file"""
+        sExp = self._write(os.path.join('jyhad', 'abebe.jpg'), b'abebe')
+        self._age_dirs()
+        oManifest = ImageManifest(self.sImageDir)
+        oManifest.scan()
+        self._write(os.path.join('jyhad', 'abebe.jpg'), b'new abebe')
+        # Overwriting doesn't change the directory, so isn't noticed
+        self._age_dirs()
+        oManifest.scan()
+        self.assertEqual(oManifest.get_file_info(sExp)[0], 5)
+        oManifest.invalidate(sExp)
+        self.assertEqual(oManifest.scan(), 1)
+        self.assertEqual(oManifest.get_file_info(sExp)[0], 9)
+        oManifest.invalidate()
+        self.assertEqual(oManifest.scan(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
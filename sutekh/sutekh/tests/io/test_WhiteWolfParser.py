@@ -6,21 +6,54 @@
 """Test the white wolf card reader"""
 
 import datetime
+import sys
 import unittest
 
-from sqlobject import SQLObjectNotFound
+from sqlobject import SQLObjectNotFound, sqlhub, connectionForURI
 
-from sutekh.base.core.BaseTables import AbstractCard
+from sutekh.base.core.BaseTables import AbstractCard, LookupHints
 from sutekh.base.core.BaseAdapters import (IAbstractCard, IPhysicalCard,
                                            IExpansion, IRarity, IRarityPair,
                                            ICardType, IArtist, IKeyword,
                                            IPrinting)
-from sutekh.base.core.DBUtility import CARDLIST_UPDATE_DATE, get_metadata_date
+from sutekh.base.core.DBUtility import (CARDLIST_UPDATE_DATE,
+                                        get_metadata_date, refresh_tables,
+                                        flush_cache)
+from sutekh.base.io.EncodedFile import EncodedFile
+from sutekh.base.tests.TestUtils import make_null_handler
 
 from sutekh.core.SutekhAdapters import (IClan, IDisciplinePair, ISect,
                                         ITitle, ICreed, IVirtue)
-from sutekh.SutekhUtility import is_crypt_card, is_vampire, is_trifle
+from sutekh.core.SutekhTables import TABLE_LIST
+from sutekh.SutekhUtility import (is_crypt_card, is_vampire, is_trifle,
+                                  read_white_wolf_list, read_lookup_data)
+from sutekh.tests.TestData import TEST_CARD_LIST, TEST_LOOKUP_LIST
 from sutekh.tests.TestCore import SutekhTest
+from sutekh.tests import create_db
+
+
+def dump_cards():
+    """Return a dictionary describing all the cards in the database,
+       suitable for comparing databases."""
+    dCards = {}
+    # pylint: disable=not-an-iterable
+    # SQLObject confuses pylint
+    for oCard in AbstractCard.select():
+        oCard = IAbstractCard(oCard)
+        aData = [oCard.name, oCard.text, oCard.search_text, oCard.group,
+                 oCard.capacity, oCard.cost, oCard.life, oCard.costtype,
+                 oCard.level]
+        for sJoin in ('rarity', 'cardtype', 'artists', 'keywords',
+                      'discipline', 'clan', 'sect', 'title', 'creed',
+                      'virtue', 'rulings'):
+            aData.append(sorted(repr(x.sqlmeta.asDict())
+                                for x in getattr(oCard, sJoin)))
+        aData.append(sorted(repr(x.printing and x.printing.sqlmeta.asDict())
+                            for x in oCard.physicalCards))
+        dCards[oCard.canonicalName] = aData
+    aLookups = sorted((x.domain, x.lookup, x.value)
+                      for x in LookupHints.select())
+    return dCards, aLookups
 
 
 class WhiteWolfParserTests(SutekhTest):
@@ -733,6 +766,51 @@ class WhiteWolfParserTests(SutekhTest):
                          IRarityPair(IRarityPair(("EK", "Common"))))
         self.assertEqual(ICardType("Vampire"), ICardType(ICardType("Vampire")))
 
+    def _use_new_db(self):
+        """Switch to a new, empty database for the rest of the test."""
+        sDbFile = self._create_tmp_file()
+        # windows is different, since we don't have a starting / for the path
+        if sys.platform.startswith("win"):
+            sqlhub.processConnection = connectionForURI("sqlite:///%s" %
+                                                        sDbFile)
+        else:
+            sqlhub.processConnection = connectionForURI("sqlite://%s" %
+                                                        sDbFile)
+        # tearDown restores the main test connection, and the caches
+        # must be flushed after that, since they hold the new database's
+        # objects
+        self.addCleanup(flush_cache)
+
+    def test_bulk_mode(self):
+        """Test that the bulk mode and the normal mode create the same
+           database."""
+        # The test database is created using bulk mode
+        dBulkCards, aBulkLookups = dump_cards()
+        self.assertEqual(len(dBulkCards), len(self.aExpectedCards))
+        # Create a second database using the normal mode
+        self._use_new_db()
+        create_db(False)
+        dCards, aLookups = dump_cards()
+        self.assertEqual(sorted(dCards), sorted(dBulkCards))
+        for sName, aData in dCards.items():
+            self.assertEqual(aData, dBulkCards[sName])
+        self.assertEqual(aLookups, aBulkLookups)
+
+    def test_bulk_caches(self):
+        """Test that the caches are updated after a bulk import."""
+        self._use_new_db()
+        assert refresh_tables(TABLE_LIST, sqlhub.processConnection)
+        oLogHandler = make_null_handler()
+        sLookupData = self._create_tmp_file(TEST_LOOKUP_LIST)
+        sCardList = self._create_tmp_file(TEST_CARD_LIST)
+        read_lookup_data(EncodedFile(sLookupData), oLogHandler)
+        # The lookup hints are cached before the cards exist, so this
+        # relies on the bulk import flushing the caches
+        read_white_wolf_list(EncodedFile(sCardList), oLogHandler, True)
+        oCard = IAbstractCard('Ankara Citadel')
+        self.assertEqual(oCard.name, 'The Ankara Citadel, Turkey')
+        self.assertEqual([x.name for x in oCard.cardtype], ['Equipment'])
+
 
 if __name__ == "__main__":
     unittest.main()
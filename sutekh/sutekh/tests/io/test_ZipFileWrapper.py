@@ -13,6 +13,8 @@ from sutekh.base.core.BaseAdapters import IPhysicalCardSet
 from sutekh.base.core.CardSetUtilities import delete_physical_card_set
 from sutekh.base.gui.ProgressDialog import SutekhCountLogHandler
 
+from sutekh.base.io.BaseZipFileWrapper import WRITE_PAGE_SIZE, write_string
+from sutekh.io.PhysicalCardSetWriter import PhysicalCardSetWriter
 from sutekh.io.ZipFileWrapper import ZipFileWrapper
 from sutekh.tests.TestCore import SutekhTest
 from sutekh.tests.core.test_PhysicalCardSet import (CARD_SET_NAMES,
@@ -148,6 +150,42 @@ class ZipFileWrapperTest(SutekhTest):
                                  oMyCollection.cards]),
                          sorted([x.abstractCard.name for x in aPhysCards]))
 
+    def test_streamed_output(self):
+        """Test the streamed card sets match the card set writer"""
+        sTempFileName = self._create_tmp_file()
+        oZipFile = ZipFileWrapper(sTempFileName)
+        aPhysCards = get_phys_cards()
+        oMyCollection = PhysicalCardSet(name='My Collection')
+        oMyCollection.comment = 'Quotes \' " & <angle brackets>'
+        oMyCollection.inuse = True
+        for oCard in aPhysCards:
+            # pylint: disable=no-member
+            # SQLObject confuses pylint
+            oMyCollection.addPhysicalCard(oCard.id)
+        oMyCollection.syncUpdate()
+        aSets = [oMyCollection]
+        # Enough card sets for several pages
+        for iNum in range(WRITE_PAGE_SIZE + 5):
+            oPCS = PhysicalCardSet(name='Set %d/%d' % (iNum, iNum),
+                                   parent=oMyCollection)
+            for oCard in aPhysCards[iNum % 5:iNum % 5 + 3]:
+                # pylint: disable=no-member
+                # SQLObject confuses pylint
+                oPCS.addPhysicalCard(oCard.id)
+            oPCS.syncUpdate()
+            aSets.append(oPCS)
+        # Empty card set
+        aSets.append(PhysicalCardSet(name='Empty'))
+
+        aNames = oZipFile.do_dump_all_to_zip()
+        self.assertEqual(len(aNames), len(aSets))
+        self.assertEqual(aNames[1], 'Set_0_0.xml')
+        oZip = zipfile.ZipFile(sTempFileName, 'r')
+        for sZipName, oPCS in zip(aNames, aSets):
+            self.assertEqual(oZip.read(sZipName).decode('ascii'),
+                             write_string(PhysicalCardSetWriter(), oPCS))
+        oZip.close()
+
     def test_old_format(self):
         """Test that an old zip file loads correctly"""
         # Create a test zipfile with old data
@@ -185,6 +223,46 @@ class ZipFileWrapperTest(SutekhTest):
         self.assertEqual(oACSCardSet1.parent, None)
         self.assertEqual(oACSCardSet2.parent, None)
 
+    def test_restore_order(self):
+        """Test that children before their parents in the zip file are
+           restored correctly"""
+        def make_set(sName, sParent):
+            """Create a card set with the given parent"""
+            sParentAttr = ''
+            if sParent:
+                sParentAttr = ' parent="%s"' % sParent
+            return ('<physicalcardset name="%s"%s sutekh_xml_version="1.3">'
+                    '<card count="2" expansion="None Specified" '
+                    'name="AK-47" /></physicalcardset>' % (sName,
+                                                           sParentAttr))
+
+        sTempFileName = self._create_tmp_file()
+        oZipFile = zipfile.ZipFile(sTempFileName, 'w')
+        oZipFile.writestr('grandchild.xml', make_set('Grandchild', 'Child'))
+        oZipFile.writestr('child.xml', make_set('Child', 'Root'))
+        oZipFile.writestr('notxml.txt', 'Not a card set')
+        oZipFile.writestr('root.xml', make_set('Root', None))
+        oZipFile.close()
+
+        oHandler = SutekhCountLogHandler()
+        oZipWrapper = ZipFileWrapper(sTempFileName)
+        oZipWrapper.do_restore_from_zip(oLogHandler=oHandler)
+        self.assertEqual(PhysicalCardSet.select().count(), 3)
+        oGrandchild = IPhysicalCardSet('Grandchild')
+        self.assertEqual(oGrandchild.parent.name, 'Child')
+        self.assertEqual(oGrandchild.parent.parent.name, 'Root')
+        self.assertEqual(len(oGrandchild.cards), 2)
+
+        # Sets with missing parents are reported, but the rest of the
+        # zip file is still restored
+        oZipFile = zipfile.ZipFile(sTempFileName, 'w')
+        oZipFile.writestr('orphan.xml', make_set('Orphan', 'Missing'))
+        oZipFile.writestr('root.xml', make_set('Root', None))
+        oZipFile.close()
+        self.assertRaises(IOError, oZipWrapper.do_restore_from_zip)
+        self.assertEqual([x.name for x in PhysicalCardSet.select()],
+                         ['Root'])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Compare the time taken to import a card list with and without the
+   bulk mode of the WhiteWolfTextParser.
+
+   By default, this uses the card list from the test suite. Run from
+   the top level sutekh directory (or with it on the PYTHONPATH)."""
+
+import optparse
+import os
+import sys
+import time
+
+from sqlobject import sqlhub, connectionForURI
+
+from sutekh.base.core.DBUtility import refresh_tables
+from sutekh.base.io.EncodedFile import EncodedFile
+from sutekh.base.tests.TestUtils import make_null_handler, create_pkg_tmp_file
+from sutekh.core.SutekhTables import TABLE_LIST
+from sutekh.SutekhUtility import (read_white_wolf_list, read_exp_info_file,
+                                  read_lookup_data)
+from sutekh.tests.TestData import (TEST_CARD_LIST, TEST_EXP_INFO,
+                                   TEST_LOOKUP_LIST)
+
+
+def parse_options(aArgs):
+    """Parse aArgs for the options to the script"""
+    oParser = optparse.OptionParser(usage="usage %prog [options]",
+                                    version="%prog 0.1")
+    oParser.add_option('-f', '--file',
+                       type="string", dest="sCardList", default=None,
+                       help="Card list to import (default: test card list)")
+    oParser.add_option('-n', '--repeat',
+                       type="int", dest="iRepeat", default=5,
+                       help="Number of times to import the card list")
+    oParser.add_option('-d', '--db',
+                       type="string", dest="sDBUrl",
+                       default="sqlite:///:memory:",
+                       help="Database URI to use (will be overwritten)")
+    return oParser, oParser.parse_args(aArgs)
+
+
+def time_import(sDBUrl, sCardList, sExpInfo, sLookupData, bBulk):
+    """Create a new database and time reading the card list into it."""
+    sqlhub.processConnection = connectionForURI(sDBUrl)
+    refresh_tables(TABLE_LIST, sqlhub.processConnection)
+    oLogHandler = make_null_handler()
+    read_lookup_data(EncodedFile(sLookupData), oLogHandler)
+    fStart = time.perf_counter()
+    read_white_wolf_list(EncodedFile(sCardList), oLogHandler, bBulk)
+    fTime = time.perf_counter() - fStart
+    read_exp_info_file(EncodedFile(sExpInfo), oLogHandler)
+    sqlhub.processConnection.close()
+    return fTime
+
+
+def main(aArgs):
+    """Run the benchmark"""
+    _oOptParser, (oOpts, _aArgs) = parse_options(aArgs)
+    aTmpFiles = [create_pkg_tmp_file(TEST_EXP_INFO),
+                 create_pkg_tmp_file(TEST_LOOKUP_LIST)]
+    sExpInfo, sLookupData = aTmpFiles
+    if oOpts.sCardList:
+        sCardList = oOpts.sCardList
+    else:
+        sCardList = create_pkg_tmp_file(TEST_CARD_LIST)
+        aTmpFiles.append(sCardList)
+    try:
+        for sMode, bBulk in (('normal', False), ('bulk', True)):
+            aTimes = [time_import(oOpts.sDBUrl, sCardList, sExpInfo,
+                                  sLookupData, bBulk)
+                      for _iRun in range(oOpts.iRepeat)]
+            print('%-6s: best %.3fs, mean %.3fs over %d runs' % (
+                sMode, min(aTimes), sum(aTimes) / len(aTimes),
+                len(aTimes)))
+    finally:
+        for sFile in aTmpFiles:
+            os.remove(sFile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
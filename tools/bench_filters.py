@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Compare the time taken to run the filter test suite using SQL queries
+   and using the in-memory FilterIndex.
+
+   We report both the total time for the suite and the time spent
+   selecting and fetching the filter results, since the suite also does
+   a lot of work unrelated to the filters.
+
+   This uses the test suite database. Run from the top level sutekh
+   directory (or with it on the PYTHONPATH)."""
+
+import optparse
+import os
+import sys
+import time
+import unittest
+
+from sutekh.base.core.BaseFilters import Filter
+from sutekh.base.core.DBUtility import get_cached_joins
+from sutekh.base.core.FilterIndex import FilterIndex, set_filter_index
+from sutekh.tests import create_db, setup_package, teardown_package
+from sutekh.tests.core.test_Filters import FilterTests
+
+
+def parse_options(aArgs):
+    """Parse aArgs for the options to the script"""
+    oParser = optparse.OptionParser(usage="usage %prog [options]",
+                                    version="%prog 0.1")
+    oParser.add_option('-n', '--repeat',
+                       type="int", dest="iRepeat", default=5,
+                       help="Number of times to run the filter tests")
+    return oParser, oParser.parse_args(aArgs)
+
+
+class SelectTimer:
+    """Wrap Filter.select to record the time taken to evaluate the
+       filters and fetch the results."""
+
+    def __init__(self):
+        self.fTime = 0.0
+        self._fOrigSelect = Filter.select
+
+    def __enter__(self):
+        fOrigSelect = self._fOrigSelect
+
+        def timed_select(oFilter, cCardClass):
+            """Time the select and fetching the results"""
+            fStart = time.perf_counter()
+            oResults = fOrigSelect(oFilter, cCardClass)
+            list(oResults.distinct())
+            self.fTime += time.perf_counter() - fStart
+            return oResults
+
+        Filter.select = timed_select
+        return self
+
+    def __exit__(self, *aExcInfo):
+        Filter.select = self._fOrigSelect
+
+
+def time_suite(bUseIndex):
+    """Time running the filter tests once, with or without the index.
+
+       The tests add card sets, so we recreate the database first."""
+    create_db()
+    oSuite = unittest.defaultTestLoader.loadTestsFromTestCase(FilterTests)
+    if bUseIndex:
+        set_filter_index(FilterIndex(get_cached_joins()))
+    else:
+        set_filter_index(None)
+    with open(os.devnull, 'w') as fNull, SelectTimer() as oTimer:
+        oRunner = unittest.TextTestRunner(stream=fNull)
+        fStart = time.perf_counter()
+        oResult = oRunner.run(oSuite)
+        fTime = time.perf_counter() - fStart
+    set_filter_index(None)
+    if not oResult.wasSuccessful():
+        raise RuntimeError('Filter tests failed (index: %s)' % bUseIndex)
+    return fTime, oTimer.fTime
+
+
+def main(aArgs):
+    """Run the benchmark"""
+    _oOptParser, (oOpts, _aArgs) = parse_options(aArgs)
+    setup_package()
+    try:
+        for sMode, bUseIndex in (('sql', False), ('index', True)):
+            aResults = [time_suite(bUseIndex)
+                        for _iRun in range(oOpts.iRepeat)]
+            for sPart, iPos in (('suite', 0), ('select', 1)):
+                aTimes = [x[iPos] for x in aResults]
+                print('%-6s %-6s: best %.3fs, mean %.3fs over %d runs' % (
+                    sMode, sPart, min(aTimes), sum(aTimes) / len(aTimes),
+                    len(aTimes)))
+    finally:
+        teardown_package()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8 ai ts=4 sts=4 et sw=4
+# Copyright 2026 Neil Muller <drnlmuller+sutekh@gmail.com>
+# GPL - see COPYING for details
+
+"""Time copying the database, as done by the database upgrade, for
+   increasing numbers of card sets.
+
+   This uses the test suite card list, and fills the card sets with
+   random cards. Use --verbose to see the rate for each table. Run from
+   the top level sutekh directory (or with it on the PYTHONPATH)."""
+
+import logging
+import optparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlobject import connectionForURI
+
+from sutekh.base.core.BaseTables import (PhysicalCard, PhysicalCardSet,
+                                         MapPhysicalCardToPhysicalCardSet)
+from sutekh.base.core.CardSetUtilities import change_card_sets
+from sutekh.base.core.DBUtility import refresh_tables
+from sutekh.base.tests.TestUtils import make_null_handler
+from sutekh.core.DatabaseUpgrade import DBUpgradeManager
+from sutekh.core.SutekhTables import TABLE_LIST
+from sutekh.tests import setup_package, teardown_package
+
+
+def parse_options(aArgs):
+    """Parse aArgs for the options to the script"""
+    oParser = optparse.OptionParser(usage="usage %prog [options]",
+                                    version="%prog 0.1")
+    oParser.add_option('-s', '--sets',
+                       type="string", dest="sSets", default="10,100,1000",
+                       help="Comma separated list of card set counts")
+    oParser.add_option('-c', '--cards',
+                       type="int", dest="iCards", default=75,
+                       help="Number of cards in each card set")
+    oParser.add_option('--verbose', action="store_true", dest="bVerbose",
+                       default=False, help="Log the rate for each table")
+    return oParser, oParser.parse_args(aArgs)
+
+
+def add_card_sets(iSets, iCards, aCards):
+    """Add card sets of random cards to the database."""
+    iStart = PhysicalCardSet.select().count()
+    dChanges = {}
+    for iNum in range(iStart, iSets):
+        oSet = PhysicalCardSet(name='Bench Set %d' % iNum)
+        dCards = {}
+        for oCard in random.choices(aCards, k=iCards):
+            dCards[oCard] = dCards.get(oCard, 0) + 1
+        dChanges[oSet] = dCards
+    change_card_sets(dChanges)
+
+
+def time_copy():
+    """Time copying the database to a new sqlite file."""
+    fDB, sDbFile = tempfile.mkstemp(suffix='.db')
+    os.close(fDB)
+    try:
+        oNewConn = connectionForURI("sqlite://%s" % sDbFile)
+        refresh_tables(TABLE_LIST, oNewConn, False)
+        oOrigConn = PhysicalCard._connection
+        fStart = time.perf_counter()
+        bOK, aMessages = DBUpgradeManager().copy_database(
+            oOrigConn, oNewConn, make_null_handler())
+        fTime = time.perf_counter() - fStart
+        oNewConn.close()
+    finally:
+        os.remove(sDbFile)
+    if not bOK:
+        raise RuntimeError('Copy failed: %s' % aMessages)
+    return fTime
+
+
+def main(aArgs):
+    """Run the benchmark"""
+    _oOptParser, (oOpts, _aArgs) = parse_options(aArgs)
+    if oOpts.bVerbose:
+        logging.basicConfig(level=logging.INFO)
+    setup_package()
+    try:
+        random.seed(42)
+        aCards = list(PhysicalCard.select())
+        for sSets in oOpts.sSets.split(','):
+            add_card_sets(int(sSets), oOpts.iCards, aCards)
+            iRows = MapPhysicalCardToPhysicalCardSet.select().count()
+            fTime = time_copy()
+            print('%6d sets, %8d card rows: %.3fs (%.0f card rows/s)' % (
+                PhysicalCardSet.select().count(), iRows, fTime,
+                iRows / fTime))
+    finally:
+        teardown_package()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))